@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+bench.py
+========
+
+Micro-benchmarks and profiles of the package hot paths, with JSON output that
+can be compared run to run.
+
+Cases (synthetic inputs, generated once into a temp dir, only for the cases
+selected with --only):
+
+  read_image_as_base64   proof image of --image-mb MB (noise JPEG)
+  create_metadata        same images; and N certificates in a row (--certs)
+  make_qr                burn-proof URL and Xumm deep link; N certificates
+  generate_rec           full certificate render with each proof image
+  wallet_from_seed       ed25519 and secp256k1 seeds
+  sign                   offline signing of a Payment
+  submit_and_wait        send_payment against the local simulator
+  pipeline               N payments through tx_pipeline against the simulator
+
+Each case is timed over --repeat runs after --warmup runs.  --profile adds a
+cProfile run and reports the top functions by cumulative time, --tracemalloc
+adds a run that records peak Python heap.  --baseline compares median times
+with a previous JSON report and exits 1 when a case regresses by more than
+--threshold.
+
+Usage:
+    python bench.py --output bench.json
+    python bench.py --preset full --profile --tracemalloc --output bench.json
+    python bench.py --only create_metadata --baseline bench.json
+
+Dependencies:
+    pip install xrpl-py Pillow qrcode[pil] PyYAML websockets
+"""
+import argparse
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from PIL import Image
+from xrpl.core.keypairs import generate_seed
+from xrpl.models.transactions import Payment
+from xrpl.transaction import sign
+from xrpl.wallet import Wallet
+
+import burn_and_mint_solrai_nft
+import generate_rec_image
+import send_payment
+from bench_flows import bench_config, simulator
+from solr_config import Config
+from tx_pipeline import pipeline
+
+PRESETS = {
+    # image sizes in MB, certificate batch sizes, renders per certificate batch
+    "quick": {"image_mb": [1], "certs": [1, 100], "render_certs": [1]},
+    "full": {"image_mb": [1, 4, 20], "certs": [1, 100, 1000, 10000], "render_certs": [1, 10]},
+}
+BURN_HASH = "B" * 64
+XUMM_URL = "https://xumm.app/sign/00000000-0000-0000-0000-000000000000"
+
+
+class Fixtures:
+    """Synthetic proof images, generated once per size into a temp dir."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.images: Dict[float, Path] = {}
+
+    def image(self, size_mb: float) -> Path:
+        if size_mb not in self.images:
+            self.images[size_mb] = self._noise_jpeg(size_mb)
+        return self.images[size_mb]
+
+    def _noise_jpeg(self, size_mb: float) -> Path:
+        # Noise does not compress, so JPEG size scales with pixel count;
+        # calibrate bytes/pixel on a small sample, then size the real image.
+        target = int(size_mb * 1024 * 1024)
+        sample = Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3))
+        buf = io.BytesIO()
+        sample.save(buf, format="JPEG", quality=95)
+        side = int((target / (buf.tell() / (256 * 256))) ** 0.5)
+        path = self.root / f"proof_{size_mb:g}mb.jpeg"
+        Image.frombytes("RGB", (side, side), os.urandom(side * side * 3)).save(path, format="JPEG", quality=95)
+        return path
+
+
+def run_case(name: str, params: dict, fn: Callable, units: int, args) -> dict:
+    for _ in range(args.warmup):
+        fn()
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    record = {
+        "case": name,
+        "params": params,
+        "units": units,
+        "repeat": len(samples),
+        "median_s": round(median, 6),
+        "min_s": round(min(samples), 6),
+        "max_s": round(max(samples), 6),
+        "per_unit_ms": round(1000 * median / units, 4),
+    }
+    if args.tracemalloc:
+        tracemalloc.start()
+        try:
+            fn()
+            record["peak_heap_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(fn)
+        record["profile"] = top_functions(profiler, args.profile_top)
+        if args.profile_dir:
+            Path(args.profile_dir).mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(Path(args.profile_dir) / f"{case_key(record).replace('|', '_')}.prof")
+    return record
+
+
+def top_functions(profiler: cProfile.Profile, limit: int) -> List[dict]:
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, func), (_cc, ncalls, tottime, cumtime, _callers) in stats.stats.items():
+        if filename == __file__ or func == "<method 'disable' of '_lsprof.Profiler' objects>":
+            continue  # the case lambda itself
+        rows.append({
+            "function": f"{Path(filename).name}:{line}({func})",
+            "ncalls": ncalls,
+            "tottime_s": round(tottime, 6),
+            "cumtime_s": round(cumtime, 6),
+        })
+    rows.sort(key=lambda r: r["cumtime_s"], reverse=True)
+    return rows[:limit]
+
+
+def case_key(record: dict) -> str:
+    params = ",".join(f"{k}={v}" for k, v in sorted(record["params"].items()))
+    return f"{record['case']}|{params}"
+
+
+# --- case builders: yield (name, params, setup, units); setup() builds the inputs and returns the timed fn ---
+def local_cases(preset: dict, fixtures: Fixtures, config: dict, out_dir: Path):
+    create_metadata = burn_and_mint_solrai_nft.create_metadata
+    for mb in preset["image_mb"]:
+        yield "read_image_as_base64", {"image_mb": mb}, \
+            lambda mb=mb: lambda p=fixtures.image(mb): burn_and_mint_solrai_nft.read_image_as_base64(p), 1
+        yield "create_metadata", {"image_mb": mb}, \
+            lambda mb=mb: lambda p=fixtures.image(mb): create_metadata(config, BURN_HASH, p), 1
+        for n in preset["render_certs"]:
+            yield "generate_rec", {"image_mb": mb, "certs": n}, \
+                lambda mb=mb, n=n: lambda p=fixtures.image(mb): render_batch(config, p, out_dir, n), n
+
+    small = preset["image_mb"][0]
+    for n in preset["certs"]:
+        yield "create_metadata_batch", {"image_mb": small, "certs": n}, \
+            lambda n=n: lambda p=fixtures.image(small): [create_metadata(config, f"{i:064X}", p) for i in range(n)], n
+        yield "make_qr_batch", {"certs": n}, \
+            lambda n=n: lambda: [generate_rec_image.make_qr(f"https://testnet.xrpl.org/transactions/{i:064X}")
+                                 for i in range(n)], n
+    yield "make_qr", {"payload": "burn_url"}, \
+        lambda: lambda: generate_rec_image.make_qr(f"https://testnet.xrpl.org/transactions/{BURN_HASH}"), 1
+    yield "make_qr", {"payload": "xumm_url"}, lambda: lambda: generate_rec_image.make_qr(XUMM_URL), 1
+
+    for algorithm in ("ed25519", "secp256k1"):
+        seed = generate_seed(entropy="00" * 16, algorithm=algorithm_enum(algorithm))
+        yield "wallet_from_seed", {"algorithm": algorithm}, lambda s=seed: lambda: Wallet.from_seed(s), 1
+        wallet = Wallet.from_seed(seed)
+        payment = Payment(account=wallet.classic_address, destination="rrrrrrrrrrrrrrrrrrrrBZbvji", amount="1000",
+                          fee="12", sequence=1, last_ledger_sequence=100)
+        yield "sign", {"algorithm": algorithm}, lambda w=wallet, tx=payment: lambda: sign(tx, w), 1
+
+
+def submission_cases(preset: dict, client, wallets: dict):
+    hot, owner = wallets["hot"], wallets["owner"]
+    yield "submit_and_wait", {"wrapper": "send_payment"}, \
+        lambda: lambda: send_payment.send_payment(client, hot, owner.classic_address, "1000"), 1
+    for n in (10, 100) if max(preset["certs"]) >= 100 else (10,):
+        txs = [Payment(account=hot.classic_address, destination=owner.classic_address, amount=str(1000 + i))
+               for i in range(n)]
+        yield "pipeline", {"txs": n}, lambda txs=txs: lambda: pipeline(client, hot, txs), n
+
+
+def algorithm_enum(name: str):
+    from xrpl import CryptoAlgorithm
+    return CryptoAlgorithm.ED25519 if name == "ed25519" else CryptoAlgorithm.SECP256K1
+
+
+def render_batch(config: Config, screenshot: Path, out_dir: Path, count: int) -> None:
+    for i in range(count):
+        generate_rec_image.generate_rec(
+            output=out_dir / f"rec_{i}.png",
+            screenshot=screenshot,
+            issuer=config.get("issuer_address", ""),
+            hot=config.get("hot_address", ""),
+            owner=config.get("system_owner_address", ""),
+            buyer=config.get("nft_buyer_address", ""),
+            currency=config.get("currency_code", "STN"),
+            kwh=1000.0,
+            jurisdiction=config.get("jurisdiction", ""),
+            program=config.get("program", ""),
+            vintage=str(config.get("vintage", "")),
+            meter_hash=config.get("meter_hash", ""),
+            oracle_ref=config.get("oracle_reference", ""),
+            burn_tx=f"{i:064X}",
+            price_usd=str(config.get("price_usd", "90")),
+            price_drops=str(config.get("price_xrp_drops", "270000000")),
+            config=config,
+        )
+
+
+def compare(records: List[dict], baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {case_key(r): r for r in json.load(f)["results"]}
+    regressions = []
+    for record in records:
+        old = baseline.get(case_key(record))
+        if not old or not old["median_s"]:
+            continue
+        ratio = record["median_s"] / old["median_s"]
+        record["baseline_ratio"] = round(ratio, 3)
+        if ratio > threshold:
+            regressions.append(f"{case_key(record)}: {old['median_s']:.6f}s -> {record['median_s']:.6f}s (x{ratio:.2f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and profile SOLR/SOLRAI hot paths")
+    parser.add_argument("--preset", choices=list(PRESETS), default="quick")
+    parser.add_argument("--image-mb", type=float, action="append", help="Override proof image sizes (MB)")
+    parser.add_argument("--certs", type=int, action="append", help="Override certificate batch sizes")
+    parser.add_argument("--only", action="append", help="Run only cases whose name contains this string")
+    parser.add_argument("--no-submit", action="store_true", help="Skip cases that need the local simulator")
+    parser.add_argument("--close-interval", type=float, default=1.0, help="Simulator ledger close interval (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--profile", action="store_true", help="Add a cProfile run per case")
+    parser.add_argument("--profile-top", type=int, default=15)
+    parser.add_argument("--profile-dir", default=None, help="Also dump .prof files here")
+    parser.add_argument("--tracemalloc", action="store_true", help="Add a tracemalloc run per case (peak heap)")
+    parser.add_argument("--baseline", default=None, help="Previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Regression ratio that fails --baseline")
+    parser.add_argument("--output", default="-", help="JSON output path, or - for stdout")
+    args = parser.parse_args()
+
+    preset = dict(PRESETS[args.preset])
+    if args.image_mb:
+        preset["image_mb"] = args.image_mb
+    if args.certs:
+        preset["certs"] = args.certs
+
+    def selected(name: str) -> bool:
+        return not args.only or any(s in name for s in args.only)
+
+    config = bench_config()
+    records = []
+    with ExitStack() as stack:
+        tmp = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="solr-bench-")))
+        fixtures = Fixtures(tmp)
+        cases = list(local_cases(preset, fixtures, config, tmp))
+        if not args.no_submit and any(selected(c) for c in ("submit_and_wait", "pipeline")):
+            _ledger, client, wallets = stack.enter_context(simulator("bench", args.close_interval))
+            cases += list(submission_cases(preset, client, wallets))
+        for name, params, setup, units in cases:
+            if not selected(name):
+                continue
+            print(f"{name} {params}", file=sys.stderr)
+            records.append(run_case(name, params, setup(), units, args))
+        image_bytes = {f"{mb:g}": p.stat().st_size for mb, p in fixtures.images.items()}
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "preset": args.preset,
+            "image_bytes": image_bytes,
+            "close_interval_s": args.close_interval,
+        },
+        "results": records,
+    }
+    regressions = compare(records, args.baseline, args.threshold) if args.baseline else []
+    report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
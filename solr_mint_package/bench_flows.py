@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+bench_flows.py
+==============
+
+Throughput / latency benchmark of the SOLR/SOLRAI flows against the local
+XRPL simulator (mock_rippled.py), so code-level changes can be measured
+without testnet latency.
+
+Every scenario runs on a fresh simulated ledger with deterministic wallets
+(seeds derived from the scenario name), does its one-time account setup
+untimed, then times each call of the module functions over --iterations:
+
+  mint_solr_token           issue_solr
+  burn_and_mint_solrai_nft  burn_solr, create_metadata, mint_solrai_nft
+  solrai_nft_flow           issue -> transfer -> burn -> metadata -> mint ->
+                            NFT to owner -> buyer payment
+  nft_market                single create/accept offers vs pipelined batches
+
+NFTokenMint URIs are capped at 256 bytes, so the embedded-image data URI
+built by create_metadata is always rejected.  The benchmark times
+create_metadata on the real image, then mints with a short sha256 reference
+to the metadata so the ledger path can still be measured.  The BLACKHOLE
+burn in solrai_nft_flow needs the simulator's blackhole sink; see
+mock_rippled.py.
+
+Usage:
+    python bench_flows.py --iterations 5 --close-interval 1.0 --output bench_flows.json
+
+Output is JSON: per scenario, transactions, tx/s, flows/s, ledgers closed,
+engine results and per-step latency (mean/p50/p95/max ms).
+
+Dependencies:
+    pip install xrpl-py websockets PyYAML
+"""
+import argparse
+import hashlib
+import importlib.metadata
+import json
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from xrpl.clients import JsonRpcClient
+from xrpl.core.keypairs import generate_seed
+from xrpl.models.transactions import NFTokenMint
+from xrpl.wallet import Wallet
+
+import burn_and_mint_solrai_nft
+import mint_solr_token
+import nft_market
+import solrai_nft_flow
+from mock_rippled import MockLedger, MockRippled
+from solr_config import Config, load_config
+from tx_pipeline import pipeline
+
+HERE = Path(__file__).resolve().parent
+ROLES = ("issuer", "hot", "owner", "buyer", "minter")
+GENESIS_DROPS = 100_000 * 1_000_000
+MAX_URI_HEX = 512
+PRICE_DROPS = "270000000"
+
+
+def make_wallets(tag: str) -> Dict[str, Wallet]:
+    """Deterministic wallets per scenario, so runs are comparable."""
+    wallets = {}
+    for role in ROLES:
+        entropy = hashlib.sha256(f"solr-bench:{tag}:{role}".encode()).hexdigest()[:32]
+        wallets[role] = Wallet.from_seed(generate_seed(entropy))
+    return wallets
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+class Timings:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def time(self, step: str, fn: Callable, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.samples.setdefault(step, []).append(time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        return {
+            step: {
+                "count": len(v),
+                "mean_ms": round(1000 * sum(v) / len(v), 3),
+                "p50_ms": round(1000 * percentile(v, 50), 3),
+                "p95_ms": round(1000 * percentile(v, 95), 3),
+                "max_ms": round(1000 * max(v), 3),
+            }
+            for step, v in self.samples.items()
+        }
+
+
+@contextmanager
+def simulator(tag: str, close_interval: float, blackhole_sink: bool = False, **ledger_options):
+    ledger = MockLedger(close_interval=close_interval, blackhole_sink=blackhole_sink, **ledger_options)
+    wallets = make_wallets(tag)
+    for wallet in wallets.values():
+        ledger.fund(wallet.classic_address, GENESIS_DROPS)
+    server = MockRippled(ledger).start()
+    try:
+        yield ledger, JsonRpcClient(server.rpc_url), wallets
+    finally:
+        server.stop()
+
+
+def bench_config() -> Config:
+    return load_config(str(HERE / "config.yaml"))
+
+
+def mintable_uri(uri_hex: str, notes: List[str]) -> str:
+    if len(uri_hex) <= MAX_URI_HEX:
+        return uri_hex
+    note = (f"data-URI metadata is {len(uri_hex) // 2} bytes, over the 256-byte NFTokenMint URI limit; "
+            "minted with a sha256 reference")
+    if note not in notes:
+        notes.append(note)
+    return ("sha256:" + hashlib.sha256(bytes.fromhex(uri_hex)).hexdigest()).encode("utf-8").hex()
+
+
+# --- scenarios: setup untimed, then `iterations` timed flows ---
+def scenario_mint_solr_token(client, wallets, iterations, timings, notes):
+    issuer, hot = wallets["issuer"], wallets["hot"]
+    currency = "STN"
+
+    def setup():
+        mint_solr_token.configure_account(client, issuer, is_issuer=True)
+        mint_solr_token.configure_account(client, hot, is_issuer=False)
+        mint_solr_token.create_trust_line(client, hot, issuer.classic_address, currency, limit=str(10**9))
+        mint_solr_token.authorize_trust_line(client, issuer, hot.classic_address, currency)
+
+    def run():
+        for _ in range(iterations):
+            timings.time("issue_solr", mint_solr_token.issue_solr, client, issuer, hot.classic_address,
+                         currency, Decimal("8.19"))
+
+    return setup, run
+
+
+def scenario_burn_and_mint_solrai_nft(client, wallets, iterations, timings, notes):
+    issuer, hot, minter = wallets["issuer"], wallets["hot"], wallets["minter"]
+    config = bench_config()
+    currency = config.get("currency_code", "STN")
+    image = HERE / config["image_path"]
+
+    def setup():
+        mint_solr_token.configure_account(client, issuer, is_issuer=True)
+        mint_solr_token.create_trust_line(client, hot, issuer.classic_address, currency, limit=str(10**9))
+        mint_solr_token.authorize_trust_line(client, issuer, hot.classic_address, currency)
+        mint_solr_token.issue_solr(client, issuer, hot.classic_address, currency, Decimal(1000 * iterations))
+
+    def run():
+        for _ in range(iterations):
+            burn_hash = timings.time("burn_solr", burn_and_mint_solrai_nft.burn_solr, client, hot,
+                                     issuer.classic_address, currency, amount="1000")
+            uri_hex = timings.time("create_metadata", burn_and_mint_solrai_nft.create_metadata, config, burn_hash, image)
+            timings.time("mint_solrai_nft", burn_and_mint_solrai_nft.mint_solrai_nft, client, minter,
+                         mintable_uri(uri_hex, notes))
+
+    return setup, run
+
+
+def scenario_solrai_nft_flow(client, wallets, iterations, timings, notes):
+    flow = solrai_nft_flow
+    issuer, hot, owner, buyer, minter = (wallets[r] for r in ROLES)
+    config = bench_config()
+    currency = config.get("currency_code", "STN")
+    image = HERE / config["image_path"]
+    notes.append("BLACKHOLE burn measured with the simulator's blackhole sink; rippled returns tecNO_DST")
+
+    def setup():
+        flow.configure_account(client, issuer, is_issuer=True)
+        flow.configure_account(client, hot, is_issuer=False)
+        flow.create_trust_line(client, hot, issuer.classic_address, currency, limit=str(10**9))
+        # The flow assumes the owner already holds a trust line (created by the owner at onboarding).
+        flow.create_trust_line(client, owner, issuer.classic_address, currency, limit=str(10**9))
+
+    def run():
+        for _ in range(iterations):
+            timings.time("issue_stn", flow.issue_stn, client, issuer, hot.classic_address, currency, 1000)
+            timings.time("transfer_stn", flow.transfer_stn, client, hot, owner.classic_address, currency, 1000,
+                         issuer.classic_address)
+            burn_hash = timings.time("burn_stn", flow.burn_stn, client, owner, currency, "1000", issuer.classic_address)
+            uri_hex = mintable_uri(timings.time("create_metadata", flow.create_metadata, config, burn_hash, image), notes)
+            timings.time("mint_solrai_nft", flow.mint_solrai_nft, client, minter, uri_hex)
+            nft_id = timings.time("fetch_nft_id_by_uri", flow.fetch_nft_id_by_uri, client, minter.classic_address, uri_hex)
+            timings.time("transfer_nft_to_owner", flow.transfer_nft_to_owner, client, minter, owner, nft_id)
+            timings.time("send_xrp_payment", flow.send_xrp_payment, client, buyer, owner.classic_address, PRICE_DROPS)
+
+    return setup, run
+
+
+def scenario_nft_market(client, wallets, iterations, timings, notes):
+    owner, buyer = wallets["owner"], wallets["buyer"]
+    nft_ids: List[str] = []
+
+    def setup():
+        mints = [NFTokenMint(account=owner.classic_address, nftoken_taxon=0, flags=8) for _ in range(2 * iterations)]
+        nft_ids.extend(row["meta"]["nftoken_id"] for row in pipeline(client, owner, mints))
+
+    def run():
+        singles, batched = nft_ids[:iterations], nft_ids[iterations:]
+        offers = []
+        for nft_id in singles:
+            res = timings.time("create_sell_offer", nft_market.create_sell_offer, owner, client, nft_id, PRICE_DROPS)
+            offers.append(nft_market.offer_index_from_meta(res["meta"]))
+        for index in offers:
+            timings.time("accept_sell_offer", nft_market.accept_sell_offer, buyer, client, index)
+
+        entries = [{"nft_id": nft_id, "amount_drops": PRICE_DROPS} for nft_id in batched]
+        rows = timings.time("create_sell_offers_batch", lambda: list(
+            nft_market.create_sell_offers_batch(owner, client, entries)))
+        accepts = [{"offer_index": r["offer_index"]} for r in rows]
+        timings.time("accept_sell_offers_batch", lambda: list(nft_market.accept_sell_offers_batch(buyer, client, accepts)))
+        for step in ("create_sell_offers_batch", "accept_sell_offers_batch"):
+            per_offer = 1000 * sum(timings.samples[step]) / max(1, len(batched))
+            notes.append(f"{step}: {per_offer:.1f} ms per offer for {len(batched)} offers")
+
+    return setup, run
+
+
+SCENARIOS = {
+    "mint_solr_token": (scenario_mint_solr_token, False),
+    "burn_and_mint_solrai_nft": (scenario_burn_and_mint_solrai_nft, False),
+    "solrai_nft_flow": (scenario_solrai_nft_flow, True),
+    "nft_market": (scenario_nft_market, False),
+}
+
+
+def run_scenario(name: str, iterations: int, close_interval: float) -> dict:
+    factory, blackhole_sink = SCENARIOS[name]
+    with simulator(name, close_interval, blackhole_sink) as (ledger, client, wallets):
+        timings, notes = Timings(), []
+        setup, run = factory(client, wallets, iterations, timings, notes)
+        setup()
+        before = dict(ledger.stats)
+        start = time.perf_counter()
+        error = None
+        try:
+            run()
+        except Exception as e:  # report and continue with the next scenario
+            error = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - start
+        after = dict(ledger.stats)
+    delta = {k: v - before.get(k, 0) for k, v in after.items() if v - before.get(k, 0)}
+    transactions = delta.get("submitted", 0)
+    return {
+        "scenario": name,
+        "iterations": iterations,
+        "elapsed_s": round(elapsed, 3),
+        "transactions": transactions,
+        "tx_per_s": round(transactions / elapsed, 3) if elapsed else None,
+        "flows_per_s": round(iterations / elapsed, 3) if elapsed else None,
+        "ledgers_closed": delta.get("ledgers_closed", 0),
+        "engine_results": {k.split(":", 1)[1]: v for k, v in delta.items() if k.startswith("validated:")},
+        "steps": timings.summary(),
+        "notes": notes,
+        "error": error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SOLR/SOLRAI flows against the local XRPL simulator")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--close-interval", type=float, default=1.0, help="Simulated ledger close interval (s)")
+    parser.add_argument("--output", default="-", help="JSON output path, or - for stdout")
+    args = parser.parse_args()
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "xrpl_py": importlib.metadata.version("xrpl-py"),
+            "close_interval_s": args.close_interval,
+        },
+        "scenarios": [],
+    }
+    for name in args.scenario or list(SCENARIOS):
+        print(f"Running {name}...", file=sys.stderr)
+        report["scenarios"].append(run_scenario(name, args.iterations, args.close_interval))
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,35 +15,41 @@ If `--burn-tx-hash` is omitted, the script will perform the burn and use the
 returned transaction hash.  Otherwise, it will skip the burn step and use
 the provided hash when constructing the metadata.
 
+The proof image is checked against the proof index (proof_index.py) before
+anything is submitted: an image already used by another mint, or a
+near-duplicate of one, is refused unless --allow-proof-reuse is given.
+`--image sha256:<hex>` uses an image stored in the index.
+
 Dependencies:
-    pip install xrpl PyYAML python-dotenv
+    pip install xrpl PyYAML python-dotenv Pillow numpy
 """
 
 import argparse
 import json
+import os
 import sys
 import base64
 from pathlib import Path
-import yaml
 from typing import Optional
 
 import xrpl
 from xrpl.clients import JsonRpcClient
 from xrpl.wallet import Wallet
 from xrpl.models import transactions, requests
-from xrpl.transaction import safe_sign_and_submit_transaction, send_reliable_submission
-
 
-TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+from burn_verifier import DEFAULT_INDEX, POLICIES, BurnAlreadyConsumed, BurnIndex, verify_burns
+from key_provider import keys_or_exit
+from meter_proofs import configured_proof, embed_proof
+from solr_config import config_or_exit
+from stream_codec import metadata_uri_hex
+from telemetry import TransactionNotApplied, submit_and_wait
 
 
-def load_config(path: str = "config.yaml") -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
 
 
 def get_client() -> JsonRpcClient:
-    return JsonRpcClient(TESTNET_URL)
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
 
 
 def burn_solr(
@@ -68,9 +74,8 @@ def burn_solr(
         },
         destination=issuer_address,
     )
-    signed = safe_sign_and_submit_transaction(burn_tx, hot_wallet, client)
-    response = send_reliable_submission(signed, client)
-    tx_hash = response.result.get("hash") or signed.result.get("hash")
+    response = submit_and_wait(burn_tx, client, hot_wallet)
+    tx_hash = response.result.get("hash")
     return tx_hash
 
 
@@ -81,19 +86,12 @@ def read_image_as_base64(image_path: Path) -> str:
     return encoded
 
 
-def create_metadata(config: dict, burn_tx_hash: str, image_path: Path) -> str:
-    """Construct metadata JSON and return a hex‑encoded data URI for the NFT.
+def metadata_fields(config: dict, burn_tx_hash: str) -> dict:
+    """Return the SOLRAI certificate fields shared by every metadata encoding (no image).
 
-    Parameters:
-        config: configuration dictionary.
-        burn_tx_hash: transaction hash of the burn operation.
-        image_path: path to the screenshot to embed.
-
-    Returns a hexadecimal string suitable for the `URI` field of an NFTokenMint
-    transaction.
+    With `meter_proof` in config the reading's Merkle inclusion proof is embedded (meter_proofs.embed_proof).
     """
-    image_b64 = read_image_as_base64(image_path)
-    metadata = {
+    fields = {
         "$schema": "https://schema.solrai.energy/rec-nft-metadata.json#",
         "schema_version": config.get("schema_version", "1.0"),
         "jurisdiction": config.get("jurisdiction"),
@@ -122,11 +120,26 @@ def create_metadata(config: dict, burn_tx_hash: str, image_path: Path) -> str:
             {"trait_type": "Transfer Fee (bps)", "value": 10000},
             {"trait_type": "Flags", "value": ["Transferable", "Burnable"]},
         ],
-        "image": f"data:image/jpeg;base64,{image_b64}",
     }
-    json_str = json.dumps(metadata, separators=(",", ":"))
-    data_uri = "data:application/json;base64," + base64.b64encode(json_str.encode("utf-8")).decode("ascii")
-    return data_uri.encode("utf-8").hex()
+    proof = configured_proof(config)
+    return fields if proof is None else embed_proof(fields, proof)
+
+
+def create_metadata(config: dict, burn_tx_hash: str, image_path: Path) -> str:
+    """Construct metadata JSON and return a hex‑encoded data URI for the NFT.
+
+    Parameters:
+        config: configuration dictionary.
+        burn_tx_hash: transaction hash of the burn operation.
+        image_path: path to the screenshot to embed.
+
+    Returns a hexadecimal string suitable for the `URI` field of an NFTokenMint
+    transaction.
+
+    The image is streamed through both base64 layers (stream_codec), so only
+    the output buffer and the returned string are ever full-size.
+    """
+    return metadata_uri_hex(metadata_fields(config, burn_tx_hash), image_path)
 
 
 def mint_solrai_nft(
@@ -147,12 +160,14 @@ def mint_solrai_nft(
         flags=flags,
         nftoken_taxon=taxon,
     )
-    signed = safe_sign_and_submit_transaction(nft_mint_tx, minter_wallet, client)
-    result = send_reliable_submission(signed, client)
+    result = submit_and_wait(nft_mint_tx, client, minter_wallet)
     return result.result
 
 
 def main() -> None:
+    # Imported here so the benches can import create_metadata without NumPy/Pillow
+    from proof_index import DEFAULT_INDEX as DEFAULT_PROOF_INDEX, ProofIndex, ProofReused, guard
+
     parser = argparse.ArgumentParser(description="Burn SOLR tokens and mint a SOLRAI NFT")
     parser.add_argument(
         "--burn-tx-hash",
@@ -163,23 +178,38 @@ def main() -> None:
     parser.add_argument(
         "--image",
         default="IMG_A6FBCF8F-9700-4089-ADB0-5C914EF43766.jpeg",
-        help="Relative path to the screenshot image used as proof",
+        help="Relative path to the screenshot image used as proof, or sha256:<hex> for a stored one",
     )
+    parser.add_argument("--proof-index", default=DEFAULT_PROOF_INDEX, help="SQLite index of proof images used")
+    parser.add_argument("--allow-proof-reuse", action="store_true",
+                        help="Mint even if the proof image (or a near-duplicate) backs another NFT")
+    parser.add_argument("--burn-index", default=DEFAULT_INDEX, help="SQLite index of verified/consumed burns")
+    parser.add_argument("--burn-policy", choices=POLICIES, default="either", help="Allowed burn destination")
     args = parser.parse_args()
 
-    config = load_config(args.config)
+    config = config_or_exit(args.config)
+    keys = keys_or_exit(config, "issuer", "hot", "minter")
+    try:  # a bad meter proof must fail before anything is burned
+        configured_proof(config)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: meter_proof: {e}")
     currency_code = config.get("currency_code", "SOLR")
-
-    issuer_seed = config.get("issuer_seed")
-    hot_seed = config.get("hot_seed")
-    minter_seed = config.get("nft_minter_seed")
-    if not issuer_seed or not hot_seed or not minter_seed:
-        sys.exit("Error: issuer_seed, hot_seed, and nft_minter_seed must be defined in the config file.")
+    proofs = ProofIndex(args.proof_index)
+    try:
+        image_path = proofs.resolve(args.image)
+    except FileNotFoundError as e:
+        sys.exit(f"Error: {e}")
+    if not image_path.exists():
+        sys.exit(f"Error: image file {image_path} not found.")
+    try:
+        proof = guard(proofs, image_path, args.allow_proof_reuse)
+    except ProofReused as e:
+        sys.exit(f"Error: {e}")
 
     client = get_client()
-    issuer_wallet = Wallet.from_seed(issuer_seed)
-    hot_wallet = Wallet.from_seed(hot_seed)
-    minter_wallet = Wallet.from_seed(minter_seed)
+    issuer_wallet = keys.wallet("issuer")
+    hot_wallet = keys.wallet("hot")
+    minter_wallet = keys.wallet("minter")
 
     burn_tx_hash: Optional[str] = args.burn_tx_hash
 
@@ -196,22 +226,44 @@ def main() -> None:
     else:
         print(f"Using provided burn transaction hash: {burn_tx_hash}")
 
-    image_path = Path(args.image)
-    if not image_path.exists():
-        sys.exit(f"Error: image file {image_path} not found.")
+    burn_index = BurnIndex(args.burn_index)
+    verdict = verify_burns(client, [burn_tx_hash], currency_code, issuer_wallet.classic_address,
+                           policy=args.burn_policy, index=burn_index)[0]
+    if not verdict["ok"]:
+        sys.exit(f"Error: burn {burn_tx_hash} rejected: {verdict['reason']}")
 
     print("Constructing metadata and data URI...")
     uri_hex = create_metadata(config, burn_tx_hash, image_path)
 
+    # Reserve the burn before minting so it can never back a second NFT.
+    try:
+        burn_index.consume(burn_tx_hash, f"{minter_wallet.classic_address}:pending")
+    except BurnAlreadyConsumed as e:
+        sys.exit(f"Error: {e}")
+
     print("Minting SOLRAI NFT via designated minter...")
-    tx_result = mint_solrai_nft(
-        client,
-        minter_wallet,
-        uri_hex,
-        transfer_fee=10000,  # 10% fee (8% marketplace + 2% ESG)
-        flags=0x09,  # tfBurnable (1) + tfTransferable (8)
-        taxon=0,
-    )
+    try:
+        tx_result = mint_solrai_nft(
+            client,
+            minter_wallet,
+            uri_hex,
+            transfer_fee=10000,  # 10% fee (8% marketplace + 2% ESG)
+            flags=0x09,  # tfBurnable (1) + tfTransferable (8)
+            taxon=0,
+        )
+    except TransactionNotApplied:
+        burn_index.release(burn_tx_hash)
+        raise
+    except Exception as e:
+        # The mint may have validated: keep the reservation so the burn cannot back a second NFT.
+        sys.exit(f"Error: mint outcome unknown ({type(e).__name__}: {e}); burn {burn_tx_hash} stays reserved as "
+                 f"pending.  Look for an NFT with this burn hash (nft_metadata.py list), then run "
+                 f"`burn_verifier.py assign {burn_tx_hash} --nft-ref <NFTokenID>` or, if none was minted, "
+                 f"`burn_verifier.py release {burn_tx_hash}`.")
+    nft_id = tx_result.get("meta", {}).get("nftoken_id")
+    if nft_id:
+        burn_index.assign(burn_tx_hash, nft_id)
+        proofs.record(proof["fingerprint"], nft_id, image_path)
     print(json.dumps(tx_result, indent=4))
     print("SOLRAI NFT minted.  Record the NFTokenID from the transaction metadata for future use.")
 
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+burn_verifier.py
+================
+
+Bulk verification of STN burn proofs before SOLRAI NFTs are minted against
+them.
+
+For every burn hash the `tx` lookup is fetched through a bounded thread pool
+and checked against the burn policy:
+
+  - validated, Payment, tesSUCCESS
+  - delivered amount (meta delivered_amount, so partial payments cannot
+    under-burn) is exactly 1,000 of the configured currency and issuer
+  - destination allowed by the policy: the issuer (burn_and_mint_solrai_nft
+    redeems to the issuer), the BLACKHOLE account (solr_constants), or either
+
+Validated transactions are final, so their lookups are cached (the fields
+the policy reads) in a local SQLite index and re-checked locally on later
+runs, whatever policy is asked for; transient outcomes (not found, not yet
+validated, RPC errors) are not cached.  The same index records consumed burns: `consume()` inserts under a
+primary key, so one burn can back at most one NFT even across processes.
+
+Usage:
+    python burn_verifier.py verify <hash> [<hash> ...] [--file hashes.txt] [--policy either]
+    python burn_verifier.py consume <hash> --nft-ref <uri-or-nft-id>
+    python burn_verifier.py status <hash>
+    python burn_verifier.py assign <hash> --nft-ref <nft-id>    # settle a "<minter>:pending" reservation
+    python burn_verifier.py release <hash>                      # ... whose mint never happened
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests import Tx
+
+from solr_config import config_or_exit
+from solr_constants import BLACKHOLE
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+BURN_AMOUNT = Decimal("1000")
+DEFAULT_INDEX = "burn_index.sqlite"
+DEFAULT_WORKERS = 8
+POLICIES = ("issuer", "blackhole", "either")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS burn_tx (
+    hash TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS consumed (
+    hash TEXT PRIMARY KEY,
+    nft_ref TEXT NOT NULL,
+    consumed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS consumed_nft_ref ON consumed (nft_ref);
+"""
+
+
+class BurnAlreadyConsumed(Exception):
+    pass
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def currency_code(code: str) -> str:
+    """Normalize a 40-hex currency code to its ASCII form (e.g. STN); applied to both sides of a compare."""
+    if len(code) == 40:
+        try:
+            return bytes.fromhex(code).rstrip(b"\x00").decode("ascii")
+        except (ValueError, UnicodeDecodeError):
+            return code.upper()
+    return code
+
+
+def check_burn(result: dict, currency: str, issuer: str, policy: str = "either") -> Dict:
+    """Apply the burn policy to a `tx` response; returns the verdict row."""
+    tx = result.get("tx_json", result)
+    meta = result.get("meta") or result.get("metaData") or {}
+    row = {
+        "hash": (result.get("hash") or tx.get("hash") or "").upper(),
+        "ok": False,
+        "reason": None,
+        "account": tx.get("Account"),
+        "destination": tx.get("Destination"),
+        "value": None,
+        "ledger_index": result.get("ledger_index"),
+        "final": bool(result.get("validated")),
+    }
+    allowed = {"issuer": {issuer}, "blackhole": {BLACKHOLE}, "either": {issuer, BLACKHOLE}}[policy]
+    delivered = meta.get("delivered_amount", tx.get("Amount"))
+    if not result.get("validated"):
+        row["reason"] = "not validated"
+    elif tx.get("TransactionType") != "Payment":
+        row["reason"] = f"not a Payment ({tx.get('TransactionType')})"
+    elif meta.get("TransactionResult") != "tesSUCCESS":
+        row["reason"] = f"failed ({meta.get('TransactionResult')})"
+    elif not isinstance(delivered, dict):
+        row["reason"] = "delivered XRP, not an issued currency"
+    elif currency_code(delivered.get("currency", "")) != currency_code(currency) or delivered.get("issuer") != issuer:
+        row["reason"] = f"wrong currency {delivered.get('currency')}/{delivered.get('issuer')}"
+    elif tx.get("Destination") not in allowed:
+        row["reason"] = f"destination {tx.get('Destination')} not allowed by policy '{policy}'"
+    else:
+        row["value"] = delivered.get("value")
+        try:
+            amount = Decimal(row["value"])
+        except (InvalidOperation, TypeError):
+            amount = None
+        if amount != BURN_AMOUNT:
+            row["reason"] = f"burned {row['value']}, expected {BURN_AMOUNT}"
+        else:
+            row["ok"] = True
+    return row
+
+
+class BurnIndex:
+    """SQLite record of verified and consumed burns (WAL, safe across processes)."""
+
+    def __init__(self, path: str = DEFAULT_INDEX):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.memo: Dict[str, dict] = {}
+
+    def cached(self, tx_hash: str) -> Optional[dict]:
+        """The cached (validated) `tx` result for a burn, if any."""
+        if tx_hash in self.memo:
+            return self.memo[tx_hash]
+        row = self.conn.execute("SELECT result FROM burn_tx WHERE hash = ?", (tx_hash,)).fetchone()
+        if row is None:
+            return None
+        result = self.memo[tx_hash] = json.loads(row[0])
+        return result
+
+    def store(self, tx_hash: str, result: dict) -> None:
+        """Cache a validated `tx` result, keeping only the fields check_burn reads."""
+        tx = result.get("tx_json", result)
+        meta = result.get("meta") or result.get("metaData") or {}
+        slim = {
+            "hash": tx_hash,
+            "validated": True,
+            "ledger_index": result.get("ledger_index"),
+            "tx_json": {k: tx.get(k) for k in ("TransactionType", "Account", "Destination", "Amount")},
+            "meta": {k: meta.get(k) for k in ("TransactionResult", "delivered_amount") if k in meta},
+        }
+        self.conn.execute("INSERT OR REPLACE INTO burn_tx VALUES (?, ?, ?)",
+                          (tx_hash, json.dumps(slim, separators=(",", ":")), time.time()))
+        self.memo[tx_hash] = slim
+
+    def consumed_by(self, tx_hash: str) -> Optional[str]:
+        row = self.conn.execute("SELECT nft_ref FROM consumed WHERE hash = ?", (tx_hash.upper(),)).fetchone()
+        return row[0] if row else None
+
+    def burn_for(self, nft_ref: str) -> Optional[str]:
+        """The burn consumed by `nft_ref` (the reverse of consumed_by)."""
+        row = self.conn.execute("SELECT hash FROM consumed WHERE nft_ref = ?", (nft_ref,)).fetchone()
+        return row[0] if row else None
+
+    def consume(self, tx_hash: str, nft_ref: str) -> None:
+        """Mark a burn as used; raises BurnAlreadyConsumed if it already backs an NFT."""
+        try:
+            self.conn.execute("INSERT INTO consumed VALUES (?, ?, ?)", (tx_hash.upper(), nft_ref, time.time()))
+        except sqlite3.IntegrityError:
+            raise BurnAlreadyConsumed(f"burn {tx_hash} already backs {self.consumed_by(tx_hash)}") from None
+
+    def assign(self, tx_hash: str, nft_ref: str) -> None:
+        """Point a consumed burn at the NFT finally minted against it."""
+        self.conn.execute("UPDATE consumed SET nft_ref = ? WHERE hash = ?", (nft_ref, tx_hash.upper()))
+
+    def release(self, tx_hash: str) -> None:
+        """Undo consume() when the mint it was reserved for did not happen."""
+        self.conn.execute("DELETE FROM consumed WHERE hash = ?", (tx_hash.upper(),))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def fetch_tx(client: JsonRpcClient, tx_hash: str) -> dict:
+    response = client.request(Tx(transaction=tx_hash))
+    if not response.is_successful():
+        return {"hash": tx_hash, "error": response.result.get("error", "request failed")}
+    return response.result
+
+
+def verify_burns(
+    client: JsonRpcClient,
+    hashes: Iterable[str],
+    currency: str,
+    issuer: str,
+    policy: str = "either",
+    index: Optional[BurnIndex] = None,
+    workers: int = DEFAULT_WORKERS,
+) -> List[dict]:
+    """Verify burn hashes concurrently; results in input order with `cached` and `consumed_by`."""
+    hashes = [h.strip().upper() for h in hashes]
+    verdicts: Dict[str, dict] = {}
+    todo = []
+    for h in dict.fromkeys(hashes):
+        cached = index.cached(h) if index else None
+        if cached is not None:
+            verdicts[h] = dict(check_burn(cached, currency, issuer, policy), hash=h, cached=True)
+        else:
+            todo.append(h)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        fetched = list(pool.map(lambda h: fetch_tx(client, h), todo))
+    for h, result in zip(todo, fetched):
+        if "error" in result:
+            verdict = {"hash": h, "ok": False, "reason": result["error"], "account": None, "destination": None,
+                       "value": None, "ledger_index": None, "final": False}
+        else:
+            verdict = check_burn(result, currency, issuer, policy)
+            verdict["hash"] = h
+            if verdict["final"] and index:
+                index.store(h, result)
+        verdicts[h] = dict(verdict, cached=False)
+
+    rows = []
+    for h in hashes:
+        row = dict(verdicts[h])
+        row["consumed_by"] = index.consumed_by(h) if index else None
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify STN burn proofs in bulk")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="SQLite burn index path")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_verify = sub.add_parser("verify")
+    p_verify.add_argument("hashes", nargs="*")
+    p_verify.add_argument("--file", default=None, help="File with one burn hash per line")
+    p_verify.add_argument("--policy", choices=POLICIES, default="either", help="Allowed burn destination")
+    p_verify.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+
+    p_consume = sub.add_parser("consume")
+    p_consume.add_argument("hash")
+    p_consume.add_argument("--nft-ref", required=True, help="NFTokenID or URI the burn backs")
+
+    p_status = sub.add_parser("status")
+    p_status.add_argument("hash")
+
+    p_assign = sub.add_parser("assign", help="Point a pending reservation at the NFT that was minted")
+    p_assign.add_argument("hash")
+    p_assign.add_argument("--nft-ref", required=True, help="NFTokenID minted against the burn")
+
+    p_release = sub.add_parser("release", help="Drop a pending reservation whose mint did not happen")
+    p_release.add_argument("hash")
+
+    args = parser.parse_args()
+    index = BurnIndex(args.index)
+    try:
+        if args.cmd == "verify":
+            hashes = list(args.hashes)
+            if args.file:
+                with open(args.file, "r", encoding="utf-8") as f:
+                    hashes += [line.strip() for line in f if line.strip()]
+            cfg = config_or_exit(args.config, "issuer_address")
+            rows = verify_burns(get_client(), hashes, cfg.get("currency_code", "STN"), cfg["issuer_address"],
+                                policy=args.policy, index=index, workers=args.workers)
+            for row in rows:
+                print(json.dumps(row))
+            if not all(r["ok"] and not r["consumed_by"] for r in rows):
+                sys.exit(1)
+        elif args.cmd == "consume":
+            try:
+                index.consume(args.hash, args.nft_ref)
+            except BurnAlreadyConsumed as e:
+                sys.exit(f"Error: {e}")
+            print(f"Recorded {args.hash.upper()} -> {args.nft_ref}")
+        elif args.cmd in ("assign", "release"):
+            current = index.consumed_by(args.hash)
+            if current is None or not current.endswith(":pending"):
+                sys.exit(f"Error: burn {args.hash.upper()} has no pending reservation (consumed by {current})")
+            if args.cmd == "assign":
+                index.assign(args.hash, args.nft_ref.upper())
+                print(f"Assigned {args.hash.upper()} -> {args.nft_ref.upper()}")
+            else:
+                index.release(args.hash)
+                print(f"Released {args.hash.upper()}")
+        else:
+            print(json.dumps({"ledger": index.cached(args.hash.upper()), "consumed_by": index.consumed_by(args.hash)}))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+cert_server.py
+==============
+
+On-demand SOLRAI REC certificate images over HTTP (Flask, like xumm_server.py).
+
+generate_rec_image.py writes one PNG per run, so a marketplace would have to
+pre-render every certificate and manage the files.  Here a certificate is
+rendered the first time it is requested:
+
+  - the NFTokenID or burn hash is resolved through the burn index
+    (burn_verifier.BurnIndex) to its (burn, NFT) pair; unknown ids, and
+    burns whose mint is still pending or failed, are 404s
+  - every render input (generate_rec_image.render_inputs: config fields,
+    burn and NFT ids, screenshot digest, RENDER_VERSION) is hashed with
+    SHA-256; the PNG is cached on disk as <cache>/<hh>/<hash>.png and the
+    hash is its ETag
+  - repeats are served from disk with ETag/If-None-Match (304) and Range
+    (206) support, without re-rendering
+  - concurrent requests for the same certificate share one render; the
+    file is written to a temporary name and renamed into place
+
+Endpoints:
+ - GET /certificates/nft/<NFTokenID>.png
+ - GET /certificates/burn/<burn tx hash>.png
+ - GET /stats   -> render/hit counters
+
+Usage:
+    python cert_server.py serve [--port 5002] [--cache-dir rec_cache] [--burn-index burn_index.sqlite]
+    python cert_server.py bench --certs 16 --clients 8 --requests 2000     # cold vs warm p99
+
+Dependencies:
+    pip install Flask Pillow qrcode[pil] PyYAML
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Flask, abort, jsonify, send_file
+
+from burn_verifier import DEFAULT_INDEX, BurnIndex
+from generate_rec_image import DEFAULT_SCREENSHOT, generate_rec, render_inputs, render_key, sample_fields
+from solr_config import Config, config_or_exit
+
+DEFAULT_CACHE_DIR = "rec_cache"
+KWH_PER_CERT = 1000.0
+MAX_AGE = 86400
+HEX64 = re.compile(r"^[0-9A-Fa-f]{64}$")
+
+
+class RenderCache:
+    """Content-addressed PNG files on disk, with one in-flight render per key."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.lock = threading.Lock()
+        self.inflight: Dict[str, Future] = {}
+        self.stats = Counter()
+
+    def path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def get(self, key: str, render: Callable[[Path], None]) -> Path:
+        """Path of the cached image for `key`, calling render(tmp_path) once if it is missing."""
+        path = self.path(key)
+        if path.exists():
+            self.stats["hits"] += 1
+            return path
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        if not leader:
+            self.stats["shared"] += 1
+            return future.result()
+        try:
+            if path.exists():  # finished between the first check and taking the lock
+                self.stats["hits"] += 1
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.png")
+                render(tmp)
+                os.replace(tmp, path)
+                self.stats["renders"] += 1
+            future.set_result(path)
+        except BaseException as e:
+            self.stats["errors"] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+        return path
+
+
+def create_app(config: Config, burn_index_path: str = DEFAULT_INDEX, cache_dir: str = DEFAULT_CACHE_DIR,
+               screenshot: Optional[str] = None) -> Flask:
+    app = Flask(__name__)
+    cache = RenderCache(Path(cache_dir))
+    screenshot_path = Path(screenshot or config.get("image_path", DEFAULT_SCREENSHOT))
+    local = threading.local()  # sqlite connections are per thread
+    app.config["RENDER_CACHE"] = cache
+
+    def index() -> BurnIndex:
+        if getattr(local, "index", None) is None:
+            local.index = BurnIndex(burn_index_path)
+        return local.index
+
+    def serve(burn_tx: str, nft_id: Optional[str]):
+        inputs = render_inputs(config, screenshot_path, burn_tx, nft_id, KWH_PER_CERT)
+        key = render_key(inputs)
+
+        def render(tmp: Path) -> None:
+            fields = {k: inputs[k] for k in sample_fields(config)}
+            generate_rec(output=tmp, screenshot=screenshot_path, kwh=KWH_PER_CERT, burn_tx=burn_tx, nft_id=nft_id,
+                         config=config, **fields)
+
+        path = cache.get(key, render)
+        return send_file(path, mimetype="image/png", etag=key, conditional=True, max_age=MAX_AGE)
+
+    @app.route("/certificates/nft/<nft_id>.png")
+    def by_nft(nft_id: str):
+        if not HEX64.match(nft_id):
+            return abort(400, description="NFTokenID must be 64 hex characters")
+        nft_id = nft_id.upper()
+        burn_tx = index().burn_for(nft_id)
+        if burn_tx is None:
+            return abort(404, description="no burn is recorded for this NFT")
+        return serve(burn_tx, nft_id)
+
+    @app.route("/certificates/burn/<burn_tx>.png")
+    def by_burn(burn_tx: str):
+        if not HEX64.match(burn_tx):
+            return abort(400, description="burn hash must be 64 hex characters")
+        burn_tx = burn_tx.upper()
+        nft_ref = index().consumed_by(burn_tx)
+        if nft_ref is None or not HEX64.match(nft_ref):  # pending and failed mints have no NFT yet
+            return abort(404, description="no NFT has been minted from this burn")
+        return serve(burn_tx, nft_ref.upper())
+
+    @app.route("/stats")
+    def stats():
+        return jsonify(dict(cache.stats))
+
+    return app
+
+
+# --- load test ---
+def bench(certs: int, clients: int, requests: int, screenshot: Optional[str] = None) -> dict:
+    """Cold (first request, concurrent per certificate) vs warm vs 304 latency against a local server."""
+    import logging
+    import random
+    import tempfile
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from urllib.error import HTTPError
+
+    from werkzeug.serving import make_server
+
+    from bench_flows import percentile
+
+    def fetch(url: str, headers: Optional[dict] = None) -> Tuple[float, int, int]:
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+                status, size = response.status, len(response.read())
+        except HTTPError as e:
+            status, size = e.code, 0
+        return time.perf_counter() - start, status, size
+
+    def summary(results) -> dict:
+        latencies = [r[0] * 1000 for r in results]
+        return {"requests": len(results), "status": dict(Counter(r[1] for r in results)),
+                "p50_ms": round(percentile(latencies, 50), 2), "p99_ms": round(percentile(latencies, 99), 2),
+                "max_ms": round(max(latencies), 2)}
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log line per request
+    config = config_or_exit(missing_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = BurnIndex(str(Path(tmp) / "burns.sqlite"))
+        pairs = [(hashlib.sha256(f"burn{i}".encode()).hexdigest().upper(),
+                  hashlib.sha256(f"nft{i}".encode()).hexdigest().upper()) for i in range(certs)]
+        for burn_tx, nft_id in pairs:
+            index.consume(burn_tx, nft_id)
+        index.close()
+        app = create_app(config, str(Path(tmp) / "burns.sqlite"), str(Path(tmp) / "cache"), screenshot)
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}/certificates/nft"
+        urls = [f"{base}/{nft_id}.png" for _, nft_id in pairs]
+        try:
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                # cold: every client asks for each certificate at once
+                cold = list(pool.map(fetch, [u for u in urls for _ in range(clients)]))
+                renders = dict(app.config["RENDER_CACHE"].stats)
+                warm = list(pool.map(fetch, [random.choice(urls) for _ in range(requests)]))
+                etags = {}
+                for url in urls:
+                    with urllib.request.urlopen(url) as response:
+                        etags[url] = response.headers["ETag"]
+                picks = [random.choice(urls) for _ in range(requests)]
+                revalidate = list(pool.map(lambda u: fetch(u, {"If-None-Match": etags[u]}), picks))
+                ranged = fetch(urls[0], {"Range": "bytes=0-1023"})
+        finally:
+            server.shutdown()
+    return {"certs": certs, "clients": clients, "cold": summary(cold), "cold_cache": renders,
+            "warm": summary(warm), "if_none_match": summary(revalidate),
+            "range": {"status": ranged[1], "bytes": ranged[2]}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve SOLRAI REC certificate images rendered on demand")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("serve", help="Run the HTTP server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=int(os.getenv("PORT", 5002)))
+    p.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    p.add_argument("--burn-index", default=DEFAULT_INDEX)
+    p.add_argument("--image", default=None, help="Screenshot image (default image_path from config)")
+    p = sub.add_parser("bench", help="Cold vs warm latency against a local server")
+    p.add_argument("--certs", type=int, default=16)
+    p.add_argument("--clients", type=int, default=8)
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--image", default=None)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        print(json.dumps(bench(args.certs, args.clients, args.requests, args.image), indent=2))
+        return
+    config = config_or_exit(missing_ok=True)
+    app = create_app(config, args.burn_index, args.cache_dir, args.image)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+fleet_flow.py
+=============
+
+The SOLRAI issue -> transfer -> burn -> mint -> deliver flow for a whole
+fleet in one process, driven by the site registry (site_registry.py).
+
+solrai_nft_flow.py handles one site per run and waits for validation after
+every transaction.  Here a production file (kWh per site) is planned into
+groups by jurisdiction and owner, and each step is batched:
+
+  1. issuer -> hot wallets: every shard of the hot-wallet pool (hot_pool)
+     short of its owners' total is topped up in one pipelined batch
+  2. hot wallets -> owners: one Payment per owner (sum of its sites) from
+     the owner's shard; each shard pipelines, shards run concurrently
+  3. owners burn 1,000 STN per certificate by paying it back to the issuer
+     (burn_and_mint_solrai_nft's redemption; `fleet_burn_sink: blackhole`
+     in config.yaml sends it to BLACKHOLE instead, which rippled rejects
+     with tecNO_DST unless that account exists); each owner's burns are
+     pipelined, different owners run concurrently
+  4. the minter pipelines one NFTokenMint per certificate.  The compact
+     metadata payload (metadata_codec) for each is written to
+     --metadata-dir as <sha256>.json and the URI is "sha256:<hash>", which
+     fits the 256-byte URI limit; a site's `meter_proof` (meter_proofs.py)
+     is embedded in each of its certificates
+  5. the minter pipelines zero-amount sell offers to each owner, and the
+     owners accept them concurrently
+
+A site earns floor(kWh / 1000) certificates; the remainder stays with the
+owner as STN.  Owners sign as key role `owner:<id>` (key_provider).  Burns
+are recorded in the burn index against the NFT minted from them.  --setup
+first sets DefaultRipple on the issuer and creates every hot wallet's and
+every owner's STN trust line.
+
+Usage:
+    python fleet_flow.py --registry site_registry.sqlite --production production.csv [--setup]
+    # production.csv: "site_id,kwh" per line (header optional)
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.transactions import (
+    AccountSet,
+    AccountSetAsfFlag,
+    NFTokenAcceptOffer,
+    NFTokenCreateOffer,
+    NFTokenMint,
+    Payment,
+    TrustSet,
+)
+from xrpl.wallet import Wallet
+
+from burn_and_mint_solrai_nft import metadata_fields
+from burn_verifier import DEFAULT_INDEX, BurnIndex
+from hot_pool import distribute, hot_float, pool_from_keys, pool_roles, setup_pool
+from key_provider import KeyProvider, keys_or_exit
+from metadata_codec import CODEC_VERSION, content_hash, encode, image_reference
+from meter_proofs import configured_proof
+from nft_market import offer_index_from_meta
+from site_registry import DEFAULT_REGISTRY, Registry, RegistryError
+from solr_config import Config, config_or_exit
+from solr_constants import BLACKHOLE
+from tx_pipeline import DEFAULT_WORKERS, fan_out, pipeline
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+KWH_PER_CERT = Decimal("1000")
+TRUST_LIMIT = str(10 ** 9)
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def read_production(path: str) -> Dict[str, Decimal]:
+    """site_id -> kWh from a "site_id,kwh" CSV (repeated sites are summed)."""
+    production: Dict[str, Decimal] = {}
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#") or row[0] == "site_id":
+                continue
+            try:
+                kwh = Decimal(row[1])
+            except (IndexError, InvalidOperation):
+                raise ValueError(f"{path}: bad production row {row}") from None
+            production[row[0]] = production.get(row[0], Decimal(0)) + kwh
+    return production
+
+
+def plan(registry: Registry, production: Dict[str, Decimal]) -> List[dict]:
+    """Work groups by (jurisdiction, owner): sites with their kWh and certificate counts."""
+    groups = []
+    for (jurisdiction, owner_id), sites in registry.groups(production).items():
+        if owner_id is None:
+            raise RegistryError(f"sites without an owner: {', '.join(s.id for s in sites)}")
+        rows = [{"site": s, "kwh": production[s.id], "certs": int(production[s.id] // KWH_PER_CERT)} for s in sites]
+        groups.append({"jurisdiction": jurisdiction, "owner_id": owner_id, "sites": rows,
+                       "kwh": sum(r["kwh"] for r in rows), "certs": sum(r["certs"] for r in rows)})
+    return groups
+
+
+def _failed(rows: List[dict]) -> List[dict]:
+    return [r for r in rows if r["status"] != "validated" or r.get("engine_result") != "tesSUCCESS"]
+
+
+def amount(currency: str, issuer: str, value) -> dict:
+    return {"currency": currency, "issuer": issuer, "value": str(value)}
+
+
+BURN_SINKS = ("issuer", "blackhole")
+
+
+def burn_sink(config: Config) -> str:
+    """Where owners send burned STN: "issuer" unless config.yaml sets `fleet_burn_sink: blackhole`."""
+    sink = config.get("fleet_burn_sink", "issuer")
+    if sink not in BURN_SINKS:
+        raise ValueError(f"fleet_burn_sink must be one of {', '.join(BURN_SINKS)}, not {sink!r}")
+    return sink
+
+
+def run_fleet(
+    client: JsonRpcClient,
+    registry: Registry,
+    config: Config,
+    keys: KeyProvider,
+    production: Dict[str, Decimal],
+    metadata_dir: Path,
+    burn_index: Optional[BurnIndex] = None,
+    setup: bool = False,
+    workers: int = DEFAULT_WORKERS,
+) -> dict:
+    """Run the flow for every site in `production`; returns step timings and one row per certificate."""
+    currency = config.currency_code
+    issuer, minter = keys.wallet("issuer"), keys.wallet("minter")
+    pool = pool_from_keys(config, keys)
+    groups = plan(registry, production)
+    owners: Dict[str, Wallet] = {g["owner_id"]: keys.wallet(f"owner:{g['owner_id']}") for g in groups}
+    owner_kwh: Dict[str, Decimal] = {}
+    for g in groups:
+        owner_kwh[g["owner_id"]] = owner_kwh.get(g["owner_id"], Decimal(0)) + g["kwh"]
+    timings: Dict[str, float] = {}
+    errors: List[str] = []
+
+    def step(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    if setup:
+        work = {f"owner:{o}": (w, [TrustSet(account=w.classic_address,
+                                            limit_amount=amount(currency, issuer.classic_address, TRUST_LIMIT))])
+                for o, w in owners.items()}
+        work["issuer"] = (issuer, [AccountSet(account=issuer.classic_address,
+                                              set_flag=AccountSetAsfFlag.ASF_DEFAULT_RIPPLE)])
+        trust = step("setup", lambda: fan_out(client, work, workers))
+        errors += [f"setup {o}: {r['engine_result']}" for o, rows in trust.items() for r in _failed(rows)]
+        errors += [f"setup {e}" for e in step("setup_pool", lambda: setup_pool(client, issuer, pool, currency,
+                                                                                 workers))]
+
+    # 1-2. top the pool's shards up, then every shard pays its owners
+    payments = [(owners[o].classic_address, kwh) for o, kwh in owner_kwh.items()]
+    distributed = distribute(client, issuer, pool, currency, payments, hot_float(config), workers)
+    timings["issue"], timings["distribute"] = distributed["timings"]["top_up"], distributed["timings"]["transfer"]
+    errors += [f"issue {shard}: {r['engine_result']}" for shard, r in distributed["top_up"].items()
+               if r["status"] != "validated" or r.get("engine_result") != "tesSUCCESS"]
+    errors += [f"distribute {r['shard']}: {r['engine_result']}" for r in _failed(distributed["rows"])]
+    if errors:
+        return {"timings": timings, "errors": errors, "certificates": []}
+
+    # 3. burns, one pipeline per owner; certificates keep plan order
+    certs = [{"site_id": r["site"].id, "owner_id": g["owner_id"], "jurisdiction": g["jurisdiction"]}
+             for g in groups for r in g["sites"] for _ in range(r["certs"])]
+    by_owner: Dict[str, List[dict]] = {}
+    for cert in certs:
+        by_owner.setdefault(cert["owner_id"], []).append(cert)
+    sink = BLACKHOLE if burn_sink(config) == "blackhole" else issuer.classic_address
+    burned = step("burn", lambda: fan_out(client, {
+        o: (owners[o], [Payment(account=owners[o].classic_address, destination=sink,
+                                amount=amount(currency, issuer.classic_address, KWH_PER_CERT)) for _ in rows])
+        for o, rows in by_owner.items()}, workers))
+    for o, rows in by_owner.items():
+        for cert, row in zip(rows, burned.get(o, [])):
+            cert["burn_tx"] = row["hash"] if row["status"] == "validated" and row["engine_result"] == "tesSUCCESS" else None
+            cert["status"] = "burned" if cert["burn_tx"] else f"burn {row['status']} {row.get('engine_result')}"
+
+    # 4. mints
+    metadata_dir.mkdir(parents=True, exist_ok=True)
+    images: Dict[str, dict] = {}
+    to_mint = [c for c in certs if c.get("burn_tx")]
+
+    def build_mints():
+        txs = []
+        for cert in to_mint:
+            site_config = registry.site_config(config, cert["site_id"])
+            cert["vintage"] = site_config.vintage
+            metadata = dict(metadata_fields(site_config, cert["burn_tx"]), codec_version=CODEC_VERSION)
+            image_path = site_config.get("image_path")
+            if image_path and Path(image_path).exists():
+                if image_path not in images:  # one digest per proof image, not per certificate
+                    images[image_path] = image_reference(Path(image_path))
+                metadata["image"] = images[image_path]
+            payload = encode(metadata)
+            digest = content_hash(payload)
+            (metadata_dir / f"{digest}.json").write_bytes(payload)
+            cert["uri"] = f"sha256:{digest}"
+            txs.append(NFTokenMint(account=minter.classic_address, uri=cert["uri"].encode("utf-8").hex(),
+                                   transfer_fee=10000, flags=0x09, nftoken_taxon=0))
+        return txs
+
+    mint_txs = step("metadata", build_mints)
+    minted = step("mint", lambda: pipeline(client, minter, mint_txs))
+    for cert, row in zip(to_mint, minted):
+        cert["nft_id"] = (row.get("meta") or {}).get("nftoken_id") if row["status"] == "validated" else None
+        cert["status"] = "minted" if cert["nft_id"] else f"mint {row['status']} {row.get('engine_result')}"
+        if cert["nft_id"] and burn_index is not None:
+            burn_index.consume(cert["burn_tx"], cert["nft_id"])
+
+    # 5. deliver: minter offers each NFT to its owner for 0, owners accept concurrently
+    to_offer = [c for c in certs if c.get("nft_id")]
+    offered = step("offer", lambda: pipeline(client, minter, [NFTokenCreateOffer(
+        account=minter.classic_address, nftoken_id=c["nft_id"], amount="0",
+        destination=owners[c["owner_id"]].classic_address, flags=1) for c in to_offer]))
+    accept_by_owner: Dict[str, List[dict]] = {}
+    for cert, row in zip(to_offer, offered):
+        cert["offer_index"] = offer_index_from_meta(row.get("meta") or {}) if row["status"] == "validated" else None
+        if cert["offer_index"]:
+            accept_by_owner.setdefault(cert["owner_id"], []).append(cert)
+        else:
+            cert["status"] = f"offer {row['status']} {row.get('engine_result')}"
+    accepted = step("accept", lambda: fan_out(client, {
+        o: (owners[o], [NFTokenAcceptOffer(account=owners[o].classic_address, nftoken_sell_offer=c["offer_index"])
+                        for c in rows]) for o, rows in accept_by_owner.items()}, workers))
+    for o, rows in accept_by_owner.items():
+        for cert, row in zip(rows, accepted.get(o, [])):
+            ok = row["status"] == "validated" and row["engine_result"] == "tesSUCCESS"
+            cert["status"] = "delivered" if ok else f"accept {row['status']} {row.get('engine_result')}"
+
+    timings["total"] = round(sum(timings.values()), 3)
+    return {"timings": timings, "errors": errors, "certificates": certs,
+            "groups": [{k: g[k] for k in ("jurisdiction", "owner_id", "certs")} | {"sites": len(g["sites"]),
+                        "kwh": str(g["kwh"])} for g in groups]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the SOLRAI flow for every site in the registry")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY)
+    parser.add_argument("--production", required=True, help="CSV of site_id,kwh")
+    parser.add_argument("--metadata-dir", default="metadata", help="Where <sha256>.json payloads are written")
+    parser.add_argument("--burn-index", default=DEFAULT_INDEX, help="SQLite index of consumed burns")
+    parser.add_argument("--report", default="-", help="JSONL per-certificate report, or - for stdout")
+    parser.add_argument("--setup", action="store_true", help="Set issuer DefaultRipple and create hot-wallet/owner trust lines first")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Owners processed concurrently")
+    args = parser.parse_args()
+
+    config = config_or_exit(args.config, "currency_code")
+    registry = Registry(args.registry)
+    try:
+        burn_sink(config)
+        production = read_production(args.production)
+        groups = plan(registry, production)
+        for site_id in production:  # a bad meter proof must fail before anything is burned
+            configured_proof(registry.site_config(config, site_id))
+    except (OSError, ValueError, RegistryError) as e:
+        sys.exit(f"Error: {e}")
+    owner_roles = sorted({f"owner:{g['owner_id']}" for g in groups})
+    keys = keys_or_exit(config, "issuer", *pool_roles(config), "minter", *owner_roles)
+    print(f"{len(production)} sites, {len(owner_roles)} owners, {len(groups)} groups, "
+          f"{sum(g['certs'] for g in groups)} certificates", file=sys.stderr)
+
+    burn_index = BurnIndex(args.burn_index)
+    try:
+        result = run_fleet(get_client(), registry, config, keys, production, Path(args.metadata_dir),
+                           burn_index=burn_index, setup=args.setup, workers=args.workers)
+    finally:
+        burn_index.close()
+        registry.close()
+
+    out = sys.stdout if args.report == "-" else open(args.report, "w", encoding="utf-8")
+    try:
+        for cert in result["certificates"]:
+            out.write(json.dumps(cert) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    delivered = sum(c["status"] == "delivered" for c in result["certificates"])
+    print(json.dumps({"timings_s": result["timings"], "delivered": delivered,
+                      "certificates": len(result["certificates"]), "errors": result["errors"]}), file=sys.stderr)
+    if result["errors"] or delivered < len(result["certificates"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,15 +17,17 @@ Dependencies:
 """
 import argparse
 import base64
+import hashlib
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-import yaml
 from PIL import Image, ImageDraw, ImageFont
 import qrcode
 
+from solr_config import Config, config_or_exit, load_config
+
 # ---------- Config ----------
 DEFAULT_OUTPUT = "SOLRAI_REC_SAMPLE.png"
 DEFAULT_SCREENSHOT = "IMG_A6FBCF8F-9700-4089-ADB0-5C914EF43766.jpeg"
@@ -36,13 +38,10 @@ ACCENT = (6, 95, 70)       # teal/dark green
 TEXT_PRIMARY = (15, 23, 42) # slate-900
 TEXT_SECOND = (71, 85, 105) # slate-600
 BORDER = (203, 213, 225)    # slate-300
-
-
-def load_config(path: str = "config.yaml") -> dict:
-    p = Path(path)
-    if not p.exists():
-        return {}
-    return yaml.safe_load(p.read_text(encoding="utf-8")) or {}
+# Bump when generate_rec's drawing changes, so cached and manifest-tracked images are re-rendered.
+RENDER_VERSION = 1
+# Fields generate_rec reads from config besides sample_fields.
+EXTRA_FIELDS = ("facility_name", "facility_location", "grid_region", "technology", "vintage_start", "vintage_end")
 
 
 def try_load_font(names, size):
@@ -140,6 +139,7 @@ def generate_rec(
     price_drops: str,
     nft_id: Optional[str] = None,
     xumm_url: Optional[str] = None,
+    config: Optional[Config] = None,
 ) -> Path:
     W, H = CANVAS_SIZE
     canvas = Image.new("RGB", (W, H), CARD_BG)
@@ -166,7 +166,7 @@ def generate_rec(
     y1 = text_block(draw, col1_x, y1, "Vintage", vintage, label_font, value_font)
     y1 = text_block(draw, col1_x, y1, "Jurisdiction / Program", f"{jurisdiction} / {program}", label_font, value_font)
     # Optional extended compliance fields if present in config
-    cfg = load_config()
+    cfg = config if config is not None else load_config(missing_ok=True)
     if cfg.get("facility_name"):
         y1 = text_block(draw, col1_x, y1, "Facility", cfg.get("facility_name", ""), label_font, value_font)
     if cfg.get("facility_location"):
@@ -249,8 +249,51 @@ def generate_rec(
     return output
 
 
+def sample_fields(cfg: Config) -> dict:
+    """generate_rec keyword arguments taken from config, with the sample defaults."""
+    return {
+        "issuer": cfg.get("issuer_address", "r3S15u4jgVru2wzHDbhyzjMhGBCXvozQWR"),
+        "hot": cfg.get("hot_address", "rUowmT93AQ4ag2C4onY29sVRTNbmqXqQWQ"),
+        "owner": cfg.get("system_owner_address", "rNeTREnTe9kXUoGqS2LH4kL8uQVgZzCH5a"),
+        "buyer": cfg.get("nft_buyer_address", "rsgpdWshJQYRVkDLEHtHJWFzxLoEs6cFe4"),
+        "currency": cfg.get("currency_code", "STN"),
+        "jurisdiction": cfg.get("jurisdiction", "US-NJ"),
+        "program": cfg.get("program", "NJ-SREC"),
+        "vintage": cfg.get("vintage", "2025"),
+        "meter_hash": cfg.get("meter_hash", "meterhashdeadbeef..."),
+        "oracle_ref": cfg.get("oracle_reference", "https://example.com/oracle-proof"),
+        "price_usd": str(cfg.get("price_usd", "90")),
+        "price_drops": str(cfg.get("price_xrp_drops", "270000000")),  # mock ~270 XRP for $90 if 1 XRP=$0.333
+    }
+
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def screenshot_digest(path: Path) -> Optional[str]:
+    """SHA-256 of an image file, memoized by (path, size, mtime) so each file is read once per process."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _digests:
+        _digests[key] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return _digests[key]
+
+
+def render_inputs(cfg: Config, screenshot: Path, burn_tx: str, nft_id: Optional[str], kwh: float = 1000.0) -> dict:
+    """Every input that changes generate_rec's output for one certificate."""
+    return dict(sample_fields(cfg), burn_tx=burn_tx, nft_id=nft_id, kwh=kwh, screenshot=screenshot_digest(screenshot),
+                extra={k: cfg.get(k) for k in EXTRA_FIELDS}, version=RENDER_VERSION)
+
+
+def render_key(inputs: dict) -> str:
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
 def main():
-    cfg = load_config()
+    cfg = config_or_exit(missing_ok=True)
     parser = argparse.ArgumentParser(description="Generate a SOLRAI REC image with mock/sample data")
     parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output image path (.png or .jpg)")
     parser.add_argument("--image", default=cfg.get("image_path", DEFAULT_SCREENSHOT), help="Screenshot image path")
@@ -263,38 +306,15 @@ def main():
     output = Path(args.output)
     screenshot = Path(args.image)
 
-    issuer = cfg.get("issuer_address", "r3S15u4jgVru2wzHDbhyzjMhGBCXvozQWR")
-    hot = cfg.get("hot_address", "rUowmT93AQ4ag2C4onY29sVRTNbmqXqQWQ")
-    owner = cfg.get("system_owner_address", "rNeTREnTe9kXUoGqS2LH4kL8uQVgZzCH5a")
-    buyer = cfg.get("nft_buyer_address", "rsgpdWshJQYRVkDLEHtHJWFzxLoEs6cFe4")
-    currency = cfg.get("currency_code", "STN")
-    jurisdiction = cfg.get("jurisdiction", "US-NJ")
-    program = cfg.get("program", "NJ-SREC")
-    vintage = cfg.get("vintage", "2025")
-    meter_hash = cfg.get("meter_hash", "meterhashdeadbeef...")
-    oracle_ref = cfg.get("oracle_reference", "https://example.com/oracle-proof")
-    price_usd = cfg.get("price_usd", "90")
-    price_drops = cfg.get("price_xrp_drops", "270000000")  # mock ~270 XRP for $90 if 1 XRP=$0.333
-
     generate_rec(
         output=output,
         screenshot=screenshot,
-        issuer=issuer,
-        hot=hot,
-        owner=owner,
-        buyer=buyer,
-        currency=currency,
         kwh=args.kwh,
-        jurisdiction=jurisdiction,
-        program=program,
-        vintage=vintage,
-        meter_hash=meter_hash,
-        oracle_ref=oracle_ref,
         burn_tx=args.burn_tx_hash,
-        price_usd=str(price_usd),
-        price_drops=str(price_drops),
         nft_id=args.nft_id,
         xumm_url=args.xumm_url,
+        config=cfg,
+        **sample_fields(cfg),
     )
     print(f"Wrote {output}")
 
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+history_export.py
+=================
+
+Columnar export of SOLRAI history for registry reporting (NJ-SREC and
+other jurisdictional programs).
+
+The issuance/burn/mint/transfer/retirement history otherwise only exists
+on the ledger, in NFT URIs and in each script's stdout.  `export` reads the
+issuer's and the minter's account_tx (reconcile.account_transactions) from
+the last exported ledger up to the current validated ledger and appends
+one row per event to a Parquet dataset, hive-partitioned by jurisdiction
+and vintage:
+
+    <export-dir>/jurisdiction=US-NJ/vintage=2025/part-<first ledger>-<n>.parquet
+
+  - events: issuance (issuer -> anyone), transfer, burn (to the black hole
+    or back to the issuer), mint, nft_transfer (accepted offers, with the
+    XRP price) and retirement (NFTokenBurn, with the beneficiary memo)
+  - addresses, currencies, event kinds and programs are dictionary-encoded
+    columns; amounts are decimal128 (STN, or XRP for NFT sales)
+  - mints take jurisdiction/vintage/program/MWh from their metadata
+    (--metadata-dir for compact "sha256:" URIs; MWh is null when it cannot
+    be resolved); later transfers and retirements of the same NFT inherit
+    them from the export state.  STN events carry no certificate, so they
+    land in the null partition
+  - the cursor (last exported ledger) and the NFT attributes live in
+    <export-dir>/_state.sqlite, so a run only reads new ledgers.  Files of
+    a run are named after its first ledger, so a run interrupted before the
+    cursor advanced is simply redone over the same names
+
+`report` aggregates the dataset (sum of amount and MWh, event count) by
+any columns; jurisdiction/vintage filters prune whole partitions, so a
+program report reads only its own files.
+
+Usage:
+    python history_export.py export [--export-dir history] [--metadata-dir metadata] [--account rExtra...]
+    python history_export.py report --jurisdiction US-NJ --vintage 2025 [--by event,program]
+    python history_export.py bench --events 1000000 --runs 20
+
+Dependencies:
+    pip install xrpl-py PyYAML pyarrow
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from xrpl.clients import JsonRpcClient
+
+from burn_verifier import currency_code
+from nft_metadata import certificate
+from reconcile import account_transactions, validated_ledger
+from retirement import KWH_PER_MWH, MEMO_TYPE, read_metadata
+from solr_constants import BLACKHOLE
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+DEFAULT_EXPORT_DIR = "history"
+STATE = "_state.sqlite"  # the leading underscore keeps it out of dataset discovery
+RIPPLE_EPOCH = 946684800
+GENESIS = 1  # first ledger read by the first export
+EVENTS = ("issuance", "transfer", "burn", "mint", "nft_transfer", "retirement")
+LSF_SELL_NFTOKEN = 0x00000001
+
+WORDS = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ("ledger_index", pa.int64()),
+    ("close_time", pa.timestamp("s", tz="UTC")),
+    ("tx_hash", pa.string()),
+    ("event", WORDS),
+    ("account", WORDS),
+    ("counterparty", WORDS),
+    ("currency", WORDS),
+    ("amount", pa.decimal128(28, 6)),
+    ("nft_id", pa.string()),
+    ("burn_tx", pa.string()),
+    ("program", WORDS),
+    ("mwh", pa.decimal128(18, 3)),
+    ("beneficiary", pa.string()),
+    ("jurisdiction", pa.string()),
+    ("vintage", pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("jurisdiction", pa.string()), ("vintage", pa.string())]), flavor="hive")
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursor (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    ledger_index INTEGER NOT NULL,
+    exported_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nfts (
+    nft_id TEXT PRIMARY KEY,
+    jurisdiction TEXT,
+    vintage TEXT,
+    program TEXT,
+    mwh TEXT
+);
+"""
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+class ExportState:
+    """Last exported ledger and the certificate attributes of every exported mint."""
+
+    def __init__(self, export_dir: Path):
+        export_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(export_dir / STATE), timeout=30)
+        self.conn.executescript(STATE_SCHEMA)
+
+    def cursor(self) -> Optional[int]:
+        row = self.conn.execute("SELECT ledger_index FROM cursor WHERE id = 0").fetchone()
+        return row[0] if row else None
+
+    def nft(self, nft_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT jurisdiction, vintage, program, mwh FROM nfts WHERE nft_id = ?",
+                                (nft_id,)).fetchone()
+        return dict(zip(("jurisdiction", "vintage", "program", "mwh"), row)) if row else None
+
+    def advance(self, ledger_index: int, nfts: Dict[str, dict]) -> None:
+        """Record the new cursor and the run's mints in one transaction (after its files are written)."""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO nfts VALUES (?, ?, ?, ?, ?)",
+                                  [(n, a["jurisdiction"], a["vintage"], a["program"], a["mwh"])
+                                   for n, a in nfts.items()])
+            self.conn.execute("INSERT OR REPLACE INTO cursor VALUES (0, ?, ?)", (ledger_index, time.time()))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _decimal(value) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def _deleted_offer(meta: dict) -> dict:
+    for affected in meta.get("AffectedNodes", []):
+        node = affected.get("DeletedNode")
+        if node and node.get("LedgerEntryType") == "NFTokenOffer":
+            return node.get("FinalFields", {})
+    return {}
+
+
+def _memo(tx: dict, memo_type: str) -> Optional[str]:
+    wanted = memo_type.encode("utf-8").hex().upper()
+    for wrapper in tx.get("Memos", []):
+        memo = wrapper.get("Memo", {})
+        if memo.get("MemoType", "").upper() == wanted and memo.get("MemoData"):
+            return bytes.fromhex(memo["MemoData"]).decode("utf-8", "replace")
+    return None
+
+
+def events(entry: dict, issuer: str, currency: str, state: ExportState, minted: Dict[str, dict],
+           metadata_dir: Optional[Path] = None) -> List[dict]:
+    """Event rows for one account_tx entry (none for unrelated or failed transactions)."""
+    tx = entry.get("tx_json") or entry.get("tx") or entry
+    meta = entry.get("meta") or entry.get("metaData") or {}
+    if meta.get("TransactionResult") != "tesSUCCESS":
+        return []
+    date = tx.get("date", entry.get("date"))
+    row = {"ledger_index": int(entry.get("ledger_index") or tx["ledger_index"]),
+           "close_time": None if date is None else datetime.fromtimestamp(RIPPLE_EPOCH + date, timezone.utc),
+           "tx_hash": (entry.get("hash") or tx.get("hash") or "").upper(), "account": tx.get("Account")}
+    kind = tx.get("TransactionType")
+    if kind == "Payment":
+        delivered = meta.get("delivered_amount", tx.get("Amount"))
+        if not (isinstance(delivered, dict) and delivered.get("issuer") == issuer
+                and currency_code(delivered.get("currency", "")) == currency):
+            return []
+        destination = tx["Destination"]
+        if tx["Account"] == issuer:
+            event = "issuance"
+        elif destination in (BLACKHOLE, issuer):
+            event = "burn"
+        else:
+            event = "transfer"
+        return [dict(row, event=event, counterparty=destination, currency=currency,
+                     amount=_decimal(delivered["value"]))]
+
+    if kind == "NFTokenMint":
+        nft_id = (meta.get("nftoken_id") or "").upper() or None
+        metadata = read_metadata(tx.get("URI"), metadata_dir)
+        cert = certificate(metadata)  # nested and flat schemas alike
+        # unresolved metadata has no known burn size: null MWh rather than a guessed 1,000 kWh
+        burned = _decimal(cert["amount_burned"]) if metadata else None
+        attributes = {"jurisdiction": cert["jurisdiction"],
+                      "vintage": None if cert["vintage"] is None else str(cert["vintage"]),
+                      "program": cert["program"], "mwh": None if burned is None else str(burned / KWH_PER_MWH)}
+        if nft_id:
+            minted[nft_id] = attributes
+        return [dict(row, event="mint", nft_id=nft_id, currency="SOLRAI", burn_tx=cert["burn_tx"],
+                     **dict(attributes, mwh=_decimal(attributes["mwh"])))]
+
+    if kind in ("NFTokenAcceptOffer", "NFTokenBurn"):
+        nft_id = (meta.get("nftoken_id") or tx.get("NFTokenID") or _deleted_offer(meta).get("NFTokenID") or "")
+        nft_id = nft_id.upper() or None
+        attributes = minted.get(nft_id) or (state.nft(nft_id) if nft_id else None) or {}
+        common = dict(row, nft_id=nft_id, jurisdiction=attributes.get("jurisdiction"),
+                      vintage=attributes.get("vintage"), program=attributes.get("program"),
+                      mwh=_decimal(attributes.get("mwh")))
+        if kind == "NFTokenBurn":
+            return [dict(common, event="retirement", currency="SOLRAI", beneficiary=_memo(tx, MEMO_TYPE))]
+        offer = _deleted_offer(meta)
+        price = offer.get("Amount")
+        # a sell offer moves the NFT from its owner to the acceptor; a buy offer the other way
+        seller, buyer = ((offer.get("Owner"), tx["Account"]) if offer.get("Flags", 0) & LSF_SELL_NFTOKEN
+                         else (tx["Account"], offer.get("Owner")))
+        return [dict(common, event="nft_transfer", account=buyer, counterparty=seller,
+                     currency="XRP" if isinstance(price, str) else (price or {}).get("currency"),
+                     amount=(Decimal(price) / 1_000_000 if isinstance(price, str)
+                             else _decimal((price or {}).get("value"))))]
+    return []
+
+
+def to_table(rows: List[dict]) -> pa.Table:
+    return pa.table({field.name: pa.array([r.get(field.name) for r in rows], type=field.type) for field in SCHEMA},
+                    schema=SCHEMA)
+
+
+def write(export_dir: Path, table: pa.Table, first_ledger: int) -> None:
+    ds.write_dataset(table, str(export_dir), format="parquet", partitioning=PARTITIONING,
+                     basename_template=f"part-{first_ledger:010d}-{{i}}.parquet",
+                     existing_data_behavior="overwrite_or_ignore",
+                     file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"))
+
+
+def export(client: JsonRpcClient, accounts: Sequence[str], issuer: str, currency: str, export_dir: Path,
+           metadata_dir: Optional[Path] = None) -> dict:
+    """Append every event since the last exported ledger; returns the ledger range and counts per event."""
+    state = ExportState(export_dir)
+    try:
+        since = state.cursor()
+        through = validated_ledger(client)
+        first = GENESIS if since is None else since + 1
+        if first > through:
+            return {"since_ledger": since, "through_ledger": since, "events": {}}
+        entries: Dict[str, dict] = {}
+        for account in dict.fromkeys(accounts):  # a transaction touching both accounts is exported once
+            for entry in account_transactions(client, account, first, through):
+                entries.setdefault(entry["hash"].upper(), entry)
+        minted: Dict[str, dict] = {}
+        rows = []
+        for entry in sorted(entries.values(), key=lambda e: (int(e["ledger_index"]), (e.get("meta") or {})
+                                                                .get("TransactionIndex", 0))):
+            rows += events(entry, issuer, currency, state, minted, metadata_dir)
+        if rows:
+            write(export_dir, to_table(rows), first)
+        state.advance(through, minted)
+        counts: Dict[str, int] = {}
+        for row in rows:
+            counts[row["event"]] = counts.get(row["event"], 0) + 1
+        return {"since_ledger": since, "through_ledger": through, "transactions": len(entries), "events": counts}
+    finally:
+        state.close()
+
+
+def dataset(export_dir: Path) -> ds.Dataset:
+    return ds.dataset(str(export_dir), format="parquet", partitioning=PARTITIONING)
+
+
+def report(export_dir: Path, by: Sequence[str] = ("jurisdiction", "vintage", "event"),
+           jurisdiction: Optional[str] = None, vintage: Optional[str] = None, program: Optional[str] = None,
+           since: Optional[str] = None, until: Optional[str] = None) -> List[dict]:
+    """Sum of amount and MWh and the event count per `by` group, over the matching partitions and dates."""
+    unknown = [c for c in by if c not in SCHEMA.names]
+    if unknown:
+        raise ValueError(f"unknown column(s) {', '.join(unknown)}")
+    conditions = []
+    if jurisdiction is not None:
+        conditions.append(pc.field("jurisdiction") == jurisdiction)
+    if vintage is not None:
+        conditions.append(pc.field("vintage") == vintage)
+    if program is not None:
+        conditions.append(pc.field("program") == program)
+    if since is not None:
+        conditions.append(pc.field("close_time") >= pa.scalar(datetime.fromisoformat(since).replace(
+            tzinfo=timezone.utc), type=SCHEMA.field("close_time").type))
+    if until is not None:
+        conditions.append(pc.field("close_time") < pa.scalar(datetime.fromisoformat(until).replace(
+            tzinfo=timezone.utc), type=SCHEMA.field("close_time").type))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+    table = dataset(export_dir).to_table(columns=list(dict.fromkeys([*by, "amount", "mwh", "tx_hash"])),
+                                         filter=condition)
+    # group keys are decoded first: dictionaries differ between files
+    table = pa.table({name: (pc.cast(col, col.type.value_type) if pa.types.is_dictionary(col.type) else col)
+                      for name, col in zip(table.column_names, table.columns)})
+    grouped = table.group_by(list(by)).aggregate([("amount", "sum"), ("mwh", "sum"), ("tx_hash", "count")])
+    rows = grouped.rename_columns([*by, "amount", "mwh", "events"]).sort_by([(c, "ascending") for c in by])
+    return [{k: (str(v) if isinstance(v, Decimal) else v) for k, v in row.items()} for row in rows.to_pylist()]
+
+
+# --- measurement ---
+def bench(events_total: int, runs: int, jurisdictions: int) -> dict:
+    """Write `events_total` synthetic events in `runs` incremental exports, then time reports.
+
+    Compares a single program report (partition-pruned) with a report over the whole history.
+    """
+    import random
+    import tempfile
+
+    rng = random.Random(49)
+    accounts = [f"r{i:05d}" for i in range(2000)]
+    names = [f"US-{chr(65 + i // 26)}{chr(65 + i % 26)}" for i in range(jurisdictions)]
+    per_run = events_total // runs
+    result: dict = {"events": per_run * runs, "runs": runs, "jurisdictions": jurisdictions, "vintages": 3}
+    with tempfile.TemporaryDirectory() as tmp:
+        export_dir = Path(tmp) / "history"
+        state = ExportState(export_dir)
+        ledger, write_s = 1000, 0.0
+        for _ in range(runs):
+            rows = []
+            for i in range(per_run):
+                ledger += i % 50 == 0
+                event = rng.choice(EVENTS)
+                certificate = event in ("mint", "nft_transfer", "retirement")
+                rows.append({"ledger_index": ledger, "close_time": datetime.fromtimestamp(
+                    RIPPLE_EPOCH + 760_000_000 + ledger * 4, timezone.utc), "tx_hash": f"{ledger:032X}{i:032X}",
+                    "event": event, "account": rng.choice(accounts), "counterparty": rng.choice(accounts),
+                    "currency": "SOLRAI" if certificate else "STN",
+                    "amount": None if certificate else Decimal(rng.randint(1, 5000)),
+                    "jurisdiction": rng.choice(names) if certificate else None,
+                    "vintage": rng.choice(("2024", "2025", "2026")) if certificate else None,
+                    "program": "SREC" if certificate else None, "mwh": Decimal(1) if certificate else None})
+            start = time.perf_counter()
+            write(export_dir, to_table(rows), ledger - per_run // 50)
+            state.advance(ledger, {})
+            write_s += time.perf_counter() - start
+        state.close()
+        files = list(export_dir.rglob("*.parquet"))
+        result.update(write_s=round(write_s, 2), files=len(files),
+                      bytes=sum(f.stat().st_size for f in files))
+
+        start = time.perf_counter()
+        one = report(export_dir, ("event",), jurisdiction=names[0], vintage="2025")
+        result["program_report_s"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        everything = report(export_dir)
+        result["full_report_s"] = round(time.perf_counter() - start, 3)
+        result["program_report"] = one
+        result["full_report_groups"] = len(everything)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export SOLRAI history to Parquet and report on it")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("export", help="Append events since the last exported ledger")
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--export-dir", default=DEFAULT_EXPORT_DIR)
+    p.add_argument("--metadata-dir", default=None, help="Where compact sha256: metadata payloads are kept")
+    p.add_argument("--account", action="append", default=[], help="Extra account to read (issuer and minter always)")
+    p = sub.add_parser("report", help="Aggregate the exported history")
+    p.add_argument("--export-dir", default=DEFAULT_EXPORT_DIR)
+    p.add_argument("--by", default="jurisdiction,vintage,event", help="Comma-separated group columns")
+    p.add_argument("--jurisdiction", default=None)
+    p.add_argument("--vintage", default=None)
+    p.add_argument("--program", default=None)
+    p.add_argument("--since", default=None, help="ISO date/time (UTC), inclusive")
+    p.add_argument("--until", default=None, help="ISO date/time (UTC), exclusive")
+    p = sub.add_parser("bench", help="Incremental writes and report latency over synthetic history")
+    p.add_argument("--events", type=int, default=1_000_000)
+    p.add_argument("--runs", type=int, default=20)
+    p.add_argument("--jurisdictions", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        print(json.dumps(bench(args.events, args.runs, args.jurisdictions), indent=2))
+        return
+    if args.cmd == "report":
+        if not Path(args.export_dir).is_dir():
+            sys.exit(f"Error: no export at {args.export_dir}")
+        try:
+            rows = report(Path(args.export_dir), [c for c in args.by.split(",") if c], args.jurisdiction,
+                          args.vintage, args.program, args.since, args.until)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+        print(json.dumps(rows, indent=2, default=str))
+        return
+
+    from key_provider import keys_or_exit
+    from solr_config import config_or_exit
+
+    config = config_or_exit(args.config, "currency_code")
+    keys = keys_or_exit(config, "issuer", "minter")
+    issuer = keys.wallet("issuer").classic_address
+    accounts = [issuer, keys.wallet("minter").classic_address, *args.account]
+    try:
+        summary = export(get_client(), accounts, issuer, currency_code(config.currency_code), Path(args.export_dir),
+                         Path(args.metadata_dir) if args.metadata_dir else None)
+    except RuntimeError as e:
+        sys.exit(f"Error: {e}")
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+hot_pool.py
+===========
+
+Sharded STN distribution across a pool of hot wallets.
+
+With one hot wallet every issuance pays issuer -> hot and every delivery
+pays hot -> owner from that single account, so its Sequence (one chain of
+transactions, a queue of ~10 per ledger on rippled) caps distribution for
+the whole fleet.  A `hot_wallets:` section in config.yaml replaces it with a
+pool of shards, each its own account with its own trust line:
+
+  - owners map to shards on a consistent-hash ring (VNODES points per
+    shard, SHA-256), so adding a shard moves only about 1/N of the owners
+  - before a distribution the shards' balances are read (one account_lines
+    call per shard) and every shard short of its owners' total is topped up
+    from the issuer in one pipelined batch, to the total plus hot_float
+  - each shard then pipelines its owners' payments (tx_pipeline), all
+    shards concurrently, so throughput grows with the number of shards
+
+Without `hot_wallets:` the pool is the single `hot` wallet and behaves as
+before.  fleet_flow.py distributes through the pool; solrai_nft_flow.py
+issues to and transfers from the owner's shard.
+
+Usage:
+    python hot_pool.py status [--config config.yaml]           # shards, balances, owner assignment
+    python hot_pool.py setup [--config config.yaml]            # trust lines (+ issuer authorization)
+    python hot_pool.py top-up [--config config.yaml] [--float 50000]
+    python hot_pool.py shard --owner r...                       # which shard serves an address
+    python hot_pool.py bench --shards 1 2 4 8 --owners 64 --transfers 200   # 10 txs/account/ledger cap
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests import AccountLines
+from xrpl.models.transactions import Payment, TrustSet
+from xrpl.wallet import Wallet
+
+from onboarding import onboard, requires_auth
+from solr_config import Config
+from tx_pipeline import DEFAULT_WORKERS, fan_out, pipeline
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+VNODES = 64
+TRUST_LIMIT = str(10 ** 9)
+# rippled's per-account transaction queue limit, applied by the bench simulator.
+BENCH_ACCOUNT_CAP = 10
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big")
+
+
+def amount(currency: str, issuer: str, value) -> dict:
+    return {"currency": currency, "issuer": issuer, "value": str(value)}
+
+
+class HotPool:
+    """Hot wallets by shard id, with owners placed on a consistent-hash ring."""
+
+    def __init__(self, shards: Dict[str, Wallet], vnodes: int = VNODES):
+        if not shards:
+            raise ValueError("a hot wallet pool needs at least one wallet")
+        self.shards = dict(shards)
+        ring = sorted((_point(f"{shard}#{i}"), shard) for shard in self.shards for i in range(vnodes))
+        self._points = [p for p, _ in ring]
+        self._owners = [shard for _, shard in ring]
+
+    def shard_for(self, address: str) -> str:
+        i = bisect.bisect(self._points, _point(address)) % len(self._points)
+        return self._owners[i]
+
+    def wallet_for(self, address: str) -> Wallet:
+        return self.shards[self.shard_for(address)]
+
+    def assign(self, payments: List[Tuple[str, Decimal]]) -> Dict[str, List[int]]:
+        """Indexes into `payments` ((destination, value) pairs) grouped by shard."""
+        by_shard: Dict[str, List[int]] = {}
+        for i, (destination, _value) in enumerate(payments):
+            by_shard.setdefault(self.shard_for(destination), []).append(i)
+        return by_shard
+
+
+def pool_roles(config: Config) -> List[str]:
+    """Key roles of the pool: hot:<id> per `hot_wallets:` entry, else the single hot wallet."""
+    return [f"hot:{w.id}" for w in config.hot_wallets] or ["hot"]
+
+
+def pool_from_keys(config: Config, keys) -> HotPool:
+    return HotPool({role: keys.wallet(role) for role in pool_roles(config)})
+
+
+def hot_float(config: Config) -> Decimal:
+    return Decimal(config.get("hot_float", "0"))
+
+
+def balances(client: JsonRpcClient, pool: HotPool, issuer_address: str, currency: str) -> Dict[str, Decimal]:
+    """STN balance of every shard (one account_lines call each, filtered to the issuer)."""
+    out = {}
+    for shard, wallet in pool.shards.items():
+        result = client.request(AccountLines(account=wallet.classic_address, peer=issuer_address)).result
+        out[shard] = sum((Decimal(line["balance"]) for line in result.get("lines", [])
+                          if line["account"] == issuer_address and line["currency"] == currency), Decimal(0))
+    return out
+
+
+def setup_pool(client: JsonRpcClient, issuer: Wallet, pool: HotPool, currency: str,
+               workers: int = DEFAULT_WORKERS) -> List[str]:
+    """Trust line from every shard (concurrently), then issuer authorization if it has RequireAuth."""
+    work = {shard: (wallet, [TrustSet(account=wallet.classic_address,
+                                      limit_amount=amount(currency, issuer.classic_address, TRUST_LIMIT))])
+            for shard, wallet in pool.shards.items()}
+    errors = [f"trust {shard}: {row.get('engine_result')}" for shard, rows in fan_out(client, work, workers).items()
+              for row in rows if row.get("engine_result") != "tesSUCCESS"]
+    if requires_auth(client, issuer.classic_address):
+        approved = [(shard, wallet.classic_address) for shard, wallet in pool.shards.items()]
+        errors += [f"authorize {row['owner_id']}: {row.get('engine_result')}"
+                   for row in onboard(client, issuer, currency, approved)["rows"] if row["status"] == "failed"]
+    return errors
+
+
+def top_up(client: JsonRpcClient, issuer: Wallet, pool: HotPool, currency: str, needs: Dict[str, Decimal],
+           float_amount: Decimal = Decimal(0)) -> Dict[str, dict]:
+    """Issue to every shard whose balance is below its need: up to need + float_amount. One issuer batch."""
+    current = balances(client, pool, issuer.classic_address, currency)
+    due = {shard: needs.get(shard, Decimal(0)) + float_amount - current[shard] for shard in pool.shards
+           if current[shard] < needs.get(shard, Decimal(0)) or (float_amount and current[shard] < float_amount)}
+    due = {shard: value for shard, value in due.items() if value > 0}
+    if not due:
+        return {}
+    rows = pipeline(client, issuer, [Payment(account=issuer.classic_address,
+                                             destination=pool.shards[shard].classic_address,
+                                             amount=amount(currency, issuer.classic_address, value))
+                                     for shard, value in due.items()])
+    return {shard: dict(row, amount=str(value)) for (shard, value), row in zip(due.items(), rows)}
+
+
+def distribute(client: JsonRpcClient, issuer: Wallet, pool: HotPool, currency: str,
+               payments: List[Tuple[str, Decimal]], float_amount: Decimal = Decimal(0),
+               workers: int = DEFAULT_WORKERS) -> dict:
+    """Pay every (destination, value) from its owner's shard, topping shards up first.
+
+    Returns {"rows": one pipeline row per payment in input order (plus its "shard"), "top_up": {shard: row},
+    "timings": seconds per phase}.
+    """
+    by_shard = pool.assign(payments)
+    needs = {shard: sum((payments[i][1] for i in idx), Decimal(0)) for shard, idx in by_shard.items()}
+    timings = {}
+    start = time.perf_counter()
+    topped = top_up(client, issuer, pool, currency, needs, float_amount)
+    timings["top_up"] = round(time.perf_counter() - start, 3)
+    failed = [shard for shard, row in topped.items() if row.get("engine_result") != "tesSUCCESS"]
+    rows: List[Optional[dict]] = [None] * len(payments)
+    work = {}
+    for shard, idx in by_shard.items():
+        if shard in failed:
+            for i in idx:
+                rows[i] = {"shard": shard, "status": "not_submitted",
+                           "engine_result": f"top-up {topped[shard].get('engine_result')}"}
+            continue
+        wallet = pool.shards[shard]
+        work[shard] = (wallet, [Payment(account=wallet.classic_address, destination=payments[i][0],
+                                        amount=amount(currency, issuer.classic_address, payments[i][1]))
+                                for i in idx])
+    start = time.perf_counter()
+    results = fan_out(client, work, workers)
+    timings["transfer"] = round(time.perf_counter() - start, 3)
+    for shard, shard_rows in results.items():
+        for i, row in zip(by_shard[shard], shard_rows):
+            rows[i] = dict(row, shard=shard)
+    return {"rows": rows, "top_up": topped, "timings": timings}
+
+
+# --- measurement against the simulator ---
+def _bench_wallets(tag: str, count: int) -> List[Wallet]:
+    from xrpl.core.keypairs import generate_seed
+
+    return [Wallet.from_seed(generate_seed(hashlib.sha256(f"solr-pool:{tag}:{i}".encode()).hexdigest()[:32]))
+            for i in range(count)]
+
+
+def bench(shard_counts: List[int], owners: int, transfers: int, close_interval: float,
+          account_cap: int = BENCH_ACCOUNT_CAP) -> dict:
+    """Distribution throughput for `transfers` payments to `owners` owners, per shard count.
+
+    The simulator caps each account at `account_cap` transactions per ledger
+    (rippled's per-account queue limit on a busy network) and skips signature
+    verification, so the numbers measure the one-Sequence-per-account
+    bottleneck rather than this machine's CPU.
+    """
+    from xrpl.models.transactions import AccountSet, AccountSetAsfFlag
+    from bench_flows import GENESIS_DROPS, simulator
+
+    currency = "STN"
+    owner_wallets = _bench_wallets("owner", owners)
+    payments = [(owner_wallets[i % owners].classic_address, Decimal(1000 + i % 7)) for i in range(transfers)]
+    report = {"owners": owners, "transfers": transfers, "close_interval_s": close_interval,
+              "account_txs_per_ledger": account_cap, "cases": []}
+    previous: Optional[HotPool] = None
+    for n in shard_counts:
+        with simulator(f"pool:{n}", close_interval, verify_signatures=False,
+                       account_txs_per_ledger=account_cap) as (ledger, client, wallets):
+            issuer = wallets["issuer"]
+            pool = HotPool({f"hot:h{i}": w for i, w in enumerate(_bench_wallets("hot", n))})
+            for wallet in list(pool.shards.values()) + owner_wallets:
+                ledger.fund(wallet.classic_address, GENESIS_DROPS)
+            # untimed setup: issuer DefaultRipple, shard and owner trust lines
+            pipeline(client, issuer, [AccountSet(account=issuer.classic_address,
+                                                 set_flag=AccountSetAsfFlag.ASF_DEFAULT_RIPPLE)])
+            errors = setup_pool(client, issuer, pool, currency)
+            trust = fan_out(client, {w.classic_address: (w, [TrustSet(
+                account=w.classic_address, limit_amount=amount(currency, issuer.classic_address, TRUST_LIMIT))])
+                for w in owner_wallets}, workers=16)
+            errors += [f"owner trust: {r.get('engine_result')}" for rows in trust.values() for r in rows
+                       if r.get("engine_result") != "tesSUCCESS"]
+
+            first_ledger = ledger.validated_index
+            start = time.perf_counter()
+            result = distribute(client, issuer, pool, currency, payments, workers=max(1, n))
+            elapsed = time.perf_counter() - start
+            ok = sum(1 for r in result["rows"] if r.get("status") == "validated"
+                     and r.get("engine_result") == "tesSUCCESS")
+            load = Counter(r.get("shard") for r in result["rows"])
+            case = {"shards": n, "seconds": round(elapsed, 3), "delivered": ok,
+                    "transfers_per_s": round(ok / elapsed, 2) if elapsed else None,
+                    "ledgers": ledger.validated_index - first_ledger, "timings": result["timings"],
+                    "top_ups": len(result["top_up"]), "payments_per_shard": [load[s] for s in pool.shards],
+                    "errors": errors}
+            if previous is not None:
+                owners_moved = sum(previous.shard_for(w.classic_address) != pool.shard_for(w.classic_address)
+                                   for w in owner_wallets)
+                case["owners_moved_from_previous"] = owners_moved
+            report["cases"].append(case)
+            previous = pool
+    base = report["cases"][0]["transfers_per_s"] if report["cases"] else None
+    for case in report["cases"]:
+        case["speedup"] = round(case["transfers_per_s"] / base, 2) if base and case["transfers_per_s"] else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded hot-wallet distribution pool")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name, help_text in (("status", "Shards, STN balances and owner assignment"),
+                            ("setup", "Create every shard's trust line (and authorize it)"),
+                            ("top-up", "Top every shard up to hot_float")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--config", default="config.yaml")
+        if name == "top-up":
+            p.add_argument("--float", dest="float_amount", default=None, help="Target balance (default hot_float)")
+    p = sub.add_parser("shard", help="Which shard serves an address")
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--owner", required=True)
+    p = sub.add_parser("bench", help="Distribution throughput per shard count against the simulator")
+    p.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--owners", type=int, default=64)
+    p.add_argument("--transfers", type=int, default=200)
+    p.add_argument("--close-interval", type=float, default=3.0)
+    p.add_argument("--account-cap", type=int, default=BENCH_ACCOUNT_CAP,
+                   help="Simulated transactions per account per ledger (0 = no cap)")
+    p.add_argument("--output", default="-")
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        text = json.dumps(bench(args.shards, args.owners, args.transfers, args.close_interval, args.account_cap), indent=2)
+        if args.output == "-":
+            print(text)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        return
+
+    from key_provider import keys_or_exit
+    from solr_config import config_or_exit
+
+    config = config_or_exit(args.config, "currency_code")
+    roles = pool_roles(config)
+    if args.cmd == "shard":
+        keys = keys_or_exit(config, *roles)
+        print(pool_from_keys(config, keys).shard_for(args.owner))
+        return
+    keys = keys_or_exit(config, "issuer", *roles)
+    pool = pool_from_keys(config, keys)
+    issuer = keys.wallet("issuer")
+    client = get_client()
+    currency = config.currency_code
+    if args.cmd == "setup":
+        errors = setup_pool(client, issuer, pool, currency)
+        if errors:
+            sys.exit("Error: " + "; ".join(errors))
+        print(f"{len(pool.shards)} shard trust lines ready")
+        return
+    if args.cmd == "top-up":
+        target = Decimal(args.float_amount) if args.float_amount is not None else hot_float(config)
+        rows = top_up(client, issuer, pool, currency, {}, target)
+        print(json.dumps({shard: {k: row.get(k) for k in ("amount", "status", "engine_result", "hash")}
+                          for shard, row in rows.items()}, indent=2))
+        return
+    owners = [o.address for o in config.owners if o.address] or [config.get("system_owner_address")]
+    current = balances(client, pool, issuer.classic_address, currency)
+    print(json.dumps({shard: {"address": wallet.classic_address, "balance": str(current[shard]),
+                              "owners": sorted(o for o in owners if o and pool.shard_for(o) == shard)}
+                      for shard, wallet in pool.shards.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
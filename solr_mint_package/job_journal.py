@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+job_journal.py
+==============
+
+Write-ahead journal for multi-step flows, so a run that dies half-way can be
+resumed without redoing work that already reached the ledger, and in
+particular without burning (or paying) twice.
+
+Every transaction step of a job goes through the journal:
+
+  1. autofill + sign; the signed blob, its hash and LastLedgerSequence are
+     committed (status "signed") before anything is submitted
+  2. submit and wait for validation (telemetry.submit_and_wait)
+  3. the validated `tx` result is committed ("done"), or, for a tec/tem
+     result, the failure ("failed")
+
+On restart the job picks up where it stopped.  "done" steps return their
+recorded result without touching the ledger.  A step left "signed" is
+reconciled by hash:
+
+  - validated             its outcome is recorded as if the run never died
+  - not found, inside     the same blob is resubmitted; same hash and
+    its window            sequence, so it can apply at most once
+  - not found, past its   it can never apply; the step is signed afresh
+    LastLedgerSequence
+
+Failed and expired steps are signed afresh on the next run.  Local steps
+(lookups, derived values) record a JSON result the same way.
+
+solrai_nft_flow.py journals every run (--journal, default
+flow_journal.sqlite).  Rerunning the same command after a crash resumes the
+unfinished job with the same parameters; --job-id names a job explicitly.
+
+Fault injection: SOLR_JOURNAL_FAULT=<step>:<phase> makes the process exit
+at that point of a step (os._exit, no cleanup, exit code 75):
+
+  signed      blob journaled, not submitted
+  submitted   blob submitted, outcome not waited for
+  validated   validated on the ledger, outcome not journaled
+
+`faults` runs solrai_nft_flow against the simulator (mock_rippled.py) once
+per step x phase: crash there, rerun, then check on the ledger that every
+flow transaction applied exactly once (one issue, one burn, one mint, one
+delivery, one payment) and that the owner holds the NFT.
+
+Usage:
+    python job_journal.py list [--journal flow_journal.sqlite]
+    python job_journal.py show <job-id>
+    python job_journal.py faults [--steps burn,mint] [--phases signed,validated] [--output faults.json]
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from xrpl.clients import JsonRpcClient
+from xrpl.ledger import get_latest_validated_ledger_sequence
+from xrpl.models.requests import AccountNFTs, Tx
+from xrpl.models.response import Response, ResponseStatus
+from xrpl.models.transactions.transaction import Transaction
+from xrpl.transaction import XRPLReliableSubmissionException, submit
+from xrpl.wallet import Wallet
+
+from sequence_coordinator import allocate_and_sign
+from telemetry import submit_and_wait
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+HERE = Path(__file__).resolve().parent
+DEFAULT_JOURNAL = "flow_journal.sqlite"
+FAULT_ENV = "SOLR_JOURNAL_FAULT"
+FAULT_EXIT = 75
+FAULT_PHASES = ("signed", "submitted", "validated")
+FLOW_STEPS = ("configure_issuer", "configure_hot", "trust_line", "issue", "transfer", "burn", "mint",
+              "transfer_nft", "transfer_nft#2", "payment")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tx_blob TEXT,
+    tx_hash TEXT,
+    last_ledger_sequence INTEGER,
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+"""
+
+
+class JournalError(Exception):
+    pass
+
+
+EMPTY_RESULTS = (None, "", [], {})
+
+
+class StepFailed(JournalError):
+    pass
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def _fault(step: str, phase: str) -> bool:
+    return os.getenv(FAULT_ENV) == f"{step}:{phase}"
+
+
+def _crash(step: str, phase: str) -> None:
+    print(f"[fault] {FAULT_ENV}={step}:{phase}: exiting", file=sys.stderr, flush=True)
+    os._exit(FAULT_EXIT)
+
+
+def ledger_state(client: JsonRpcClient, tx_hash: str, last_ledger_sequence: int) -> Tuple[str, Optional[dict]]:
+    """("validated", tx result), ("expired", None) or ("pending", None) for a signed transaction."""
+    # Read the validated ledger first: if the lookup then misses and that ledger is already past the
+    # window, the transaction was in none of the ledgers it could have been in.
+    validated = get_latest_validated_ledger_sequence(client)
+    response = client.request(Tx(transaction=tx_hash))
+    if response.is_successful():
+        if response.result.get("validated"):
+            return "validated", response.result
+    elif response.result.get("error") != "txnNotFound":
+        raise JournalError(f"tx lookup for {tx_hash} failed: {response.result.get('error')}")
+    if validated >= last_ledger_sequence:
+        return "expired", None
+    return "pending", None
+
+
+class Journal:
+    """SQLite record of jobs and their steps (WAL, synchronous=FULL: a committed step survives a crash)."""
+
+    def __init__(self, path: str = DEFAULT_JOURNAL):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(SCHEMA)
+
+    def open_job(self, kind: str, params: Dict[str, Any], job_id: Optional[str] = None) -> "Job":
+        """Resume `job_id`, or the latest unfinished `kind` job with the same params; else start a new job."""
+        encoded = json.dumps(params, sort_keys=True, default=str)
+        if job_id is None:
+            row = self.conn.execute("SELECT id FROM jobs WHERE kind = ? AND params = ? AND status = 'running' "
+                                    "ORDER BY created_at DESC LIMIT 1", (kind, encoded)).fetchone()
+            job_id = row["id"] if row else None
+        if job_id is not None:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                if row["kind"] != kind or row["params"] != encoded:
+                    raise JournalError(f"job {job_id} was started as {row['kind']} with {row['params']}")
+                return Job(self, job_id, params, resumed=True)
+        else:
+            job_id = f"{kind}-{time.strftime('%Y%m%dT%H%M%S')}-{os.urandom(3).hex()}"
+        now = time.time()
+        self.conn.execute("INSERT INTO jobs VALUES (?, ?, ?, 'running', ?, ?)", (job_id, kind, encoded, now, now))
+        return Job(self, job_id, params, resumed=False)
+
+    def jobs(self) -> List[dict]:
+        rows = self.conn.execute("SELECT id, kind, status, params, created_at, updated_at FROM jobs "
+                                 "ORDER BY created_at").fetchall()
+        return [dict(row, params=json.loads(row["params"])) for row in rows]
+
+    def steps(self, job_id: str) -> List[dict]:
+        rows = self.conn.execute("SELECT name, status, tx_hash, last_ledger_sequence, attempts, updated_at, result "
+                                 "FROM steps WHERE job_id = ? ORDER BY rowid", (job_id,)).fetchall()
+        out = []
+        for row in rows:
+            step = dict(row)
+            result = json.loads(step.pop("result") or "null")
+            if isinstance(result, dict) and "meta" in result:
+                step["engine_result"] = result["meta"].get("TransactionResult")
+                step["ledger_index"] = result.get("ledger_index")
+            elif result is not None:
+                step["value"] = result
+            out.append(step)
+        return out
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class Job:
+    """One run of a flow; steps are identified by name and run at most once to completion."""
+
+    def __init__(self, journal: Journal, job_id: str, params: Dict[str, Any], resumed: bool):
+        self.journal = journal
+        self.conn = journal.conn
+        self.id = job_id
+        self.params = params
+        self.resumed = resumed
+
+    def _step(self, name: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute("SELECT * FROM steps WHERE job_id = ? AND name = ?", (self.id, name)).fetchone()
+
+    def _signed(self, name: str, signed: Transaction) -> None:
+        self.conn.execute(
+            "INSERT INTO steps (job_id, name, status, tx_blob, tx_hash, last_ledger_sequence, attempts, updated_at) "
+            "VALUES (?, ?, 'signed', ?, ?, ?, 1, ?) ON CONFLICT (job_id, name) DO UPDATE SET status = 'signed', "
+            "tx_blob = excluded.tx_blob, tx_hash = excluded.tx_hash, last_ledger_sequence = "
+            "excluded.last_ledger_sequence, result = NULL, attempts = attempts + 1, updated_at = excluded.updated_at",
+            (self.id, name, signed.blob(), signed.get_hash(), signed.last_ledger_sequence, time.time()))
+
+    def _record(self, name: str, status: str, result: Any) -> None:
+        now = time.time()
+        self.conn.execute(
+            "INSERT INTO steps (job_id, name, status, result, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (job_id, name) DO UPDATE SET status = excluded.status, result = excluded.result, "
+            "updated_at = excluded.updated_at",
+            (self.id, name, status, json.dumps(result, separators=(",", ":")), now))
+        self.conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, self.id))
+
+    def done_steps(self) -> List[str]:
+        return [row["name"] for row in self.conn.execute(
+            "SELECT name FROM steps WHERE job_id = ? AND status = 'done' ORDER BY rowid", (self.id,))]
+
+    def local(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Run `fn` once for this job and record its (JSON) result.
+
+        An empty result (None, "", [], {}) is a miss, not an answer: it is not recorded and JournalError is
+        raised, so a resumed job runs `fn` again.
+        """
+        row = self._step(name)
+        if row is not None and row["status"] == "done":
+            value = json.loads(row["result"])
+            if value not in EMPTY_RESULTS:  # journals written before empty results were refused
+                return value
+        value = fn()
+        if value in EMPTY_RESULTS:
+            raise JournalError(f"step {name}: empty result, not recorded")
+        self._record(name, "done", value)
+        return value
+
+    def submit(self, name: str, transaction: Transaction, client: JsonRpcClient,
+               wallet: Optional[Wallet] = None) -> Response:
+        """Journaled submit_and_wait: sign, record the blob, submit, record the validated outcome."""
+        row = self._step(name)
+        if row is not None and row["status"] == "done":
+            return Response(status=ResponseStatus.SUCCESS, result=json.loads(row["result"]))
+        if row is not None and row["status"] == "signed":
+            response = self._reconcile(name, row, client)
+            if response is not None:
+                return response
+        signed = allocate_and_sign(transaction, client, wallet)
+        self._signed(name, signed)
+        return self._submit(name, signed, client, wallet)
+
+    def submitter(self, name: str) -> Callable[..., Response]:
+        """A submit_and_wait stand-in that journals successive calls as <name>, <name>#2, ..."""
+        calls = itertools.count(1)
+
+        def journaled(transaction: Transaction, client: JsonRpcClient, wallet: Optional[Wallet] = None, **_kwargs):
+            n = next(calls)
+            return self.submit(name if n == 1 else f"{name}#{n}", transaction, client, wallet)
+
+        return journaled
+
+    def finish(self) -> None:
+        self.conn.execute("UPDATE jobs SET status = 'done', updated_at = ? WHERE id = ?", (time.time(), self.id))
+
+    def _reconcile(self, name: str, row: sqlite3.Row, client: JsonRpcClient) -> Optional[Response]:
+        state, result = ledger_state(client, row["tx_hash"], row["last_ledger_sequence"])
+        if state == "validated":
+            return self._outcome(name, result)
+        if state == "expired":
+            self._record(name, "expired", None)
+            return None
+        # Still inside its window: resubmitting the journaled blob cannot apply it twice.
+        return self._submit(name, Transaction.from_blob(row["tx_blob"]), client)
+
+    def _submit(self, name: str, signed: Transaction, client: JsonRpcClient,
+                wallet: Optional[Wallet] = None) -> Response:
+        if _fault(name, "signed"):
+            _crash(name, "signed")
+        if _fault(name, "submitted"):
+            submit(signed, client)
+            _crash(name, "submitted")
+        try:
+            response = submit_and_wait(signed, client, wallet)
+        except XRPLReliableSubmissionException as e:
+            state, result = ledger_state(client, signed.get_hash(), signed.last_ledger_sequence)
+            if state == "validated":
+                self._outcome(name, result)
+            elif state == "expired":
+                self._record(name, "expired", None)
+            elif str(e)[:3] == "tem":  # malformed: never applies
+                self._record(name, "failed", {"engine_result": str(e)})
+            raise
+        if _fault(name, "validated"):
+            _crash(name, "validated")
+        self._record(name, "done", response.result)
+        return response
+
+    def _outcome(self, name: str, result: dict) -> Response:
+        engine_result = (result.get("meta") or {}).get("TransactionResult")
+        if engine_result != "tesSUCCESS":
+            self._record(name, "failed", result)
+            raise StepFailed(f"step {name}: {result.get('hash')} validated with {engine_result}")
+        self._record(name, "done", result)
+        return Response(status=ResponseStatus.SUCCESS, result=result)
+
+
+# --- fault injection against the simulator ---
+def _fault_config(path: Path, wallets: Dict[str, Wallet], currency: str) -> None:
+    import yaml
+
+    roles = {"issuer": "issuer", "hot": "hot", "owner": "system_owner", "buyer": "nft_buyer", "minter": "nft_minter"}
+    config = {"currency_code": currency, "jurisdiction": "US-NJ", "program": "NJ-SREC", "vintage": "2025",
+              "image_path": str(HERE / "IMG_A6FBCF8F-9700-4089-ADB0-5C914EF43766.jpeg")}
+    for role, prefix in roles.items():
+        config[f"{prefix}_seed"] = wallets[role].seed
+        config[f"{prefix}_address"] = wallets[role].classic_address
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+
+
+def _applied(ledger, wallets: Dict[str, Wallet]) -> Dict[str, int]:
+    """Successful validated transactions per "<role> <TransactionType>"."""
+    roles = {w.classic_address: role for role, w in wallets.items()}
+    counts = Counter()
+    for entry in list(ledger.txs.values()):
+        if entry["validated"] and entry["meta"]["TransactionResult"] == "tesSUCCESS":
+            counts[f"{roles.get(entry['tx_json']['Account'], '?')} {entry['tx_json']['TransactionType']}"] += 1
+    return dict(counts)
+
+
+EXPECTED = {"issuer AccountSet": 1, "issuer Payment": 1, "hot AccountSet": 1, "hot TrustSet": 1, "hot Payment": 1,
+            "owner TrustSet": 1, "owner Payment": 1, "owner NFTokenAcceptOffer": 1, "minter NFTokenMint": 1,
+            "minter NFTokenCreateOffer": 1, "buyer Payment": 1}
+
+
+def run_fault(step: str, phase: str, close_interval: float, workdir: Path) -> dict:
+    """Crash the flow at step:phase on a fresh simulated ledger, rerun it, and check nothing applied twice."""
+    from bench_flows import simulator
+    from solrai_nft_flow import create_trust_line
+
+    currency = "STN"
+    with simulator(f"journal-faults:{step}:{phase}", close_interval, blackhole_sink=True) as (ledger, client, wallets):
+        # The flow expects the owner's trust line from onboarding.
+        create_trust_line(client, wallets["owner"], wallets["issuer"].classic_address, currency, str(10**9))
+        config = workdir / f"{step}-{phase}.yaml".replace("#", "_")
+        _fault_config(config, wallets, currency)
+        journal = workdir / f"{step}-{phase}.sqlite".replace("#", "_")
+        cmd = [sys.executable, str(HERE / "solrai_nft_flow.py"), "--kwh", "1500", "--config", str(config),
+               "--price_xrp_drops", "1000000", "--journal", str(journal), "--metadata-dir", str(workdir / "metadata"),
+               "--proof-index", str(journal.with_suffix(".proofs.sqlite"))]
+        env = dict(os.environ, XRPL_RPC_URL=client.url)
+        start = time.perf_counter()
+        crashed = subprocess.run(cmd, env=dict(env, **{FAULT_ENV: f"{step}:{phase}"}), capture_output=True, text=True)
+        resumed = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        applied = _applied(ledger, wallets)
+        owner_nfts = client.request(AccountNFTs(account=wallets["owner"].classic_address))
+        row = {
+            "fault": f"{step}:{phase}",
+            "crash_exit": crashed.returncode,
+            "resume_exit": resumed.returncode,
+            "owner_nfts": len(owner_nfts.result.get("account_nfts", [])),
+            "applied": applied,
+            "seconds": round(time.perf_counter() - start, 2),
+        }
+        row["ok"] = (crashed.returncode == FAULT_EXIT and resumed.returncode == 0
+                     and applied == EXPECTED and row["owner_nfts"] == 1)
+        if not row["ok"]:
+            row["stderr"] = (crashed.stderr[-2000:], resumed.stderr[-2000:])
+        return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job journal for resumable flows")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="Jobs in the journal")
+    p.add_argument("--journal", default=DEFAULT_JOURNAL)
+    p = sub.add_parser("show", help="Steps of one job")
+    p.add_argument("job_id")
+    p.add_argument("--journal", default=DEFAULT_JOURNAL)
+    p = sub.add_parser("faults", help="Crash solrai_nft_flow at every step/phase on the simulator and resume it")
+    p.add_argument("--steps", default=",".join(FLOW_STEPS), help="Comma-separated step names")
+    p.add_argument("--phases", default=",".join(FAULT_PHASES), help="Comma-separated phases")
+    p.add_argument("--close-interval", type=float, default=0.25, help="Simulated ledger close interval (s)")
+    p.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    if args.command in ("list", "show"):
+        if not os.path.exists(args.journal):
+            sys.exit(f"Error: no journal at {args.journal}")
+        journal = Journal(args.journal)
+        if args.command == "list":
+            print(json.dumps(journal.jobs(), indent=2))
+        else:
+            print(json.dumps(journal.steps(args.job_id), indent=2))
+        return
+
+    steps = [s for s in args.steps.split(",") if s]
+    phases = [p for p in args.phases.split(",") if p]
+    unknown = [p for p in phases if p not in FAULT_PHASES]
+    if unknown:
+        sys.exit(f"Error: unknown phase(s) {', '.join(unknown)} (expected {', '.join(FAULT_PHASES)})")
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="solr-faults-") as tmp:
+        for step in steps:
+            for phase in phases:
+                row = run_fault(step, phase, args.close_interval, Path(tmp))
+                rows.append(row)
+                print(f"{row['fault']:<28} {'ok' if row['ok'] else 'FAILED':<7} {row['seconds']}s", file=sys.stderr)
+    report = {"cases": len(rows), "failed": sum(not r["ok"] for r in rows), "expected": EXPECTED, "rows": rows}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+key_provider.py
+===============
+
+Wallets by role, derived once per process.
+
+Scripts ask a provider for `wallet("issuer")`, `wallet("hot")`,
+`wallet("minter")`, `wallet("owner")`, `wallet("buyer")` or, for fleets
+configured with an `owners:` section, `wallet("owner:<id>")` (and, for a
+`hot_wallets:` pool, `wallet("hot:<id>")`).  Each keypair is derived lazily
+on first use and kept for the process lifetime (seed -> Wallet, shared by
+every provider, so the solr.py daemon stays warm across commands).
+Derivation time and cache hits are counted in `STATS`.
+
+Backends (`SOLR_KEY_BACKEND`, or `key_backend:` in config.yaml):
+
+  config    seeds from config.yaml (default; SOLR_<KEY> env overrides apply)
+  env       seeds only from SOLR_ISSUER_SEED, SOLR_NFT_MINTER_SEED,
+            SOLR_OWNER_<ID>_SEED, ... (no secrets in the file)
+  keystore  scrypt + AES-GCM encrypted JSON keystore (`SOLR_KEYSTORE`,
+            passphrase from SOLR_KEYSTORE_PASSPHRASE or a prompt)
+  command   an external key service: `SOLR_KEY_COMMAND` (e.g.
+            "vault kv get -field=seed secret/solr/{role}") prints the seed
+            for a role on stdout; it is run once per role
+
+Usage:
+    python key_provider.py check --role issuer --role hot [--config config.yaml]
+    python key_provider.py keystore-add --role issuer [--keystore keystore.json]
+    python key_provider.py keystore-list [--keystore keystore.json]
+    python key_provider.py bench [--accounts 50] [--uses 20]
+
+Dependencies:
+    pip install xrpl-py PyYAML
+    pip install cryptography     # keystore backend only
+"""
+import argparse
+import base64
+import getpass
+import hashlib
+import json
+import os
+import secrets
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from xrpl import CryptoAlgorithm
+from xrpl.core.addresscodec import decode_seed
+from xrpl.core.keypairs import generate_seed
+from xrpl.wallet import Wallet
+
+from solr_config import Config, OwnerConfig, config_or_exit, is_placeholder, is_seed
+
+ROLE_SEEDS = {
+    "issuer": "issuer_seed",
+    "hot": "hot_seed",
+    "minter": "nft_minter_seed",
+    "owner": "system_owner_seed",
+    "buyer": "nft_buyer_seed",
+}
+BACKENDS = ("config", "env", "keystore", "command")
+DEFAULT_KEYSTORE = "keystore.json"
+KEYSTORE_VERSION = 1
+SCRYPT = {"n": 2 ** 15, "r": 8, "p": 1}
+
+
+class KeyProviderError(Exception):
+    pass
+
+
+class DerivationStats:
+    """Process-wide count of keypair derivations, cache hits and time spent deriving."""
+
+    def __init__(self):
+        self.derivations = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {"derivations": self.derivations, "cache_hits": self.hits,
+                "derive_ms": round(1000 * self.seconds, 3)}
+
+
+STATS = DerivationStats()
+_DERIVED: Dict[str, Wallet] = {}
+_LOCK = threading.Lock()
+
+
+def derive(seed: str) -> Wallet:
+    """Wallet.from_seed, once per seed for the life of the process."""
+    with _LOCK:
+        wallet = _DERIVED.get(seed)
+        if wallet is not None:
+            STATS.hits += 1
+            return wallet
+    start = time.perf_counter()
+    # xrpl-py 2.x defaults from_seed() to ed25519; use the algorithm the seed encodes
+    _entropy, algorithm = decode_seed(seed)
+    wallet = Wallet.from_seed(seed, algorithm=algorithm)
+    elapsed = time.perf_counter() - start
+    with _LOCK:
+        STATS.derivations += 1
+        STATS.seconds += elapsed
+        return _DERIVED.setdefault(seed, wallet)
+
+
+def seed_key(role: str) -> str:
+    """Config/env key naming the seed for a role ("owner:acme" -> "owner_acme_seed", "hot:h0" -> "hot_h0_seed")."""
+    if role in ROLE_SEEDS:
+        return ROLE_SEEDS[role]
+    kind, _, ident = role.partition(":")
+    if kind not in ("owner", "hot") or not ident:
+        raise KeyProviderError(f"unknown role '{role}' (expected {', '.join(ROLE_SEEDS)}, owner:<id> or hot:<id>)")
+    return f"{kind}_{ident}_seed"
+
+
+class KeyProvider:
+    """Lazily derived wallets by role; subclasses only say where seeds come from."""
+
+    backend = "base"
+
+    def __init__(self):
+        self._wallets: Dict[str, Wallet] = {}
+
+    def seed(self, role: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def wallet(self, role: str) -> Wallet:
+        wallet = self._wallets.get(role)
+        if wallet is not None:
+            with _LOCK:
+                STATS.hits += 1
+            return wallet
+        seed = self.seed(role)
+        if not seed:
+            raise KeyProviderError(f"no key for role '{role}' ({self.backend} backend)")
+        wallet = self._wallets[role] = derive(seed)
+        return wallet
+
+    def address(self, role: str) -> str:
+        return self.wallet(role).classic_address
+
+    def problems(self, roles) -> List[str]:
+        """Why each of `roles` cannot be served, without deriving anything."""
+        problems = []
+        for role in roles:
+            try:
+                seed = self.seed(role)
+            except KeyProviderError as e:
+                problems.append(str(e))
+                continue
+            if not seed:
+                problems.append(f"no key for role '{role}' ({self.backend} backend)")
+            elif not is_seed(seed):
+                problems.append(f"key for role '{role}' is not a valid seed ({self.backend} backend)")
+        return problems
+
+    def require(self, *roles: str) -> "KeyProvider":
+        problems = self.problems(roles)
+        if problems:
+            raise KeyProviderError("; ".join(problems))
+        return self
+
+
+class ConfigKeys(KeyProvider):
+    backend = "config"
+
+    def __init__(self, config: Config):
+        super().__init__()
+        self.config = config
+
+    def seed(self, role: str) -> Optional[str]:
+        if role.startswith(("owner:", "hot:")):
+            kind, _, ident = role.partition(":")
+            try:
+                entry = self.config.owner(ident) if kind == "owner" else self.config.hot_wallet(ident)
+            except KeyError as e:
+                raise KeyProviderError(e.args[0]) from None
+            return entry.seed
+        key = seed_key(role)
+        return None if key in self.config.placeholders else self.config.get(key)
+
+    def problems(self, roles) -> List[str]:
+        template = [r for r in roles if r in ROLE_SEEDS and ROLE_SEEDS[r] in self.config.placeholders]
+        return ([f"{ROLE_SEEDS[r]} in {self.config.path} is still a template value" for r in template]
+                + super().problems([r for r in roles if r not in template]))
+
+
+class EnvKeys(KeyProvider):
+    backend = "env"
+
+    def __init__(self, prefix: str = "SOLR_"):
+        super().__init__()
+        self.prefix = prefix
+
+    def seed(self, role: str) -> Optional[str]:
+        value = os.environ.get(self.prefix + seed_key(role).upper())
+        return None if is_placeholder(value) else value
+
+
+def _scrypt(passphrase: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(passphrase.encode("utf-8"), salt=salt, n=n, r=r, p=p, dklen=32, maxmem=64 * 1024 * 1024)
+
+
+def _aesgcm(key: bytes):
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        raise KeyProviderError("the keystore backend needs `pip install cryptography`") from None
+    return AESGCM(key)
+
+
+def encrypt_seed(seed: str, passphrase: str, role: str) -> dict:
+    """One keystore entry; the role is authenticated so entries cannot be swapped."""
+    salt, nonce = secrets.token_bytes(16), secrets.token_bytes(12)
+    ciphertext = _aesgcm(_scrypt(passphrase, salt, **SCRYPT)).encrypt(nonce, seed.encode("ascii"), role.encode("utf-8"))
+    b64 = lambda b: base64.b64encode(b).decode("ascii")  # noqa: E731
+    return {"kdf": dict(SCRYPT, name="scrypt", salt=b64(salt)), "nonce": b64(nonce), "ciphertext": b64(ciphertext)}
+
+
+def decrypt_seed(entry: dict, passphrase: str, role: str) -> str:
+    kdf = entry["kdf"]
+    key = _scrypt(passphrase, base64.b64decode(kdf["salt"]), kdf["n"], kdf["r"], kdf["p"])
+    try:
+        plain = _aesgcm(key).decrypt(base64.b64decode(entry["nonce"]), base64.b64decode(entry["ciphertext"]),
+                                     role.encode("utf-8"))
+    except Exception:  # cryptography raises InvalidTag
+        raise KeyProviderError(f"cannot decrypt key for role '{role}' (wrong passphrase?)") from None
+    return plain.decode("ascii")
+
+
+def read_keystore(path: str) -> dict:
+    p = Path(path)
+    if not p.exists():
+        return {"version": KEYSTORE_VERSION, "keys": {}}
+    with p.open("r", encoding="utf-8") as f:
+        store = json.load(f)
+    if store.get("version") != KEYSTORE_VERSION:
+        raise KeyProviderError(f"{path}: unsupported keystore version {store.get('version')}")
+    return store
+
+
+def write_keystore(path: str, store: dict) -> None:
+    tmp = Path(f"{path}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(store, f, indent=2)
+    os.replace(tmp, path)
+
+
+class KeystoreKeys(KeyProvider):
+    backend = "keystore"
+
+    def __init__(self, path: str = DEFAULT_KEYSTORE, passphrase: Optional[str] = None):
+        super().__init__()
+        self.path = path
+        self.entries = read_keystore(path)["keys"]
+        self._passphrase = passphrase
+        self._seeds: Dict[str, str] = {}
+
+    def passphrase(self) -> str:
+        if self._passphrase is None:
+            self._passphrase = os.getenv("SOLR_KEYSTORE_PASSPHRASE") or getpass.getpass(f"Passphrase for {self.path}: ")
+        return self._passphrase
+
+    def problems(self, roles) -> List[str]:
+        # Presence only: decrypting costs a scrypt per role, which wallet() pays on first use.
+        return [f"no key for role '{role}' in {self.path}" for role in roles if role not in self.entries]
+
+    def seed(self, role: str) -> Optional[str]:
+        if role not in self._seeds:
+            entry = self.entries.get(role)
+            if entry is None:
+                return None
+            self._seeds[role] = decrypt_seed(entry, self.passphrase(), role)
+        return self._seeds[role]
+
+
+class CommandKeys(KeyProvider):
+    backend = "command"
+
+    def __init__(self, template: str, timeout: float = 30.0):
+        super().__init__()
+        self.template = template
+        self.timeout = timeout
+        self._seeds: Dict[str, Optional[str]] = {}
+
+    def seed(self, role: str) -> Optional[str]:
+        if role not in self._seeds:
+            seed_key(role)  # reject unknown roles before running anything
+            argv = [arg.format(role=role) for arg in shlex.split(self.template)]
+            try:
+                done = subprocess.run(argv, capture_output=True, text=True, timeout=self.timeout)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                raise KeyProviderError(f"key command failed for role '{role}': {e}") from None
+            if done.returncode != 0:
+                raise KeyProviderError(f"key command exited {done.returncode} for role '{role}': "
+                                       f"{done.stderr.strip()[:200]}")
+            self._seeds[role] = done.stdout.strip() or None
+        return self._seeds[role]
+
+
+def provider_from_config(config: Config, backend: Optional[str] = None) -> KeyProvider:
+    backend = backend or os.getenv("SOLR_KEY_BACKEND") or config.get("key_backend", "config")
+    if backend == "config":
+        return ConfigKeys(config)
+    if backend == "env":
+        return EnvKeys()
+    if backend == "keystore":
+        return KeystoreKeys(os.getenv("SOLR_KEYSTORE") or config.get("keystore_path", DEFAULT_KEYSTORE))
+    if backend == "command":
+        template = os.getenv("SOLR_KEY_COMMAND") or config.get("key_command")
+        if not template:
+            raise KeyProviderError("command backend needs SOLR_KEY_COMMAND or key_command in the config")
+        return CommandKeys(template)
+    raise KeyProviderError(f"unknown key backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+
+
+def keys_or_exit(config: Config, *roles: str, backend: Optional[str] = None) -> KeyProvider:
+    """Provider for script entry points: check every role up front, print all problems and exit."""
+    try:
+        return provider_from_config(config, backend).require(*roles)
+    except KeyProviderError as e:
+        sys.exit(f"Error: {e}")
+
+
+def bench(accounts: int, uses: int) -> dict:
+    """Key derivation cost for a batch touching `accounts` wallets `uses` times each."""
+    report = {"accounts": accounts, "uses_per_account": uses}
+    for algorithm in (CryptoAlgorithm.SECP256K1, CryptoAlgorithm.ED25519):
+        seeds = [generate_seed(algorithm=algorithm) for _ in range(accounts)]
+        start = time.perf_counter()
+        for _ in range(uses):
+            for seed in seeds:
+                Wallet.from_seed(seed, algorithm=algorithm)
+        rederive = time.perf_counter() - start
+
+        keys = ConfigKeys(Config(path="<bench>", owners=tuple(OwnerConfig(id=f"b{i}", seed=seed)
+                                                              for i, seed in enumerate(seeds))))
+        before = STATS.as_dict()
+        start = time.perf_counter()
+        for _ in range(uses):
+            for i in range(accounts):
+                keys.wallet(f"owner:b{i}")
+        cached = time.perf_counter() - start
+        after = STATS.as_dict()
+        report[algorithm.value] = {
+            "rederive_every_use_ms": round(1000 * rederive, 2),
+            "provider_ms": round(1000 * cached, 2),
+            "derive_once_ms": round(after["derive_ms"] - before["derive_ms"], 2),
+            "derivations": after["derivations"] - before["derivations"],
+            "cache_hits": after["cache_hits"] - before["cache_hits"],
+            "per_derivation_ms": round(1000 * rederive / (accounts * uses), 3),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Role-based wallet provider")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_check = sub.add_parser("check", help="Check that roles resolve (addresses only, no secrets printed)")
+    p_check.add_argument("--config", default="config.yaml")
+    p_check.add_argument("--backend", choices=BACKENDS, default=None)
+    p_check.add_argument("--role", action="append", default=[], help="issuer, hot, minter, owner, buyer, owner:<id>, hot:<id>")
+
+    p_add = sub.add_parser("keystore-add", help="Encrypt a seed into the keystore (seed read from a prompt)")
+    p_add.add_argument("--keystore", default=os.getenv("SOLR_KEYSTORE", DEFAULT_KEYSTORE))
+    p_add.add_argument("--role", required=True)
+
+    p_list = sub.add_parser("keystore-list")
+    p_list.add_argument("--keystore", default=os.getenv("SOLR_KEYSTORE", DEFAULT_KEYSTORE))
+
+    p_bench = sub.add_parser("bench", help="Measure derivation time: re-derive per use vs provider cache")
+    p_bench.add_argument("--accounts", type=int, default=50)
+    p_bench.add_argument("--uses", type=int, default=20)
+
+    args = parser.parse_args()
+    try:
+        if args.cmd == "check":
+            config = config_or_exit(args.config)
+            roles = args.role or list(ROLE_SEEDS)
+            keys = keys_or_exit(config, *roles, backend=args.backend)
+            for role in roles:
+                print(f"{role:<12} {keys.address(role)}")
+            print(json.dumps(STATS.as_dict()))
+        elif args.cmd == "keystore-add":
+            seed_key(args.role)
+            seed = getpass.getpass(f"Seed for {args.role}: ").strip()
+            if not is_seed(seed):
+                sys.exit("Error: not a valid seed.")
+            passphrase = os.getenv("SOLR_KEYSTORE_PASSPHRASE") or getpass.getpass(f"Passphrase for {args.keystore}: ")
+            store = read_keystore(args.keystore)
+            store["keys"][args.role] = encrypt_seed(seed, passphrase, args.role)
+            write_keystore(args.keystore, store)
+            print(f"Stored {args.role} ({derive(seed).classic_address}) in {args.keystore}")
+        elif args.cmd == "keystore-list":
+            for role in sorted(read_keystore(args.keystore)["keys"]):
+                print(role)
+        else:
+            print(json.dumps(bench(args.accounts, args.uses), indent=2))
+    except KeyProviderError as e:
+        sys.exit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
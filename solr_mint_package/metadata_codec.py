@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+metadata_codec.py
+=================
+
+Compact, signed SOLRAI certificate metadata.
+
+`create_metadata` embeds the proof image as base64 inside base64 JSON, so a
+verifier has to download and parse megabytes per NFT.  This codec encodes the
+same certificate fields (burn proof, meter/oracle references, facility) as
+canonical minified JSON — keys sorted, no whitespace, nulls dropped, UTF-8 —
+and refers to the proof image by SHA-256 instead of embedding it.  Equal
+content always encodes to equal bytes, so the SHA-256 of the payload is a
+stable content hash.
+
+The payload is signed with the minter key as a detached signature
+(JWS-style: the signature travels next to the payload, not inside it):
+
+    {"alg": "Ed25519", "kid": "<minter public key>", "sha256": "<payload hash>", "sig": "<hex>"}
+
+Use an Ed25519 minter seed ("sEd...") for Ed25519 signatures; secp256k1 keys
+also work (alg "secp256k1", signature over SHA-512Half as in XRPL).
+
+`verify_batch` checks many (payload, signature) pairs at once, spreading
+cache misses over worker processes, and memoizes results by content hash +
+signature in a `VerificationCache`, so re-verifying a known certificate is a
+dict lookup.
+
+Canonical JSON was chosen over CBOR so the codec needs no new dependency and
+payloads stay human-readable.
+
+Usage:
+    python metadata_codec.py encode --burn-tx-hash <hash> --image proof.jpeg --output cert.json
+    python metadata_codec.py sign --payload cert.json            # writes cert.json.sig
+    python metadata_codec.py verify cert.json [more.json ...]           # trusts the configured minter key
+    python metadata_codec.py verify --trusted-key <pubkey> cert.json
+    python metadata_codec.py bench --certs 5000 --workers 4
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from xrpl.core import keypairs
+from xrpl.wallet import Wallet
+
+from key_provider import KeyProviderError, keys_or_exit, provider_from_config
+from solr_config import Config, config_or_exit
+
+CODEC_VERSION = 1
+# Below this many cache misses, process start-up costs more than it saves.
+PARALLEL_THRESHOLD = 64
+DEFAULT_CACHE_SIZE = 100_000
+
+
+def _prune(value):
+    if isinstance(value, dict):
+        return {k: _prune(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_prune(v) for v in value]
+    return value
+
+
+def encode(metadata: dict) -> bytes:
+    """Canonical minified JSON: sorted keys, no whitespace, no nulls, UTF-8."""
+    return json.dumps(_prune(metadata), sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                      allow_nan=False).encode("utf-8")
+
+
+def decode(payload: bytes) -> dict:
+    return json.loads(payload.decode("utf-8"))
+
+
+def content_hash(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+def image_reference(image_path: Path, media_type: str = "image/jpeg") -> dict:
+    """Digest of the proof image, hashed in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    with image_path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+            size += len(block)
+    return {"sha256": digest.hexdigest(), "size": size, "media_type": media_type}
+
+
+def build_metadata(config: dict, burn_tx_hash: str, image_path: Optional[Path] = None) -> dict:
+    # Imported here: burn_and_mint_solrai_nft imports meter_proofs, which imports this module
+    from burn_and_mint_solrai_nft import metadata_fields
+
+    metadata = metadata_fields(config, burn_tx_hash)
+    metadata["codec_version"] = CODEC_VERSION
+    if image_path is not None:
+        metadata["image"] = image_reference(image_path)
+    return metadata
+
+
+def sign_payload(payload: bytes, wallet: Wallet) -> dict:
+    """Detached signature over `payload` with the wallet's key."""
+    alg = "Ed25519" if wallet.public_key.upper().startswith("ED") else "secp256k1"
+    return {
+        "alg": alg,
+        "kid": wallet.public_key,
+        "sha256": content_hash(payload),
+        "sig": keypairs.sign(payload, wallet.private_key),
+    }
+
+
+def verify(payload: bytes, signature: dict, trusted_keys: Iterable[str]) -> bool:
+    """True if `signature` is valid for `payload` and made by one of `trusted_keys`.
+
+    The `kid` inside a signature is only a claim: anyone can sign forged metadata with their own key, so the
+    signer must be one of the keys the caller trusts (normally the minter's, see trusted_minter_keys).
+    """
+    if signature.get("kid") not in set(trusted_keys):
+        return False
+    return _signature_ok(payload, signature)
+
+
+def _signature_ok(payload: bytes, signature: dict) -> bool:
+    if signature.get("sha256") != content_hash(payload):
+        return False
+    try:
+        return keypairs.is_valid_message(payload, bytes.fromhex(signature["sig"]), signature["kid"])
+    except Exception:  # malformed key or signature
+        return False
+
+
+class VerificationCache:
+    """Bounded LRU of verification results keyed by content hash + signature + key."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, bool]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(signature: dict) -> str:
+        return f"{signature.get('sha256')}:{signature.get('kid')}:{signature.get('sig')}"
+
+    def get(self, key: str) -> Optional[bool]:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: bool) -> None:
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def _verify_many(items: Sequence[Tuple[bytes, dict]]) -> List[bool]:
+    # signers were checked against the trusted keys before the batch was split
+    return [_signature_ok(payload, signature) for payload, signature in items]
+
+
+def verify_batch(
+    items: Sequence[Tuple[bytes, dict]],
+    trusted_keys: Iterable[str],
+    cache: Optional[VerificationCache] = None,
+    workers: Optional[int] = None,
+) -> List[bool]:
+    """Verify (payload, signature) pairs; results in input order.
+
+    Untrusted keys fail without any crypto.  Cached results are reused; the
+    remaining pairs are verified across `workers` processes (default: CPU
+    count) when there are enough of them to pay for the pool.
+    """
+    trusted = set(trusted_keys)
+    results: List[Optional[bool]] = [None] * len(items)
+    todo: List[int] = []
+    for i, (payload, signature) in enumerate(items):
+        if signature.get("kid") not in trusted:
+            results[i] = False
+            continue
+        if signature.get("sha256") != content_hash(payload):
+            results[i] = False  # never cached: the key is only meaningful for the matching payload
+            continue
+        if cache is not None:
+            cached = cache.get(VerificationCache.key(signature))
+            if cached is not None:
+                results[i] = cached
+                continue
+        todo.append(i)
+
+    workers = workers or os.cpu_count() or 1
+    pending = [items[i] for i in todo]
+    if workers > 1 and len(pending) >= PARALLEL_THRESHOLD:
+        size = -(-len(pending) // (workers * 4))
+        chunks = [pending[k:k + size] for k in range(0, len(pending), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            verified = [ok for chunk in pool.map(_verify_many, chunks) for ok in chunk]
+    else:
+        verified = _verify_many(pending)
+
+    for i, ok in zip(todo, verified):
+        results[i] = ok
+        if cache is not None:
+            cache.put(VerificationCache.key(items[i][1]), ok)
+    return results
+
+
+def write_signed(path: Path, payload: bytes, signature: dict) -> None:
+    path.write_bytes(payload)
+    Path(str(path) + ".sig").write_text(json.dumps(signature, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def read_signed(path: Path) -> Tuple[bytes, dict]:
+    return path.read_bytes(), json.loads(Path(str(path) + ".sig").read_text(encoding="utf-8"))
+
+
+def minter_wallet(config: Config) -> Wallet:
+    return keys_or_exit(config, "minter").wallet("minter")
+
+
+def trusted_minter_keys(config: Config) -> List[str]:
+    """Public keys verification accepts by default: nft_minter_public_key, else the minter key's; may be empty."""
+    configured = config.get("nft_minter_public_key")
+    if configured:
+        return [configured]
+    try:
+        return [provider_from_config(config).require("minter").wallet("minter").public_key]
+    except KeyProviderError:
+        return []
+
+
+def bench(config: dict, image_path: Path, certs: int, workers: Optional[int]) -> dict:
+    """Encode size, encode/sign/verify time and batch-verify throughput."""
+    from xrpl import CryptoAlgorithm
+
+    from burn_and_mint_solrai_nft import create_metadata, metadata_fields
+    wallet = Wallet.create(algorithm=CryptoAlgorithm.ED25519)
+    hashes = [hashlib.sha256(str(i).encode()).hexdigest().upper() for i in range(certs)]
+
+    start = time.perf_counter()
+    legacy_hex = create_metadata(config, hashes[0], image_path)
+    legacy_s = time.perf_counter() - start
+
+    image = image_reference(image_path)
+    start = time.perf_counter()
+    payloads = []
+    for h in hashes:
+        metadata = metadata_fields(config, h)
+        metadata["codec_version"] = CODEC_VERSION
+        metadata["image"] = image
+        payloads.append(encode(metadata))
+    encode_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    signatures = [sign_payload(p, wallet) for p in payloads]
+    sign_s = time.perf_counter() - start
+
+    items = list(zip(payloads, signatures))
+    start = time.perf_counter()
+    verify(*items[0], [wallet.public_key])
+    verify_one_s = time.perf_counter() - start
+
+    cache = VerificationCache()
+    start = time.perf_counter()
+    cold = verify_batch(items, cache=cache, trusted_keys=[wallet.public_key], workers=workers)
+    cold_s = time.perf_counter() - start
+    start = time.perf_counter()
+    warm = verify_batch(items, cache=cache, trusted_keys=[wallet.public_key], workers=workers)
+    warm_s = time.perf_counter() - start
+
+    return {
+        "certs": certs,
+        "workers": workers or os.cpu_count(),
+        "legacy_uri_bytes": len(legacy_hex) // 2,
+        "legacy_encode_ms": round(1000 * legacy_s, 3),
+        "compact_bytes_mean": round(sum(map(len, payloads)) / certs, 1),
+        "signature_bytes": len(json.dumps(signatures[0], sort_keys=True)),
+        "encode_ms_per_cert": round(1000 * encode_s / certs, 4),
+        "sign_ms_per_cert": round(1000 * sign_s / certs, 4),
+        "verify_ms_single": round(1000 * verify_one_s, 4),
+        "batch_verify_cold_per_s": round(certs / cold_s, 1),
+        "batch_verify_warm_per_s": round(certs / warm_s, 1),
+        "all_valid": all(cold) and all(warm),
+        "cache_hits": cache.hits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact signed SOLRAI metadata")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_encode = sub.add_parser("encode", help="Write canonical compact metadata")
+    p_encode.add_argument("--config", default="config.yaml")
+    p_encode.add_argument("--burn-tx-hash", required=True)
+    p_encode.add_argument("--image", default=None, help="Proof image to reference by SHA-256")
+    p_encode.add_argument("--output", required=True)
+    p_encode.add_argument("--sign", action="store_true", help="Also write a detached signature with the minter key")
+
+    p_sign = sub.add_parser("sign", help="Write a detached signature (<payload>.sig) with the minter key")
+    p_sign.add_argument("--config", default="config.yaml")
+    p_sign.add_argument("--payload", required=True)
+
+    p_verify = sub.add_parser("verify", help="Verify payloads against their .sig files")
+    p_verify.add_argument("payloads", nargs="+")
+    p_verify.add_argument("--config", default="config.yaml")
+    p_verify.add_argument("--trusted-key", action="append",
+                          help="Accept only these public keys (default: nft_minter_public_key, else the minter key's)")
+    p_verify.add_argument("--workers", type=int, default=None)
+
+    p_bench = sub.add_parser("bench", help="Measure encode size/time and batch-verify throughput")
+    p_bench.add_argument("--config", default="config.yaml")
+    p_bench.add_argument("--image", default="IMG_A6FBCF8F-9700-4089-ADB0-5C914EF43766.jpeg")
+    p_bench.add_argument("--certs", type=int, default=2000)
+    p_bench.add_argument("--workers", type=int, default=None)
+
+    args = parser.parse_args()
+
+    if args.cmd == "encode":
+        config = config_or_exit(args.config)
+        payload = encode(build_metadata(config, args.burn_tx_hash, Path(args.image) if args.image else None))
+        out = Path(args.output)
+        if args.sign:
+            write_signed(out, payload, sign_payload(payload, minter_wallet(config)))
+        else:
+            out.write_bytes(payload)
+        print(f"Wrote {out} ({len(payload)} bytes, sha256 {content_hash(payload)})")
+    elif args.cmd == "sign":
+        payload = Path(args.payload).read_bytes()
+        write_signed(Path(args.payload), payload, sign_payload(payload, minter_wallet(config_or_exit(args.config))))
+        print(f"Wrote {args.payload}.sig")
+    elif args.cmd == "verify":
+        trusted = args.trusted_key or trusted_minter_keys(config_or_exit(args.config, missing_ok=True))
+        if not trusted:
+            sys.exit("Error: no trusted signer: pass --trusted-key, or set nft_minter_public_key "
+                     "(or the minter seed) in the config")
+        items = [read_signed(Path(p)) for p in args.payloads]
+        results = verify_batch(items, trusted, workers=args.workers)
+        for path, ok in zip(args.payloads, results):
+            print(f"{'OK  ' if ok else 'FAIL'} {path}")
+        if not all(results):
+            sys.exit(1)
+    else:
+        print(json.dumps(bench(config_or_exit(args.config), Path(args.image), args.certs, args.workers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
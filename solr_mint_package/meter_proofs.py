@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+meter_proofs.py
+===============
+
+Merkle-batched meter proofs: one oracle attestation per settlement window
+instead of one per issuance.
+
+All meter readings of a window (every site, every interval) become leaves of
+a binary SHA-256 Merkle tree.  The root is anchored once — as a memo on an
+AccountSet from the oracle account, and in the window manifest — and each
+certificate carries only its reading plus an O(log n) inclusion proof in
+its metadata (`metadata["meter"]["inclusion_proof"]`), so a verifier needs
+the anchored root and ~20 hashes per certificate for a million readings.
+
+Tree shape:
+  leaf  = sha256(0x00 || canonical JSON of the reading)   (metadata_codec.encode)
+  node  = sha256(0x01 || left || right)
+  an unpaired last node is promoted to the next level unchanged (no
+  duplication, so two different leaf sets can never share a root)
+
+Leaves are ordered by (site_id, interval_start) so a window always builds the
+same tree.  Each level is stored as one contiguous byte string (32 bytes per
+node), so building is O(n) hashes and ~64 bytes of memory per leaf.
+
+A window directory holds manifest.json (root, leaf count, anchor tx),
+leaves.bin (leaf hashes) and readings.jsonl (line i = leaf i).
+
+Certificates pick their proof up from config: `meter_proof: <proof.json>`
+(top level or per site, the output of `proof`) makes metadata_fields
+(burn_and_mint_solrai_nft.py, fleet_flow.py) and solrai_nft_flow.py embed it.
+
+`verify` checks a proof against an anchored root: --root, or the root read
+back from the proof's anchor transaction with --anchored.  Without either it
+only checks the root the proof carries, and says so.
+
+Usage:
+    python meter_proofs.py build --readings readings.jsonl --window 2025-06 --output windows/2025-06
+    python meter_proofs.py anchor --window-dir windows/2025-06 --config config.yaml
+    python meter_proofs.py proof --window-dir windows/2025-06 --site SITE-1 --interval-start 2025-06-01T00:00Z
+    python meter_proofs.py verify --proof proof.json --root <hex> | --anchored
+    python meter_proofs.py bench --leaves 1000000
+
+Readings are JSON objects with at least site_id, interval_start,
+interval_end and kwh; any other fields are committed as well.
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests import Tx
+from xrpl.models.transactions import AccountSet, Memo
+from xrpl.wallet import Wallet
+
+from metadata_codec import encode
+from key_provider import keys_or_exit
+from solr_config import config_or_exit
+from telemetry import submit_and_wait
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+HASH_SIZE = 32
+MEMO_TYPE = "solrai/meter-root"
+PROOF_VERSION = 1
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def reading_key(reading: dict):
+    return (str(reading["site_id"]), str(reading["interval_start"]))
+
+
+def leaf_hash(reading: dict) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + encode(reading)).digest()
+
+
+def _parent_level(level: bytes) -> bytes:
+    sha256 = hashlib.sha256
+    count = len(level) // HASH_SIZE
+    view = memoryview(level)
+    out = bytearray()
+    for off in range(0, (count - 1) * HASH_SIZE, 2 * HASH_SIZE):
+        out += sha256(NODE_PREFIX + view[off:off + 2 * HASH_SIZE]).digest()
+    if count % 2:
+        out += view[(count - 1) * HASH_SIZE:]
+    return bytes(out)
+
+
+class MerkleTree:
+    """Binary Merkle tree over pre-hashed leaves, one byte string per level."""
+
+    def __init__(self, leaves: bytes):
+        if not leaves or len(leaves) % HASH_SIZE:
+            raise ValueError("leaves must be a non-empty concatenation of 32-byte hashes")
+        self.levels: List[bytes] = [bytes(leaves)]
+        while len(self.levels[-1]) > HASH_SIZE:
+            self.levels.append(_parent_level(self.levels[-1]))
+
+    @classmethod
+    def from_readings(cls, readings: Iterable[dict]) -> "MerkleTree":
+        return cls(b"".join(leaf_hash(r) for r in readings))
+
+    @property
+    def leaf_count(self) -> int:
+        return len(self.levels[0]) // HASH_SIZE
+
+    @property
+    def root(self) -> str:
+        return self.levels[-1].hex()
+
+    def proof(self, index: int) -> List[str]:
+        """Sibling hashes from leaf `index` up to the root (promoted levels are skipped)."""
+        if not 0 <= index < self.leaf_count:
+            raise IndexError(index)
+        path = []
+        for level in self.levels[:-1]:
+            width = len(level) // HASH_SIZE
+            sibling = index ^ 1
+            if sibling < width:
+                path.append(level[sibling * HASH_SIZE:(sibling + 1) * HASH_SIZE].hex())
+            index //= 2
+        return path
+
+
+def root_from_proof(leaf: bytes, index: int, leaf_count: int, path: List[str]) -> bytes:
+    node, width, i = leaf, leaf_count, index
+    siblings = iter(path)
+    while width > 1:
+        if i ^ 1 < width:
+            sibling = bytes.fromhex(next(siblings))
+            pair = sibling + node if i & 1 else node + sibling
+            node = hashlib.sha256(NODE_PREFIX + pair).digest()
+        i //= 2
+        width = (width + 1) // 2
+    if next(siblings, None) is not None:
+        raise ValueError("proof is longer than the tree height")
+    return node
+
+
+def inclusion_proof(tree: MerkleTree, index: int, reading: dict, window: str, anchor_tx: Optional[str] = None) -> dict:
+    """Proof object to embed as metadata["meter"]["inclusion_proof"]."""
+    return {
+        "version": PROOF_VERSION,
+        "window": window,
+        "root": tree.root,
+        "anchor_tx": anchor_tx,
+        "leaf_count": tree.leaf_count,
+        "index": index,
+        "reading": reading,
+        "path": tree.proof(index),
+    }
+
+
+def verify_proof(proof: dict, root: Optional[str] = None) -> bool:
+    """Check a proof against `root` (the anchored root) or, if omitted, the root it names."""
+    expected = (root or proof["root"]).lower()
+    try:
+        computed = root_from_proof(leaf_hash(proof["reading"]), proof["index"], proof["leaf_count"], proof["path"])
+    except (ValueError, StopIteration, KeyError):
+        return False
+    return computed.hex() == expected
+
+
+def embed_proof(metadata: dict, proof: dict) -> dict:
+    """Attach an inclusion proof to certificate metadata (see metadata_fields)."""
+    meter = metadata.setdefault("meter", {})
+    meter["meter_hash"] = leaf_hash(proof["reading"]).hex()
+    meter["oracle_reference"] = f"xrpl:{proof['anchor_tx']}" if proof.get("anchor_tx") else f"merkle:{proof['root']}"
+    meter["inclusion_proof"] = proof
+    return metadata
+
+
+@functools.lru_cache(maxsize=None)
+def load_proof(path: str) -> dict:
+    """Read a proof file (or metadata carrying one) once per path; ValueError if it does not match its root."""
+    with open(path, "r", encoding="utf-8") as f:
+        proof = json.load(f)
+    proof = proof.get("meter", {}).get("inclusion_proof", proof)  # accept full metadata too
+    if not verify_proof(proof):
+        raise ValueError(f"{path}: inclusion proof does not match its root")
+    return proof
+
+
+def configured_proof(config) -> Optional[dict]:
+    """The inclusion proof named by `meter_proof` in a (site) config, if any."""
+    path = config.get("meter_proof")
+    return load_proof(str(path)) if path else None
+
+
+def anchored_root(client: JsonRpcClient, anchor_tx: str) -> str:
+    """The window root published by anchor_root() in `anchor_tx` (validated transactions only)."""
+    result = client.request(Tx(transaction=anchor_tx)).result
+    if "error" in result:
+        raise RuntimeError(f"tx {anchor_tx}: {result['error']}")
+    if not result.get("validated") or result.get("meta", {}).get("TransactionResult") != "tesSUCCESS":
+        raise RuntimeError(f"tx {anchor_tx} is not a validated, successful transaction")
+    for wrapper in result.get("Memos", []):
+        memo = wrapper.get("Memo", {})
+        if bytes.fromhex(memo.get("MemoType", "")).decode("utf-8", "replace") == MEMO_TYPE:
+            return json.loads(bytes.fromhex(memo["MemoData"]))["root"]
+    raise RuntimeError(f"tx {anchor_tx} carries no {MEMO_TYPE} memo")
+
+
+# --- window directories ---
+def read_readings(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_window(readings: List[dict], window: str, out_dir: Path) -> MerkleTree:
+    readings = sorted(readings, key=reading_key)
+    keys = [reading_key(r) for r in readings]
+    if len(set(keys)) != len(keys):
+        raise ValueError("duplicate (site_id, interval_start) readings in window")
+    tree = MerkleTree.from_readings(readings)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "leaves.bin").write_bytes(tree.levels[0])
+    with (out_dir / "readings.jsonl").open("w", encoding="utf-8") as f:
+        for r in readings:
+            f.write(encode(r).decode("utf-8") + "\n")
+    write_manifest(out_dir, {"window": window, "root": tree.root, "leaf_count": tree.leaf_count, "anchor_tx": None})
+    return tree
+
+
+def write_manifest(out_dir: Path, manifest: dict) -> None:
+    tmp = out_dir / "manifest.json.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, out_dir / "manifest.json")
+
+
+def load_window(out_dir: Path):
+    manifest = json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))
+    tree = MerkleTree((out_dir / "leaves.bin").read_bytes())
+    if tree.root != manifest["root"]:
+        raise ValueError(f"{out_dir}: leaves.bin does not match the manifest root")
+    return manifest, tree
+
+
+def find_reading(out_dir: Path, site_id: str, interval_start: str):
+    with (out_dir / "readings.jsonl").open("r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            reading = json.loads(line)
+            if reading_key(reading) == (site_id, interval_start):
+                return index, reading
+    return None, None
+
+
+def anchor_root(client: JsonRpcClient, wallet: Wallet, manifest: dict) -> str:
+    """Publish the window root as a memo on a no-op AccountSet; return the tx hash."""
+    data = json.dumps({"window": manifest["window"], "root": manifest["root"], "leaf_count": manifest["leaf_count"]},
+                      sort_keys=True, separators=(",", ":"))
+    tx = AccountSet(
+        account=wallet.classic_address,
+        memos=[Memo(
+            memo_type=MEMO_TYPE.encode("utf-8").hex(),
+            memo_format="application/json".encode("utf-8").hex(),
+            memo_data=data.encode("utf-8").hex(),
+        )],
+    )
+    return submit_and_wait(tx, client, wallet).result["hash"]
+
+
+def bench(leaves: int, samples: int) -> dict:
+    rng = random.Random(7)
+    sample_readings = [{"site_id": f"SITE-{i % 5000}", "interval_start": f"2025-06-01T{i % 24:02d}:00Z",
+                        "interval_end": f"2025-06-01T{i % 24:02d}:15Z", "kwh": "12.5"} for i in range(min(leaves, 100_000))]
+    start = time.perf_counter()
+    for r in sample_readings:
+        leaf_hash(r)
+    leaf_us = 1e6 * (time.perf_counter() - start) / len(sample_readings)
+
+    # Synthetic leaf hashes for the full tree, so the build timing is the tree itself.
+    hashed = b"".join(hashlib.sha256(i.to_bytes(8, "big")).digest() for i in range(leaves))
+    start = time.perf_counter()
+    tree = MerkleTree(hashed)
+    build_s = time.perf_counter() - start
+
+    indexes = [rng.randrange(leaves) for _ in range(samples)]
+    start = time.perf_counter()
+    proofs = [tree.proof(i) for i in indexes]
+    proof_us = 1e6 * (time.perf_counter() - start) / samples
+
+    start = time.perf_counter()
+    ok = all(root_from_proof(hashed[i * HASH_SIZE:(i + 1) * HASH_SIZE], i, leaves, p).hex() == tree.root
+             for i, p in zip(indexes, proofs))
+    verify_us = 1e6 * (time.perf_counter() - start) / samples
+
+    return {
+        "leaves": leaves,
+        "leaf_hash_us": round(leaf_us, 3),
+        "build_s": round(build_s, 3),
+        "tree_bytes": sum(len(level) for level in tree.levels),
+        "height": len(tree.levels) - 1,
+        "proof_hashes": len(proofs[0]),
+        "proof_json_bytes": len(json.dumps(proofs[0])),
+        "proof_us": round(proof_us, 3),
+        "verify_us": round(verify_us, 3),
+        "all_verified": ok,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merkle-batched meter proofs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="Build a window tree from JSONL readings")
+    p_build.add_argument("--readings", required=True)
+    p_build.add_argument("--window", required=True, help="Settlement window id, e.g. 2025-06")
+    p_build.add_argument("--output", required=True, help="Window directory")
+
+    p_anchor = sub.add_parser("anchor", help="Anchor the window root on ledger (AccountSet memo)")
+    p_anchor.add_argument("--window-dir", required=True)
+    p_anchor.add_argument("--config", default="config.yaml")
+    p_anchor.add_argument("--role", default="issuer", help="Key role of the anchoring (oracle) account")
+
+    p_proof = sub.add_parser("proof", help="Print the inclusion proof for one reading")
+    p_proof.add_argument("--window-dir", required=True)
+    p_proof.add_argument("--site", required=True)
+    p_proof.add_argument("--interval-start", required=True)
+
+    p_verify = sub.add_parser("verify", help="Verify a proof JSON file")
+    p_verify.add_argument("--proof", required=True)
+    anchor = p_verify.add_mutually_exclusive_group()
+    anchor.add_argument("--root", default=None, help="Anchored root to check against")
+    anchor.add_argument("--anchored", action="store_true", help="Read the root from the proof's anchor_tx on ledger")
+
+    p_bench = sub.add_parser("bench")
+    p_bench.add_argument("--leaves", type=int, default=1_000_000)
+    p_bench.add_argument("--samples", type=int, default=10_000)
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        tree = build_window(read_readings(args.readings), args.window, Path(args.output))
+        print(f"Window {args.window}: {tree.leaf_count} readings, root {tree.root}")
+    elif args.cmd == "anchor":
+        out_dir = Path(args.window_dir)
+        manifest, _tree = load_window(out_dir)
+        keys = keys_or_exit(config_or_exit(args.config), args.role)
+        manifest["anchor_tx"] = anchor_root(get_client(), keys.wallet(args.role), manifest)
+        write_manifest(out_dir, manifest)
+        print(f"Anchored root {manifest['root']} in {manifest['anchor_tx']}")
+    elif args.cmd == "proof":
+        out_dir = Path(args.window_dir)
+        manifest, tree = load_window(out_dir)
+        index, reading = find_reading(out_dir, args.site, args.interval_start)
+        if reading is None:
+            sys.exit("Error: no such reading in this window.")
+        print(json.dumps(inclusion_proof(tree, index, reading, manifest["window"], manifest.get("anchor_tx")), indent=2))
+    elif args.cmd == "verify":
+        with open(args.proof, "r", encoding="utf-8") as f:
+            proof = json.load(f)
+        proof = proof.get("meter", {}).get("inclusion_proof", proof)  # accept full metadata too
+        root = args.root
+        if args.anchored:
+            if not proof.get("anchor_tx"):
+                sys.exit("Error: the proof names no anchor_tx; pass --root")
+            try:
+                root = anchored_root(get_client(), proof["anchor_tx"])
+            except RuntimeError as e:
+                sys.exit(f"Error: {e}")
+        ok = verify_proof(proof, root)
+        if root is None:
+            print(("OK" if ok else "FAIL") + " (NOT ANCHORED: checked only against the root the proof carries; "
+                  "pass --root or --anchored)")
+        else:
+            print(("OK" if ok else "FAIL") + f" (root {root.lower()})")
+        if not ok:
+            sys.exit(1)
+    else:
+        print(json.dumps(bench(args.leaves, args.samples), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -20,31 +20,27 @@ Dependencies:
 """
 
 import argparse
-import sys
+import os
 import time
-import yaml
 from decimal import Decimal
 
 import xrpl
 from xrpl.clients import JsonRpcClient
 from xrpl.wallet import Wallet
 from xrpl.models import transactions, requests
-from xrpl.transaction import safe_sign_and_submit_transaction, send_reliable_submission
 from xrpl.utils import xrp_to_drops
 
-
-TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+from key_provider import keys_or_exit
+from solr_config import config_or_exit
+from telemetry import submit_and_wait
 
 
-def load_config(path: str = "config.yaml") -> dict:
-    """Load YAML configuration.  Raises FileNotFoundError if the file is missing."""
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
 
 
 def get_client() -> JsonRpcClient:
     """Instantiate a JSON RPC client for XRPL testnet."""
-    return JsonRpcClient(TESTNET_URL)
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
 
 
 def configure_account(client: JsonRpcClient, wallet: Wallet, is_issuer: bool) -> None:
@@ -54,29 +50,23 @@ def configure_account(client: JsonRpcClient, wallet: Wallet, is_issuer: bool) ->
     Destination Tag.  If False (hot account), enable Require Auth to prevent
     accidental issuance, Disallow XRP and Require Destination Tag.
     """
-    # Flags definitions from xrpl library
-    issuer_flags = (
-        xrpl.models.transactions.AccountSetFlag.UNSET              # placeholder
-    )
     # Build flags bitmask for issuer/hot
-    # The tf flags come from xrpl.models.transactions.AccountSetTfFlags
-    from xrpl.models.transactions import AccountSet, AccountSetAsfFlags, AccountSetTfFlags
+    # The tf flags come from xrpl.models.transactions.AccountSetFlag
+    from xrpl.models.transactions import AccountSet, AccountSetAsfFlag, AccountSetFlag
 
     # Common tf flags
-    flags = AccountSetTfFlags.tfDisallowXRP | AccountSetTfFlags.tfRequireDestTag
+    flags = AccountSetFlag.TF_DISALLOW_XRP | AccountSetFlag.TF_REQUIRE_DEST_TAG
     # Apply common flags
     base_tx = AccountSet(account=wallet.classic_address, flags=flags)
-    signed = safe_sign_and_submit_transaction(base_tx, wallet, client)
-    send_reliable_submission(signed, client)
+    submit_and_wait(base_tx, client, wallet)
 
     # Apply ASF flags as separate transactions (one per tx)
     if is_issuer:
         # Issuer: DefaultRipple and RequireAuth for trust lines
-        for asf in (AccountSetAsfFlags.asfDefaultRipple, AccountSetAsfFlags.asfRequireAuth):
+        for asf in (AccountSetAsfFlag.ASF_DEFAULT_RIPPLE, AccountSetAsfFlag.ASF_REQUIRE_AUTH):
             tx = AccountSet(account=wallet.classic_address, set_flag=asf)
             # TODO: Ensure issuer seed is kept offline and this transaction is run from a secure machine
-            signed = safe_sign_and_submit_transaction(tx, wallet, client)
-            send_reliable_submission(signed, client)
+            submit_and_wait(tx, client, wallet)
     else:
         # Hot: RequireAuth not strictly necessary; skip to reduce friction. Keep it minimal.
         pass
@@ -102,20 +92,16 @@ def create_trust_line(client: JsonRpcClient, hot_wallet: Wallet, issuer_address:
             "value": str(limit),
         },
     )
-    signed = safe_sign_and_submit_transaction(trust_tx, hot_wallet, client)
-    send_reliable_submission(signed, client)
+    submit_and_wait(trust_tx, client, hot_wallet)
 
 
-def authorize_trust_line(client: JsonRpcClient, issuer_wallet: Wallet, holder_address: str, currency: str) -> None:
-    """Issuer authorizes holder's trust line when RequireAuth is set.
-
-    Sets the Authorized flag on the trust line from issuer->holder.
-    """
+def authorization_tx(issuer_address: str, holder_address: str, currency: str):
+    """The issuer's tfSetAuth TrustSet approving `holder_address` to hold `currency`."""
     from xrpl.models.transactions import TrustSet, TrustSetFlag
 
-    auth_tx = TrustSet(
-        account=issuer_wallet.classic_address,
-        flags=TrustSetFlag.tfSetAuth,
+    return TrustSet(
+        account=issuer_address,
+        flags=TrustSetFlag.TF_SET_AUTH,
         limit_amount={
             "currency": currency,
             # Note: 'issuer' field here is the counterparty (holder) for issuer's trustline
@@ -123,9 +109,17 @@ def authorize_trust_line(client: JsonRpcClient, issuer_wallet: Wallet, holder_ad
             "value": "0",
         },
     )
+
+
+def authorize_trust_line(client: JsonRpcClient, issuer_wallet: Wallet, holder_address: str, currency: str) -> None:
+    """Issuer authorizes holder's trust line when RequireAuth is set.
+
+    Sets the Authorized flag on the trust line from issuer->holder.  For many
+    holders at once, see onboarding.py.
+    """
+    auth_tx = authorization_tx(issuer_wallet.classic_address, holder_address, currency)
     # TODO: In production, restrict who can trigger this call (KYC/AML process) and sign using issuer cold key
-    signed = safe_sign_and_submit_transaction(auth_tx, issuer_wallet, client)
-    send_reliable_submission(signed, client)
+    submit_and_wait(auth_tx, client, issuer_wallet)
 
 
 def issue_solr(client: JsonRpcClient, issuer_wallet: Wallet, hot_address: str, currency: str, amount: Decimal) -> None:
@@ -149,8 +143,7 @@ def issue_solr(client: JsonRpcClient, issuer_wallet: Wallet, hot_address: str, c
         },
         destination=hot_address,
     )
-    signed = safe_sign_and_submit_transaction(pay_tx, issuer_wallet, client)
-    send_reliable_submission(signed, client)
+    submit_and_wait(pay_tx, client, issuer_wallet)
 
 
 def main() -> None:
@@ -159,19 +152,15 @@ def main() -> None:
     parser.add_argument("--config", default="config.yaml", help="Path to configuration YAML")
     args = parser.parse_args()
 
-    config = load_config(args.config)
-    issuer_seed = config.get("issuer_seed")
-    hot_seed = config.get("hot_seed")
+    config = config_or_exit(args.config)
+    keys = keys_or_exit(config, "issuer", "hot")
     currency_code = config.get("currency_code", "SOLR")
 
-    if not issuer_seed or not hot_seed:
-        sys.exit("Error: issuer_seed and hot_seed must be defined in the config file.")
-
     # Connect to testnet
     client = get_client()
 
-    issuer_wallet = Wallet.from_seed(issuer_seed)
-    hot_wallet = Wallet.from_seed(hot_seed)
+    issuer_wallet = keys.wallet("issuer")
+    hot_wallet = keys.wallet("hot")
 
     print(f"Issuer address: {issuer_wallet.classic_address}")
     print(f"Hot address:    {hot_wallet.classic_address}")
@@ -0,0 +1,1083 @@
+#!/usr/bin/env python3
+"""
+mock_rippled.py
+===============
+
+Deterministic in-process XRPL simulator (JSON-RPC + WebSocket) for running
+and benchmarking the SOLR/SOLRAI scripts without a network.
+
+It implements the subset of rippled the scripts use: submit, tx,
+account_info, account_lines, account_nfts, account_tx, fee, ledger,
+ledger_closed, ledger_current, ledger_accept, server_info, nft_sell_offers,
+nft_buy_offers, nfts_by_issuer (Clio) and, over WebSocket, subscribe to the
+`ledger` / `transactions` streams and `accounts`.
+
+Modelled semantics:
+  - signatures, Sequence / Ticket ordering (tefPAST_SEQ, terPRE_SEQ held
+    until the gap fills, LastLedgerSequence expiry), fees and reserves;
+  - trust lines with limits, issuer RequireAuth + tfSetAuth, DefaultRipple
+    for holder-to-holder rippling, IOU issue / redeem / transfer;
+  - NFTokenMint / Burn / CreateOffer / AcceptOffer / CancelOffer with real
+    NFTokenID and offer-index derivation and transfer fees (XRP-priced
+    offers; brokered mode is not modelled);
+  - AccountSet flags, TrustSet, TicketCreate (at most 250 Tickets owned,
+    tecDIR_FULL beyond), XRP payments.
+
+Not modelled: destination-tag requirements (flags are recorded only),
+partial payments, paths/DEX offers, fee escalation, NFTokenPage ledger
+entries in metadata.  The transaction queue is only modelled as an optional
+per-account cap (--account-txs-per-ledger N): an account's transactions
+beyond N in one open ledger get terQUEUED and apply in later ledgers, as
+on a busy network (queue depth is not limited).  IOU payments to ACCOUNT_ZERO (the
+BLACKHOLE burn used by solrai_nft_flow.py) fail with tecNO_DST as on rippled
+unless started with --blackhole-sink, which treats them as burns.
+
+Ledgers close every --close-interval seconds.  With --close-interval 0 the
+open ledger closes on demand, the first time a client reads validated state
+after submitting, so a given request sequence always produces the same
+ledgers, hashes and results.
+
+Usage:
+    python mock_rippled.py --port 5005 --ws-port 6006 --config config.yaml
+    XRPL_RPC_URL=http://127.0.0.1:5005 python mint_solr_token.py --kwh 8.19
+
+Dependencies:
+    pip install xrpl-py websockets PyYAML
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from xrpl.core.addresscodec import decode_classic_address, is_valid_classic_address
+from xrpl.core.binarycodec import decode, encode_for_signing
+from xrpl.core.keypairs import derive_classic_address, is_valid_message
+
+from solr_config import config_or_exit
+
+ACCOUNT_ZERO = "rrrrrrrrrrrrrrrrrrrrrhoLvTp"
+ACCOUNT_ONE = "rrrrrrrrrrrrrrrrrrrrBZbvji"
+GENESIS_LEDGER = 2
+GENESIS_CLOSE_TIME = 780000000  # Ripple epoch seconds; fixed for determinism
+NETWORK_ID = 1                  # testnet
+MAX_URI_BYTES = 256
+MAX_TRANSFER_FEE = 50000
+MAX_TICKETS = 250
+NFTS_PER_PAGE = 32
+
+# Ledger-entry flags
+LSF_REQUIRE_DEST_TAG = 0x00020000
+LSF_REQUIRE_AUTH = 0x00040000
+LSF_DISALLOW_XRP = 0x00080000
+LSF_DEFAULT_RIPPLE = 0x00800000
+LSF_SELL_NFTOKEN = 0x00000001
+# AccountSet SetFlag / ClearFlag values -> AccountRoot flag
+ASF_FLAGS = {1: LSF_REQUIRE_DEST_TAG, 2: LSF_REQUIRE_AUTH, 3: LSF_DISALLOW_XRP, 8: LSF_DEFAULT_RIPPLE}
+ASF_AUTHORIZED_NFTOKEN_MINTER = 10
+# AccountSet tf flags: (set bit, clear bit, ledger flag)
+TF_ACCOUNT_FLAGS = (
+    (0x00010000, 0x00020000, LSF_REQUIRE_DEST_TAG),
+    (0x00040000, 0x00080000, LSF_REQUIRE_AUTH),
+    (0x00100000, 0x00200000, LSF_DISALLOW_XRP),
+)
+TF_SET_AUTH = 0x00010000
+TF_BURNABLE = 0x00000001
+TF_TRANSFERABLE = 0x00000008
+
+ERROR_CODES = {"actNotFound": 19, "txnNotFound": 29, "objectNotFound": 92, "lgrNotFound": 21,
+               "invalidParams": 31, "unknownCmd": 32, "invalidTransaction": 80}
+
+
+def sha512half(data: bytes) -> str:
+    return hashlib.sha512(data).digest()[:32].hex().upper()
+
+
+def tx_hash(blob: str) -> str:
+    return sha512half(bytes.fromhex("54584E00" + blob))
+
+
+def currency_bytes(code: str) -> bytes:
+    if len(code) == 3:
+        return bytes(12) + code.encode("ascii") + bytes(5)
+    return bytes.fromhex(code)
+
+
+def offer_index(account: str, sequence: int) -> str:
+    return sha512half(b"\x00q" + decode_classic_address(account) + sequence.to_bytes(4, "big"))
+
+
+def ticket_index(account: str, sequence: int) -> str:
+    return sha512half(b"\x00T" + decode_classic_address(account) + sequence.to_bytes(4, "big"))
+
+
+def account_index(account: str) -> str:
+    return sha512half(b"\x00a" + decode_classic_address(account))
+
+
+def make_nftoken_id(flags: int, transfer_fee: int, issuer: str, taxon: int, sequence: int) -> str:
+    scrambled = taxon ^ ((384160001 * sequence + 2459) & 0xFFFFFFFF)
+    return (
+        flags.to_bytes(2, "big") + transfer_fee.to_bytes(2, "big") + decode_classic_address(issuer)
+        + scrambled.to_bytes(4, "big") + sequence.to_bytes(4, "big")
+    ).hex().upper()
+
+
+def fmt_value(value: Decimal) -> str:
+    text = format(value.normalize(), "f")
+    return "0" if text in ("-0", "0") else text
+
+
+def node(kind: str, entry_type: str, index: str, fields: dict, previous: Optional[dict] = None) -> dict:
+    body = {"LedgerEntryType": entry_type, "LedgerIndex": index}
+    body["NewFields" if kind == "CreatedNode" else "FinalFields"] = fields
+    if previous:
+        body["PreviousFields"] = previous
+    return {kind: body}
+
+
+class TrustLine:
+    __slots__ = ("holder", "issuer", "currency", "balance", "limit", "authorized")
+
+    def __init__(self, holder: str, issuer: str, currency: str):
+        self.holder, self.issuer, self.currency = holder, issuer, currency
+        self.balance = Decimal(0)   # tokens the holder holds
+        self.limit = Decimal(0)
+        self.authorized = False
+
+    @property
+    def index(self) -> str:
+        low, high = sorted((decode_classic_address(self.holder), decode_classic_address(self.issuer)))
+        return sha512half(b"\x00r" + low + high + currency_bytes(self.currency))
+
+    def fields(self) -> dict:
+        """RippleState fields; Balance is from the low account's perspective."""
+        holder_is_low = decode_classic_address(self.holder) < decode_classic_address(self.issuer)
+        balance = self.balance if holder_is_low else -self.balance
+        holder_limit = {"currency": self.currency, "issuer": self.holder, "value": fmt_value(self.limit)}
+        issuer_limit = {"currency": self.currency, "issuer": self.issuer, "value": "0"}
+        return {
+            "Balance": {"currency": self.currency, "issuer": ACCOUNT_ONE, "value": fmt_value(balance)},
+            "LowLimit": holder_limit if holder_is_low else issuer_limit,
+            "HighLimit": issuer_limit if holder_is_low else holder_limit,
+            "Flags": 0,
+        }
+
+    def balance_field(self) -> dict:
+        return {"Balance": self.fields()["Balance"]}
+
+
+class MockLedger:
+    """Ledger state, transaction engine and RPC method handlers."""
+
+    def __init__(
+        self,
+        close_interval: float = 1.0,
+        verify_signatures: bool = True,
+        blackhole_sink: bool = False,
+        base_fee: int = 10,
+        reserve_base: int = 10_000_000,
+        reserve_inc: int = 2_000_000,
+        account_txs_per_ledger: int = 0,
+    ):
+        self.close_interval = close_interval
+        self.verify_signatures = verify_signatures
+        self.blackhole_sink = blackhole_sink
+        self.base_fee = base_fee
+        self.reserve_base = reserve_base
+        self.reserve_inc = reserve_inc
+        self.account_txs_per_ledger = account_txs_per_ledger
+
+        self.lock = threading.RLock()
+        self.accounts: Dict[str, dict] = {}
+        self.lines: Dict[Tuple[str, str, str], TrustLine] = {}
+        self.nfts: Dict[str, dict] = {}
+        self.offers: Dict[str, dict] = {}
+        self.tickets: set = set()
+        self.txs: Dict[str, dict] = {}
+        self.account_txs: Dict[str, List[str]] = {}
+        self.ledgers: Dict[int, dict] = {}
+        self.held: Dict[Tuple[str, int], str] = {}
+        self.queued: Dict[str, List[str]] = {}
+        self.queued_hashes: set = set()
+        self.open_counts: Counter = Counter()
+        self.open_ledger: List[str] = []
+        self.open_index = GENESIS_LEDGER + 1
+        self.listeners: List[Callable[[dict], None]] = []
+        self.stats: Counter = Counter()
+        self.ledgers[GENESIS_LEDGER] = self._ledger_header(GENESIS_LEDGER, [], "0" * 64)
+        self._stop = threading.Event()
+        self._closer: Optional[threading.Thread] = None
+
+    # --- setup / lifecycle ---
+    def fund(self, address: str, drops: int) -> None:
+        with self.lock:
+            acct = self.accounts.setdefault(address, self._new_account(address, 0))
+            acct["Balance"] += int(drops)
+
+    def start(self) -> None:
+        if self.close_interval > 0 and self._closer is None:
+            self._closer = threading.Thread(target=self._close_loop, daemon=True)
+            self._closer.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _close_loop(self) -> None:
+        while not self._stop.wait(self.close_interval):
+            self.close_ledger()
+
+    def _new_account(self, address: str, drops: int) -> dict:
+        return {"Account": address, "Balance": drops, "Sequence": self.open_index, "Flags": 0,
+                "OwnerCount": 0, "MintedNFTokens": 0, "BurnedNFTokens": 0, "NFTokenMinter": None,
+                "TicketCount": 0}
+
+    def _ledger_header(self, index: int, hashes: List[str], parent: str) -> dict:
+        close_time = GENESIS_CLOSE_TIME + (index - GENESIS_LEDGER) * max(1, int(round(self.close_interval)))
+        ledger_hash = sha512half(index.to_bytes(4, "big") + bytes.fromhex(parent) + "".join(hashes).encode())
+        return {"ledger_index": index, "ledger_hash": ledger_hash, "parent_hash": parent,
+                "close_time": close_time, "transactions": hashes}
+
+    @property
+    def validated_index(self) -> int:
+        return self.open_index - 1
+
+    def close_ledger(self) -> int:
+        """Close the open ledger, validating everything applied to it."""
+        with self.lock:
+            index = self.open_index
+            hashes = self.open_ledger
+            header = self._ledger_header(index, hashes, self.ledgers[index - 1]["ledger_hash"])
+            self.ledgers[index] = header
+            events = []
+            for h in hashes:
+                entry = self.txs[h]
+                entry["validated"] = True
+                entry["date"] = header["close_time"]
+                entry["ledger_hash"] = header["ledger_hash"]
+                self.stats["validated:" + entry["meta"]["TransactionResult"]] += 1
+                for address in entry["affected"]:
+                    self.account_txs.setdefault(address, []).append(h)
+                events.append(self._tx_event(entry))
+            self.open_ledger = []
+            self.open_index = index + 1
+            self.open_counts.clear()
+            queued, self.queued = self.queued, {}
+            self.queued_hashes.clear()
+            for blobs in queued.values():
+                for blob in sorted(blobs, key=lambda b: decode(b).get("Sequence", 0)):
+                    self.stats["queued:" + self._submit_decoded(decode(blob), tx_hash(blob), blob)] += 1
+            for key in [k for k, blob in self.held.items()
+                        if decode(blob).get("LastLedgerSequence", self.open_index) < self.open_index]:
+                del self.held[key]
+            self.stats["ledgers_closed"] += 1
+            ledger_event = {
+                "type": "ledgerClosed", "ledger_index": index, "ledger_hash": header["ledger_hash"],
+                "ledger_time": header["close_time"], "txn_count": len(hashes), "fee_base": self.base_fee,
+                "reserve_base": self.reserve_base, "reserve_inc": self.reserve_inc,
+                "validated_ledgers": f"{GENESIS_LEDGER}-{index}",
+            }
+        for listener in list(self.listeners):
+            listener(ledger_event)
+            for event in events:
+                listener(event)
+        return index
+
+    def _close_on_demand(self) -> None:
+        if self.close_interval <= 0 and self.open_ledger:
+            self.close_ledger()
+
+    def _tx_event(self, entry: dict) -> dict:
+        return {"type": "transaction", "transaction": dict(entry["tx_json"], hash=entry["hash"]),
+                "meta": entry["meta"], "ledger_index": entry["ledger_index"],
+                "ledger_hash": entry.get("ledger_hash"), "engine_result": entry["meta"]["TransactionResult"],
+                "validated": True, "affected": sorted(entry["affected"])}
+
+    # --- submission ---
+    def submit(self, blob: str) -> dict:
+        with self.lock:
+            self.stats["submitted"] += 1
+            try:
+                tx = decode(blob)
+            except Exception:  # malformed blob
+                return {"error": "invalidTransaction", "error_exception": "Could not decode tx_blob"}
+            h = tx_hash(blob)
+            result = self._submit_decoded(tx, h, blob)
+            self.stats["engine:" + result] += 1
+            return {"engine_result": result, "engine_result_code": 0 if result == "tesSUCCESS" else -1,
+                    "engine_result_message": result, "tx_blob": blob, "tx_json": dict(tx, hash=h),
+                    "accepted": result[:3] in ("tes", "tec", "ter"), "applied": result[:3] in ("tes", "tec"),
+                    "validated_ledger_index": self.validated_index}
+
+    def _submit_decoded(self, tx: dict, h: str, blob: str) -> str:
+        if h in self.txs:
+            return "tefALREADY"
+        if h in self.queued_hashes:
+            return "terQUEUED"
+        handler = getattr(self, "_apply_" + tx.get("TransactionType", ""), None)
+        if handler is None:
+            return "temUNKNOWN"
+        if self.verify_signatures and not self._signature_ok(tx):
+            return "temBAD_SIGNATURE"
+        malformed = self._preflight(tx)
+        if malformed:
+            return malformed
+        account = tx["Account"]
+        acct = self.accounts.get(account)
+        if acct is None:
+            return "terNO_ACCOUNT"
+        if int(tx.get("Fee", "0")) < self.base_fee:
+            return "telINSUF_FEE_P"
+        if tx.get("LastLedgerSequence", self.open_index) < self.open_index:
+            return "tefMAX_LEDGER"
+        ticket = tx.get("TicketSequence")
+        seq = tx.get("Sequence", 0)
+        if ticket is not None:
+            if seq != 0:
+                return "temSEQ_AND_TICKET"
+            if (account, ticket) not in self.tickets:
+                return "terPRE_TICKET" if ticket >= acct["Sequence"] else "tefNO_TICKET"
+        elif seq < acct["Sequence"]:
+            return "tefPAST_SEQ"
+        elif seq > acct["Sequence"]:
+            self.held[(account, seq)] = blob
+            return "terPRE_SEQ"
+        if acct["Balance"] < int(tx["Fee"]):
+            return "terINSUF_FEE_B"
+        if self.account_txs_per_ledger and self.open_counts[account] >= self.account_txs_per_ledger:
+            self.queued.setdefault(account, []).append(blob)
+            self.queued_hashes.add(h)
+            return "terQUEUED"
+
+        previous = {"Balance": str(acct["Balance"]), "Sequence": acct["Sequence"]}
+        result, nodes, affected, extra_meta = handler(tx, acct)
+        if result[:3] not in ("tes", "tec"):
+            return result
+        acct["Balance"] -= int(tx["Fee"])
+        self.open_counts[account] += 1
+        if ticket is not None:
+            self.tickets.discard((account, ticket))
+            acct["OwnerCount"] -= 1
+            acct["TicketCount"] -= 1
+            nodes.append(node("DeletedNode", "Ticket", ticket_index(account, ticket),
+                              {"Account": account, "TicketSequence": ticket}))
+        else:
+            acct["Sequence"] = max(acct["Sequence"], seq + 1)
+        nodes.insert(0, node("ModifiedNode", "AccountRoot", account_index(account),
+                             self._account_fields(acct), previous))
+        meta = {"TransactionIndex": len(self.open_ledger), "TransactionResult": result, "AffectedNodes": nodes}
+        meta.update(extra_meta)
+        self.txs[h] = {"hash": h, "tx_json": tx, "meta": meta, "ledger_index": self.open_index,
+                       "validated": False, "affected": {account} | affected}
+        self.open_ledger.append(h)
+
+        # A gap just filled: apply held successors.
+        next_key = (account, acct["Sequence"])
+        if next_key in self.held:
+            held_blob = self.held.pop(next_key)
+            self.stats["engine:" + self._submit_decoded(decode(held_blob), tx_hash(held_blob), held_blob)] += 1
+        return result
+
+    def _signature_ok(self, tx: dict) -> bool:
+        signature, public_key = tx.get("TxnSignature"), tx.get("SigningPubKey")
+        if not signature or not public_key:
+            return False
+        if derive_classic_address(public_key) != tx["Account"]:
+            return False
+        unsigned = {k: v for k, v in tx.items() if k != "TxnSignature"}
+        return is_valid_message(bytes.fromhex(encode_for_signing(unsigned)), bytes.fromhex(signature), public_key)
+
+    def _preflight(self, tx: dict) -> Optional[str]:
+        """Static checks rippled performs before touching state (tem*)."""
+        kind = tx["TransactionType"]
+        if kind == "Payment":
+            if tx.get("Destination") == tx["Account"]:
+                return "temREDUNDANT"
+            amount = tx.get("Amount")
+            if isinstance(amount, str) and int(amount) <= 0:
+                return "temBAD_AMOUNT"
+            if isinstance(amount, dict) and Decimal(amount["value"]) <= 0:
+                return "temBAD_AMOUNT"
+        elif kind == "TrustSet":
+            limit = tx.get("LimitAmount")
+            if not isinstance(limit, dict) or Decimal(limit["value"]) < 0:
+                return "temBAD_LIMIT"
+            if limit["issuer"] == tx["Account"]:
+                return "temDST_IS_SRC"
+        elif kind == "NFTokenMint":
+            fee = tx.get("TransferFee", 0)
+            if fee > MAX_TRANSFER_FEE:
+                return "temBAD_NFTOKEN_TRANSFER_FEE"
+            if fee and not tx.get("Flags", 0) & TF_TRANSFERABLE:
+                return "temMALFORMED"
+            if "URI" in tx and not 0 < len(tx["URI"]) // 2 <= MAX_URI_BYTES:
+                return "temMALFORMED"
+        elif kind == "NFTokenCreateOffer":
+            is_sell = tx.get("Flags", 0) & LSF_SELL_NFTOKEN
+            if bool(is_sell) == ("Owner" in tx) or tx.get("Destination") == tx["Account"]:
+                return "temMALFORMED"
+            if not isinstance(tx.get("Amount"), str):
+                return "temBAD_AMOUNT"  # only XRP-priced offers are modelled
+            if not is_sell and int(tx["Amount"]) <= 0:
+                return "temBAD_AMOUNT"
+        elif kind == "NFTokenAcceptOffer":
+            has_sell, has_buy = "NFTokenSellOffer" in tx, "NFTokenBuyOffer" in tx
+            if not (has_sell or has_buy):
+                return "temMALFORMED"
+            if has_sell and has_buy:
+                return "temDISABLED"  # brokered mode is not modelled
+        elif kind == "NFTokenCancelOffer":
+            if not tx.get("NFTokenOffers"):
+                return "temMALFORMED"
+        elif kind == "TicketCreate":
+            if not 1 <= tx.get("TicketCount", 0) <= MAX_TICKETS:
+                return "temINVALID_COUNT"
+        return None
+
+    # --- helpers ---
+    def _reserve(self, acct: dict, extra_objects: int = 0) -> int:
+        return self.reserve_base + self.reserve_inc * (acct["OwnerCount"] + extra_objects)
+
+    def _account_fields(self, acct: dict) -> dict:
+        fields = {k: acct[k] for k in ("Account", "Sequence", "Flags", "OwnerCount")}
+        fields["Balance"] = str(acct["Balance"])
+        for k in ("MintedNFTokens", "BurnedNFTokens", "NFTokenMinter", "TicketCount"):
+            if acct.get(k):
+                fields[k] = acct[k]
+        return fields
+
+    def _account_node(self, address: str, previous: Optional[dict] = None) -> dict:
+        return node("ModifiedNode", "AccountRoot", account_index(address),
+                    self._account_fields(self.accounts[address]), previous)
+
+    def _nft_pages(self, owner: str) -> int:
+        count = sum(1 for nft in self.nfts.values() if nft["Owner"] == owner)
+        return -(-count // NFTS_PER_PAGE)
+
+    def _move_nft(self, nft_id: str, new_owner: str) -> None:
+        nft = self.nfts[nft_id]
+        old_owner = nft["Owner"]
+        old_pages, new_pages = self._nft_pages(old_owner), self._nft_pages(new_owner)
+        nft["Owner"] = new_owner
+        self.accounts[old_owner]["OwnerCount"] += self._nft_pages(old_owner) - old_pages
+        self.accounts[new_owner]["OwnerCount"] += self._nft_pages(new_owner) - new_pages
+
+    def _delete_offer(self, index: str) -> dict:
+        offer = self.offers.pop(index)
+        self.accounts[offer["Owner"]]["OwnerCount"] -= 1
+        return node("DeletedNode", "NFTokenOffer", index, dict(offer))
+
+    def _check_iou(self, sender: str, receiver: str, currency: str, issuer: str, value: Decimal) -> str:
+        issuer_flags = self.accounts[issuer]["Flags"] if issuer in self.accounts else 0
+        need_auth = bool(issuer_flags & LSF_REQUIRE_AUTH)
+        if sender != issuer:
+            line = self.lines.get((sender, issuer, currency))
+            if line is None or line.balance < value:
+                return "tecPATH_PARTIAL"
+        if receiver != issuer:
+            line = self.lines.get((receiver, issuer, currency))
+            if line is None or (need_auth and not line.authorized):
+                return "tecPATH_DRY"
+            if line.balance + value > line.limit:
+                return "tecPATH_PARTIAL"
+        if sender != issuer and receiver != issuer and not issuer_flags & LSF_DEFAULT_RIPPLE:
+            return "tecPATH_DRY"  # issuer's side of both lines is NoRipple
+        return "tesSUCCESS"
+
+    def _move_iou(self, sender: str, receiver: str, currency: str, issuer: str, value: Decimal) -> List[dict]:
+        nodes = []
+        for holder, delta in ((sender, -value), (receiver, value)):
+            if holder == issuer:
+                continue
+            line = self.lines[(holder, issuer, currency)]
+            previous = line.balance_field()
+            line.balance += delta
+            nodes.append(node("ModifiedNode", "RippleState", line.index, line.fields(), previous))
+        return nodes
+
+    # --- transactors: return (result, nodes, extra affected accounts, extra meta) ---
+    def _apply_Payment(self, tx: dict, acct: dict):
+        amount, dest = tx["Amount"], tx["Destination"]
+        fee = int(tx["Fee"])
+        if isinstance(amount, str):
+            drops = int(amount)
+            if dest not in self.accounts and drops < self.reserve_base:
+                return "tecNO_DST_INSUF_XRP", [], set(), {}
+            if acct["Balance"] - fee - drops < self._reserve(acct):
+                return "tecUNFUNDED_PAYMENT", [], set(), {}
+            acct["Balance"] -= drops
+            if dest not in self.accounts:
+                self.accounts[dest] = self._new_account(dest, drops)
+                nodes = [node("CreatedNode", "AccountRoot", account_index(dest), self._account_fields(self.accounts[dest]))]
+            else:
+                previous = {"Balance": str(self.accounts[dest]["Balance"])}
+                self.accounts[dest]["Balance"] += drops
+                nodes = [self._account_node(dest, previous)]
+            return "tesSUCCESS", nodes, {dest}, {"delivered_amount": amount}
+
+        currency, issuer, value = amount["currency"], amount["issuer"], Decimal(amount["value"])
+        if dest == ACCOUNT_ZERO and self.blackhole_sink:
+            line = self.lines.get((tx["Account"], issuer, currency))
+            if line is None or line.balance < value:
+                return "tecPATH_PARTIAL", [], set(), {}
+            previous = line.balance_field()
+            line.balance -= value
+            nodes = [node("ModifiedNode", "RippleState", line.index, line.fields(), previous)]
+            return "tesSUCCESS", nodes, {issuer}, {"delivered_amount": amount}
+        if dest not in self.accounts:
+            return "tecNO_DST", [], set(), {}
+        result = self._check_iou(tx["Account"], dest, currency, issuer, value)
+        if result != "tesSUCCESS":
+            return result, [], set(), {}
+        nodes = self._move_iou(tx["Account"], dest, currency, issuer, value)
+        return "tesSUCCESS", nodes, {dest, issuer}, {"delivered_amount": amount}
+
+    def _apply_AccountSet(self, tx: dict, acct: dict):
+        flags, tf = acct["Flags"], tx.get("Flags", 0)
+        for set_bit, clear_bit, ledger_flag in TF_ACCOUNT_FLAGS:
+            if tf & set_bit:
+                flags |= ledger_flag
+            if tf & clear_bit:
+                flags &= ~ledger_flag
+        set_flag, clear_flag = tx.get("SetFlag"), tx.get("ClearFlag")
+        if set_flag in ASF_FLAGS:
+            flags |= ASF_FLAGS[set_flag]
+        if clear_flag in ASF_FLAGS:
+            flags &= ~ASF_FLAGS[clear_flag]
+        newly_require_auth = flags & LSF_REQUIRE_AUTH and not acct["Flags"] & LSF_REQUIRE_AUTH
+        if newly_require_auth and any(line.issuer == tx["Account"] for line in self.lines.values()):
+            return "tecOWNERS", [], set(), {}
+        acct["Flags"] = flags
+        if set_flag == ASF_AUTHORIZED_NFTOKEN_MINTER:
+            acct["NFTokenMinter"] = tx.get("NFTokenMinter")
+        if clear_flag == ASF_AUTHORIZED_NFTOKEN_MINTER:
+            acct["NFTokenMinter"] = None
+        return "tesSUCCESS", [], set(), {}
+
+    def _apply_TrustSet(self, tx: dict, acct: dict):
+        limit = tx["LimitAmount"]
+        account, peer, currency = tx["Account"], limit["issuer"], limit["currency"]
+        if peer not in self.accounts:
+            return "tecNO_DST", [], set(), {}
+        if tx.get("Flags", 0) & TF_SET_AUTH:
+            # Issuer authorizes the holder (`peer`) to hold its currency.
+            if not acct["Flags"] & LSF_REQUIRE_AUTH:
+                return "tefNO_AUTH_REQUIRED", [], set(), {}
+            key = (peer, account, currency)
+        else:
+            key = (account, peer, currency)
+        line = self.lines.get(key)
+        if line is None:
+            owner = self.accounts[key[0]]
+            if key[0] == account and acct["Balance"] - int(tx["Fee"]) < self._reserve(acct, 1):
+                return "tecNO_LINE_INSUF_RESERVE", [], set(), {}
+            line = self.lines[key] = TrustLine(*key)
+            owner["OwnerCount"] += 1
+            kind, previous = "CreatedNode", None
+        else:
+            kind, previous = "ModifiedNode", line.fields()
+        if tx.get("Flags", 0) & TF_SET_AUTH:
+            line.authorized = True
+        else:
+            line.limit = Decimal(limit["value"])
+        return "tesSUCCESS", [node(kind, "RippleState", line.index, line.fields(), previous)], {peer}, {}
+
+    def _apply_TicketCreate(self, tx: dict, acct: dict):
+        count = tx["TicketCount"]
+        if acct["TicketCount"] + count > MAX_TICKETS:  # an account owns at most 250 Tickets
+            return "tecDIR_FULL", [], set(), {}
+        if acct["Balance"] - int(tx["Fee"]) < self._reserve(acct, count):
+            return "tecINSUFFICIENT_RESERVE", [], set(), {}
+        first = acct["Sequence"] if "TicketSequence" in tx else tx["Sequence"] + 1
+        nodes = []
+        for seq in range(first, first + count):
+            self.tickets.add((tx["Account"], seq))
+            nodes.append(node("CreatedNode", "Ticket", ticket_index(tx["Account"], seq),
+                              {"Account": tx["Account"], "TicketSequence": seq}))
+        acct["OwnerCount"] += count
+        acct["TicketCount"] += count
+        acct["Sequence"] = first + count
+        return "tesSUCCESS", nodes, set(), {}
+
+    def _apply_NFTokenMint(self, tx: dict, acct: dict):
+        account = tx["Account"]
+        issuer = tx.get("Issuer", account)
+        if issuer != account and (issuer not in self.accounts or self.accounts[issuer]["NFTokenMinter"] != account):
+            return "tecNO_PERMISSION", [], set(), {}
+        pages_before = self._nft_pages(account)
+        new_page = -(-(sum(1 for n in self.nfts.values() if n["Owner"] == account) + 1) // NFTS_PER_PAGE) > pages_before
+        if new_page and acct["Balance"] - int(tx["Fee"]) < self._reserve(acct, 1):
+            return "tecINSUFFICIENT_RESERVE", [], set(), {}
+        issuer_acct = self.accounts[issuer]
+        nft_id = make_nftoken_id(tx.get("Flags", 0) & 0xFFFF, tx.get("TransferFee", 0), issuer,
+                                 tx["NFTokenTaxon"], issuer_acct["MintedNFTokens"])
+        issuer_acct["MintedNFTokens"] += 1
+        self.nfts[nft_id] = {"NFTokenID": nft_id, "Owner": account, "Issuer": issuer, "URI": tx.get("URI"),
+                             "Flags": tx.get("Flags", 0) & 0xFFFF, "TransferFee": tx.get("TransferFee", 0),
+                             "NFTokenTaxon": tx["NFTokenTaxon"], "nft_serial": issuer_acct["MintedNFTokens"] - 1,
+                             "is_burned": False}
+        acct["OwnerCount"] += self._nft_pages(account) - pages_before
+        nodes = [] if issuer == account else [self._account_node(issuer)]
+        return "tesSUCCESS", nodes, {issuer}, {"nftoken_id": nft_id}
+
+    def _apply_NFTokenBurn(self, tx: dict, acct: dict):
+        nft = self.nfts.get(tx["NFTokenID"])
+        owner = tx.get("Owner", tx["Account"])
+        if nft is None or nft["is_burned"] or nft["Owner"] != owner:
+            return "tecNO_ENTRY", [], set(), {}
+        if tx["Account"] != owner and not (tx["Account"] == nft["Issuer"] and nft["Flags"] & TF_BURNABLE):
+            return "tecNO_PERMISSION", [], set(), {}
+        nodes = [self._delete_offer(i) for i, o in list(self.offers.items()) if o["NFTokenID"] == nft["NFTokenID"]]
+        pages_before = self._nft_pages(owner)
+        nft["is_burned"] = True
+        nft["Owner"] = None
+        self.accounts[owner]["OwnerCount"] += self._nft_pages(owner) - pages_before
+        self.accounts[nft["Issuer"]]["BurnedNFTokens"] += 1
+        return "tesSUCCESS", nodes, {owner, nft["Issuer"]}, {"nftoken_id": nft["NFTokenID"]}
+
+    def _apply_NFTokenCreateOffer(self, tx: dict, acct: dict):
+        account = tx["Account"]
+        nft = self.nfts.get(tx["NFTokenID"])
+        is_sell = bool(tx.get("Flags", 0) & LSF_SELL_NFTOKEN)
+        holder = account if is_sell else tx.get("Owner")
+        if nft is None or nft["is_burned"] or nft["Owner"] != holder:
+            return "tecNO_ENTRY", [], set(), {}
+        if not nft["Flags"] & TF_TRANSFERABLE and nft["Issuer"] not in (account, holder):
+            return "tefNFTOKEN_IS_NOT_TRANSFERABLE", [], set(), {}
+        if acct["Balance"] - int(tx["Fee"]) < self._reserve(acct, 1):
+            return "tecINSUFFICIENT_RESERVE", [], set(), {}
+        if not is_sell and acct["Balance"] - int(tx["Fee"]) < int(tx["Amount"]):
+            return "tecUNFUNDED_OFFER", [], set(), {}
+        index = offer_index(account, tx.get("TicketSequence") or tx["Sequence"])
+        offer = {"Owner": account, "NFTokenID": nft["NFTokenID"], "Amount": tx["Amount"],
+                 "Flags": LSF_SELL_NFTOKEN if is_sell else 0}
+        if "Destination" in tx:
+            offer["Destination"] = tx["Destination"]
+        self.offers[index] = offer
+        acct["OwnerCount"] += 1
+        affected = {holder} | ({tx["Destination"]} if "Destination" in tx else set())
+        return "tesSUCCESS", [node("CreatedNode", "NFTokenOffer", index, dict(offer))], affected, {"offer_id": index}
+
+    def _apply_NFTokenAcceptOffer(self, tx: dict, acct: dict):
+        account = tx["Account"]
+        is_sell = "NFTokenSellOffer" in tx
+        index = tx["NFTokenSellOffer"] if is_sell else tx["NFTokenBuyOffer"]
+        offer = self.offers.get(index)
+        if offer is None:
+            return "tecOBJECT_NOT_FOUND", [], set(), {}
+        if bool(offer["Flags"] & LSF_SELL_NFTOKEN) != is_sell:
+            return "tecNFTOKEN_OFFER_TYPE_MISMATCH", [], set(), {}
+        if offer["Owner"] == account:
+            return "tecCANT_ACCEPT_OWN_NFTOKEN_OFFER", [], set(), {}
+        if offer.get("Destination") and offer["Destination"] != account:
+            return "tecNO_PERMISSION", [], set(), {}
+        nft = self.nfts[offer["NFTokenID"]]
+        seller, buyer = (offer["Owner"], account) if is_sell else (account, offer["Owner"])
+        if nft["Owner"] != seller:
+            return "tecNO_PERMISSION", [], set(), {}
+        buyer_acct = self.accounts[buyer]
+        price = int(offer["Amount"])
+        buyer_fee = int(tx["Fee"]) if buyer == account else 0
+        if buyer_acct["Balance"] - buyer_fee - price < self._reserve(buyer_acct):
+            return "tecINSUFFICIENT_FUNDS", [], set(), {}
+
+        touched = {buyer: str(buyer_acct["Balance"]), seller: str(self.accounts[seller]["Balance"])}
+        cut = price * nft["TransferFee"] // 100000 if seller != nft["Issuer"] else 0
+        buyer_acct["Balance"] -= price
+        self.accounts[seller]["Balance"] += price - cut
+        if cut:
+            touched.setdefault(nft["Issuer"], str(self.accounts[nft["Issuer"]]["Balance"]))
+            self.accounts[nft["Issuer"]]["Balance"] += cut
+        nodes = [self._delete_offer(index)]
+        self._move_nft(nft["NFTokenID"], buyer)
+        nodes += [self._account_node(a, {"Balance": b}) for a, b in touched.items() if a != account]
+        return "tesSUCCESS", nodes, {seller, buyer, nft["Issuer"]}, {"nftoken_id": nft["NFTokenID"]}
+
+    def _apply_NFTokenCancelOffer(self, tx: dict, acct: dict):
+        account = tx["Account"]
+        live = [i for i in tx["NFTokenOffers"] if i in self.offers]
+        for index in live:
+            offer = self.offers[index]
+            if account not in (offer["Owner"], offer.get("Destination")):
+                return "tecNO_PERMISSION", [], set(), {}
+        owners = {self.offers[i]["Owner"] for i in live}
+        return "tesSUCCESS", [self._delete_offer(i) for i in live], owners, {}
+
+    # --- RPC ---
+    def handle(self, method: str, params: dict) -> dict:
+        handler = getattr(self, "rpc_" + method, None)
+        self.stats["rpc:" + method] += 1
+        if handler is None:
+            return self._error("unknownCmd", "Unknown method.", params)
+        try:
+            with self.lock:
+                result = handler(params)
+        except (KeyError, ValueError, TypeError) as e:
+            return self._error("invalidParams", f"Invalid parameters: {e}", params)
+        if "error" in result:
+            result.setdefault("error_code", ERROR_CODES.get(result["error"], 0))
+            result.setdefault("request", params)
+            result["status"] = "error"
+        else:
+            result["status"] = "success"
+        return result
+
+    @staticmethod
+    def _error(code: str, message: str, params: dict) -> dict:
+        return {"error": code, "error_code": ERROR_CODES.get(code, 0), "error_message": message,
+                "request": params, "status": "error"}
+
+    def _resolve_ledger(self, params: dict) -> int:
+        index = params.get("ledger_index", "current")
+        if index in ("current", "open"):
+            return self.open_index
+        if index in ("validated", "closed"):
+            self._close_on_demand()
+            return self.validated_index
+        return int(index)
+
+    def _page(self, items: list, params: dict, default_limit: int = 200) -> Tuple[list, Optional[int]]:
+        start = int(params.get("marker") or 0)
+        limit = int(params.get("limit") or default_limit)
+        page = items[start:start + limit]
+        return page, (start + limit if start + limit < len(items) else None)
+
+    def _with_marker(self, result: dict, marker: Optional[int]) -> dict:
+        if marker is not None:
+            result["marker"] = marker
+        return result
+
+    def rpc_submit(self, params: dict) -> dict:
+        return self.submit(params["tx_blob"])
+
+    def rpc_server_info(self, params: dict) -> dict:
+        return {"info": {
+            "build_version": "2.0.0-mock", "network_id": NETWORK_ID, "server_state": "full",
+            "complete_ledgers": f"{GENESIS_LEDGER}-{self.validated_index}",
+            "validated_ledger": {"seq": self.validated_index, "hash": self.ledgers[self.validated_index]["ledger_hash"],
+                                 "base_fee_xrp": self.base_fee / 1e6, "reserve_base_xrp": self.reserve_base / 1e6,
+                                 "reserve_inc_xrp": self.reserve_inc / 1e6},
+        }}
+
+    def rpc_fee(self, params: dict) -> dict:
+        fee = str(self.base_fee)
+        return {"current_ledger_size": str(len(self.open_ledger)), "current_queue_size": "0",
+                "drops": {"base_fee": fee, "median_fee": "5000", "minimum_fee": fee, "open_ledger_fee": fee},
+                "expected_ledger_size": "1000", "ledger_current_index": self.open_index,
+                "levels": {"median_level": "128000", "minimum_level": "256", "open_ledger_level": "256",
+                           "reference_level": "256"},
+                "max_queue_size": "2000"}
+
+    def rpc_ledger_accept(self, params: dict) -> dict:
+        self.close_ledger()
+        return {"ledger_current_index": self.open_index}
+
+    def rpc_ledger_closed(self, params: dict) -> dict:
+        self._close_on_demand()
+        return {"ledger_index": self.validated_index, "ledger_hash": self.ledgers[self.validated_index]["ledger_hash"]}
+
+    def rpc_ledger_current(self, params: dict) -> dict:
+        return {"ledger_current_index": self.open_index}
+
+    def rpc_ledger(self, params: dict) -> dict:
+        self._close_on_demand()
+        index = self._resolve_ledger(params)
+        if index == self.open_index:
+            hashes, closed = list(self.open_ledger), False
+            header = {"ledger_index": str(index), "closed": False, "parent_hash": self.ledgers[index - 1]["ledger_hash"]}
+        elif index in self.ledgers:
+            stored = self.ledgers[index]
+            hashes, closed = stored["transactions"], True
+            header = {"ledger_index": str(index), "closed": True, "ledger_hash": stored["ledger_hash"],
+                      "parent_hash": stored["parent_hash"], "close_time": stored["close_time"]}
+        else:
+            return {"error": "lgrNotFound", "error_message": "ledgerNotFound"}
+        if params.get("transactions"):
+            if params.get("expand"):
+                header["transactions"] = [
+                    dict(self.txs[h]["tx_json"], hash=h, metaData=self.txs[h]["meta"]) if closed
+                    else dict(self.txs[h]["tx_json"], hash=h)
+                    for h in hashes
+                ]
+            else:
+                header["transactions"] = list(hashes)
+        result = {"ledger": header, "ledger_index": index, "validated": closed}
+        if closed:
+            result["ledger_hash"] = header["ledger_hash"]
+        else:
+            result["ledger_current_index"] = index
+        return result
+
+    def rpc_tx(self, params: dict) -> dict:
+        self._close_on_demand()
+        entry = self.txs.get(params["transaction"])
+        if entry is None:
+            return {"error": "txnNotFound", "error_message": "Transaction not found."}
+        result = dict(entry["tx_json"], hash=entry["hash"], ledger_index=entry["ledger_index"],
+                      validated=entry["validated"])
+        if entry["validated"]:
+            result["meta"] = entry["meta"]
+            result["date"] = entry["date"]
+        return result
+
+    def rpc_account_info(self, params: dict) -> dict:
+        acct = self.accounts.get(params["account"])
+        if acct is None:
+            return {"error": "actNotFound", "error_message": "Account not found.", "account": params["account"]}
+        index = self._resolve_ledger(params)
+        result = {"account_data": dict(self._account_fields(acct), index=account_index(acct["Account"]))}
+        if index == self.open_index:
+            result.update(ledger_current_index=index, validated=False)
+        else:
+            result.update(ledger_index=index, validated=True)
+        return result
+
+    def rpc_account_lines(self, params: dict) -> dict:
+        account = params["account"]
+        if account not in self.accounts:
+            return {"error": "actNotFound", "error_message": "Account not found."}
+        rows = []
+        for line in self.lines.values():
+            if line.holder == account:
+                rows.append({"account": line.issuer, "balance": fmt_value(line.balance), "currency": line.currency,
+                             "limit": fmt_value(line.limit), "limit_peer": "0", "quality_in": 0, "quality_out": 0,
+                             "peer_authorized": line.authorized})
+            elif line.issuer == account:
+                rows.append({"account": line.holder, "balance": fmt_value(-line.balance), "currency": line.currency,
+                             "limit": "0", "limit_peer": fmt_value(line.limit), "quality_in": 0, "quality_out": 0,
+                             "authorized": line.authorized})
+            else:
+                continue
+            if params.get("peer") and rows[-1]["account"] != params["peer"]:
+                rows.pop()
+        page, marker = self._page(rows, params)
+        return self._with_marker({"account": account, "lines": page, "ledger_current_index": self.open_index}, marker)
+
+    def rpc_account_nfts(self, params: dict) -> dict:
+        account = params["account"]
+        if account not in self.accounts:
+            return {"error": "actNotFound", "error_message": "Account not found."}
+        rows = [{k: nft[k] for k in ("Flags", "Issuer", "NFTokenID", "NFTokenTaxon", "TransferFee", "nft_serial")}
+                | ({"URI": nft["URI"]} if nft["URI"] else {})
+                for nft in self.nfts.values() if nft["Owner"] == account]
+        page, marker = self._page(rows, params, default_limit=100)
+        return self._with_marker({"account": account, "account_nfts": page,
+                                  "ledger_current_index": self.open_index, "validated": False}, marker)
+
+    def rpc_account_tx(self, params: dict) -> dict:
+        account = params["account"]
+        if account not in self.accounts:
+            return {"error": "actNotFound", "error_message": "Account not found."}
+        self._close_on_demand()
+        lo = int(params.get("ledger_index_min", -1))
+        hi = int(params.get("ledger_index_max", -1))
+        lo = GENESIS_LEDGER if lo < 0 else lo
+        hi = self.validated_index if hi < 0 else hi
+        hashes = [h for h in self.account_txs.get(account, []) if lo <= self.txs[h]["ledger_index"] <= hi]
+        if not params.get("forward"):
+            hashes.reverse()
+        page, marker = self._page(hashes, params)
+        rows = [{"tx": dict(self.txs[h]["tx_json"], hash=h, ledger_index=self.txs[h]["ledger_index"],
+                            date=self.txs[h]["date"]),
+                 "meta": self.txs[h]["meta"], "validated": True} for h in page]
+        return self._with_marker({"account": account, "ledger_index_min": lo, "ledger_index_max": hi,
+                                  "transactions": rows, "validated": True}, marker)
+
+    def _nft_offers(self, params: dict, sell: bool) -> dict:
+        rows = [{"amount": o["Amount"], "flags": o["Flags"], "nft_offer_index": i, "owner": o["Owner"]}
+                | ({"destination": o["Destination"]} if "Destination" in o else {})
+                for i, o in self.offers.items()
+                if o["NFTokenID"] == params["nft_id"] and bool(o["Flags"] & LSF_SELL_NFTOKEN) == sell]
+        if not rows:
+            return {"error": "objectNotFound", "error_message": "The requested object was not found."}
+        page, marker = self._page(rows, params, default_limit=250)
+        return self._with_marker({"nft_id": params["nft_id"], "offers": page}, marker)
+
+    def rpc_nft_sell_offers(self, params: dict) -> dict:
+        return self._nft_offers(params, sell=True)
+
+    def rpc_nft_buy_offers(self, params: dict) -> dict:
+        return self._nft_offers(params, sell=False)
+
+    def rpc_nfts_by_issuer(self, params: dict) -> dict:
+        taxon = params.get("nft_taxon")
+        rows = [{"nft_id": n["NFTokenID"], "owner": n["Owner"], "is_burned": n["is_burned"], "uri": n["URI"] or "",
+                 "flags": n["Flags"], "transfer_fee": n["TransferFee"], "issuer": n["Issuer"],
+                 "nft_taxon": n["NFTokenTaxon"], "nft_serial": n["nft_serial"]}
+                for n in self.nfts.values()
+                if n["Issuer"] == params["issuer"] and (taxon is None or n["NFTokenTaxon"] == taxon)]
+        page, marker = self._page(rows, params, default_limit=100)
+        return self._with_marker({"issuer": params["issuer"], "nfts": page, "ledger_index": self.validated_index}, marker)
+
+
+# --- transports ---
+class _RpcHandler(BaseHTTPRequestHandler):
+    ledger: MockLedger = None  # set per server
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            request = json.loads(body)
+            params = (request.get("params") or [{}])[0]
+            result = self.ledger.handle(request["method"], params)
+        except (ValueError, KeyError):
+            result = MockLedger._error("invalidParams", "Malformed JSON-RPC request.", {})
+        payload = json.dumps({"result": result}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockRippled:
+    """Serve a MockLedger over JSON-RPC (and optionally WebSocket) on localhost."""
+
+    def __init__(self, ledger: MockLedger, host: str = "127.0.0.1", rpc_port: int = 0, ws_port: Optional[int] = None):
+        self.ledger = ledger
+        self.host = host
+        handler = type("RpcHandler", (_RpcHandler,), {"ledger": ledger})
+        self.httpd = ThreadingHTTPServer((host, rpc_port), handler)
+        self.httpd.daemon_threads = True
+        self.ws_port = ws_port
+        self._ws_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[object, dict] = {}
+
+    @property
+    def rpc_url(self) -> str:
+        return f"http://{self.host}:{self.httpd.server_address[1]}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.ws_port}"
+
+    def start(self) -> "MockRippled":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        if self.ws_port is not None:
+            ready = threading.Event()
+            threading.Thread(target=self._run_ws, args=(ready,), daemon=True).start()
+            ready.wait()
+            self.ledger.listeners.append(self._publish)
+        self.ledger.start()
+        return self
+
+    def stop(self) -> None:
+        self.ledger.stop()
+        self.httpd.shutdown()
+        if self._ws_loop:
+            self._ws_loop.call_soon_threadsafe(self._ws_loop.stop)
+
+    # WebSocket
+    def _run_ws(self, ready: threading.Event) -> None:
+        import websockets
+
+        self._ws_loop = loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(websockets.serve(self._ws_session, self.host, self.ws_port))
+        self.ws_port = server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    async def _ws_session(self, websocket, path=None):
+        self._subscribers[websocket] = {"streams": set(), "accounts": set()}
+        try:
+            async for raw in websocket:
+                request = json.loads(raw)
+                command = request.pop("command", None)
+                request_id = request.pop("id", None)
+                if command == "subscribe":
+                    sub = self._subscribers[websocket]
+                    sub["streams"].update(request.get("streams", []))
+                    sub["accounts"].update(request.get("accounts", []))
+                    result = {"status": "success"}
+                    if "ledger" in sub["streams"]:
+                        result.update(self.ledger.handle("ledger_closed", {}))
+                elif command == "unsubscribe":
+                    sub = self._subscribers[websocket]
+                    sub["streams"].difference_update(request.get("streams", []))
+                    sub["accounts"].difference_update(request.get("accounts", []))
+                    result = {"status": "success"}
+                else:
+                    result = self.ledger.handle(command, request)
+                status = result.pop("status")
+                response = {"id": request_id, "type": "response", "status": status}
+                if status == "success":
+                    response["result"] = result
+                else:
+                    response.update(result)
+                await websocket.send(json.dumps(response))
+        finally:
+            self._subscribers.pop(websocket, None)
+
+    def _publish(self, event: dict) -> None:
+        if self._ws_loop is None:
+            return
+        for websocket, sub in list(self._subscribers.items()):
+            if event["type"] == "ledgerClosed":
+                wanted = "ledger" in sub["streams"]
+            else:
+                wanted = "transactions" in sub["streams"] or bool(sub["accounts"] & set(event["affected"]))
+            if wanted:
+                message = json.dumps({k: v for k, v in event.items() if k != "affected"})
+                asyncio.run_coroutine_threadsafe(websocket.send(message), self._ws_loop)
+
+
+def genesis_from_config(ledger: MockLedger, config, drops: int) -> List[str]:
+    """Fund every valid *_address in a scripts config.yaml, plus its owners: section."""
+    funded = []
+    addresses = [v for k, v in (config or {}).items() if k.endswith("_address")]
+    addresses += [owner.address for owner in getattr(config, "owners", ())]
+    for value in addresses:
+        if isinstance(value, str) and is_valid_classic_address(value):
+            ledger.fund(value, drops)
+            funded.append(value)
+    return funded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic local XRPL simulator (JSON-RPC + WebSocket)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005, help="JSON-RPC port")
+    parser.add_argument("--ws-port", type=int, default=6006, help="WebSocket port")
+    parser.add_argument("--close-interval", type=float, default=1.0,
+                        help="Seconds between ledger closes; 0 closes on demand (deterministic)")
+    parser.add_argument("--config", default=None, help="Fund every *_address in this config YAML")
+    parser.add_argument("--fund", action="append", default=[], metavar="ADDRESS[:DROPS]", help="Fund an account")
+    parser.add_argument("--genesis-drops", type=int, default=100_000_000_000, help="Default funding per account")
+    parser.add_argument("--no-verify", action="store_true", help="Skip signature verification")
+    parser.add_argument("--blackhole-sink", action="store_true",
+                        help="Treat IOU payments to ACCOUNT_ZERO as burns instead of tecNO_DST")
+    parser.add_argument("--account-txs-per-ledger", type=int, default=0, metavar="N",
+                        help="Queue (terQUEUED) an account's transactions beyond N per open ledger; 0 = no cap")
+    args = parser.parse_args()
+
+    ledger = MockLedger(close_interval=args.close_interval, verify_signatures=not args.no_verify,
+                        blackhole_sink=args.blackhole_sink, account_txs_per_ledger=args.account_txs_per_ledger)
+    if args.config:
+        for address in genesis_from_config(ledger, config_or_exit(args.config), args.genesis_drops):
+            print(f"Funded {address}")
+    for spec in args.fund:
+        address, _, drops = spec.partition(":")
+        ledger.fund(address, int(drops or args.genesis_drops))
+        print(f"Funded {address}")
+
+    server = MockRippled(ledger, args.host, args.port, args.ws_port).start()
+    print(f"mock rippled JSON-RPC on {server.rpc_url}, WebSocket on {server.ws_url} "
+          f"(close interval {args.close_interval}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
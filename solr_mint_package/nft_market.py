@@ -8,38 +8,54 @@ Prereqs:
 Notes:
 - XRPL NFT offers: NFTokenCreateOffer, NFTokenAcceptOffer.
 - Xaman users can sign these txs via deep links (see xaman_payloads.py for quick links).
+- create-sell-batch / accept-sell-batch read a JSONL manifest (one offer per
+  line) and pipeline the transactions by sequence or ticket (tx_pipeline.py),
+  writing one JSONL result per offer.  Manifest lines look like:
+    {"nft_id": "000800...", "amount_drops": "270000000", "destination": "r..."}
+    {"offer_index": "5A1B..."}
 """
 import argparse
 import json
+import os
 import sys
-import yaml
+from typing import Iterable, List, Optional
 from xrpl.clients import JsonRpcClient
 from xrpl.wallet import Wallet
-from xrpl.transaction import safe_sign_and_submit_transaction, send_reliable_submission
 from xrpl.models.transactions import NFTokenCreateOffer, NFTokenAcceptOffer
 
-TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+from key_provider import keys_or_exit
+from solr_config import config_or_exit
+from telemetry import submit_and_wait
+from tx_pipeline import DEFAULT_CHUNK_SIZE, created_node, pipeline
 
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
 
-def load_config(path: str = "config.yaml") -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+# Config key holding the seed for each --wallet role.
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
 
 
-def get_client() -> JsonRpcClient:
-    return JsonRpcClient(TESTNET_URL)
+def offer_index_from_meta(meta: dict) -> Optional[str]:
+    """Return the NFTokenOffer index created by a NFTokenCreateOffer."""
+    if meta.get("offer_id"):
+        return meta["offer_id"]
+    node = created_node(meta, "NFTokenOffer")
+    return node.get("LedgerIndex") if node else None
 
 
-def create_sell_offer(wallet: Wallet, client: JsonRpcClient, nftoken_id: str, amount_drops: str, destination: str = None) -> dict:
-    tx = NFTokenCreateOffer(
-        account=wallet.classic_address,
-        amount=amount_drops,
+def build_sell_offer(account: str, nftoken_id: str, amount_drops: str, destination: str = None) -> NFTokenCreateOffer:
+    return NFTokenCreateOffer(
+        account=account,
+        amount=str(amount_drops),
         nftoken_id=nftoken_id,
         destination=destination,  # optional: restrict buyer
         flags=1  # tfSellOffer
     )
-    signed = safe_sign_and_submit_transaction(tx, wallet, client)
-    result = send_reliable_submission(signed, client)
+
+
+def create_sell_offer(wallet: Wallet, client: JsonRpcClient, nftoken_id: str, amount_drops: str, destination: str = None) -> dict:
+    tx = build_sell_offer(wallet.classic_address, nftoken_id, amount_drops, destination)
+    result = submit_and_wait(tx, client, wallet)
     return result.result
 
 
@@ -48,47 +64,115 @@ def accept_sell_offer(wallet: Wallet, client: JsonRpcClient, sell_offer_index: s
         account=wallet.classic_address,
         nftoken_sell_offer=sell_offer_index,
     )
-    signed = safe_sign_and_submit_transaction(tx, wallet, client)
-    result = send_reliable_submission(signed, client)
+    result = submit_and_wait(tx, client, wallet)
     return result.result
 
 
+def read_manifest(path: str) -> List[dict]:
+    """Read a JSONL manifest ("-" for stdin); blank lines and # comments are skipped."""
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [json.loads(line) for line in f if line.strip() and not line.lstrip().startswith("#")]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _result_row(entry: dict, row: dict) -> dict:
+    out = dict(entry)
+    out.update({
+        "hash": row["hash"],
+        "status": row["status"],
+        "engine_result": row.get("engine_result"),
+        "ledger_index": row.get("ledger_index"),
+    })
+    return out
+
+
+def create_sell_offers_batch(
+    wallet: Wallet,
+    client: JsonRpcClient,
+    entries: List[dict],
+    use_tickets: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterable[dict]:
+    """Pipeline one NFTokenCreateOffer per manifest entry; yield rows with `offer_index`."""
+    txs = [
+        build_sell_offer(wallet.classic_address, e["nft_id"], e["amount_drops"], e.get("destination"))
+        for e in entries
+    ]
+    for entry, row in zip(entries, pipeline(client, wallet, txs, use_tickets=use_tickets, chunk_size=chunk_size)):
+        out = _result_row(entry, row)
+        out["offer_index"] = offer_index_from_meta(row.get("meta", {})) if row.get("engine_result") == "tesSUCCESS" else None
+        yield out
+
+
+def accept_sell_offers_batch(
+    wallet: Wallet,
+    client: JsonRpcClient,
+    entries: List[dict],
+    use_tickets: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterable[dict]:
+    """Pipeline one NFTokenAcceptOffer per manifest entry."""
+    txs = [
+        NFTokenAcceptOffer(account=wallet.classic_address, nftoken_sell_offer=e["offer_index"])
+        for e in entries
+    ]
+    for entry, row in zip(entries, pipeline(client, wallet, txs, use_tickets=use_tickets, chunk_size=chunk_size)):
+        yield _result_row(entry, row)
+
+
 def main():
     parser = argparse.ArgumentParser(description="XRPL NFT offer helpers")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     p_create = sub.add_parser("create-sell")
     p_create.add_argument("--config", default="config.yaml")
-    p_create.add_argument("--wallet", choices=["issuer", "hot", "owner", "buyer"], default="owner")
+    p_create.add_argument("--wallet", default="owner")
     p_create.add_argument("--nft-id", required=True)
     p_create.add_argument("--amount-drops", required=True)
     p_create.add_argument("--destination", default=None)
 
     p_accept = sub.add_parser("accept-sell")
     p_accept.add_argument("--config", default="config.yaml")
-    p_accept.add_argument("--wallet", choices=["issuer", "hot", "owner", "buyer"], default="buyer")
+    p_accept.add_argument("--wallet", default="buyer")
     p_accept.add_argument("--offer-index", required=True)
 
+    for name, default_wallet in (("create-sell-batch", "owner"), ("accept-sell-batch", "buyer")):
+        p_batch = sub.add_parser(name)
+        p_batch.add_argument("--config", default="config.yaml")
+        p_batch.add_argument("--wallet", default=default_wallet)
+        p_batch.add_argument("--manifest", required=True, help="JSONL manifest path, or - for stdin")
+        p_batch.add_argument("--output", default="-", help="JSONL results path, or - for stdout")
+        p_batch.add_argument("--use-tickets", action="store_true", help="Pipeline by Ticket instead of Sequence")
+        p_batch.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
     args = parser.parse_args()
-    cfg = load_config(args.config)
+    # Only the signing role's key is derived (key_provider caches it for the process)
+    keys = keys_or_exit(config_or_exit(args.config), args.wallet)
 
     client = get_client()
-
-    wallet_map = {
-        "issuer": Wallet.from_seed(cfg["issuer_seed"]),
-        "hot": Wallet.from_seed(cfg["hot_seed"]),
-        "owner": Wallet.from_seed(cfg["system_owner_seed"]),
-        "buyer": Wallet.from_seed(cfg["nft_buyer_seed"]),
-    }
-    wallet = wallet_map[args.wallet]
+    wallet = keys.wallet(args.wallet)
 
     if args.cmd == "create-sell":
         res = create_sell_offer(wallet, client, args.nft_id, args.amount_drops, destination=args.destination)
         print(json.dumps(res, indent=2))
-        print("Note: capture offer index from metadata to share via Xaman.")
+        print(f"Offer index: {offer_index_from_meta(res.get('meta', {}))}")
     elif args.cmd == "accept-sell":
         res = accept_sell_offer(wallet, client, args.offer_index)
         print(json.dumps(res, indent=2))
+    else:
+        entries = read_manifest(args.manifest)
+        batch = create_sell_offers_batch if args.cmd == "create-sell-batch" else accept_sell_offers_batch
+        out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            for row in batch(wallet, client, entries, use_tickets=args.use_tickets, chunk_size=args.chunk_size):
+                out.write(json.dumps(row) + "\n")
+                out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+nft_metadata.py
+===============
+
+Read SOLRAI NFT metadata back: list a minter's NFTs and decode their URIs,
+lazily and with a cache.
+
+Reading a certificate from its URI otherwise means un-hexing the URI,
+base64-decoding the whole data URI, parsing a JSON document that is mostly
+the embedded proof image and base64-decoding that image, for every NFT on
+every view.  Here:
+
+  - both URI forms are read: the data URI built by create_metadata
+    (hex(data:application/json;base64, ...)) and the compact
+    "sha256:<digest>" URI of solrai_nft_flow.store_metadata, resolved in
+    --metadata-dir (the file must hash to the digest)
+  - decoding is lazy.  Both writers put the image last in the JSON
+    (stream_codec.json_parts), so only the JSON before the image and the
+    last base64 block are decoded to get the fields; for data URIs that is
+    a few KB of hex and base64 whatever the image size.  The image is
+    decoded from its own byte range on demand (NFTMetadata.image()).  JSON
+    laid out any other way is decoded in full
+  - fields of both schema variants (burn_and_mint_solrai_nft's nested
+    burn_proof/meter/facility, solrai_nft_flow's flat burn_tx_hash/
+    meter_hash, and metadata_codec payloads) are normalized by `certificate`
+  - decoded fields are cached by the SHA-256 of the URI in a bounded LRU in
+    front of SQLite (--cache), so a second run or another process reads
+    nothing but the cache.  Unresolved "sha256:" URIs are not cached: their
+    file may be added later
+  - `list` pages nfts_by_issuer (Clio) for the minter and taxon, fetching
+    the next page while the current one is decoded by a thread pool; with
+    --holder it reads those accounts' account_nfts concurrently instead
+    (rippled has no nfts_by_issuer)
+
+Usage:
+    python nft_metadata.py list [--taxon 0] [--metadata-dir metadata] [--holder rOwner...] [--output nfts.jsonl]
+    python nft_metadata.py show <URI hex or file> [--metadata-dir metadata] [--image-out proof.jpeg]
+    python nft_metadata.py bench --nfts 200 --image-kb 512
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import base64
+import binascii
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests import GenericRequest
+
+from retirement import held_nfts
+from stream_codec import DATA_URI_PREFIX
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+DEFAULT_CACHE = "nft_metadata_cache.sqlite"
+DEFAULT_CACHE_SIZE = 10_000
+DEFAULT_WORKERS = 8
+PAGE_LIMIT = 400
+SCAN_BYTES = 3 * 1024  # JSON bytes decoded per step while looking for the image
+MAX_HEAD = 1 << 20  # past this much JSON without finding the image, decode the rest in full
+IMAGE_MARKER = b'"image":"data:'
+SHA256_PREFIX = "sha256:"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    uri_hash TEXT PRIMARY KEY,
+    decoded TEXT NOT NULL,
+    decoded_at REAL NOT NULL
+);
+"""
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def uri_hash(uri_hex: str) -> str:
+    """Cache key of a URI: the SHA-256 of its hex form, upper case as the ledger returns it."""
+    return hashlib.sha256(uri_hex.encode("ascii")).hexdigest()
+
+
+# --- sources: random access to the metadata JSON bytes ---
+class DataUriSource:
+    """The JSON inside hex(data:application/json;base64, ...), decoded one base64 range at a time."""
+
+    def __init__(self, uri_hex: str):
+        self.hex = uri_hex
+        self.offset = 2 * len(DATA_URI_PREFIX)  # hex characters before the first base64 character
+        chars = (len(uri_hex) - self.offset) // 2
+        if chars % 4:
+            raise ValueError("data URI base64 is truncated")
+        last = self._chars(chars - 4, chars) if chars else b""
+        self.length = chars // 4 * 3 - last.count(b"=")
+
+    def _chars(self, start: int, end: int) -> bytes:
+        return binascii.unhexlify(self.hex[self.offset + 2 * start:self.offset + 2 * end])
+
+    def read(self, start: int, end: int) -> bytes:
+        end = min(end, self.length)
+        if start >= end:
+            return b""
+        first = start // 3
+        blocks = binascii.a2b_base64(self._chars(4 * first, 4 * -(-end // 3)), strict_mode=True)
+        return blocks[start - 3 * first:end - 3 * first]
+
+
+class FileSource:
+    """The JSON of a content-addressed metadata file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.length = path.stat().st_size
+
+    def read(self, start: int, end: int) -> bytes:
+        with self.path.open("rb") as f:
+            f.seek(start)
+            return f.read(max(0, min(end, self.length) - start))
+
+
+def _split(source) -> dict:
+    """Fields (image left out) and the image's byte range, decoding as little of `source` as possible."""
+    head = b""
+    marker = base = -1
+    while base < 0 and len(head) < min(source.length, MAX_HEAD):
+        scanned = max(0, len(head) - len(IMAGE_MARKER))
+        head += source.read(len(head), len(head) + SCAN_BYTES)
+        if marker < 0:
+            marker = head.find(IMAGE_MARKER, scanned)
+        if marker >= 0:
+            base = head.find(b";base64,", marker)
+    tail = source.read(source.length - 2, source.length)
+    if base >= 0 and tail == b'"}':
+        key_end = marker + len(b'"image":')
+        try:
+            fields = json.loads(head[:key_end] + b"null}")
+        except ValueError:
+            fields = None
+        # the marker must be the top-level image key, and the image the last field
+        if isinstance(fields, dict) and "image" in fields and fields["image"] is None:
+            media_type = head[marker + len(IMAGE_MARKER):base].decode("utf-8", "replace")
+            fields.pop("image")
+            return {"fields": fields, "image": {"media_type": media_type, "start": base + len(b";base64,"),
+                                                "end": source.length - 2}}
+    fields = json.loads(head + source.read(len(head), source.length))
+    if not isinstance(fields, dict):
+        raise ValueError("metadata is not a JSON object")
+    image = fields.pop("image", None)
+    if isinstance(image, str) and image.startswith("data:") and ";base64," in image:
+        # embedded but not the last field: image() decodes the whole JSON again
+        return {"fields": fields, "image": {"media_type": image[5:image.index(";base64,")], "start": None}}
+    return {"fields": fields, "image": {"reference": image} if isinstance(image, dict) else None}
+
+
+def decode_uri(uri_hex: str, metadata_dir: Optional[Path] = None) -> dict:
+    """{"variant", "fields", "image"[, "error"]} for one NFT URI; "unresolved" when a sha256: file is missing."""
+    try:
+        uri_head = binascii.unhexlify(uri_hex[:2 * len(DATA_URI_PREFIX)])
+    except (binascii.Error, ValueError):
+        return {"variant": "invalid", "fields": {}, "image": None, "error": "URI is not hex"}
+    try:
+        if uri_head == DATA_URI_PREFIX:
+            return dict(_split(DataUriSource(uri_hex)), variant="data-uri")
+        uri = binascii.unhexlify(uri_hex).decode("utf-8")
+    except (binascii.Error, ValueError) as e:
+        return {"variant": "invalid", "fields": {}, "image": None, "error": str(e)}
+    if not uri.startswith(SHA256_PREFIX):
+        return {"variant": "external", "fields": {}, "image": None, "uri": uri}
+    digest = uri[len(SHA256_PREFIX):].lower()
+    path = metadata_dir / f"{digest}.json" if metadata_dir is not None else None
+    if path is None or not path.exists():
+        return {"variant": "unresolved", "fields": {}, "image": None, "digest": digest}
+    hasher = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+    if hasher.hexdigest() != digest:
+        return {"variant": "invalid", "fields": {}, "image": None, "error": f"{path.name} does not match its digest"}
+    try:
+        return dict(_split(FileSource(path)), variant="sha256", digest=digest)
+    except ValueError as e:
+        return {"variant": "invalid", "fields": {}, "image": None, "error": str(e)}
+
+
+def schema_of(fields: dict) -> Optional[str]:
+    if "codec_version" in fields:
+        return "metadata_codec"
+    if "burn_proof" in fields:
+        return "burn_and_mint_solrai_nft"
+    if "burn_tx_hash" in fields:
+        return "solrai_nft_flow"
+    return None
+
+
+def certificate(fields: dict) -> dict:
+    """The certificate fields shared by every schema variant."""
+    proof = fields.get("burn_proof") or {}
+    meter = fields.get("meter") or {}
+    facility = fields.get("facility") or {}
+    return {
+        "schema": schema_of(fields),
+        "jurisdiction": fields.get("jurisdiction"),
+        "program": fields.get("program"),
+        "vintage": fields.get("vintage"),
+        "burn_tx": (proof.get("tx_hash") or fields.get("burn_tx_hash") or "").upper() or None,
+        "amount_burned": proof.get("amount_burned", "1000"),
+        "meter_hash": meter.get("meter_hash", fields.get("meter_hash")),
+        "oracle_reference": meter.get("oracle_reference", fields.get("oracle_reference")),
+        "facility": facility.get("name"),
+    }
+
+
+class MetadataCache:
+    """Bounded LRU of decoded URIs in front of a SQLite table, keyed by uri_hash; safe across threads."""
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        self.conn = None
+        if path is not None:
+            self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.conn.executescript(SCHEMA)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self.lock:
+            decoded = self.entries.get(key)
+            if decoded is not None:
+                self.entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return decoded
+            row = self.conn.execute("SELECT decoded FROM metadata WHERE uri_hash = ?",
+                                    (key,)).fetchone() if self.conn else None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            decoded = json.loads(row[0])
+            self._remember(key, decoded)
+            return decoded
+
+    def put(self, key: str, decoded: dict) -> None:
+        with self.lock:
+            self._remember(key, decoded)
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?)",
+                                      (key, json.dumps(decoded, separators=(",", ":")), time.time()))
+
+    def _remember(self, key: str, decoded: dict) -> None:
+        self.entries[key] = decoded
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+
+
+class NFTMetadata:
+    """One NFT's decoded fields; the image is only decoded when image() is called."""
+
+    def __init__(self, uri_hex: str, decoded: dict, metadata_dir: Optional[Path] = None, nft: Optional[dict] = None):
+        self.uri_hex = uri_hex
+        self.decoded = decoded
+        self.metadata_dir = metadata_dir
+        self.nft = nft or {}
+
+    @property
+    def variant(self) -> str:
+        return self.decoded["variant"]
+
+    @property
+    def fields(self) -> dict:
+        return self.decoded["fields"]
+
+    @property
+    def certificate(self) -> dict:
+        return certificate(self.fields)
+
+    @property
+    def media_type(self) -> Optional[str]:
+        return (self.decoded.get("image") or {}).get("media_type")
+
+    def _source(self):
+        if self.variant == "data-uri":
+            return DataUriSource(self.uri_hex)
+        return FileSource(self.metadata_dir / f"{self.decoded['digest']}.json")
+
+    def image(self) -> Optional[bytes]:
+        """The embedded proof image, or None (no image, or only a sha256 reference to one)."""
+        image = self.decoded.get("image") or {}
+        if "media_type" not in image:
+            return None
+        source = self._source()
+        if image["start"] is None:
+            embedded = json.loads(source.read(0, source.length))["image"]
+            return base64.b64decode(embedded[embedded.index(";base64,") + len(";base64,"):])
+        return binascii.a2b_base64(source.read(image["start"], image["end"]), strict_mode=True)
+
+    def row(self) -> dict:
+        """One line of `list` output."""
+        image = self.decoded.get("image") or {}
+        return {"nft_id": self.nft.get("nft_id"), "owner": self.nft.get("owner"), "uri": self.uri_hex,
+                "uri_hash": uri_hash(self.uri_hex), "variant": self.variant, **self.certificate,
+                "image": image.get("media_type") or image.get("reference"),
+                **{k: self.decoded[k] for k in ("error", "digest") if k in self.decoded}}
+
+
+class MetadataReader:
+    """Decode NFT URIs through a MetadataCache."""
+
+    def __init__(self, cache: MetadataCache, metadata_dir: Optional[Path] = None, workers: int = DEFAULT_WORKERS):
+        self.cache = cache
+        self.metadata_dir = metadata_dir
+        self.workers = workers
+
+    def read(self, uri_hex: str, nft: Optional[dict] = None) -> NFTMetadata:
+        uri_hex = (uri_hex or "").upper()
+        key = uri_hash(uri_hex)
+        decoded = self.cache.get(key)
+        if decoded is None:
+            decoded = decode_uri(uri_hex, self.metadata_dir)
+            if decoded["variant"] != "unresolved":
+                self.cache.put(key, decoded)
+        return NFTMetadata(uri_hex, decoded, self.metadata_dir, nft)
+
+    def read_many(self, nfts: Sequence[dict], pool: Optional[ThreadPoolExecutor] = None) -> List[NFTMetadata]:
+        if pool is None or len(nfts) < 2:
+            return [self.read(nft["uri"], nft) for nft in nfts]
+        return list(pool.map(lambda nft: self.read(nft["uri"], nft), nfts))
+
+    def collection(self, client: JsonRpcClient, issuer: str, taxon: Optional[int] = 0,
+                   holders: Sequence[str] = (), include_burned: bool = False) -> Iterator[NFTMetadata]:
+        """Every NFT of `issuer`/`taxon` with its metadata, page by page."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            if holders:
+                for nfts in pool.map(lambda account: _holder_nfts(client, account, issuer, taxon), holders):
+                    yield from self.read_many(nfts, pool)
+                return
+            page = pool.submit(_issuer_page, client, issuer, taxon, None)
+            while page is not None:
+                nfts, marker = page.result()
+                # the next request is in flight while this page is decoded
+                page = pool.submit(_issuer_page, client, issuer, taxon, marker) if marker else None
+                yield from self.read_many([n for n in nfts if include_burned or not n["is_burned"]], pool)
+
+
+def _issuer_page(client: JsonRpcClient, issuer: str, taxon: Optional[int], marker) -> tuple:
+    result = client.request(GenericRequest(method="nfts_by_issuer", issuer=issuer, nft_taxon=taxon,
+                                           limit=PAGE_LIMIT, marker=marker)).result
+    if "error" in result:
+        raise RuntimeError(f"nfts_by_issuer {issuer}: {result.get('error_message') or result['error']}"
+                           " (not a Clio server? pass --holder accounts instead)")
+    nfts = [{"nft_id": n["nft_id"].upper(), "owner": n.get("owner"), "uri": n.get("uri") or "",
+             "is_burned": bool(n.get("is_burned"))} for n in result.get("nfts", [])]
+    return nfts, result.get("marker")
+
+
+def _holder_nfts(client: JsonRpcClient, account: str, issuer: str, taxon: Optional[int]) -> List[dict]:
+    return [{"nft_id": nft_id, "owner": account, "uri": nft.get("URI") or "", "is_burned": False}
+            for nft_id, nft in held_nfts(client, account).items()
+            if nft.get("Issuer") == issuer and (taxon is None or nft.get("NFTokenTaxon") == taxon)]
+
+
+# --- measurement ---
+def bench(nfts: int, image_kb: int) -> dict:
+    """Eager full decode vs lazy cold decode vs LRU and SQLite hits, for both URI variants."""
+    import tempfile
+
+    from solrai_nft_flow import metadata_dict
+    from stream_codec import metadata_uri_hex, write_metadata_json
+
+    from bench_flows import bench_config
+
+    config = bench_config()
+    result: dict = {"nfts": nfts, "image_kb": image_kb}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        image = tmp / "proof.jpeg"
+        image.write_bytes(os.urandom(image_kb * 1024))
+        metadata_dir = tmp / "metadata"
+        metadata_dir.mkdir()
+        data_uris, file_uris = [], []
+        for i in range(nfts):
+            burn = hashlib.sha256(f"burn{i}".encode()).hexdigest().upper()
+            data_uris.append(metadata_uri_hex(metadata_dict(config, burn), image).upper())
+            with (metadata_dir / "payload.tmp").open("wb") as out:
+                digest = write_metadata_json(metadata_dict(config, burn), image, out)
+            os.replace(metadata_dir / "payload.tmp", metadata_dir / f"{digest}.json")
+            file_uris.append(f"{SHA256_PREFIX}{digest}".encode("utf-8").hex().upper())
+
+        def eager(uri_hex: str) -> dict:  # what a reader had to do before: everything, image included
+            uri = bytes.fromhex(uri_hex).decode("utf-8")
+            if uri.startswith(SHA256_PREFIX):
+                metadata = json.loads((metadata_dir / f"{uri[len(SHA256_PREFIX):]}.json").read_bytes())
+            else:
+                metadata = json.loads(base64.b64decode(uri[len(DATA_URI_PREFIX):]))
+            image_b64 = metadata.pop("image")
+            base64.b64decode(image_b64[image_b64.index(",") + 1:])
+            return metadata
+
+        for variant, uris in (("data-uri", data_uris), ("sha256", file_uris)):
+            timings = {}
+            start = time.perf_counter()
+            expected = [eager(u) for u in uris]
+            timings["eager_s"] = time.perf_counter() - start
+
+            cache = MetadataCache(str(tmp / f"{variant}.sqlite"))
+            reader = MetadataReader(cache, metadata_dir)
+            start = time.perf_counter()
+            cold = [reader.read(u) for u in uris]
+            timings["lazy_cold_s"] = time.perf_counter() - start
+            if [m.fields for m in cold] != expected:
+                raise AssertionError(f"{variant}: lazy fields differ from a full decode")
+            start = time.perf_counter()
+            for u in uris:
+                reader.read(u)
+            timings["lru_s"] = time.perf_counter() - start
+            cache.close()
+
+            cache = MetadataCache(str(tmp / f"{variant}.sqlite"))
+            reader = MetadataReader(cache, metadata_dir)
+            start = time.perf_counter()
+            warm = [reader.read(u) for u in uris]
+            timings["sqlite_s"] = time.perf_counter() - start
+            start = time.perf_counter()
+            images = [m.image() for m in warm[:10]]
+            timings["image_on_demand_ms"] = 1000 * (time.perf_counter() - start) / len(images)
+            if any(img != image.read_bytes() for img in images):
+                raise AssertionError(f"{variant}: on-demand image differs from the original")
+            result[variant] = {k: round(v, 4) for k, v in timings.items()}
+            result[variant]["cache"] = dict(cache.stats)
+            cache.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read and decode SOLRAI NFT metadata")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("list", help="Every NFT of the minter/taxon with its certificate fields (JSONL)")
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--issuer", default=None, help="NFT issuer (default nft_minter_address from config)")
+    p.add_argument("--taxon", type=int, default=0)
+    p.add_argument("--holder", action="append", default=[],
+                   help="Read these accounts' account_nfts instead of nfts_by_issuer (repeatable)")
+    p.add_argument("--include-burned", action="store_true")
+    p.add_argument("--output", default=None, help="JSONL file (default: stdout)")
+    p = sub.add_parser("show", help="Decode one URI")
+    p.add_argument("uri", help="URI hex as minted, or a file holding it (data URIs with an image are long)")
+    p.add_argument("--image-out", default=None, help="Write the embedded image here")
+    for p in sub.choices.values():
+        p.add_argument("--metadata-dir", default=None, help="Where compact sha256: metadata payloads are kept")
+        p.add_argument("--cache", default=DEFAULT_CACHE)
+        p.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE)
+        p.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    p = sub.add_parser("bench", help="Eager vs lazy vs cached decode")
+    p.add_argument("--nfts", type=int, default=200)
+    p.add_argument("--image-kb", type=int, default=512)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        print(json.dumps(bench(args.nfts, args.image_kb), indent=2))
+        return
+    cache = MetadataCache(args.cache, args.cache_size)
+    reader = MetadataReader(cache, Path(args.metadata_dir) if args.metadata_dir else None, args.workers)
+    try:
+        if args.cmd == "show":
+            uri_hex = Path(args.uri).read_text(encoding="ascii").strip() if Path(args.uri).is_file() else args.uri
+            metadata = reader.read(uri_hex)
+            print(json.dumps({"variant": metadata.variant, "certificate": metadata.certificate,
+                              "fields": metadata.fields, "image": metadata.decoded.get("image")}, indent=2))
+            if args.image_out:
+                image = metadata.image()
+                if image is None:
+                    sys.exit("Error: this metadata embeds no image")
+                Path(args.image_out).write_bytes(image)
+            return
+
+        issuer = args.issuer
+        if issuer is None:
+            from solr_config import config_or_exit
+
+            issuer = config_or_exit(args.config, "nft_minter_address").nft_minter_address
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        count = 0
+        try:
+            for metadata in reader.collection(get_client(), issuer, args.taxon, args.holder, args.include_burned):
+                out.write(json.dumps(metadata.row()) + "\n")
+                count += 1
+        except RuntimeError as e:
+            sys.exit(f"Error: {e}")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(json.dumps({"nfts": count, "cache": dict(cache.stats)}), file=sys.stderr)
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+offer_book.py
+=============
+
+In-memory order book of NFToken offers for SOLRAI NFTs.
+
+The book is loaded once from the ledger (every NFT the minter issued under a
+taxon, then the sell/buy offers for each), and then kept current by applying
+validated transactions from the stream: created NFTokenOffer nodes are added,
+deleted ones (accepted, cancelled, or removed with a burned NFT) are dropped.
+Queries are answered from memory:
+
+  - cheapest public XRP sell offer per (vintage, jurisdiction)
+  - all offers by owner account
+
+A JSON snapshot records the book and the last applied ledger, so a restart
+restores the snapshot and only catches up on the ledgers since.  `follow`
+subscribes first and then catches up to the ledger before the first streamed
+one (stream messages queue meanwhile), so no ledger falls between the two.
+
+Usage:
+    python offer_book.py load --snapshot book.json
+    python offer_book.py follow --snapshot book.json
+    python offer_book.py replay --fixtures fixtures/offer_book_replay.jsonl --snapshot book.json \
+        --issuer rGhcCYwFwQdKuJpn7bsEg51U6jxKffSKGF
+    python offer_book.py query --snapshot book.json --vintage 2025 --jurisdiction US-NJ
+    python offer_book.py query --snapshot book.json --owner rNeTREnTe9kXUoGqS2LH4kL8uQVgZzCH5a
+
+Replay fixtures are JSONL in the shape of `transactions` stream messages:
+    {"ledger_index": 123, "transaction": {...}, "meta": {...}}
+fixtures/offer_book_replay.jsonl (recorded from mock_rippled.py) mints two
+NFTs and lists both, takes and cancels a bid on the first, sells the second
+and the buyer burns it; replayed into an empty book it leaves the first
+NFT's 25 XRP sell offer.
+
+Dependencies:
+    pip install xrpl PyYAML
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from xrpl.clients import JsonRpcClient, WebsocketClient
+from xrpl.core.addresscodec import encode_classic_address
+from xrpl.ledger import get_latest_validated_ledger_sequence
+from xrpl.models.requests import GenericRequest, Ledger, NFTBuyOffers, NFTSellOffers, StreamParameter, Subscribe
+
+from nft_metadata import decode_uri
+from solr_config import config_or_exit
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+TESTNET_WS_URL = "wss://s.altnet.rippletest.net:51233"
+# nfts_by_issuer is a Clio method; the public testnet endpoints are Clio-backed.
+SNAPSHOT_VERSION = 1
+LSF_SELL_NFTOKEN = 0x00000001
+LOAD_WORKERS = 8
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def decode_nftoken_id(nft_id: str) -> dict:
+    """Split an NFTokenID into flags, transfer fee, issuer, taxon and sequence.
+
+    The taxon is stored scrambled with the mint sequence; see XLS-20.
+    """
+    raw = bytes.fromhex(nft_id)
+    sequence = int.from_bytes(raw[28:32], "big")
+    scrambled = int.from_bytes(raw[24:28], "big")
+    return {
+        "flags": int.from_bytes(raw[0:2], "big"),
+        "transfer_fee": int.from_bytes(raw[2:4], "big"),
+        "issuer": encode_classic_address(raw[4:24]),
+        "taxon": scrambled ^ ((384160001 * sequence + 2459) & 0xFFFFFFFF),
+        "sequence": sequence,
+    }
+
+
+def decode_metadata_uri(uri_hex: str) -> dict:
+    """Fields of a hex data-URI produced by create_metadata; the image is skipped, not decoded."""
+    decoded = decode_uri(uri_hex or "")
+    return decoded["fields"] if decoded["variant"] == "data-uri" else {}
+
+
+def _offer_from_fields(index: str, fields: dict) -> dict:
+    return {
+        "offer_index": index,
+        "nft_id": fields.get("NFTokenID") or fields.get("nft_id"),
+        "owner": fields.get("Owner") or fields.get("owner"),
+        "amount": fields.get("Amount", fields.get("amount")),
+        "destination": fields.get("Destination") or fields.get("destination"),
+        "expiration": fields.get("Expiration") or fields.get("expiration"),
+        "is_sell": bool(int(fields.get("Flags", fields.get("flags", 0))) & LSF_SELL_NFTOKEN),
+    }
+
+
+class OfferBook:
+    """Offers on one issuer/taxon's NFTs, indexed for marketplace queries."""
+
+    def __init__(self, issuer: str, taxon: int = 0):
+        self.issuer = issuer
+        self.taxon = taxon
+        self.ledger_index = 0
+        self.nfts: Dict[str, dict] = {}           # nft_id -> {"vintage", "jurisdiction"}
+        self.offers: Dict[str, dict] = {}         # offer_index -> offer
+        self.by_nft: Dict[str, Set[str]] = {}
+        self.by_owner: Dict[str, Set[str]] = {}
+        # (vintage, jurisdiction) -> heap of (drops, offer_index); stale entries
+        # are skipped lazily on query.
+        self._cheapest: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+
+    # --- membership ---
+    def is_solrai(self, nft_id: str) -> bool:
+        if not nft_id:
+            return False
+        info = decode_nftoken_id(nft_id)
+        return info["issuer"] == self.issuer and info["taxon"] == self.taxon
+
+    def add_nft(self, nft_id: str, metadata: dict) -> None:
+        self.nfts[nft_id] = {"vintage": metadata.get("vintage"), "jurisdiction": metadata.get("jurisdiction")}
+        for index in self.by_nft.get(nft_id, ()):
+            self._push_cheapest(self.offers[index])
+
+    def remove_nft(self, nft_id: str) -> None:
+        for index in list(self.by_nft.get(nft_id, ())):
+            self.remove_offer(index)
+        self.nfts.pop(nft_id, None)
+
+    # --- offers ---
+    def add_offer(self, offer: dict) -> None:
+        index = offer["offer_index"]
+        self.offers[index] = offer
+        self.by_nft.setdefault(offer["nft_id"], set()).add(index)
+        self.by_owner.setdefault(offer["owner"], set()).add(index)
+        self._push_cheapest(offer)
+
+    def remove_offer(self, index: str) -> None:
+        offer = self.offers.pop(index, None)
+        if not offer:
+            return
+        for mapping, key in ((self.by_nft, offer["nft_id"]), (self.by_owner, offer["owner"])):
+            bucket = mapping.get(key)
+            if bucket is not None:
+                bucket.discard(index)
+                if not bucket:
+                    del mapping[key]
+
+    def _push_cheapest(self, offer: dict) -> None:
+        # Only public, XRP-denominated sell offers compete on price.
+        if not offer["is_sell"] or offer["destination"] or not isinstance(offer["amount"], str):
+            return
+        attrs = self.nfts.get(offer["nft_id"])
+        if attrs is None:
+            return
+        key = (attrs["vintage"], attrs["jurisdiction"])
+        heapq.heappush(self._cheapest.setdefault(key, []), (int(offer["amount"]), offer["offer_index"]))
+
+    # --- queries ---
+    def cheapest(self, vintage: str, jurisdiction: str) -> Optional[dict]:
+        heap = self._cheapest.get((vintage, jurisdiction), [])
+        while heap:
+            drops, index = heap[0]
+            offer = self.offers.get(index)
+            if offer is not None and int(offer["amount"]) == drops:
+                return offer
+            heapq.heappop(heap)
+        return None
+
+    def offers_by_owner(self, owner: str) -> List[dict]:
+        return [self.offers[i] for i in sorted(self.by_owner.get(owner, ()))]
+
+    def offers_for_nft(self, nft_id: str) -> List[dict]:
+        return [self.offers[i] for i in sorted(self.by_nft.get(nft_id, ()))]
+
+    # --- incremental updates ---
+    def apply_transaction(self, tx: dict, meta: dict, ledger_index: Optional[int] = None) -> None:
+        """Apply one validated transaction's effect on SOLRAI offers and NFTs."""
+        tx_type = tx.get("TransactionType")
+        if tx_type == "NFTokenMint" and meta.get("TransactionResult") == "tesSUCCESS":
+            nft_id = meta.get("nftoken_id")
+            if self.is_solrai(nft_id):
+                self.add_nft(nft_id, decode_metadata_uri(tx.get("URI", "")))
+        for node in meta.get("AffectedNodes", []):
+            kind, body = next(iter(node.items()))
+            if body.get("LedgerEntryType") != "NFTokenOffer":
+                continue
+            if kind == "CreatedNode":
+                offer = _offer_from_fields(body["LedgerIndex"], body.get("NewFields", {}))
+                if self.is_solrai(offer["nft_id"]):
+                    self.add_offer(offer)
+            elif kind == "DeletedNode":
+                self.remove_offer(body["LedgerIndex"])
+        if tx_type == "NFTokenBurn" and meta.get("TransactionResult") == "tesSUCCESS":
+            self.remove_nft(tx.get("NFTokenID"))
+        if ledger_index is not None:
+            self.ledger_index = max(self.ledger_index, int(ledger_index))
+
+    def apply_stream_message(self, message: dict) -> None:
+        if message.get("type", "transaction") != "transaction" or not message.get("validated", True):
+            return
+        self.apply_transaction(message["transaction"], message.get("meta", {}), message.get("ledger_index"))
+
+    def replay(self, messages: Iterable[dict]) -> int:
+        count = 0
+        for message in messages:
+            self.apply_stream_message(message)
+            count += 1
+        return count
+
+    # --- persistence ---
+    def snapshot(self, path: Path) -> None:
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "issuer": self.issuer,
+            "taxon": self.taxon,
+            "ledger_index": self.ledger_index,
+            "nfts": self.nfts,
+            "offers": list(self.offers.values()),
+        }
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(state, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def restore(cls, path: Path) -> "OfferBook":
+        state = json.loads(path.read_text(encoding="utf-8"))
+        if state.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported offer book snapshot version: {state.get('version')}")
+        book = cls(state["issuer"], state["taxon"])
+        book.ledger_index = state["ledger_index"]
+        book.nfts = state["nfts"]
+        for offer in state["offers"]:
+            book.add_offer(offer)
+        return book
+
+
+# --- ledger I/O ---
+def _paged(client: JsonRpcClient, make_request, key: str) -> Iterable[dict]:
+    marker = None
+    while True:
+        result = client.request(make_request(marker)).result
+        if "error" in result:
+            # objectNotFound: no offers of this kind for the NFT.
+            return
+        yield from result.get(key, [])
+        marker = result.get("marker")
+        if not marker:
+            return
+
+
+def _offers_for_nft(client: JsonRpcClient, nft_id: str) -> List[dict]:
+    offers = []
+    for request_cls in (NFTSellOffers, NFTBuyOffers):
+        for raw in _paged(client, lambda m, rc=request_cls: rc(nft_id=nft_id, marker=m), "offers"):
+            offer = _offer_from_fields(raw["nft_offer_index"], raw)
+            offer["nft_id"] = nft_id
+            offers.append(offer)
+    return offers
+
+
+def load_from_ledger(client: JsonRpcClient, issuer: str, taxon: int = 0, workers: int = LOAD_WORKERS) -> OfferBook:
+    """Build a book from every live NFT of `issuer`/`taxon` and its offers."""
+    book = OfferBook(issuer, taxon)
+    book.ledger_index = get_latest_validated_ledger_sequence(client)
+    nfts = [
+        nft for nft in _paged(
+            client,
+            lambda m: GenericRequest(method="nfts_by_issuer", issuer=issuer, nft_taxon=taxon, marker=m),
+            "nfts",
+        )
+        if not nft.get("is_burned")
+    ]
+    for nft in nfts:
+        book.add_nft(nft["nft_id"], decode_metadata_uri(nft.get("uri", "")))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for offers in pool.map(lambda nft: _offers_for_nft(client, nft["nft_id"]), nfts):
+            for offer in offers:
+                book.add_offer(offer)
+    return book
+
+
+def catch_up(book: OfferBook, client: JsonRpcClient, through: Optional[int] = None) -> int:
+    """Apply every validated ledger after `book.ledger_index` through `through` (default: the latest).
+
+    Returns the number of ledgers applied.
+    """
+    latest = get_latest_validated_ledger_sequence(client) if through is None else through
+    start = book.ledger_index + 1
+    for index in range(start, latest + 1):
+        result = client.request(Ledger(ledger_index=index, transactions=True, expand=True)).result
+        for tx in result.get("ledger", {}).get("transactions", []):
+            book.apply_transaction(tx, tx.get("metaData") or tx.get("meta") or {}, index)
+        book.ledger_index = index
+    return max(0, latest - start + 1)
+
+
+def follow(book: OfferBook, ws_url: str, client: JsonRpcClient, snapshot_path: Optional[Path] = None,
+           snapshot_every: int = 50) -> None:
+    """Apply the live transactions stream, snapshotting every `snapshot_every` ledgers.
+
+    The stream starts at whichever ledger validates after Subscribe.  The ledgers between the book and the first
+    streamed ledger are caught up over `client` before it is applied; stream messages queue up meanwhile.
+    """
+    last_saved = book.ledger_index
+    caught_up_through = None  # ledgers up to here are in the book already; their stream messages are skipped
+    with WebsocketClient(ws_url) as ws:
+        ws.send(Subscribe(streams=[StreamParameter.TRANSACTIONS]))
+        for message in ws:
+            if message.get("type") != "transaction" or message.get("ledger_index") is None:
+                continue
+            ledger_index = int(message["ledger_index"])
+            if caught_up_through is None:
+                applied = catch_up(book, client, through=ledger_index - 1)
+                caught_up_through = book.ledger_index
+                print(f"Caught up {applied} ledgers to the start of the stream (ledger {ledger_index}).")
+            if ledger_index <= caught_up_through:
+                continue
+            book.apply_stream_message(message)
+            if snapshot_path and book.ledger_index - last_saved >= snapshot_every:
+                book.snapshot(snapshot_path)
+                last_saved = book.ledger_index
+
+
+def read_fixtures(path: Path) -> Iterable[dict]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SOLRAI NFT offer book cache")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("load", "follow", "replay", "query"):
+        p = sub.add_parser(name)
+        p.add_argument("--config", default="config.yaml")
+        p.add_argument("--snapshot", default="offer_book.json", help="Snapshot file to restore from / save to")
+        p.add_argument("--taxon", type=int, default=0)
+        if name == "follow":
+            p.add_argument("--ws-url", default=TESTNET_WS_URL)
+        if name == "replay":
+            p.add_argument("--fixtures", required=True, help="JSONL of transactions stream messages")
+            p.add_argument("--issuer", default=None, help="NFT issuer of a new book (default: nft_minter_address)")
+        if name == "query":
+            p.add_argument("--vintage")
+            p.add_argument("--jurisdiction")
+            p.add_argument("--owner")
+    args = parser.parse_args()
+    if args.cmd == "query" and not (args.owner or (args.vintage and args.jurisdiction)):
+        sys.exit("Error: query needs --owner, or --vintage and --jurisdiction.")
+
+    snapshot_path = Path(args.snapshot)
+    if args.cmd in ("query", "follow") or (args.cmd == "replay" and snapshot_path.exists()):
+        if not snapshot_path.exists():
+            sys.exit(f"Error: snapshot {snapshot_path} not found; run `load` first.")
+        book = OfferBook.restore(snapshot_path)
+    elif args.cmd == "replay":
+        issuer = args.issuer or config_or_exit(args.config, "nft_minter_address").nft_minter_address
+        book = OfferBook(issuer, args.taxon)
+    else:
+        issuer = config_or_exit(args.config, "nft_minter_address").nft_minter_address
+        book = load_from_ledger(get_client(), issuer, args.taxon)
+
+    if args.cmd == "query":
+        if args.owner:
+            print(json.dumps(book.offers_by_owner(args.owner), indent=2))
+        else:
+            print(json.dumps(book.cheapest(args.vintage, args.jurisdiction), indent=2))
+        return
+
+    if args.cmd == "follow":
+        print(f"Caught up {catch_up(book, get_client())} ledgers since snapshot.")
+        try:
+            follow(book, args.ws_url, get_client(), snapshot_path)
+        except KeyboardInterrupt:
+            pass
+    elif args.cmd == "replay":
+        print(f"Replayed {book.replay(read_fixtures(Path(args.fixtures)))} transactions.")
+    book.snapshot(snapshot_path)
+    print(f"{len(book.offers)} offers on {len(book.nfts)} NFTs as of ledger {book.ledger_index}; saved {snapshot_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+onboarding.py
+=============
+
+Bulk KYC onboarding: authorize the STN trust lines of every approved owner.
+
+mint_solr_token.authorize_trust_line approves one holder per run and waits a
+ledger for it, whether or not the line is already authorized.  Here an
+approved-owner list is checked against the issuer's own trust lines first:
+
+  - the issuer's `account_lines` are paged once (400 lines per call) into an
+    in-memory map of counterparty -> authorized
+  - owners already authorized are skipped without a transaction
+  - a tfSetAuth TrustSet is signed for each remaining owner and the batch is
+    pipelined from the issuer (tx_pipeline); an owner without a trust line
+    yet is pre-authorized, so its line is usable as soon as it is created
+
+Transactions and ledger waits scale with the number of new owners, not the
+size of the list.  One JSON line per owner is written to --report with its
+status: already_authorized, authorized, preauthorized, failed or invalid.
+
+The approved list is a text or CSV file: one classic address per line, or
+"owner_id,address" (a header row and # comments are ignored).
+
+Usage:
+    python onboarding.py --approved approved.csv [--report onboarding.jsonl]
+    python onboarding.py --approved approved.csv --dry-run      # who would be authorized
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from xrpl.clients import JsonRpcClient
+from xrpl.core.addresscodec import is_valid_classic_address
+from xrpl.models.requests import AccountInfo, AccountLines
+from xrpl.wallet import Wallet
+
+from mint_solr_token import authorization_tx
+from tx_pipeline import pipeline
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+LSF_REQUIRE_AUTH = 0x00040000
+PAGE_LIMIT = 400
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def read_approved(path: str) -> List[Tuple[Optional[str], str]]:
+    """(owner_id or None, address) per approved owner, in file order, duplicates dropped."""
+    approved, seen = [], set()
+    with (sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")) as f:
+        for row in csv.reader(f):
+            row = [cell.strip() for cell in row]
+            if not row or not row[0] or row[0].startswith("#") or row[-1].lower() == "address":
+                continue
+            owner_id, address = (row[0], row[1]) if len(row) > 1 else (None, row[0])
+            if address not in seen:
+                seen.add(address)
+                approved.append((owner_id, address))
+    return approved
+
+
+def requires_auth(client: JsonRpcClient, issuer_address: str) -> bool:
+    flags = client.request(AccountInfo(account=issuer_address)).result.get("account_data", {}).get("Flags", 0)
+    return bool(flags & LSF_REQUIRE_AUTH)
+
+
+def issuer_lines(client: JsonRpcClient, issuer_address: str, currency: str) -> Tuple[Dict[str, bool], int]:
+    """({counterparty: authorized} for `currency`, pages read) from the issuer's side of its trust lines."""
+    lines: Dict[str, bool] = {}
+    marker, pages, ledger = None, 0, "validated"
+    while True:
+        result = client.request(AccountLines(account=issuer_address, ledger_index=ledger,
+                                             limit=PAGE_LIMIT, marker=marker)).result
+        if "error" in result:
+            raise RuntimeError(f"account_lines {issuer_address}: {result.get('error_message') or result['error']}")
+        pages += 1
+        ledger = result.get("ledger_index", ledger)  # later pages must read the same ledger
+        for line in result.get("lines", []):
+            if line["currency"] == currency:
+                lines[line["account"]] = bool(line.get("authorized"))
+        marker = result.get("marker")
+        if not marker:
+            return lines, pages
+
+
+def onboard(client: JsonRpcClient, issuer: Wallet, currency: str, approved: List[Tuple[Optional[str], str]],
+            dry_run: bool = False) -> dict:
+    """Authorize every approved owner the issuer has not authorized yet.
+
+    Returns {"rows": one row per approved owner, "summary": counts and timings}.  With `dry_run` nothing is
+    submitted and owners that would be authorized have status "pending".
+    """
+    start = time.perf_counter()
+    lines, pages = issuer_lines(client, issuer.classic_address, currency)
+    lookup_s = time.perf_counter() - start
+    rows, missing = [], []
+    for owner_id, address in approved:
+        row = {"owner_id": owner_id, "address": address, "had_line": address in lines}
+        if not is_valid_classic_address(address):
+            row.update(status="invalid", had_line=False)
+        elif lines.get(address):
+            row["status"] = "already_authorized"
+        else:
+            row["status"] = "pending"
+            missing.append(row)
+        rows.append(row)
+
+    start = time.perf_counter()
+    if missing and not dry_run:
+        results = pipeline(client, issuer, [authorization_tx(issuer.classic_address, row["address"], currency)
+                                            for row in missing])
+        for row, result in zip(missing, results):
+            ok = result["status"] == "validated" and result.get("engine_result") == "tesSUCCESS"
+            row.update(hash=result["hash"], engine_result=result.get("engine_result"),
+                       ledger_index=result.get("ledger_index"))
+            row["status"] = ("authorized" if row["had_line"] else "preauthorized") if ok else "failed"
+    counts: Dict[str, int] = {}
+    for row in rows:
+        counts[row["status"]] = counts.get(row["status"], 0) + 1
+    summary = {"approved": len(approved), "issuer_lines": len(lines), "account_lines_pages": pages,
+               "submitted": 0 if dry_run else len(missing), "by_status": counts,
+               "lookup_s": round(lookup_s, 3), "authorize_s": round(time.perf_counter() - start, 3)}
+    return {"rows": rows, "summary": summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authorize the trust lines of every approved owner (KYC onboarding)")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--approved", required=True, help="Approved owners: address or owner_id,address per line")
+    parser.add_argument("--report", default="-", help="JSONL row per owner, or - for stdout")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which owners would be authorized")
+    args = parser.parse_args()
+
+    from key_provider import keys_or_exit
+    from solr_config import config_or_exit
+
+    config = config_or_exit(args.config, "currency_code")
+    try:
+        approved = read_approved(args.approved)
+    except OSError as e:
+        sys.exit(f"Error: {e}")
+    issuer = keys_or_exit(config, "issuer").wallet("issuer")
+    client = get_client()
+    if not requires_auth(client, issuer.classic_address):
+        sys.exit(f"Error: issuer {issuer.classic_address} does not have RequireAuth set; "
+                 "trust lines need no authorization")
+    try:
+        result = onboard(client, issuer, config.currency_code, approved, dry_run=args.dry_run)
+    except RuntimeError as e:
+        sys.exit(f"Error: {e}")
+
+    out = sys.stdout if args.report == "-" else open(args.report, "w", encoding="utf-8")
+    try:
+        for row in result["rows"]:
+            out.write(json.dumps(row) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(result["summary"]), file=sys.stderr)
+    if result["summary"]["by_status"].get("failed"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
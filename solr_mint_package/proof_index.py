@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+proof_index.py
+==============
+
+Index of proof screenshots used for mints, to catch proof reuse.
+
+Nothing stopped the same SolisCloud screenshot being passed with --image to
+any number of mints, and checking by hand meant comparing whole images.
+Every proof image recorded here gets:
+
+  - its SHA-256 (exact duplicates)
+  - a 64-bit pHash (DCT of a 32x32 grayscale thumbnail) and dHash (row
+    gradients of a 9x8 one), computed with NumPy; JPEGs are decoded at
+    reduced scale (Image.draft), so a 16 MP screenshot is fingerprinted in
+    about 0.1 s.  Re-encoded, resized or lightly edited copies stay within
+    a few bits of the original's pHash
+  - the references (NFTokenID or burn hash) of the mints that used it
+  - its bytes, stored once by SHA-256 in a blob dir next to the index
+
+Near-duplicate lookup is multi-index hashing: the pHash is split into four
+16-bit chunks, each with its own dict.  Two hashes within distance r agree
+to within r // 4 bits on at least one chunk, so a query probes each table
+with every chunk value that close (137 probes per table for r = 10) and
+checks only those candidates, instead of scanning every proof.
+
+burn_and_mint_solrai_nft.py and solrai_nft_flow.py check the proof before
+submitting anything and record it after the mint (--allow-proof-reuse
+overrides the check).  `--image sha256:<hex>` in burn_and_mint reuses a
+stored blob.
+
+Usage:
+    python proof_index.py check proof.jpeg [--max-distance 10]
+    python proof_index.py add proof.jpeg --ref <NFTokenID or burn hash>
+    python proof_index.py blob <sha256>                # path of the stored image
+    python proof_index.py bench --proofs 100000        # lookup latency at 100k proofs
+
+Dependencies:
+    pip install Pillow numpy
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_INDEX = "proof_index.sqlite"
+DEFAULT_BLOB_DIR = "proof_blobs"
+DEFAULT_MAX_DISTANCE = 10  # pHash bits; re-encodes and resizes land well under this, different screenshots near 32
+CHUNKS = 4
+CHUNK_BITS = 16
+PHASH_SIZE = 32
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proofs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    phash TEXT NOT NULL,
+    dhash TEXT NOT NULL,
+    blob TEXT,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uses (
+    sha256 TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (sha256, ref)
+);
+"""
+
+
+class ProofReused(Exception):
+    pass
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    return np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n))
+
+
+DCT = _dct_matrix(PHASH_SIZE)
+
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """(..., 64) booleans -> (...,) uint64, first bit most significant."""
+    return np.packbits(bits, axis=-1).view(">u8")[..., 0]
+
+
+def phash(pixels: np.ndarray) -> np.ndarray:
+    """pHash of (..., 32, 32) grayscale thumbnails: low 8x8 DCT coefficients above their median (DC excluded)."""
+    low = (DCT @ pixels.astype(np.float64) @ DCT.T)[..., :8, :8].reshape(*pixels.shape[:-2], 64)
+    return _pack(low > np.median(low[..., 1:], axis=-1, keepdims=True))
+
+
+def dhash(pixels: np.ndarray) -> np.ndarray:
+    """dHash of (..., 8, 9) grayscale thumbnails: is each pixel brighter than its left neighbour."""
+    return _pack((pixels[..., :, 1:] > pixels[..., :, :-1]).reshape(*pixels.shape[:-2], 64))
+
+
+def thumbnails(image_path: Path):
+    """(32x32, 8x9) grayscale arrays of an image, decoding JPEGs at reduced scale."""
+    with Image.open(image_path) as im:
+        im.draft("L", (PHASH_SIZE * 2, PHASH_SIZE * 2))
+        gray = im.convert("L")
+    small = np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS))
+    return small, np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+
+
+def fingerprint(image_path: Path) -> dict:
+    """{"sha256", "size", "phash", "dhash"} of an image file (hashes as 16 hex digits)."""
+    digest = hashlib.sha256()
+    size = 0
+    with image_path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+            size += len(block)
+    small, strip = thumbnails(image_path)
+    return {"sha256": digest.hexdigest(), "size": size,
+            "phash": f"{int(phash(small)):016x}", "dhash": f"{int(dhash(strip)):016x}"}
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+@lru_cache(maxsize=None)
+def _flips(radius: int) -> tuple:
+    """Every CHUNK_BITS-bit mask with at most `radius` bits set."""
+    return tuple(m for m in range(1 << CHUNK_BITS) if bin(m).count("1") <= radius)
+
+
+class ProofIndex:
+    """SQLite record of proof images and their uses, with an in-memory multi-index over the pHashes."""
+
+    def __init__(self, path: str = DEFAULT_INDEX, blob_dir: Optional[str] = None):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.blob_dir = Path(blob_dir) if blob_dir else Path(path).parent / DEFAULT_BLOB_DIR
+        self.shas: List[str] = []
+        self.phashes: List[int] = []
+        self.dhashes: List[int] = []
+        self.positions: Dict[str, int] = {}
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in range(CHUNKS)]
+        for sha, p, d in self.conn.execute("SELECT sha256, phash, dhash FROM proofs"):
+            self._remember(sha, int(p, 16), int(d, 16))
+
+    def _remember(self, sha: str, p: int, d: int) -> None:
+        pos = self.positions[sha] = len(self.shas)
+        self.shas.append(sha)
+        self.phashes.append(p)
+        self.dhashes.append(d)
+        for i, table in enumerate(self.tables):
+            table.setdefault((p >> (i * CHUNK_BITS)) & 0xFFFF, []).append(pos)
+
+    def __len__(self) -> int:
+        return len(self.shas)
+
+    def near(self, p: int, max_distance: int = DEFAULT_MAX_DISTANCE) -> List[tuple]:
+        """(distance, position) of every recorded pHash within `max_distance` bits of `p`, closest first."""
+        flips = _flips(max_distance // CHUNKS)
+        seen, found = set(), []
+        for i, table in enumerate(self.tables):
+            chunk = (p >> (i * CHUNK_BITS)) & 0xFFFF
+            for mask in flips:
+                for pos in table.get(chunk ^ mask, ()):
+                    if pos not in seen:
+                        seen.add(pos)
+                        distance = hamming(self.phashes[pos], p)
+                        if distance <= max_distance:
+                            found.append((distance, pos))
+        return sorted(found)
+
+    def refs(self, sha: str) -> List[str]:
+        return [r for (r,) in self.conn.execute("SELECT ref FROM uses WHERE sha256 = ? ORDER BY used_at", (sha,))]
+
+    def check(self, image_path: Path, max_distance: int = DEFAULT_MAX_DISTANCE) -> dict:
+        """{"fingerprint", "matches"}: recorded proofs identical or perceptually close to the image, closest first."""
+        fp = fingerprint(image_path)
+        d = int(fp["dhash"], 16)
+        matches = []
+        for distance, pos in self.near(int(fp["phash"], 16), max_distance):
+            sha = self.shas[pos]
+            matches.append({"sha256": sha, "exact": sha == fp["sha256"], "phash_distance": distance,
+                            "dhash_distance": hamming(self.dhashes[pos], d), "refs": self.refs(sha)})
+        matches.sort(key=lambda m: (not m["exact"], m["phash_distance"]))
+        return {"fingerprint": fp, "matches": matches}
+
+    def record(self, fp: dict, ref: Optional[str] = None, image_path: Optional[Path] = None) -> None:
+        """Add a proof (its blob too, if `image_path` is given) and the mint that used it."""
+        sha = fp["sha256"]
+        blob = self.store_blob(sha, image_path) if image_path is not None else None
+        self.conn.execute("INSERT OR IGNORE INTO proofs VALUES (?, ?, ?, ?, ?, ?)",
+                          (sha, fp["size"], fp["phash"], fp["dhash"], blob, time.time()))
+        if blob is not None:
+            self.conn.execute("UPDATE proofs SET blob = ? WHERE sha256 = ? AND blob IS NULL", (blob, sha))
+        if ref:
+            self.conn.execute("INSERT OR IGNORE INTO uses VALUES (?, ?, ?)", (sha, ref, time.time()))
+        if sha not in self.positions:
+            self._remember(sha, int(fp["phash"], 16), int(fp["dhash"], 16))
+
+    def store_blob(self, sha: str, image_path: Path) -> str:
+        """Copy the image into the blob dir under its SHA-256 unless it is already there; returns its name there."""
+        name = f"{sha[:2]}/{sha}{image_path.suffix.lower()}"
+        path = self.blob_dir / name
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}")
+            shutil.copyfile(image_path, tmp)
+            os.replace(tmp, path)
+        return name
+
+    def blob_path(self, sha: str) -> Optional[Path]:
+        row = self.conn.execute("SELECT blob FROM proofs WHERE sha256 = ?", (sha.lower(),)).fetchone()
+        path = self.blob_dir / row[0] if row and row[0] else None
+        return path if path is not None and path.exists() else None
+
+    def resolve(self, image: str) -> Path:
+        """An --image argument as a path: a file, or "sha256:<hex>" for a stored blob."""
+        if image.startswith("sha256:"):
+            path = self.blob_path(image[len("sha256:"):])
+            if path is None:
+                raise FileNotFoundError(f"no stored blob for {image}")
+            return path
+        return Path(image)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def reuse_message(image_path: Path, report: dict) -> str:
+    best = report["matches"][0]
+    kind = "already used" if best["exact"] else f"{best['phash_distance']} bits from a proof"
+    refs = ", ".join(best["refs"]) or "no recorded mint"
+    return f"proof image {image_path} is {kind} ({best['sha256'][:16]}…, used by {refs})"
+
+
+def guard(index: ProofIndex, image_path: Path, allow_reuse: bool = False,
+          max_distance: int = DEFAULT_MAX_DISTANCE) -> dict:
+    """check() for a mint: raises ProofReused on any match unless `allow_reuse`; returns the report."""
+    report = index.check(image_path, max_distance)
+    if report["matches"] and not allow_reuse:
+        raise ProofReused(reuse_message(image_path, report))
+    return report
+
+
+# --- measurement ---
+def bench(proofs: int, queries: int, max_distance: int, images: List[str]) -> dict:
+    """Lookup latency over `proofs` recorded pHashes, against a NumPy linear scan, plus real-image distances.
+
+    The bulk of the index is random 64-bit hashes (pHash bits are balanced by the median, so the chunk tables fill
+    about evenly); near-duplicates are planted at known distances to check recall.
+    """
+    import io
+    import random
+    import tempfile
+
+    from bench_flows import percentile
+
+    rng = np.random.default_rng(7)
+    result: dict = {"proofs": proofs, "max_distance": max_distance}
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ProofIndex(str(Path(tmp) / "proofs.sqlite"), str(Path(tmp) / "blobs"))
+        real = {}
+        for name in images:
+            start = time.perf_counter()
+            fp = fingerprint(Path(name))
+            real[name] = dict(fp, fingerprint_ms=round(1000 * (time.perf_counter() - start), 2))
+            index.record(fp, f"bench:{name}", Path(name))
+        variants = {}
+        for name in images:  # re-encoded at lower quality and half size: should match its original
+            with Image.open(name) as im:
+                im.draft("RGB", (im.width // 2, im.height // 2))
+                buf = io.BytesIO()
+                im.convert("RGB").resize((im.width // 2, im.height // 2)).save(buf, "JPEG", quality=60)
+            path = Path(tmp) / f"variant_{Path(name).name}"
+            path.write_bytes(buf.getvalue())
+            report = index.check(path, max_distance)
+            variants[name] = [{"original": m["sha256"] == real[name]["sha256"], "phash_distance": m["phash_distance"],
+                               "dhash_distance": m["dhash_distance"]} for m in report["matches"]]
+        names = list(real)
+        result["images"] = {n: {k: real[n][k] for k in ("sha256", "phash", "dhash", "fingerprint_ms")} for n in names}
+        result["image_distances"] = {f"{a} vs {b}": hamming(int(real[a]["phash"], 16), int(real[b]["phash"], 16))
+                                     for i, a in enumerate(names) for b in names[i + 1:]}
+        result["half_size_q60_variants"] = variants
+
+        bulk = rng.integers(0, 2**63, size=proofs, dtype=np.int64).astype(np.uint64) * np.uint64(2) \
+            + rng.integers(0, 2, size=proofs, dtype=np.int64).astype(np.uint64)
+        planted = []
+        for i in range(min(queries, proofs)):  # every i-th query has a recorded neighbour at distance i % (r + 1)
+            base = int(bulk[i])
+            near = base
+            for bit in random.Random(i).sample(range(64), i % (max_distance + 1)):
+                near ^= 1 << bit
+            bulk[i] = near
+            planted.append((base, i % (max_distance + 1)))
+        start = time.perf_counter()
+        index.conn.execute("BEGIN")
+        index.conn.executemany("INSERT INTO proofs VALUES (?, ?, ?, ?, NULL, 0)",
+                               ((f"{i:064x}", 0, f"{int(h):016x}", f"{int(h):016x}") for i, h in enumerate(bulk)))
+        index.conn.execute("COMMIT")
+        result["insert_s"] = round(time.perf_counter() - start, 3)
+        index.close()
+
+        start = time.perf_counter()
+        index = ProofIndex(str(Path(tmp) / "proofs.sqlite"), str(Path(tmp) / "blobs"))
+        result["open_s"] = round(time.perf_counter() - start, 3)
+        result["indexed"] = len(index)
+
+        table = np.array(index.phashes, dtype=np.uint64)
+        multi, linear, recall = [], [], 0
+        for base, distance in planted:
+            start = time.perf_counter()
+            found = index.near(base, max_distance)
+            multi.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            bits = np.unpackbits((table ^ np.uint64(base)).view(np.uint8)).reshape(-1, 64).sum(axis=1)
+            scanned = sorted((int(bits[pos]), int(pos)) for pos in np.flatnonzero(bits <= max_distance))
+            linear.append(time.perf_counter() - start)
+            if found != scanned:
+                raise AssertionError(f"multi-index and linear scan disagree for {base:016x}")
+            recall += any(d == distance for d, _ in found)
+        index.close()
+    result["lookup"] = {
+        "queries": len(planted), "planted_found": recall,
+        "multi_index_p50_ms": round(1000 * percentile(multi, 50), 3),
+        "multi_index_p99_ms": round(1000 * percentile(multi, 99), 3),
+        "numpy_scan_p50_ms": round(1000 * percentile(linear, 50), 3),
+        "numpy_scan_p99_ms": round(1000 * percentile(linear, 99), 3),
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect duplicate and near-duplicate proof images")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="SQLite proof index path")
+    parser.add_argument("--blob-dir", default=None, help=f"Where recorded images are stored (default: {DEFAULT_BLOB_DIR}/ "
+                                                         "next to the index)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("check", help="List recorded proofs identical or close to an image")
+    p.add_argument("image")
+    p.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE, help="pHash bits")
+    p = sub.add_parser("add", help="Record an image (and the mint that used it)")
+    p.add_argument("image")
+    p.add_argument("--ref", default=None, help="NFTokenID or burn hash of the mint")
+    p = sub.add_parser("blob", help="Path of a stored image")
+    p.add_argument("sha256")
+    p = sub.add_parser("bench", help="Lookup latency at --proofs recorded hashes")
+    p.add_argument("--proofs", type=int, default=100_000)
+    p.add_argument("--queries", type=int, default=1000)
+    p.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE)
+    p.add_argument("--image", action="append", default=None, help="Real images to hash (default: the bundled ones)")
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        images = args.image or ["IMG_A6FBCF8F-9700-4089-ADB0-5C914EF43766.jpeg",
+                                "B7EABA6E-B149-4AB0-B722-B28370B93D06.jpeg"]
+        print(json.dumps(bench(args.proofs, args.queries, args.max_distance, images), indent=2))
+        return
+    index = ProofIndex(args.index, args.blob_dir)
+    try:
+        if args.cmd == "blob":
+            path = index.blob_path(args.sha256)
+            if path is None:
+                sys.exit(f"Error: no stored blob for {args.sha256}")
+            print(path)
+            return
+        image = index.resolve(args.image)
+        if not image.exists():
+            sys.exit(f"Error: image file {image} not found.")
+        if args.cmd == "check":
+            report = index.check(image, args.max_distance)
+            print(json.dumps(report, indent=2))
+            if report["matches"]:
+                sys.exit(1)
+        else:
+            fp = fingerprint(image)
+            index.record(fp, args.ref, image)
+            print(json.dumps(fp))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,563 @@
+#!/usr/bin/env python3
+"""
+reconcile.py
+============
+
+Fleet-wide supply reconciliation: metered kWh vs STN issued vs STN burned
+vs SOLRAI minted.
+
+TOKEN_ECONOMICS.md fixes two invariants, 1 STN = 1 kWh metered and
+1 SOLRAI = 1,000 burned STN, and nothing checked them short of many
+account_lines/gateway_balances calls.  Here the history is read once:
+
+  - account_tx dumps (JSONL, one transaction per line) of the issuer and
+    the minter.  Every STN payment moves a trust line of the issuer, so the
+    issuer's history holds all issuance, distribution and burns; the
+    minter's holds the NFTokenMints.  `dump` writes them and continues from
+    the last ledger already dumped
+  - meter readings (meter_proofs.py format: site_id, interval_start, kwh;
+    the vintage is the year of interval_start unless a reading has one)
+  - the site registry, for owner addresses and each site's owner and
+    jurisdiction, and --metadata-dir for compact "sha256:" mint URIs
+
+`load` parses these once into a columnar store (.npz): account, owner,
+burn-hash, jurisdiction and vintage codes as integer arrays and amounts in
+micro-STN.  `check` reconciles a store in vectorized passes (grouped
+integer sums per owner and per jurisdiction/vintage, a use count per burn
+hash) and reports balances and violations:
+
+  over_issuance        STN distributed to an owner exceeds its metered kWh
+  fleet_over_issuance  STN issued (net of returns to the issuer) exceeds
+                       all metered kWh
+  unbacked_mint        a mint whose burn is unknown or not exactly 1,000
+                       STN, or whose metadata cannot be resolved
+  double_used_burn     one burn named by more than one mint
+  over_certified       MWh minted for a jurisdiction/vintage exceeds the
+                       kWh metered there / 1,000
+
+Usage:
+    python reconcile.py dump --account issuer --output issuer.jsonl       # incremental
+    python reconcile.py dump --account minter --output minter.jsonl
+    python reconcile.py load --dump issuer.jsonl minter.jsonl --readings readings.jsonl --output supply.npz
+    python reconcile.py check supply.npz [--report report.json]           # exit 1 on violations
+    python reconcile.py bench --records 4000000                           # synthetic fleet with planted violations
+
+Dependencies:
+    pip install xrpl-py PyYAML numpy
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, fields
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests import AccountTx, Ledger
+
+from burn_verifier import currency_code
+from site_registry import DEFAULT_REGISTRY, Registry
+from solr_constants import BLACKHOLE
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+MICRO = 10**6  # amounts are held as integer micro-STN (micro-kWh)
+BURN_AMOUNT = 1000 * MICRO
+PAGE_LIMIT = 400
+DEFAULT_MAX_VIOLATIONS = 1000
+STORE_VERSION = 1
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def micro(value) -> int:
+    return int(Decimal(str(value)).scaleb(6).to_integral_value())
+
+
+class Codes:
+    """Dense integer codes for strings, in first-seen order."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def __call__(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.index)
+        return code
+
+    def array(self) -> np.ndarray:
+        return np.array(list(self.index), dtype=str)
+
+
+@dataclass
+class Store:
+    """Columnar supply history; every *_code / code array indexes the matching string table."""
+
+    accounts: np.ndarray
+    owners: np.ndarray
+    hashes: np.ndarray
+    jurisdictions: np.ndarray
+    vintages: np.ndarray
+    account_owner: np.ndarray  # owner code per account code, -1 if not an owner
+    issuer: int
+    blackhole: int
+    pay_src: np.ndarray
+    pay_dst: np.ndarray
+    pay_value: np.ndarray  # micro-STN delivered
+    pay_hash: np.ndarray
+    mint_burn: np.ndarray  # burn hash code named by the metadata, -1 if unresolved
+    mint_nft: np.ndarray  # hash code of the NFTokenID (or the mint tx hash)
+    mint_jurisdiction: np.ndarray
+    mint_vintage: np.ndarray
+    meter_owner: np.ndarray
+    meter_jurisdiction: np.ndarray
+    meter_vintage: np.ndarray
+    meter_kwh: np.ndarray  # micro-kWh
+
+    def save(self, path: str) -> None:
+        tmp = f"{path}.{os.getpid()}.npz"
+        np.savez(tmp, version=STORE_VERSION, **{f.name: getattr(self, f.name) for f in fields(self)})
+        os.replace(tmp, path)
+
+    @classmethod
+    def open(cls, path: str) -> "Store":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != STORE_VERSION:
+                raise ValueError(f"{path}: store version {int(data['version'])}, expected {STORE_VERSION}")
+            values = {f.name: data[f.name] for f in fields(cls)}
+        values["issuer"], values["blackhole"] = int(values["issuer"]), int(values["blackhole"])
+        return cls(**values)
+
+    def records(self) -> int:
+        return len(self.pay_value) + len(self.mint_burn) + len(self.meter_kwh)
+
+
+# --- loading ---
+def read_jsonl(paths: Iterable[str]) -> Iterable[dict]:
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load(dumps: Iterable[str], readings: Iterable[str], registry: Registry, issuer: str, currency: str,
+         metadata_dir: Optional[Path] = None) -> Store:
+    """Build a Store from account_tx dumps, meter readings and the registry (each transaction counted once)."""
+    from nft_metadata import certificate
+    from retirement import read_metadata
+
+    currency = currency_code(currency)  # config may give the 40-hex form; ledger amounts are decoded the same way
+    accounts, owners, hashes, jurisdictions, vintages = Codes(), Codes(), Codes(), Codes(), Codes()
+    issuer_code, blackhole_code = accounts(issuer), accounts(BLACKHOLE)
+    account_owner: Dict[int, int] = {}
+    for owner in registry.owners.values():
+        if owner.address:
+            account_owner[accounts(owner.address)] = owners(owner.id)
+    site_owner = {s.id: owners(s.owner_id) for s in registry.sites.values()}
+    site_jurisdiction = {s.id: jurisdictions(s.jurisdiction) for s in registry.sites.values()}
+
+    pays: List[tuple] = []
+    mints: List[tuple] = []
+    seen = set()
+    for entry in read_jsonl(dumps):
+        tx = entry.get("tx_json") or entry.get("tx") or entry
+        meta = entry.get("meta") or entry.get("metaData") or {}
+        tx_hash = (entry.get("hash") or tx.get("hash") or "").upper()
+        if tx_hash in seen or not entry.get("validated", True) or meta.get("TransactionResult") != "tesSUCCESS":
+            continue
+        seen.add(tx_hash)
+        kind = tx.get("TransactionType")
+        if kind == "Payment":
+            delivered = meta.get("delivered_amount", tx.get("Amount"))
+            if (isinstance(delivered, dict) and delivered.get("issuer") == issuer
+                    and currency_code(delivered.get("currency", "")) == currency):
+                pays.append((accounts(tx["Account"]), accounts(tx["Destination"]), micro(delivered["value"]),
+                             hashes(tx_hash)))
+        elif kind == "NFTokenMint":
+            cert = certificate(read_metadata(tx.get("URI"), metadata_dir))  # nested and flat schemas alike
+            vintage = cert["vintage"]
+            mints.append((hashes(cert["burn_tx"]), hashes((meta.get("nftoken_id") or tx_hash).upper()),
+                          jurisdictions(cert["jurisdiction"]),
+                          vintages(None if vintage is None else str(vintage))))
+
+    meters: List[tuple] = []
+    for reading in read_jsonl(readings):
+        site_id = str(reading["site_id"])
+        vintage = reading.get("vintage") or str(reading["interval_start"])[:4]
+        meters.append((site_owner.get(site_id, -1), site_jurisdiction.get(site_id, -1), vintages(str(vintage)),
+                       micro(reading["kwh"])))
+
+    owner_of = np.full(len(accounts.index), -1, dtype=np.int32)
+    for account, owner in account_owner.items():
+        owner_of[account] = owner
+
+    def columns(rows: List[tuple], width: int, dtypes: tuple) -> List[np.ndarray]:
+        table = np.array(rows, dtype=np.int64).reshape(-1, width)
+        return [table[:, i].astype(dtype) for i, dtype in enumerate(dtypes)]
+
+    pay_src, pay_dst, pay_value, pay_hash = columns(pays, 4, (np.int32, np.int32, np.int64, np.int32))
+    mint_burn, mint_nft, mint_jur, mint_vin = columns(mints, 4, (np.int32, np.int32, np.int32, np.int32))
+    meter_owner, meter_jur, meter_vin, meter_kwh = columns(meters, 4, (np.int32, np.int32, np.int32, np.int64))
+    return Store(accounts.array(), owners.array(), hashes.array(), jurisdictions.array(), vintages.array(), owner_of,
+                 issuer_code, blackhole_code, pay_src, pay_dst, pay_value, pay_hash, mint_burn, mint_nft, mint_jur,
+                 mint_vin, meter_owner, meter_jur, meter_vin, meter_kwh)
+
+
+# --- reconciliation ---
+def _sum_by(codes: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Exact int64 sums of `values` per code in [0, size); negative codes are dropped.
+
+    np.add.at rather than bincount: bincount sums in float64, which is no longer exact past 2**53 micro-kWh.
+    """
+    keep = codes >= 0
+    sums = np.zeros(size, dtype=np.int64)
+    np.add.at(sums, codes[keep], values[keep].astype(np.int64))
+    return sums
+
+
+def _stn(value) -> float:
+    return round(int(value) / MICRO, 6)
+
+
+def reconcile(s: Store, max_violations: int = DEFAULT_MAX_VIOLATIONS) -> dict:
+    """Balances per owner, vintage, jurisdiction and jurisdiction/vintage, plus every invariant violation."""
+    n_owners, n_hashes = len(s.owners), len(s.hashes)
+    n_jur, n_vin = len(s.jurisdictions), len(s.vintages)
+    src_owner, dst_owner = s.account_owner[s.pay_src], s.account_owner[s.pay_dst]
+    to_sink = (s.pay_dst == s.blackhole) | (s.pay_dst == s.issuer)
+    from_issuer = s.pay_src == s.issuer
+    is_burn = to_sink & ~from_issuer
+    owner_burn = is_burn & (src_owner >= 0)
+
+    # per owner: STN in from distribution (issuer, hot wallets), between owners, burned, metered
+    received = _sum_by(np.where(src_owner < 0, dst_owner, -1), s.pay_value, n_owners)
+    transfers_in = _sum_by(np.where(src_owner >= 0, dst_owner, -1), s.pay_value, n_owners)
+    outgoing = _sum_by(np.where(is_burn, -1, src_owner), s.pay_value, n_owners)
+    burned = _sum_by(np.where(owner_burn, src_owner, -1), s.pay_value, n_owners)
+    metered = _sum_by(s.meter_owner, s.meter_kwh, n_owners)
+
+    # burns by hash, and what each mint's burn was
+    burn_value = np.full(n_hashes, -1, dtype=np.int64)
+    burn_value[s.pay_hash[is_burn]] = s.pay_value[is_burn]
+    burn_owner = np.full(n_hashes, -1, dtype=np.int32)
+    burn_owner[s.pay_hash[is_burn]] = src_owner[is_burn]
+    named = s.mint_burn >= 0
+    mint_value = np.where(named, burn_value[np.where(named, s.mint_burn, 0)], -1)
+    backed = mint_value == BURN_AMOUNT
+    uses = np.bincount(s.mint_burn[named], minlength=n_hashes)
+    backed_owner = burn_owner[s.mint_burn[backed]]
+    certificates = np.bincount(backed_owner[backed_owner >= 0], minlength=n_owners)
+    unminted = is_burn & (uses[s.pay_hash] == 0) if n_hashes else is_burn
+
+    # per jurisdiction/vintage: metered kWh vs certificates
+    def cell(jur: np.ndarray, vin: np.ndarray) -> np.ndarray:
+        return np.where((jur >= 0) & (vin >= 0), jur.astype(np.int64) * n_vin + vin, -1)
+
+    metered_cell = _sum_by(cell(s.meter_jurisdiction, s.meter_vintage), s.meter_kwh, n_jur * n_vin)
+    minted_cell = _sum_by(cell(s.mint_jurisdiction, s.mint_vintage), np.ones(len(s.mint_burn)), n_jur * n_vin)
+
+    violations: Dict[str, List[dict]] = {}
+    counts: Dict[str, int] = {}
+
+    def flag(kind: str, positions: np.ndarray, row) -> None:
+        counts[kind] = len(positions)
+        if len(positions):
+            violations[kind] = [row(int(i)) for i in positions[:max_violations]]
+
+    flag("over_issuance", np.flatnonzero(received > metered), lambda o: {
+        "owner_id": str(s.owners[o]), "received_stn": _stn(received[o]), "metered_kwh": _stn(metered[o]),
+        "excess_stn": _stn(received[o] - metered[o])})
+    issued = int(s.pay_value[from_issuer & ~to_sink].sum())
+    returned = int(s.pay_value[(s.pay_dst == s.issuer) & ~from_issuer & (src_owner < 0)].sum())
+    total_metered = int(s.meter_kwh.sum())
+    flag("fleet_over_issuance", np.flatnonzero([issued - returned > total_metered]), lambda _: {
+        "issued_stn": _stn(issued - returned), "metered_kwh": _stn(total_metered),
+        "excess_stn": _stn(issued - returned - total_metered)})
+
+    def unbacked(i: int) -> dict:
+        if not named[i]:
+            reason = "metadata has no resolvable burn"
+        elif mint_value[i] < 0:
+            reason = "burn not found among STN burns"
+        else:
+            reason = f"burned {_stn(mint_value[i])} STN, expected {_stn(BURN_AMOUNT)}"
+        return {"nft": str(s.hashes[s.mint_nft[i]]), "burn_tx": str(s.hashes[s.mint_burn[i]]) if named[i] else None,
+                "reason": reason}
+
+    flag("unbacked_mint", np.flatnonzero(~backed), unbacked)
+    flag("double_used_burn", np.flatnonzero(uses > 1), lambda h: {
+        "burn_tx": str(s.hashes[h]), "mints": int(uses[h]),
+        "nfts": [str(s.hashes[n]) for n in s.mint_nft[s.mint_burn == h]]})
+    flag("over_certified", np.flatnonzero(minted_cell * BURN_AMOUNT > metered_cell), lambda c: {
+        "jurisdiction": str(s.jurisdictions[c // n_vin]), "vintage": str(s.vintages[c % n_vin]),
+        "certificates": int(minted_cell[c]), "metered_kwh": _stn(metered_cell[c])})
+
+    balance = received + transfers_in - outgoing - burned
+    by_vintage_metered = _sum_by(s.meter_vintage, s.meter_kwh, n_vin)
+    by_vintage_minted = np.bincount(s.mint_vintage[s.mint_vintage >= 0], minlength=n_vin)
+    by_jur_metered = _sum_by(s.meter_jurisdiction, s.meter_kwh, n_jur)
+    by_jur_minted = np.bincount(s.mint_jurisdiction[s.mint_jurisdiction >= 0], minlength=n_jur)
+    return {
+        "records": s.records(),
+        "totals": {
+            "metered_kwh": _stn(total_metered), "issued_stn": _stn(issued), "returned_stn": _stn(returned),
+            "burned_stn": _stn(s.pay_value[is_burn].sum()), "burns": int(is_burn.sum()),
+            "unminted_burns": int(unminted.sum()), "mints": len(s.mint_burn), "backed_mints": int(backed.sum()),
+        },
+        "by_owner": [{"owner_id": str(s.owners[o]), "metered_kwh": _stn(metered[o]), "received_stn": _stn(received[o]),
+                      "transfers_in_stn": _stn(transfers_in[o]), "sent_stn": _stn(outgoing[o]),
+                      "burned_stn": _stn(burned[o]), "certificates": int(certificates[o]),
+                      "balance_stn": _stn(balance[o])} for o in range(n_owners)],
+        "by_vintage": {str(v): {"metered_kwh": _stn(by_vintage_metered[i]), "certificates": int(by_vintage_minted[i])}
+                       for i, v in enumerate(s.vintages)},
+        "by_jurisdiction": {str(j): {"metered_kwh": _stn(by_jur_metered[i]), "certificates": int(by_jur_minted[i])}
+                            for i, j in enumerate(s.jurisdictions)},
+        "violation_counts": counts,
+        "violations": violations,
+    }
+
+
+# --- account_tx dumps ---
+def last_ledger(path: Path) -> Optional[int]:
+    """Ledger index of the last transaction in a dump (dumps are written oldest first)."""
+    if not path.exists() or path.stat().st_size == 0:
+        return None
+    with path.open("rb") as f:
+        f.seek(max(0, path.stat().st_size - 65536))
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    entry = json.loads(lines[-1])
+    return int(entry.get("ledger_index") or (entry.get("tx_json") or entry.get("tx") or {})["ledger_index"])
+
+
+def account_transactions(client: JsonRpcClient, account: str, first: int = -1, last: int = -1) -> Iterator[dict]:
+    """Validated transactions of `account` in ledgers first..last (-1: open-ended), oldest first, paged."""
+    marker = None
+    while True:
+        result = client.request(AccountTx(account=account, ledger_index_min=first, ledger_index_max=last,
+                                          forward=True, limit=PAGE_LIMIT, marker=marker)).result
+        if "error" in result:
+            raise RuntimeError(f"account_tx {account}: {result.get('error_message') or result['error']}")
+        last = result.get("ledger_index_max", last)  # later pages must end at the same ledger
+        for entry in result.get("transactions", []):
+            if entry.get("validated"):
+                tx = entry.get("tx_json") or entry.get("tx") or {}
+                entry.setdefault("hash", tx.get("hash"))
+                entry.setdefault("ledger_index", tx.get("ledger_index"))
+                yield entry
+        marker = result.get("marker")
+        if not marker:
+            return
+
+
+def validated_ledger(client: JsonRpcClient) -> int:
+    result = client.request(Ledger(ledger_index="validated")).result
+    if "error" in result:
+        raise RuntimeError(f"ledger: {result.get('error_message') or result['error']}")
+    return int(result["ledger_index"])
+
+
+def dump(client: JsonRpcClient, account: str, path: Path) -> dict:
+    """Append `account`'s validated transactions after the dump's last ledger to `path`; returns counts."""
+    since = last_ledger(path)
+    through = validated_ledger(client)
+    written = 0
+    with path.open("a", encoding="utf-8") as out:
+        for entry in account_transactions(client, account, -1 if since is None else since + 1, through):
+            out.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            written += 1
+    return {"account": account, "since_ledger": since, "through_ledger": through, "written": written}
+
+
+# --- measurement ---
+def bench(records: int, owners: int, planted: int) -> dict:
+    """Reconcile a synthetic fleet of about `records` records with `planted` violations of each kind.
+
+    Columns are generated directly (half meter readings, a quarter burns, a quarter mints) and the planted violations
+    must come back exactly.  JSON parsing is measured separately on a sample, since `load` runs once per dump.
+    """
+    import tempfile
+
+    rng = np.random.default_rng(48)
+    n_read, n_burn = records // 2, records // 4
+    # US-XX has no sites: certificates planted there are over-certified
+    jur_names, vin_names = np.array(["US-NJ", "US-CA", "US-TX", "US-MA", "US-XX"]), np.array(["2024", "2025"])
+    shards = 8
+    # accounts: issuer 0, blackhole 1, hot shards 2..9, owners after
+    accounts = np.array(["issuer", BLACKHOLE] + [f"hot{i}" for i in range(shards)]
+                        + [f"owner{i}" for i in range(owners)])
+    account_owner = np.concatenate([np.full(2 + shards, -1, np.int32), np.arange(owners, dtype=np.int32)])
+    owner_jur = rng.integers(0, len(jur_names) - 1, owners).astype(np.int32)
+
+    meter_owner = rng.integers(0, owners, n_read).astype(np.int32)
+    meter_vin = rng.integers(0, len(vin_names), n_read).astype(np.int32)
+    meter_kwh = rng.integers(1_000, 8_000, n_read).astype(np.int64) * MICRO
+    metered = np.bincount(meter_owner, weights=meter_kwh, minlength=owners).astype(np.int64)
+
+    # each owner burns floor(metered / 1000) times (capped to n_burn overall) and receives exactly its metered kWh
+    certs = metered // BURN_AMOUNT
+    certs = np.minimum(certs, np.maximum(0, n_burn * certs // max(1, certs.sum())))
+    burn_owner = np.repeat(np.arange(owners, dtype=np.int32), certs)
+    n_burn = len(burn_owner)
+    received = metered.copy()
+    over = rng.choice(owners, planted, replace=False)
+    received[over] += 5 * MICRO  # planted over-issuance
+    shard = (np.arange(owners) % shards + 2).astype(np.int32)
+    top_up = np.bincount(shard, weights=received, minlength=2 + shards)[2:].astype(np.int64)
+
+    owner_acct = (np.arange(owners) + 2 + shards).astype(np.int32)
+    pay_src = np.concatenate([np.zeros(shards, np.int32), shard, owner_acct[burn_owner]])
+    pay_dst = np.concatenate([np.arange(2, 2 + shards, dtype=np.int32), owner_acct,
+                              np.ones(n_burn, np.int32)])
+    pay_value = np.concatenate([top_up, received, np.full(n_burn, BURN_AMOUNT, np.int64)])
+    n_pay = len(pay_value)
+    pay_hash = np.arange(n_pay, dtype=np.int32)
+    burn_hashes = pay_hash[shards + owners:]
+    short = rng.choice(n_burn, planted, replace=False)
+    pay_value[shards + owners + short] = 999 * MICRO  # planted short burns
+
+    mint_burn = burn_hashes.copy()
+    double = rng.choice(np.setdiff1d(np.arange(n_burn), short), 2 * planted, replace=False)
+    mint_burn[double[planted:]] = mint_burn[double[:planted]]  # planted double use (loses those burns' own mints)
+    unknown = rng.choice(np.setdiff1d(np.arange(n_burn), np.concatenate([short, double])), planted, replace=False)
+    mint_burn[unknown] = -1  # planted unresolved metadata
+    n_mint = len(mint_burn)
+    mint_nft = (n_pay + np.arange(n_mint)).astype(np.int32)
+    mint_jur = owner_jur[burn_owner]
+    mint_vin = rng.integers(0, len(vin_names), n_mint).astype(np.int32)
+    elsewhere = rng.choice(n_mint, planted, replace=False)
+    mint_jur[elsewhere] = len(jur_names) - 1
+    hashes = np.char.add("H", np.arange(n_pay + n_mint).astype(str))
+
+    store = Store(accounts, np.char.add("o", np.arange(owners).astype(str)), hashes, jur_names, vin_names,
+                  account_owner, 0, 1, pay_src, pay_dst, pay_value, pay_hash, mint_burn, mint_nft, mint_jur,
+                  mint_vin, meter_owner, owner_jur[meter_owner], meter_vin, meter_kwh)
+    result: dict = {"records": store.records(), "owners": owners, "planted_per_kind": planted}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "supply.npz")
+        start = time.perf_counter()
+        store.save(path)
+        result["save_s"] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        store = Store.open(path)
+        result["open_s"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        report = reconcile(store, max_violations=10 * planted)
+        result["reconcile_s"] = round(time.perf_counter() - start, 3)
+
+        found = report["violations"]
+        expected = {
+            "over_issuance": {f"o{o}" for o in over},
+            "unbacked_mint": {f"H{n_pay + i}" for i in np.concatenate([short, unknown])},
+            "double_used_burn": {f"H{int(burn_hashes[i])}" for i in double[:planted]},
+            "over_certified": {("US-XX", str(vin_names[v])) for v in mint_vin[elsewhere]},
+        }
+        got = {"over_issuance": {r["owner_id"] for r in found.get("over_issuance", [])},
+               "unbacked_mint": {r["nft"] for r in found.get("unbacked_mint", [])},
+               "double_used_burn": {r["burn_tx"] for r in found.get("double_used_burn", [])},
+               "over_certified": {(r["jurisdiction"], r["vintage"]) for r in found.get("over_certified", [])}}
+        result["violation_counts"] = report["violation_counts"]
+        result["planted_found_exactly"] = {k: got[k] == expected[k] for k in expected}
+
+        # one-time parse cost: account_tx dump lines -> store
+        sample = min(100_000, n_pay)
+        dump_path = Path(tmp) / "issuer.jsonl"
+        with dump_path.open("w", encoding="utf-8") as f:
+            for i in range(sample):
+                f.write(json.dumps({"hash": f"{i:064X}", "ledger_index": 1000 + i, "validated": True,
+                                    "tx": {"TransactionType": "Payment", "Account": f"r{i % 97}",
+                                           "Destination": BLACKHOLE,
+                                           "Amount": {"currency": "STN", "issuer": "rIssuer", "value": "1000"}},
+                                    "meta": {"TransactionResult": "tesSUCCESS",
+                                             "delivered_amount": {"currency": "STN", "issuer": "rIssuer",
+                                                                  "value": "1000"}}}) + "\n")
+        registry = Registry(":memory:")
+        start = time.perf_counter()
+        parsed = load([str(dump_path)], [], registry, "rIssuer", "STN")
+        elapsed = time.perf_counter() - start
+        registry.close()
+        result["load_lines_per_s"] = round(len(parsed.pay_value) / elapsed)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile metered kWh, STN issued/burned and SOLRAI minted")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("dump", help="Append an account's validated transactions to a JSONL dump")
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--account", required=True, help="Key role (issuer, minter) or classic address")
+    p.add_argument("--output", required=True)
+    p = sub.add_parser("load", help="Parse dumps, readings and the registry into a columnar store")
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--dump", nargs="+", required=True, help="account_tx JSONL dumps (issuer and minter)")
+    p.add_argument("--readings", nargs="*", default=[], help="Meter readings JSONL")
+    p.add_argument("--registry", default=DEFAULT_REGISTRY)
+    p.add_argument("--metadata-dir", default=None, help="Where compact sha256: metadata payloads are kept")
+    p.add_argument("--output", required=True, help="Store (.npz)")
+    p = sub.add_parser("check", help="Reconcile a store; exit 1 if any invariant is violated")
+    p.add_argument("store")
+    p.add_argument("--report", default="-", help="JSON report path, or - for stdout")
+    p.add_argument("--max-violations", type=int, default=DEFAULT_MAX_VIOLATIONS, help="Listed per kind")
+    p = sub.add_parser("bench", help="Reconcile a synthetic fleet with planted violations")
+    p.add_argument("--records", type=int, default=4_000_000)
+    p.add_argument("--owners", type=int, default=10_000)
+    p.add_argument("--planted", type=int, default=25, help="Violations planted per kind")
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        print(json.dumps(bench(args.records, args.owners, args.planted), indent=2))
+        return
+    if args.cmd == "check":
+        try:
+            store = Store.open(args.store)
+        except (OSError, ValueError, KeyError) as e:
+            sys.exit(f"Error: {e}")
+        report = reconcile(store, args.max_violations)
+        text = json.dumps(report, indent=2)
+        if args.report == "-":
+            print(text)
+        else:
+            Path(args.report).write_text(text + "\n", encoding="utf-8")
+        print(json.dumps({"records": report["records"], "violations": report["violation_counts"]}), file=sys.stderr)
+        if any(report["violation_counts"].values()):
+            sys.exit(1)
+        return
+
+    from key_provider import keys_or_exit
+    from solr_config import config_or_exit
+
+    config = config_or_exit(args.config, "currency_code")
+    if args.cmd == "dump":
+        account = args.account
+        if not account.startswith("r"):
+            account = keys_or_exit(config, account).wallet(account).classic_address
+        try:
+            print(json.dumps(dump(get_client(), account, Path(args.output))))
+        except RuntimeError as e:
+            sys.exit(f"Error: {e}")
+        return
+    issuer = keys_or_exit(config, "issuer").wallet("issuer").classic_address
+    registry = Registry(args.registry)
+    try:
+        store = load(args.dump, args.readings, registry, issuer, config.currency_code,
+                     Path(args.metadata_dir) if args.metadata_dir else None)
+    except (OSError, ValueError, KeyError, InvalidOperation) as e:
+        sys.exit(f"Error: {e}")
+    finally:
+        registry.close()
+    store.save(args.output)
+    print(json.dumps({"output": args.output, "payments": len(store.pay_value), "mints": len(store.mint_burn),
+                      "readings": len(store.meter_kwh)}))
+
+
+if __name__ == "__main__":
+    main()
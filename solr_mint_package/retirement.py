@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+retirement.py
+=============
+
+Retirement of SOLRAI certificates: the holder burns the NFT (NFTokenBurn)
+to claim the SREC on-chain (Model.md, step 6), in batches.
+
+`retire` takes a list of NFTokenIDs held by one account and:
+
+  1. reads the holder's NFTs once (account_nfts, paged) and skips IDs it
+     does not hold or that the local index already shows as retired
+  2. resolves each certificate's vintage, jurisdiction, program and MWh from
+     its URI: legacy data-URI metadata is decoded inline, compact
+     "sha256:<hash>" URIs are read from --metadata-dir and checked against
+     their hash.  MWh is amount_burned / 1000 (1,000 STN = 1 MWh).  NFTs
+     whose metadata cannot be resolved are not retired (status
+     "unresolved") unless --allow-unresolved, which records them as 1 MWh
+  3. pipelines the NFTokenBurns from the holder (tx_pipeline.py), by
+     Sequence or Ticket, with an optional beneficiary memo on each
+  4. records a receipt per validated burn (NFTokenID, hash, ledger index,
+     vintage, MWh, beneficiary) in a local SQLite index as each chunk
+     validates, so a run that dies half-way keeps the receipts of the burns
+     that already applied
+
+`statement` aggregates receipts into one retirement statement: totals and
+one line per vintage/jurisdiction/program, plus every receipt, identified by
+the SHA-256 of its sorted burn hashes.
+
+Usage:
+    python retirement.py retire <nft_id> [...] [--file ids.txt] [--wallet buyer] \\
+        [--beneficiary "ACME Corp FY2025"] [--metadata-dir metadata] [--statement statement.json]
+    python retirement.py statement [--holder r...] [--beneficiary ...] [--output statement.json]
+    python retirement.py bench --certs 200 --close-interval 0.5
+
+Dependencies:
+    pip install xrpl-py PyYAML
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests import AccountNFTs
+from xrpl.models.transactions import Memo, NFTokenBurn
+from xrpl.wallet import Wallet
+
+from key_provider import keys_or_exit
+from solr_config import config_or_exit
+from telemetry import submit_and_wait
+from tx_pipeline import DEFAULT_CHUNK_SIZE, pipeline
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+DEFAULT_INDEX = "retirements.sqlite"
+KWH_PER_MWH = Decimal("1000")
+UNRESOLVED_MWH = Decimal("1")  # one standard certificate (1,000 STN burned), only with --allow-unresolved
+DATA_URI_PREFIX = "data:application/json;base64,"
+MEMO_TYPE = "solrai/retirement"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS retirements (
+    nft_id TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    tx_hash TEXT NOT NULL,
+    ledger_index INTEGER,
+    vintage TEXT,
+    jurisdiction TEXT,
+    program TEXT,
+    mwh TEXT NOT NULL,
+    beneficiary TEXT,
+    retired_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS retirements_holder ON retirements (holder, retired_at);
+"""
+RECEIPT_FIELDS = ("nft_id", "holder", "tx_hash", "ledger_index", "vintage", "jurisdiction", "program", "mwh",
+                  "beneficiary", "retired_at")
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+class RetirementIndex:
+    """SQLite record of retirement receipts, one per burned NFT (WAL, safe across processes)."""
+
+    def __init__(self, path: str = DEFAULT_INDEX):
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def receipt(self, nft_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT * FROM retirements WHERE nft_id = ?", (nft_id.upper(),)).fetchone()
+        return dict(row) if row else None
+
+    def record(self, receipts: Iterable[dict]) -> None:
+        """Store receipts in one transaction (a receipt is final, so re-recording one is a no-op)."""
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO retirements VALUES ({', '.join('?' * len(RECEIPT_FIELDS))})",
+                [tuple(r.get(k) for k in RECEIPT_FIELDS) for r in receipts])
+
+    def receipts(self, holder: Optional[str] = None, beneficiary: Optional[str] = None,
+                 since: Optional[float] = None) -> List[dict]:
+        where, params = [], []
+        for column, value in (("holder", holder), ("beneficiary", beneficiary)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("retired_at >= ?")
+            params.append(since)
+        sql = "SELECT * FROM retirements" + (" WHERE " + " AND ".join(where) if where else "")
+        return [dict(row) for row in self.conn.execute(sql + " ORDER BY ledger_index, nft_id", params)]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def held_nfts(client: JsonRpcClient, account: str) -> Dict[str, dict]:
+    """NFTokenID -> account_nfts entry for every NFT `account` holds."""
+    held, marker = {}, None
+    while True:
+        result = client.request(AccountNFTs(account=account, limit=400, marker=marker)).result
+        if "error" in result:
+            raise RuntimeError(f"account_nfts {account}: {result['error']}")
+        for nft in result.get("account_nfts", []):
+            held[nft["NFTokenID"].upper()] = nft
+        marker = result.get("marker")
+        if marker is None:
+            return held
+
+
+def read_metadata(uri_hex: Optional[str], metadata_dir: Optional[Path] = None) -> dict:
+    """Certificate metadata behind an NFT URI; {} when it cannot be resolved locally."""
+    if not uri_hex:
+        return {}
+    uri = bytes.fromhex(uri_hex).decode("utf-8", "replace")
+    if uri.startswith(DATA_URI_PREFIX):
+        return json.loads(base64.b64decode(uri[len(DATA_URI_PREFIX):]))
+    if uri.startswith("sha256:") and metadata_dir is not None:
+        digest = uri[len("sha256:"):].lower()
+        path = metadata_dir / f"{digest}.json"
+        if path.exists():
+            payload = path.read_bytes()
+            if hashlib.sha256(payload).hexdigest() == digest:
+                return json.loads(payload)
+    return {}
+
+
+def certificate(nft_id: str, uri_hex: Optional[str], metadata_dir: Optional[Path] = None) -> dict:
+    """The receipt fields known before the burn: vintage, jurisdiction, program, MWh (None if unresolved)."""
+    metadata = read_metadata(uri_hex, metadata_dir)
+    try:
+        mwh = str(Decimal(str((metadata.get("burn_proof") or {}).get("amount_burned", "1000"))) / KWH_PER_MWH)
+    except InvalidOperation:
+        mwh = None
+    return {"nft_id": nft_id, "vintage": metadata.get("vintage"), "jurisdiction": metadata.get("jurisdiction"),
+            "program": metadata.get("program"), "mwh": mwh if metadata else None}
+
+
+def retirement_memo(beneficiary: str) -> Memo:
+    return Memo(memo_type=MEMO_TYPE.encode("utf-8").hex(), memo_data=beneficiary.encode("utf-8").hex())
+
+
+def retire(
+    client: JsonRpcClient,
+    wallet: Wallet,
+    nft_ids: Iterable[str],
+    index: RetirementIndex,
+    metadata_dir: Optional[Path] = None,
+    beneficiary: Optional[str] = None,
+    use_tickets: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    allow_unresolved: bool = False,
+) -> List[dict]:
+    """Pipeline one NFTokenBurn per held, not yet retired NFT; return one row per distinct input ID.
+
+    Receipts are recorded chunk by chunk as burns validate.  NFTs without resolvable metadata are skipped
+    (status "unresolved") unless `allow_unresolved`, which retires them as UNRESOLVED_MWH each.
+    """
+    holder = wallet.classic_address
+    held = held_nfts(client, holder)
+    rows: "OrderedDict[str, dict]" = OrderedDict()
+    todo = []
+    for nft_id in (i.strip().upper() for i in nft_ids):
+        if not nft_id or nft_id in rows:
+            continue
+        receipt = index.receipt(nft_id)
+        if receipt is not None:
+            rows[nft_id] = dict(receipt, status="already_retired")
+        elif nft_id not in held:
+            rows[nft_id] = {"nft_id": nft_id, "status": "not_held"}
+        else:
+            rows[nft_id] = cert = certificate(nft_id, held[nft_id].get("URI"), metadata_dir)
+            if cert["mwh"] is None:
+                if not allow_unresolved:
+                    cert["status"] = "unresolved"
+                    continue
+                cert.update(mwh=str(UNRESOLVED_MWH), unresolved=True)
+            todo.append(cert)
+
+    def record(validated: List[tuple]) -> None:
+        receipts = []
+        for i, row in validated:
+            if row["engine_result"] == "tesSUCCESS":
+                todo[i].update(holder=holder, tx_hash=row["hash"], ledger_index=row["ledger_index"],
+                               beneficiary=beneficiary, retired_at=time.time(), status="retired")
+                receipts.append(todo[i])
+        index.record(receipts)
+
+    memos = [retirement_memo(beneficiary)] if beneficiary else None
+    txs = [NFTokenBurn(account=holder, nftoken_id=c["nft_id"], memos=memos) for c in todo]
+    for cert, row in zip(todo, pipeline(client, wallet, txs, use_tickets=use_tickets, chunk_size=chunk_size,
+                                        on_validated=record)):
+        if cert.get("status") != "retired":
+            cert.update(status=row["status"], engine_result=row.get("engine_result"), tx_hash=row["hash"])
+    return list(rows.values())
+
+
+def build_statement(receipts: List[dict], holder: Optional[str] = None, beneficiary: Optional[str] = None) -> dict:
+    """One aggregated statement over retirement receipts."""
+    receipts = sorted(receipts, key=lambda r: (r.get("ledger_index") or 0, r["nft_id"]))
+    lines: Dict[tuple, dict] = {}
+    total = Decimal(0)
+    for r in receipts:
+        key = (r.get("vintage") or "", r.get("jurisdiction") or "", r.get("program") or "")
+        line = lines.setdefault(key, {"vintage": key[0] or None, "jurisdiction": key[1] or None,
+                                      "program": key[2] or None, "certificates": 0, "mwh": Decimal(0)})
+        line["certificates"] += 1
+        line["mwh"] += Decimal(r["mwh"])
+        total += Decimal(r["mwh"])
+    digest = hashlib.sha256("\n".join(sorted(r["tx_hash"] for r in receipts)).encode("utf-8")).hexdigest()
+    ledgers = [r["ledger_index"] for r in receipts if r.get("ledger_index") is not None]
+    return {
+        "statement_id": digest,
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "holder": holder,
+        "beneficiary": beneficiary,
+        "ledger_range": [min(ledgers), max(ledgers)] if ledgers else None,
+        "totals": {"certificates": len(receipts), "mwh": str(total)},
+        "lines": [dict(line, mwh=str(line["mwh"])) for _key, line in sorted(lines.items())],
+        "receipts": [{k: r.get(k) for k in ("nft_id", "tx_hash", "ledger_index", "vintage", "jurisdiction",
+                                            "program", "mwh")} for r in receipts],
+    }
+
+
+def read_ids(values: List[str], path: Optional[str]) -> List[str]:
+    ids = list(values)
+    if path:
+        f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            ids += [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    return ids
+
+
+def write_json(doc: dict, path: str) -> None:
+    text = json.dumps(doc, indent=2)
+    if path == "-":
+        print(text)
+    else:
+        Path(path).write_text(text + "\n", encoding="utf-8")
+
+
+# --- benchmark against the simulator ---
+def bench(certs: int, close_interval: float, chunk_size: int, sequential: int) -> dict:
+    """Retire `certs` NFTs one at a time (first `sequential` of them) vs pipelined by Sequence and by Ticket."""
+    import tempfile
+
+    from bench_flows import simulator
+    from burn_and_mint_solrai_nft import metadata_fields
+    from metadata_codec import CODEC_VERSION, content_hash, encode
+    from nft_market import offer_index_from_meta
+    from xrpl.models.transactions import NFTokenAcceptOffer, NFTokenCreateOffer, NFTokenMint
+
+    report = {"certs": certs, "close_interval_s": close_interval, "chunk_size": chunk_size, "modes": {}}
+    with tempfile.TemporaryDirectory(prefix="solr-retire-") as tmp, \
+            simulator("retirement", close_interval) as (ledger, client, wallets):
+        minter, holder = wallets["minter"], wallets["buyer"]
+        metadata_dir = Path(tmp)
+
+        def issue(n: int) -> List[str]:
+            # Untimed setup: mint n certificates across three vintages and deliver them to the holder.
+            uris = []
+            for i in range(n):
+                config = {"jurisdiction": "US-NJ", "program": "NJ-SREC", "vintage": str(2023 + i % 3)}
+                payload = encode(dict(metadata_fields(config, f"{i:064X}"), codec_version=CODEC_VERSION))
+                digest = content_hash(payload)
+                (metadata_dir / f"{digest}.json").write_bytes(payload)
+                uris.append(f"sha256:{digest}".encode("utf-8").hex())
+            minted = pipeline(client, minter, [NFTokenMint(account=minter.classic_address, uri=u, flags=0x09,
+                                                           transfer_fee=10000, nftoken_taxon=0) for u in uris])
+            nft_ids = [r["meta"]["nftoken_id"] for r in minted]
+            offered = pipeline(client, minter, [NFTokenCreateOffer(
+                account=minter.classic_address, nftoken_id=n_id, amount="0", destination=holder.classic_address,
+                flags=1) for n_id in nft_ids])
+            pipeline(client, holder, [NFTokenAcceptOffer(account=holder.classic_address,
+                                                         nftoken_sell_offer=offer_index_from_meta(r["meta"]))
+                                      for r in offered])
+            return nft_ids
+
+        def run(mode: str, nft_ids: List[str], fn) -> None:
+            index = RetirementIndex(str(metadata_dir / f"{mode}.sqlite"))
+            closed = ledger.validated_index
+            start = time.perf_counter()
+            rows = fn(index, nft_ids)
+            elapsed = time.perf_counter() - start
+            retired = sum(r["status"] == "retired" for r in rows)
+            statement = build_statement(index.receipts())
+            report["modes"][mode] = {
+                "nfts": len(nft_ids), "retired": retired, "seconds": round(elapsed, 3),
+                "burns_per_s": round(retired / elapsed, 2), "ledgers": ledger.validated_index - closed,
+                "statement_mwh": statement["totals"]["mwh"], "statement_lines": len(statement["lines"]),
+            }
+            index.close()
+
+        def one_at_a_time(index, nft_ids):
+            rows = []
+            for nft_id in nft_ids:
+                response = submit_and_wait(NFTokenBurn(account=holder.classic_address, nftoken_id=nft_id),
+                                           client, holder)
+                rows.append({"status": "retired"})
+                cert = dict(certificate(nft_id, None), mwh=str(UNRESOLVED_MWH))
+                index.record([dict(cert, holder=holder.classic_address, tx_hash=response.result["hash"],
+                                   ledger_index=response.result.get("ledger_index"), retired_at=time.time())])
+            return rows
+
+        run("one_at_a_time", issue(min(sequential, certs)), one_at_a_time)
+        run("pipelined_sequence", issue(certs), lambda index, ids: retire(
+            client, holder, ids, index, metadata_dir, "bench", chunk_size=chunk_size))
+        run("pipelined_tickets", issue(certs), lambda index, ids: retire(
+            client, holder, ids, index, metadata_dir, "bench", use_tickets=True, chunk_size=chunk_size))
+        report["engine"] = {k: v for k, v in ledger.stats.items() if k.startswith("engine:")}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retire (burn) SOLRAI certificates in batches")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("retire", help="Burn NFTs held by --wallet and record receipts")
+    p.add_argument("nft_ids", nargs="*")
+    p.add_argument("--file", default=None, help="File with one NFTokenID per line, or - for stdin")
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--wallet", default="buyer", help="Key role of the holder (buyer, owner, owner:<id>, ...)")
+    p.add_argument("--beneficiary", default=None, help="Retired on behalf of (memo on each burn)")
+    p.add_argument("--metadata-dir", default=None, help="Where compact sha256:<hash> metadata payloads live")
+    p.add_argument("--allow-unresolved", action="store_true",
+                   help=f"Retire NFTs whose metadata cannot be resolved, as {UNRESOLVED_MWH} MWh each")
+    p.add_argument("--index", default=DEFAULT_INDEX)
+    p.add_argument("--use-tickets", action="store_true", help="Pipeline by Ticket instead of Sequence")
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.add_argument("--output", default=None, help="JSONL row per NFT (default: none)")
+    p.add_argument("--statement", default="-", help="Statement for this batch (JSON path, or - for stdout)")
+
+    p = sub.add_parser("statement", help="Aggregate recorded receipts into one statement")
+    p.add_argument("--index", default=DEFAULT_INDEX)
+    p.add_argument("--holder", default=None)
+    p.add_argument("--beneficiary", default=None)
+    p.add_argument("--since", default=None, help="Only receipts retired on or after this ISO date")
+    p.add_argument("--output", default="-")
+
+    p = sub.add_parser("bench", help="Retirement throughput against the simulator")
+    p.add_argument("--certs", type=int, default=200)
+    p.add_argument("--sequential", type=int, default=20, help="NFTs retired one at a time for the baseline")
+    p.add_argument("--close-interval", type=float, default=0.5)
+    p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    p.add_argument("--output", default="-")
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        write_json(bench(args.certs, args.close_interval, args.chunk_size, args.sequential), args.output)
+        return
+
+    if args.cmd == "statement":
+        since = None
+        if args.since:
+            try:
+                since = datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc).timestamp()
+            except ValueError:
+                sys.exit(f"Error: --since {args.since!r} is not an ISO date")
+        index = RetirementIndex(args.index)
+        receipts = index.receipts(args.holder, args.beneficiary, since)
+        write_json(build_statement(receipts, args.holder, args.beneficiary), args.output)
+        return
+
+    nft_ids = read_ids(args.nft_ids, args.file)
+    if not nft_ids:
+        sys.exit("Error: no NFTokenIDs given (positional or --file)")
+    keys = keys_or_exit(config_or_exit(args.config), args.wallet)
+    wallet = keys.wallet(args.wallet)
+    index = RetirementIndex(args.index)
+    rows = retire(get_client(), wallet, nft_ids, index, Path(args.metadata_dir) if args.metadata_dir else None,
+                  args.beneficiary, use_tickets=args.use_tickets, chunk_size=args.chunk_size,
+                  allow_unresolved=args.allow_unresolved)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            for row in rows:
+                out.write(json.dumps(row) + "\n")
+    retired = [r for r in rows if r["status"] == "retired"]
+    write_json(build_statement(retired, wallet.classic_address, args.beneficiary), args.statement)
+    skipped = len(rows) - len(retired)
+    unresolved = sum(r["status"] == "unresolved" for r in rows)
+    if unresolved:
+        print(f"Warning: {unresolved} NFTs have unresolved metadata and were not retired "
+              f"(pass --metadata-dir, or --allow-unresolved)", file=sys.stderr)
+    guessed = sum(bool(r.get("unresolved")) for r in retired)
+    if guessed:
+        print(f"Warning: {guessed} NFTs with unresolved metadata were recorded as {UNRESOLVED_MWH} MWh each",
+              file=sys.stderr)
+    print(f"Retired {len(retired)} of {len(rows)} NFTs" + (f" ({skipped} skipped or failed)" if skipped else ""),
+          file=sys.stderr)
+    if any(r["status"] not in ("retired", "already_retired") for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
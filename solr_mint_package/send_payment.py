@@ -20,26 +20,23 @@ Dependencies:
 """
 
 import argparse
-import sys
-import yaml
+import os
 import json
 
 import xrpl
 from xrpl.clients import JsonRpcClient
 from xrpl.wallet import Wallet
 from xrpl.models import transactions
-from xrpl.transaction import safe_sign_and_submit_transaction, send_reliable_submission
-
-TESTNET_URL = "https://s.altnet.rippletest.net:51234"
 
+from key_provider import keys_or_exit
+from solr_config import config_or_exit
+from telemetry import submit_and_wait
 
-def load_config(path: str = "config.yaml") -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
 
 
 def get_client() -> JsonRpcClient:
-    return JsonRpcClient(TESTNET_URL)
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
 
 
 def send_payment(
@@ -57,8 +54,7 @@ def send_payment(
         destination=destination,
         destination_tag=dest_tag,
     )
-    signed = safe_sign_and_submit_transaction(payment_tx, wallet, client)
-    result = send_reliable_submission(signed, client)
+    result = submit_and_wait(payment_tx, client, wallet)
     return result.result
 
 
@@ -70,14 +66,11 @@ def main() -> None:
     parser.add_argument("--config", default="config.yaml", help="Path to configuration YAML file")
     args = parser.parse_args()
 
-    config = load_config(args.config)
     # Default to sending from the hot account
-    sender_seed = config.get("hot_seed")
-    if not sender_seed:
-        sys.exit("Error: hot_seed must be defined in the config file.")
+    keys = keys_or_exit(config_or_exit(args.config), "hot")
 
     client = get_client()
-    sender_wallet = Wallet.from_seed(sender_seed)
+    sender_wallet = keys.wallet("hot")
 
     print(f"Sending {args.drops} drops from {sender_wallet.classic_address} to {args.to}...")
     tx_result = send_payment(client, sender_wallet, args.to, args.drops, dest_tag=args.tag)
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+sequence_coordinator.py
+=======================
+
+Per-account Sequence allocation shared by every process on a host.
+
+Each script autofills `Sequence` from account_info on its own, so two runs
+from the same account (send_payment.py and burn_and_mint_solrai_nft.py from
+the hot wallet, two mint_solr_token.py runs from the issuer) sign the same
+number and one of them fails with tefPAST_SEQ or sits in terPRE_SEQ.  With
+SOLR_SEQUENCE_DB set, every submitter on the host takes its numbers from one
+SQLite file instead:
+
+  - allocation runs inside BEGIN IMMEDIATE, so it is atomic across processes
+    (the SQLite write lock is the file lock); a block of N consecutive
+    numbers is one transaction (tx_pipeline chunks)
+  - a number whose transaction never applied (tem/tef rejection, expired
+    past its LastLedgerSequence) is released as a gap: at the top of the
+    allocated range it is simply handed out again, below transactions still
+    in flight it is reclaimed by the next allocation or filled with a no-op
+    AccountSet so the transactions behind it can apply
+  - the account is resynced from account_info (current ledger) every
+    RESYNC_SECONDS and whenever a submission reports tefPAST_SEQ (something
+    outside the coordinator used the account); allocations the ledger has
+    passed are dropped, and ones left by a crashed process become gaps once
+    their LastLedgerSequence (or, if never signed, LEASE_SECONDS) is past
+
+telemetry.submit_and_wait, tx_pipeline and job_journal allocate through it,
+so every script that submits is covered.  Without SOLR_SEQUENCE_DB nothing
+changes.
+
+Usage:
+    SOLR_SEQUENCE_DB=/var/lib/solr/sequences.sqlite python send_payment.py ...
+    python sequence_coordinator.py show [--db sequences.sqlite]
+    python sequence_coordinator.py stress --procs 4 --txs 25   # parallel workers against the simulator
+
+Dependencies:
+    pip install xrpl-py
+"""
+import argparse
+import dataclasses
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from xrpl.clients import JsonRpcClient
+from xrpl.ledger import get_fee, get_latest_validated_ledger_sequence
+from xrpl.models.requests import AccountInfo
+from xrpl.models.transactions import AccountSet
+from xrpl.models.transactions.transaction import Transaction
+from xrpl.transaction import autofill_and_sign, sign, submit
+from xrpl.wallet import Wallet
+
+from validation_waiter import TransactionExpired, waiter_for
+
+TESTNET_URL = "https://s.altnet.rippletest.net:51234"
+DB_ENV = "SOLR_SEQUENCE_DB"
+DEFAULT_DB = "sequences.sqlite"
+RESYNC_SECONDS = 30
+# An allocation that was never signed is considered abandoned after this long.
+LEASE_SECONDS = 300
+FILL_LEDGER_WINDOW = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    account TEXT PRIMARY KEY,
+    next_sequence INTEGER NOT NULL,
+    ledger_sequence INTEGER NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS allocations (
+    account TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    holder TEXT NOT NULL,
+    tx_hash TEXT,
+    last_ledger_sequence INTEGER,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (account, sequence)
+);
+"""
+
+
+class SequenceError(Exception):
+    pass
+
+
+def get_client() -> JsonRpcClient:
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
+
+
+def account_sequence(client: JsonRpcClient, account: str) -> Tuple[int, int]:
+    """(next Sequence in the current ledger, current ledger index) from account_info."""
+    result = client.request(AccountInfo(account=account, ledger_index="current")).result
+    if "account_data" not in result:
+        raise SequenceError(f"account_info {account}: {result.get('error', 'no account_data')}")
+    return int(result["account_data"]["Sequence"]), int(result.get("ledger_current_index") or 0)
+
+
+class SequenceCoordinator:
+    """Outstanding Sequence numbers per account in one SQLite file (WAL; writers serialize on its lock).
+
+    `allocations` holds only numbers that are not yet settled: allocated (possibly signed and in
+    flight), gap (released unused) and filling (a no-op is being submitted for it).  Applied numbers
+    are deleted; `accounts.next_sequence` is the first number never handed out.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.stats = Counter()
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE ... COMMIT: one writer at a time across every process using the file."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    # --- allocation ---
+    def allocate(self, client: JsonRpcClient, account: str, count: int = 1) -> List[int]:
+        """`count` Sequence numbers for `account`: the lowest reclaimable gap, else new consecutive ones."""
+        row = self.conn.execute("SELECT synced_at FROM accounts WHERE account = ?", (account,)).fetchone()
+        if row is None or time.time() - row["synced_at"] > RESYNC_SECONDS:
+            self.sync(client, account)
+        now = time.time()
+        with self._write() as conn:
+            # A block must be consecutive, so only single allocations reclaim gaps; fills cover the rest.
+            gaps = [r["sequence"] for r in conn.execute(
+                "SELECT sequence FROM allocations WHERE account = ? AND status = 'gap' ORDER BY sequence LIMIT 1",
+                (account,))] if count == 1 else []
+            if gaps:
+                conn.executemany("UPDATE allocations SET status = 'allocated', holder = ?, tx_hash = NULL, "
+                                 "last_ledger_sequence = NULL, updated_at = ? WHERE account = ? AND sequence = ?",
+                                 [(self.holder, now, account, s) for s in gaps])
+                self.stats["reclaimed"] += len(gaps)
+                return gaps
+            first = conn.execute("SELECT next_sequence FROM accounts WHERE account = ?",
+                                 (account,)).fetchone()["next_sequence"]
+            numbers = list(range(first, first + count))
+            conn.executemany("INSERT INTO allocations (account, sequence, status, holder, updated_at) "
+                             "VALUES (?, ?, 'allocated', ?, ?)", [(account, s, self.holder, now) for s in numbers])
+            conn.execute("UPDATE accounts SET next_sequence = ? WHERE account = ?", (first + count, account))
+        self.stats["allocated"] += count
+        return numbers
+
+    def signed(self, txs: Iterable[Transaction]) -> None:
+        """Record hash and LastLedgerSequence of signed allocations (lets a resync judge them later)."""
+        rows = [(tx.get_hash(), tx.last_ledger_sequence, time.time(), tx.account, tx.sequence) for tx in txs]
+        with self._write() as conn:
+            conn.executemany("UPDATE allocations SET tx_hash = ?, last_ledger_sequence = ?, updated_at = ? "
+                             "WHERE account = ? AND sequence = ?", rows)
+
+    def release(self, account: str, outcomes: Dict[int, bool]) -> bool:
+        """Settle numbers: applied (True) are forgotten, unused (False) become gaps.
+
+        Returns True if gaps remain below numbers still outstanding, i.e. a fill is needed.
+        """
+        now = time.time()
+        with self._write() as conn:
+            for sequence, applied in outcomes.items():
+                if applied:
+                    conn.execute("DELETE FROM allocations WHERE account = ? AND sequence = ?", (account, sequence))
+                else:
+                    conn.execute("UPDATE allocations SET status = 'gap', updated_at = ? "
+                                 "WHERE account = ? AND sequence = ?", (now, account, sequence))
+            self.stats["released_unused"] += sum(1 for applied in outcomes.values() if not applied)
+            return self._rewind(conn, account)
+
+    def forget(self, account: str, sequence: int) -> None:
+        """The ledger already used `sequence` (tefPAST_SEQ): drop it without making a gap."""
+        with self._write() as conn:
+            conn.execute("DELETE FROM allocations WHERE account = ? AND sequence = ?", (account, sequence))
+
+    def _rewind(self, conn: sqlite3.Connection, account: str) -> bool:
+        """Hand gaps at the top of the range back to next_sequence; True if gaps remain below."""
+        next_sequence = conn.execute("SELECT next_sequence FROM accounts WHERE account = ?",
+                                     (account,)).fetchone()["next_sequence"]
+        while True:
+            top = conn.execute("SELECT status FROM allocations WHERE account = ? AND sequence = ?",
+                               (account, next_sequence - 1)).fetchone()
+            if top is None or top["status"] != "gap":
+                break
+            conn.execute("DELETE FROM allocations WHERE account = ? AND sequence = ?", (account, next_sequence - 1))
+            next_sequence -= 1
+            self.stats["rewound"] += 1
+        conn.execute("UPDATE accounts SET next_sequence = ? WHERE account = ?", (next_sequence, account))
+        return conn.execute("SELECT 1 FROM allocations WHERE account = ? AND status = 'gap' LIMIT 1",
+                            (account,)).fetchone() is not None
+
+    # --- drift ---
+    def sync(self, client: JsonRpcClient, account: str) -> bool:
+        """Reconcile with account_info; returns True if gaps need filling afterwards."""
+        ledger_sequence, current_index = account_sequence(client, account)
+        now = time.time()
+        self.stats["syncs"] += 1
+        with self._write() as conn:
+            row = conn.execute("SELECT next_sequence FROM accounts WHERE account = ?", (account,)).fetchone()
+            # Numbers below the ledger's Sequence were used, by us or by something else.
+            conn.execute("DELETE FROM allocations WHERE account = ? AND sequence < ?", (account, ledger_sequence))
+            # Left behind by a crashed or stuck process: past their window, or never signed within the lease.
+            stale = conn.execute(
+                "UPDATE allocations SET status = 'gap', updated_at = ? WHERE account = ? AND status != 'gap' AND "
+                "((last_ledger_sequence IS NOT NULL AND last_ledger_sequence < ?) OR "
+                "(last_ledger_sequence IS NULL AND updated_at < ?))",
+                (now, account, current_index, now - LEASE_SECONDS)).rowcount
+            self.stats["stale"] += stale
+            outstanding = conn.execute("SELECT MAX(sequence) AS top FROM allocations WHERE account = ?",
+                                       (account,)).fetchone()["top"]
+            next_sequence = ledger_sequence if outstanding is None else max(ledger_sequence, outstanding + 1)
+            if row is not None and row["next_sequence"] != next_sequence:
+                self.stats["drift"] += 1
+            conn.execute("INSERT INTO accounts VALUES (?, ?, ?, ?) ON CONFLICT (account) DO UPDATE SET "
+                         "next_sequence = excluded.next_sequence, ledger_sequence = excluded.ledger_sequence, "
+                         "synced_at = excluded.synced_at", (account, next_sequence, ledger_sequence, now))
+            return self._rewind(conn, account)
+
+    # --- gap fills ---
+    def fill_gaps(self, client: JsonRpcClient, wallet: Wallet) -> int:
+        """Claim the account's gaps and fill each with a no-op AccountSet; returns how many applied."""
+        account = wallet.classic_address
+        now = time.time()
+        with self._write() as conn:
+            gaps = [r["sequence"] for r in conn.execute(
+                "SELECT sequence FROM allocations WHERE account = ? AND status = 'gap' ORDER BY sequence", (account,))]
+            conn.executemany("UPDATE allocations SET status = 'filling', holder = ?, updated_at = ? "
+                             "WHERE account = ? AND sequence = ?", [(self.holder, now, account, s) for s in gaps])
+        if not gaps:
+            return 0
+        fee = get_fee(client)
+        last_ledger = get_latest_validated_ledger_sequence(client) + FILL_LEDGER_WINDOW
+        fills = [sign(AccountSet(account=account, sequence=s, fee=fee, last_ledger_sequence=last_ledger), wallet)
+                 for s in gaps]
+        self.signed(fills)
+        outcomes: Dict[int, bool] = {}
+        waiting = []
+        waiter = waiter_for(client)
+        for tx in fills:
+            submitted = submit(tx, client).result
+            engine_result = submitted.get("engine_result", "")
+            if engine_result == "tefPAST_SEQ":
+                outcomes[tx.sequence] = True  # already used: nothing to fill
+            elif engine_result[:3] in ("tes", "ter", "tec"):
+                waiting.append((tx, waiter.watch(tx.get_hash(), tx.last_ledger_sequence,
+                                                 submitted.get("validated_ledger_index"))))
+            else:
+                outcomes[tx.sequence] = False
+        filled = 0
+        for tx, future in waiting:
+            try:
+                future.result()
+            except TransactionExpired:
+                outcomes[tx.sequence] = False
+            else:
+                outcomes[tx.sequence] = True
+                filled += 1
+        self.stats["filled"] += filled
+        self.release(account, outcomes)
+        return filled
+
+    def accounts(self) -> List[dict]:
+        out = []
+        for row in self.conn.execute("SELECT * FROM accounts ORDER BY account"):
+            entry = dict(row)
+            entry["outstanding"] = dict(Counter(r["status"] for r in self.conn.execute(
+                "SELECT status FROM allocations WHERE account = ?", (row["account"],))))
+            out.append(entry)
+        return out
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+_coordinators: Dict[str, SequenceCoordinator] = {}
+_coordinators_lock = threading.Lock()
+
+
+def coordinator() -> Optional[SequenceCoordinator]:
+    """The process-wide coordinator for SOLR_SEQUENCE_DB, or None when coordination is off."""
+    path = os.getenv(DB_ENV)
+    if not path:
+        return None
+    with _coordinators_lock:
+        found = _coordinators.get(path)
+        if found is None:
+            found = _coordinators[path] = SequenceCoordinator(path)
+        return found
+
+
+def _coordinated(tx: Transaction) -> Optional[SequenceCoordinator]:
+    if tx.ticket_sequence is not None or not tx.sequence:
+        return None
+    return coordinator()
+
+
+def allocate_and_sign(transaction: Transaction, client: JsonRpcClient, wallet: Wallet,
+                      check_fee: bool = True) -> Transaction:
+    """xrpl autofill_and_sign, with the Sequence taken from the coordinator when one is configured."""
+    found = coordinator()
+    if found is None or transaction.sequence is not None or transaction.ticket_sequence is not None:
+        return autofill_and_sign(transaction, client, wallet, check_fee=check_fee)
+    sequence = found.allocate(client, transaction.account)[0]
+    try:
+        signed = autofill_and_sign(dataclasses.replace(transaction, sequence=sequence), client, wallet,
+                                   check_fee=check_fee)
+    except Exception:
+        found.release(transaction.account, {sequence: False})
+        raise
+    found.signed([signed])
+    return signed
+
+
+def allocate_block(client: JsonRpcClient, account: str, count: int) -> Optional[List[int]]:
+    """`count` consecutive numbers from the coordinator, or None when coordination is off."""
+    found = coordinator()
+    return found.allocate(client, account, count) if found is not None else None
+
+
+def release_sequences(client: JsonRpcClient, signed: Iterable[Tuple[Transaction, bool]],
+                      wallet: Optional[Wallet] = None) -> None:
+    """Settle (transaction, applied) pairs; with `wallet`, fill any gaps left below live allocations."""
+    found = coordinator()
+    if found is None:
+        return
+    by_account: Dict[str, Dict[int, bool]] = {}
+    for tx, applied in signed:
+        if _coordinated(tx) is not None:
+            by_account.setdefault(tx.account, {})[tx.sequence] = applied
+    for account, outcomes in by_account.items():
+        if found.release(account, outcomes) and wallet is not None and wallet.classic_address == account:
+            found.fill_gaps(client, wallet)
+
+
+def resync_after_past_seq(client: JsonRpcClient, signed: Transaction) -> bool:
+    """tefPAST_SEQ on a coordinated number: drop it and resync the account. False if not coordinated."""
+    found = _coordinated(signed)
+    if found is None:
+        return False
+    found.forget(signed.account, signed.sequence)
+    found.sync(client, signed.account)
+    return True
+
+
+# --- concurrency check against the simulator ---
+def worker(seed: str, destination: str, txs: int, fail_every: int, tag: int) -> dict:
+    """Send `txs` payments through telemetry.submit_and_wait; every `fail_every`-th one is built to be
+    rejected without using its Sequence (LastLedgerSequence already past: tefMAX_LEDGER)."""
+    from xrpl.models.transactions import Payment
+    from xrpl.transaction import XRPLReliableSubmissionException
+    from telemetry import submit_and_wait
+
+    client = get_client()
+    wallet = Wallet.from_seed(seed)
+    report = {"worker": tag, "ok": 0, "expected_failures": 0, "errors": Counter()}
+    for n in range(txs):
+        doomed = fail_every and (n + 1) % fail_every == 0
+        tx = Payment(account=wallet.classic_address, destination=destination, amount=str(1000 + tag),
+                     last_ledger_sequence=1 if doomed else None)
+        try:
+            submit_and_wait(tx, client, wallet)
+        except XRPLReliableSubmissionException as e:
+            if doomed:
+                report["expected_failures"] += 1
+            else:
+                message = str(e)
+                report["errors"][message.rsplit("Prelim result: ", 1)[-1] if "Prelim result" in message
+                                 else message[:60]] += 1
+        else:
+            report["ok"] += 1
+    import sequence_coordinator  # the module telemetry allocates through (this file may be __main__)
+
+    found = sequence_coordinator.coordinator()
+    report["coordinator"] = dict(found.stats) if found is not None else {}
+    return report
+
+
+def stress(procs: int, txs: int, fail_every: int, close_interval: float) -> dict:
+    """`procs` worker processes paying from one account at once, without and with the coordinator."""
+    import tempfile
+    from bench_flows import simulator
+
+    report = {"procs": procs, "txs_per_proc": txs, "fail_every": fail_every, "close_interval_s": close_interval,
+              "modes": {}}
+    for mode in ("uncoordinated", "coordinated"):
+        with simulator(f"sequences:{mode}", close_interval) as (ledger, client, wallets), \
+                tempfile.TemporaryDirectory(prefix="solr-seq-") as tmp:
+            sender, destination = wallets["hot"], wallets["owner"].classic_address
+            env = {k: v for k, v in os.environ.items() if k != DB_ENV}
+            env["XRPL_RPC_URL"] = client.url
+            if mode == "coordinated":
+                env[DB_ENV] = str(Path(tmp) / DEFAULT_DB)
+            start = time.perf_counter()
+            running = [subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "worker", "--seed",
+                                         sender.seed, "--destination", destination, "--txs", str(txs),
+                                         "--fail-every", str(fail_every), "--tag", str(i)],
+                                        env=env, stdout=subprocess.PIPE, text=True) for i in range(procs)]
+            workers = [json.loads(p.communicate()[0] or "{}") for p in running]
+            elapsed = time.perf_counter() - start
+            applied = Counter(entry["tx_json"]["TransactionType"] for entry in list(ledger.txs.values())
+                              if entry["validated"] and entry["tx_json"]["Account"] == sender.classic_address
+                              and entry["meta"]["TransactionResult"] == "tesSUCCESS")
+            ok = sum(w.get("ok", 0) for w in workers)
+            errors = sum((Counter(w.get("errors", {})) for w in workers), Counter())
+            expected_ok = procs * (txs - (txs // fail_every if fail_every else 0))
+            report["modes"][mode] = {
+                "seconds": round(elapsed, 3),
+                "ok": ok,
+                "expected_ok": expected_ok,
+                "expected_failures": sum(w.get("expected_failures", 0) for w in workers),
+                "errors": dict(errors),
+                "applied": dict(applied),
+                "engine": {k: v for k, v in ledger.stats.items() if k.startswith("engine:")},
+                "coordinator": dict(sum((Counter(w.get("coordinator", {})) for w in workers), Counter())),
+                "passed": ok == expected_ok == applied.get("Payment", 0) and not errors,
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-process Sequence coordinator")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("show", help="Accounts and outstanding allocations")
+    p.add_argument("--db", default=os.getenv(DB_ENV, DEFAULT_DB))
+    p = sub.add_parser("sync", help="Resync an account from account_info and fill its gaps")
+    p.add_argument("--db", default=os.getenv(DB_ENV, DEFAULT_DB))
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--role", default="hot", help="Key role of the account (key_provider)")
+    p = sub.add_parser("stress", help="Parallel workers from one account against the simulator")
+    p.add_argument("--procs", type=int, default=4)
+    p.add_argument("--txs", type=int, default=25, help="Payments per worker")
+    p.add_argument("--fail-every", type=int, default=7, help="Every Nth payment is rejected unused (0: none)")
+    p.add_argument("--close-interval", type=float, default=0.25)
+    p.add_argument("--output", default="-")
+    p = sub.add_parser("worker", help=argparse.SUPPRESS)
+    p.add_argument("--seed", required=True)
+    p.add_argument("--destination", required=True)
+    p.add_argument("--txs", type=int, required=True)
+    p.add_argument("--fail-every", type=int, default=0)
+    p.add_argument("--tag", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.cmd == "worker":
+        print(json.dumps(worker(args.seed, args.destination, args.txs, args.fail_every, args.tag)))
+        return
+    if args.cmd == "stress":
+        text = json.dumps(stress(args.procs, args.txs, args.fail_every, args.close_interval), indent=2)
+        if args.output == "-":
+            print(text)
+        else:
+            Path(args.output).write_text(text + "\n", encoding="utf-8")
+        return
+    if args.cmd == "show":
+        if not Path(args.db).exists():
+            sys.exit(f"Error: {args.db} not found.")
+        print(json.dumps(SequenceCoordinator(args.db).accounts(), indent=2))
+        return
+
+    from key_provider import keys_or_exit
+    from solr_config import config_or_exit
+
+    wallet = keys_or_exit(config_or_exit(args.config), args.role).wallet(args.role)
+    found = SequenceCoordinator(args.db)
+    client = get_client()
+    found.sync(client, wallet.classic_address)
+    filled = found.fill_gaps(client, wallet)
+    print(json.dumps({"account": wallet.classic_address, "filled": filled,
+                      "accounts": found.accounts()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
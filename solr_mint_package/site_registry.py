@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+site_registry.py
+================
+
+Registry of the fleet: owners, sites (facilities), meters and vintages.
+
+config.yaml describes one facility with one system owner, so a fleet used
+to mean one config file and one process per site.  The registry keeps the
+whole fleet in a small SQLite file and, once opened, in memory: lookups by
+owner address, facility name, meter hash or site id are dict hits, and
+`groups()` hands the flows their work already grouped by jurisdiction and
+owner so each owner's transactions can be pipelined together
+(fleet_flow.py).
+
+Tables: owners(id, address, name), sites(id, owner_id, facility fields,
+jurisdiction, program, ...), meters(meter_hash, site_id, oracle_reference)
+and vintages(site_id, vintage, start, end).  Writes go to SQLite in one
+transaction and then update the in-memory indexes.
+
+Owner keys are not stored here: an owner with id `acme` signs as role
+`owner:acme` through key_provider (config `owners:` section, SOLR_OWNER_ACME_SEED,
+keystore or key command).
+
+Usage:
+    python site_registry.py import --config config.yaml        # owners:/sites: sections, or the single site
+    python site_registry.py generate --sites 1000 --owners 50 --out fleet.yaml
+    python site_registry.py stats
+    python site_registry.py lookup (--address r... | --facility NAME | --meter HASH | --site ID)
+    python site_registry.py groups
+
+Dependencies:
+    pip install PyYAML
+"""
+import argparse
+import dataclasses
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from solr_config import Config, config_or_exit
+
+DEFAULT_REGISTRY = "site_registry.sqlite"
+DEFAULT_SITE = "default"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS owners (
+    id TEXT PRIMARY KEY,
+    address TEXT UNIQUE,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS sites (
+    id TEXT PRIMARY KEY,
+    owner_id TEXT REFERENCES owners(id),
+    facility_name TEXT UNIQUE,
+    facility_location TEXT,
+    jurisdiction TEXT,
+    program TEXT,
+    grid_region TEXT,
+    technology TEXT,
+    image_path TEXT,
+    rec_serial_prefix TEXT
+);
+CREATE TABLE IF NOT EXISTS meters (
+    meter_hash TEXT PRIMARY KEY,
+    site_id TEXT NOT NULL REFERENCES sites(id),
+    oracle_reference TEXT
+);
+CREATE TABLE IF NOT EXISTS vintages (
+    site_id TEXT NOT NULL REFERENCES sites(id),
+    vintage TEXT NOT NULL,
+    start TEXT,
+    end TEXT,
+    PRIMARY KEY (site_id, vintage)
+);
+"""
+
+
+class RegistryError(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Owner:
+    id: str
+    address: Optional[str] = None
+    name: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class Site:
+    id: str
+    owner_id: Optional[str] = None
+    facility_name: Optional[str] = None
+    facility_location: Optional[str] = None
+    jurisdiction: Optional[str] = None
+    program: Optional[str] = None
+    grid_region: Optional[str] = None
+    technology: Optional[str] = None
+    image_path: Optional[str] = None
+    rec_serial_prefix: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class Meter:
+    meter_hash: str
+    site_id: str
+    oracle_reference: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class Vintage:
+    site_id: str
+    vintage: str
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+
+def _columns(cls) -> Tuple[str, ...]:
+    return tuple(f.name for f in dataclasses.fields(cls))
+
+
+TABLES = {Owner: "owners", Site: "sites", Meter: "meters", Vintage: "vintages"}
+
+
+class Registry:
+    """SQLite-backed fleet registry with in-memory indexes for O(1) lookups."""
+
+    def __init__(self, path: str = DEFAULT_REGISTRY):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.owners: Dict[str, Owner] = {}
+        self.sites: Dict[str, Site] = {}
+        self.meters: Dict[str, Meter] = {}
+        self._owner_by_address: Dict[str, Owner] = {}
+        self._site_by_facility: Dict[str, Site] = {}
+        self._sites_by_owner: Dict[Optional[str], List[Site]] = {}
+        self._sites_by_jurisdiction: Dict[Optional[str], List[Site]] = {}
+        self._meters_by_site: Dict[str, List[Meter]] = {}
+        self._vintages: Dict[str, Dict[str, Vintage]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        for cls in TABLES:
+            rows = self.conn.execute(f"SELECT {', '.join(_columns(cls))} FROM {TABLES[cls]} ORDER BY rowid")
+            self._index([cls(*row) for row in rows])
+
+    def _index(self, records: Iterable) -> None:
+        for record in records:
+            if isinstance(record, Owner):
+                self.owners[record.id] = record
+                if record.address:
+                    self._owner_by_address[record.address] = record
+            elif isinstance(record, Site):
+                self.sites[record.id] = record
+                if record.facility_name:
+                    self._site_by_facility[record.facility_name] = record
+                self._sites_by_owner.setdefault(record.owner_id, []).append(record)
+                self._sites_by_jurisdiction.setdefault(record.jurisdiction, []).append(record)
+            elif isinstance(record, Meter):
+                self.meters[record.meter_hash] = record
+                self._meters_by_site.setdefault(record.site_id, []).append(record)
+            else:
+                self._vintages.setdefault(record.site_id, {})[record.vintage] = record
+
+    def add(self, *records) -> None:
+        """Insert owners, sites, meters and vintages in one transaction, then index them.
+
+        Records are written owners first so foreign keys resolve within one call.
+        """
+        order = {Owner: 0, Site: 1, Meter: 2, Vintage: 3}
+        records = sorted(records, key=lambda r: order[type(r)])
+        try:
+            with self.conn:
+                for record in records:
+                    cls = type(record)
+                    cols = _columns(cls)
+                    self.conn.execute(f"INSERT INTO {TABLES[cls]} ({', '.join(cols)}) VALUES "
+                                      f"({', '.join('?' * len(cols))})", dataclasses.astuple(record))
+        except sqlite3.IntegrityError as e:
+            raise RegistryError(f"{self.path}: {e}") from None
+        self._index(records)
+
+    # --- O(1) lookups ---
+    def owner(self, owner_id: str) -> Owner:
+        try:
+            return self.owners[owner_id]
+        except KeyError:
+            raise RegistryError(f"unknown owner '{owner_id}'") from None
+
+    def site(self, site_id: str) -> Site:
+        try:
+            return self.sites[site_id]
+        except KeyError:
+            raise RegistryError(f"unknown site '{site_id}'") from None
+
+    def by_address(self, address: str) -> Optional[Owner]:
+        return self._owner_by_address.get(address)
+
+    def by_facility(self, facility_name: str) -> Optional[Site]:
+        return self._site_by_facility.get(facility_name)
+
+    def by_meter(self, meter_hash: str) -> Optional[Site]:
+        meter = self.meters.get(meter_hash)
+        return self.sites.get(meter.site_id) if meter else None
+
+    def meters_of(self, site_id: str) -> List[Meter]:
+        return self._meters_by_site.get(site_id, [])
+
+    def vintage(self, site_id: str, vintage: Optional[str] = None) -> Optional[Vintage]:
+        """The named vintage for a site, or its latest."""
+        vintages = self._vintages.get(site_id, {})
+        if vintage is not None:
+            return vintages.get(vintage)
+        return vintages[max(vintages)] if vintages else None
+
+    def sites_of(self, owner_id: str) -> List[Site]:
+        return self._sites_by_owner.get(owner_id, [])
+
+    def sites_in(self, jurisdiction: str) -> List[Site]:
+        return self._sites_by_jurisdiction.get(jurisdiction, [])
+
+    def groups(self, site_ids: Optional[Iterable[str]] = None) -> Dict[Tuple[Optional[str], Optional[str]], List[Site]]:
+        """Sites grouped by (jurisdiction, owner_id), in registry order within each group."""
+        sites = self.sites.values() if site_ids is None else [self.site(s) for s in site_ids]
+        grouped: Dict[Tuple[Optional[str], Optional[str]], List[Site]] = {}
+        for site in sites:
+            grouped.setdefault((site.jurisdiction, site.owner_id), []).append(site)
+        return dict(sorted(grouped.items(), key=lambda kv: (kv[0][0] or "", kv[0][1] or "")))
+
+    def site_config(self, base: Config, site_id: str, vintage: Optional[str] = None) -> Config:
+        """`base` with this site's facility, owner address, meter and vintage fields.
+
+        The result drops straight into create_metadata / build_metadata /
+        generate_rec like a single-site config.
+        """
+        site = self.site(site_id)
+        changes = {k: getattr(site, k) for k in ("facility_name", "facility_location", "jurisdiction", "program",
+                                                   "grid_region", "technology", "image_path", "rec_serial_prefix")
+                   if getattr(site, k) is not None}
+        if site.owner_id and self.owner(site.owner_id).address:
+            changes["system_owner_address"] = self.owner(site.owner_id).address
+        meters = self.meters_of(site_id)
+        if meters:
+            changes["meter_hash"] = meters[0].meter_hash
+            if meters[0].oracle_reference:
+                changes["oracle_reference"] = meters[0].oracle_reference
+        chosen = self.vintage(site_id, vintage)
+        if chosen is not None:
+            changes.update(vintage=chosen.vintage, vintage_start=chosen.start or base.vintage_start,
+                           vintage_end=chosen.end or base.vintage_end)
+        return dataclasses.replace(base, site_id=site_id, **changes)
+
+    def stats(self) -> dict:
+        return {"owners": len(self.owners), "sites": len(self.sites), "meters": len(self.meters),
+                "vintages": sum(len(v) for v in self._vintages.values()),
+                "jurisdictions": len(self._sites_by_jurisdiction)}
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def records_from_config(config: Config) -> List:
+    """Registry records for the config's owners:/sites: sections, or its single site."""
+    records: List = [Owner(o.id, o.address, o.name) for o in config.owners]
+    sites = config.sites
+    if not sites:
+        records.append(Owner(DEFAULT_SITE, config.system_owner_address))
+        records.append(Site(DEFAULT_SITE, DEFAULT_SITE, config.facility_name, config.facility_location,
+                            config.jurisdiction, config.program, config.grid_region, config.technology,
+                            config.image_path, config.rec_serial_prefix))
+        site_ids = [DEFAULT_SITE]
+    else:
+        for s in sites:
+            records.append(Site(s.id, s.owner, s.facility_name, s.facility_location, s.jurisdiction or config.jurisdiction,
+                                s.program or config.program, s.grid_region or config.grid_region,
+                                s.technology or config.technology, s.image_path, s.rec_serial_prefix))
+        site_ids = [s.id for s in sites]
+    by_id = {s.id: s for s in sites}
+    for site_id in site_ids:
+        s = by_id.get(site_id)
+        meter_hash = (s.meter_hash if s else None) or (None if sites else config.meter_hash)
+        if meter_hash:
+            records.append(Meter(meter_hash, site_id, (s.oracle_reference if s else None) or config.oracle_reference))
+        vintage = (s.vintage if s else None) or config.vintage
+        if vintage:
+            records.append(Vintage(site_id, vintage, (s.vintage_start if s else None) or config.vintage_start,
+                                   (s.vintage_end if s else None) or config.vintage_end))
+    return records
+
+
+def generate_fleet(sites: int, owners: int, jurisdictions: Iterable[str] = ("US-NJ", "US-CA", "US-TX", "US-MA")) -> dict:
+    """A synthetic owners:/sites: config section with fresh testnet seeds (for simulator runs)."""
+    from xrpl.core.keypairs import generate_seed
+    from key_provider import derive
+
+    jurisdictions = list(jurisdictions)
+    fleet = {"owners": [], "sites": []}
+    for i in range(owners):
+        seed = generate_seed()
+        fleet["owners"].append({"id": f"owner-{i:04d}", "address": derive(seed).classic_address, "seed": seed})
+    for i in range(sites):
+        jurisdiction = jurisdictions[i % len(jurisdictions)]
+        fleet["sites"].append({
+            "id": f"site-{i:05d}",
+            "owner": f"owner-{i % owners:04d}",
+            "facility_name": f"Solar Site #{i:05d}",
+            "jurisdiction": jurisdiction,
+            "meter_hash": hashlib.sha256(f"meter-{i}".encode()).hexdigest(),
+        })
+    return fleet
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet registry of owners, sites, meters and vintages")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY, help="SQLite registry path")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_import = sub.add_parser("import", help="Register the owners/sites of a config file")
+    p_import.add_argument("--config", default="config.yaml")
+
+    p_gen = sub.add_parser("generate", help="Write a synthetic fleet config (owners with fresh seeds)")
+    p_gen.add_argument("--sites", type=int, default=1000)
+    p_gen.add_argument("--owners", type=int, default=50)
+    p_gen.add_argument("--base", default="config.yaml", help="Config whose top-level fields the fleet inherits")
+    p_gen.add_argument("--out", required=True)
+
+    sub.add_parser("stats")
+    p_lookup = sub.add_parser("lookup")
+    group = p_lookup.add_mutually_exclusive_group(required=True)
+    group.add_argument("--address")
+    group.add_argument("--facility")
+    group.add_argument("--meter")
+    group.add_argument("--site")
+    sub.add_parser("groups", help="Sites per (jurisdiction, owner)")
+
+    args = parser.parse_args()
+    if args.cmd == "generate":
+        import yaml
+
+        config = config_or_exit(args.base)
+        base = dict(config.items())
+        if config.hot_wallets:
+            base["hot_wallets"] = [{k: v for k, v in dataclasses.asdict(w).items() if v is not None}
+                                   for w in config.hot_wallets]
+        base.update(generate_fleet(args.sites, args.owners))
+        with open(args.out, "w", encoding="utf-8") as f:
+            yaml.safe_dump(base, f, sort_keys=False)
+        print(f"Wrote {args.out} ({args.sites} sites, {args.owners} owners)")
+        return
+
+    start = time.perf_counter()
+    registry = Registry(args.registry)
+    load_s = time.perf_counter() - start
+    try:
+        if args.cmd == "import":
+            records = records_from_config(config_or_exit(args.config))
+            try:
+                registry.add(*records)
+            except RegistryError as e:
+                sys.exit(f"Error: {e}")
+            print(json.dumps(registry.stats()))
+        elif args.cmd == "stats":
+            print(json.dumps(dict(registry.stats(), load_ms=round(1000 * load_s, 2))))
+        elif args.cmd == "lookup":
+            if args.address:
+                found = registry.by_address(args.address)
+                found = {"owner": found, "sites": registry.sites_of(found.id)} if found else None
+            elif args.facility:
+                found = registry.by_facility(args.facility)
+            elif args.meter:
+                found = registry.by_meter(args.meter)
+            else:
+                found = registry.sites.get(args.site)
+            if found is None:
+                sys.exit("Error: not found.")
+            print(json.dumps(found, default=dataclasses.asdict, indent=2))
+        else:
+            for (jurisdiction, owner_id), sites in registry.groups().items():
+                print(f"{jurisdiction or '-':<8} {owner_id or '-':<16} {len(sites)} sites")
+    finally:
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()
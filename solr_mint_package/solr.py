@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+solr.py
+=======
+
+Single entry point for the package scripts.  Only the chosen subcommand's
+module is imported, so `solr xumm ...` never loads xrpl-py and `solr pay ...`
+never loads PIL:
+
+    python solr.py <command> [args...]        # same args as the script itself
+    python solr.py --help                     # list commands (imports nothing)
+
+Commands map to the existing scripts (mint -> mint_solr_token.py, burn-mint
+-> burn_and_mint_solrai_nft.py, flow, market, pay, render, xumm, ...).
+
+Daemon mode keeps the interpreter warm for cron-driven runs: modules stay
+imported and derived wallets stay cached (key_provider keeps seed -> Wallet
+for the process lifetime), and commands are sent over a local Unix socket.  The client falls back to running locally
+when no daemon is listening.
+
+    python solr.py daemon --socket /tmp/solr.sock &
+    SOLR_SOCKET=/tmp/solr.sock python solr.py pay --to r... --drops 1000000
+    python solr.py daemon --socket /tmp/solr.sock --stop
+
+The daemon runs one command at a time in its own working directory and
+environment, with the caller's cwd and XRPL_/SOLR_/XUMM_ variables applied
+for the duration of the command (the daemon's own variables with those
+prefixes are hidden, and telemetry re-reads SOLR_TX_LOG per command).  The
+socket is created mode 0600.
+
+    python solr.py timings                    # cold start vs daemon latency
+
+Dependencies:
+    per subcommand (see each script)
+"""
+import importlib
+import io
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import List, Optional
+
+HERE = Path(__file__).resolve().parent
+COMMANDS = {
+    "mint": ("mint_solr_token", "Configure accounts, authorize trust lines, issue STN"),
+    "burn-mint": ("burn_and_mint_solrai_nft", "Burn 1,000 STN and mint a SOLRAI NFT"),
+    "flow": ("solrai_nft_flow", "End-to-end issue/burn/mint/transfer flow"),
+    "fleet": ("fleet_flow", "The same flow for every site in the registry, batched"),
+    "jobs": ("job_journal", "Inspect the flow job journal, run crash/resume fault injection"),
+    "sequences": ("sequence_coordinator", "Cross-process Sequence allocation: show, sync, stress"),
+    "pool": ("hot_pool", "Sharded hot-wallet pool: status, setup, top-up, shard, bench"),
+    "onboard": ("onboarding", "Authorize approved owners' trust lines in bulk (KYC)"),
+    "sites": ("site_registry", "Fleet registry of owners, sites, meters, vintages"),
+    "market": ("nft_market", "Create/accept NFT sell offers (single or batch)"),
+    "retire": ("retirement", "Retire (burn) SOLRAI NFTs in batches, receipts and statements"),
+    "pay": ("send_payment", "Send an XRP payment"),
+    "render": ("generate_rec_image", "Render a REC certificate image"),
+    "certs": ("cert_server", "Serve certificate images rendered on demand (cached, ETag/Range)"),
+    "vintage-render": ("vintage_render", "Re-render only the stale certificate images of a vintage"),
+    "proof-index": ("proof_index", "Detect duplicate and near-duplicate proof images, stored proof blobs"),
+    "reconcile": ("reconcile", "Reconcile metered kWh, STN issued/burned and SOLRAI minted"),
+    "history": ("history_export", "Export ledger history to Parquet and report on it"),
+    "nfts": ("nft_metadata", "List SOLRAI NFTs and decode their metadata (lazy, cached)"),
+    "xumm": ("xaman_payloads", "Xaman/Xumm payment deep link"),
+    "xumm-offer": ("xumm_offer_helper", "Xaman/Xumm offer payloads"),
+    "offers": ("offer_book", "SOLRAI offer book (load/follow/query)"),
+    "burns": ("burn_verifier", "Verify burn proofs and record consumed burns"),
+    "metadata": ("metadata_codec", "Compact signed metadata"),
+    "proofs": ("meter_proofs", "Merkle-batched meter proofs"),
+    "metrics": ("telemetry", "Aggregate transaction span logs"),
+    "config": ("solr_config", "Validate or show config.yaml"),
+    "keys": ("key_provider", "Check key roles, manage the keystore, time derivation"),
+    "bench": ("bench", "Hot-path micro-benchmarks"),
+    "bench-flows": ("bench_flows", "Flow benchmarks against the simulator"),
+    "mock": ("mock_rippled", "Local XRPL simulator"),
+}
+DEFAULT_SOCKET = os.getenv("SOLR_SOCKET")
+FORWARDED_ENV = ("XRPL_", "SOLR_", "XUMM_")
+
+
+def usage() -> str:
+    lines = ["usage: solr [--socket PATH] <command> [args...]", "", "commands:"]
+    lines += [f"  {name:<12} {help_text}" for name, (_module, help_text) in COMMANDS.items()]
+    lines += ["  daemon       Serve commands over a Unix socket (--socket PATH, --stop)",
+              "  timings      Measure cold start and daemon per-command latency"]
+    return "\n".join(lines)
+
+
+def run_local(command: str, args: List[str]) -> int:
+    """Import the command's module and run its main() with `args`; return the exit code."""
+    module = importlib.import_module(COMMANDS[command][0])
+    saved = sys.argv
+    sys.argv = [f"solr {command}"] + list(args)
+    try:
+        module.main()
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    finally:
+        sys.argv = saved
+
+
+# --- daemon ---
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        if request.get("stop"):
+            self.wfile.write(b'{"code": 0, "stdout": "", "stderr": "daemon stopping\\n"}\n')
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        command, args = request["argv"][0], request["argv"][1:]
+        out, err = io.StringIO(), io.StringIO()
+        start = time.perf_counter()
+        # Imported here: clients never need telemetry, only the daemon does
+        from telemetry import reset_from_env
+
+        with self.server.lock:
+            saved_cwd, saved_env = os.getcwd(), dict(os.environ)
+            try:
+                os.chdir(request.get("cwd") or saved_cwd)
+                # Only the caller's forwarded variables apply, not the daemon's own
+                for key in [k for k in os.environ if k.startswith(FORWARDED_ENV)]:
+                    del os.environ[key]
+                os.environ.update(request.get("env") or {})
+                reset_from_env()
+                with redirect_stdout(out), redirect_stderr(err):
+                    try:
+                        code = run_local(command, args)
+                    except Exception as e:  # report, keep serving
+                        print(f"{type(e).__name__}: {e}", file=sys.stderr)
+                        code = 1
+            finally:
+                os.chdir(saved_cwd)
+                os.environ.clear()
+                os.environ.update(saved_env)
+                reset_from_env()
+        reply = {"code": code, "stdout": out.getvalue(), "stderr": err.getvalue(),
+                 "elapsed_s": round(time.perf_counter() - start, 6)}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path: str, preload: bool = True) -> None:
+    if os.path.exists(path):
+        os.unlink(path)
+    if preload:
+        for module, _help in COMMANDS.values():
+            try:
+                importlib.import_module(module)
+            except ImportError as e:  # optional dependency missing: load on demand instead
+                print(f"solr daemon: not preloading {module}: {e}", file=sys.stderr)
+    umask = os.umask(0o177)  # the socket is created owner-only, with no window before a chmod
+    try:
+        server = _Server(path, _Handler)
+    finally:
+        os.umask(umask)
+    server.lock = threading.Lock()
+    print(f"solr daemon listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def send(path: str, request: dict) -> Optional[dict]:
+    """Send one request to the daemon; None if nothing is listening."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    return json.loads(line) if line else None
+
+
+def run_remote(path: str, argv: List[str]) -> Optional[int]:
+    env = {k: v for k, v in os.environ.items() if k.startswith(FORWARDED_ENV)}
+    reply = send(path, {"argv": argv, "cwd": os.getcwd(), "env": env})
+    if reply is None:
+        return None
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    return reply["code"]
+
+
+# --- measurements ---
+def timings(socket_path: str, runs: int = 5) -> dict:
+    """Cold start of the old per-script entry points vs the lazy CLI vs the daemon."""
+    python = sys.executable
+    cases = [
+        ("help", ["--help"]),
+        ("xumm", ["xumm", "--destination", "rrrrrrrrrrrrrrrrrrrrBZbvji", "--drops", "1000"]),
+        ("pay --help", ["pay", "--help"]),
+        ("render --help", ["render", "--help"]),
+        ("flow --help", ["flow", "--help"]),
+    ]
+
+    def median_wall(cmd: List[str], env=None) -> float:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(cmd, cwd=HERE, capture_output=True, env=env)
+            samples.append(time.perf_counter() - start)
+        return round(1000 * sorted(samples)[len(samples) // 2], 2)
+
+    local_env = {k: v for k, v in os.environ.items() if k != "SOLR_SOCKET"}
+    report = {"runs": runs, "bare_python_ms": median_wall([python, "-c", "pass"]), "cases": {}}
+    daemon = subprocess.Popen([python, str(HERE / "solr.py"), "daemon", "--socket", socket_path],
+                              cwd=HERE, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(200):
+            if os.path.exists(socket_path) and send(socket_path, {"argv": ["xumm", "--help"]}) is not None:
+                break
+            time.sleep(0.05)
+        for name, argv in cases:
+            row = {"cli_cold_ms": median_wall([python, str(HERE / "solr.py")] + argv, env=local_env)}
+            if argv[0] in COMMANDS:
+                script = HERE / (COMMANDS[argv[0]][0] + ".py")
+                row["script_cold_ms"] = median_wall([python, str(script)] + argv[1:])
+            if argv[0] != "--help":
+                samples = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    send(socket_path, {"argv": argv, "cwd": str(HERE)})
+                    samples.append(time.perf_counter() - start)
+                row["daemon_ms"] = round(1000 * sorted(samples)[len(samples) // 2], 3)
+            report["cases"][name] = row
+    finally:
+        send(socket_path, {"stop": True})
+        daemon.wait(timeout=10)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    socket_path = DEFAULT_SOCKET
+    if argv[:1] == ["--socket"] and len(argv) > 1:
+        socket_path, argv = argv[1], argv[2:]
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+
+    command, args = argv[0], argv[1:]
+    if command == "daemon":
+        path = args[args.index("--socket") + 1] if "--socket" in args else socket_path
+        if not path:
+            print("solr daemon: --socket PATH (or SOLR_SOCKET) is required", file=sys.stderr)
+            return 2
+        if "--stop" in args:
+            return 0 if send(path, {"stop": True}) is not None else 1
+        serve(path, preload="--no-preload" not in args)
+        return 0
+    if command == "timings":
+        path = args[args.index("--socket") + 1] if "--socket" in args else f"/tmp/solr-timings-{os.getpid()}.sock"
+        print(json.dumps(timings(path), indent=2))
+        return 0
+    if command not in COMMANDS:
+        print(f"solr: unknown command '{command}'\n\n{usage()}", file=sys.stderr)
+        return 2
+    if socket_path:
+        code = run_remote(socket_path, argv)
+        if code is not None:
+            return code
+    return run_local(command, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+solr_config.py
+==============
+
+One loader for `config.yaml`, shared by every script.
+
+The YAML is parsed and validated once into a frozen `Config` (slots
+dataclass), with `SOLR_<KEY>` environment variables layered on top
+(`SOLR_ISSUER_SEED`, `SOLR_PRICE_XRP_DROPS`, ...), and cached by file mtime,
+size and the override values, so repeated `load_config()` calls in one
+process (daemon mode, render loops) cost a stat().
+
+Validation runs at load time, before any script builds a client:
+
+  - *_address values must be classic addresses and *_seed values must be
+    decodable family seeds (checked locally, without importing xrpl-py)
+  - currency_code is a 3-letter code other than XRP or 40 hex characters
+  - price_xrp_drops is a positive integer, price_usd a number
+  - vintage_start / vintage_end are ISO dates in order
+  - `owners` / `sites` ids are unique and every site's owner exists
+
+Template values ("<YOUR_...>", "YOUR_ISSUER_SEED", "<XRP_drops_...>") in
+seed, address, currency and price fields count as unset rather than invalid;
+`Config.require()` reports them by name.  Scripts call
+`config_or_exit(path, *required)` so every problem is printed at once.
+
+Several sites and owners can share one file; top-level fields are the
+defaults each site inherits:
+
+    owners:
+      - id: acme
+        address: r...
+        seed: s...
+    sites:
+      - id: nj-trenton-01
+        owner: acme
+        facility_name: Mock Solar Plant #1
+        jurisdiction: US-NJ
+
+A pool of hot (distribution) wallets can replace the single hot_seed;
+owners are spread over them by consistent hashing (hot_pool.py), and
+hot_float is the STN balance each one is topped up to:
+
+    hot_wallets:
+      - id: h0
+        address: r...
+        seed: s...
+    hot_float: 50000
+
+`config.for_site(site_id)` returns a Config with that site's fields (and its
+owner's address/seed as system_owner_*) in place of the top-level ones, so
+existing functions that take a config work per site unchanged.
+
+Usage:
+    python solr_config.py check [--config config.yaml] [--require issuer_seed ...]
+    python solr_config.py show [--config config.yaml] [--site ID]
+
+Dependencies:
+    pip install PyYAML
+"""
+import argparse
+import dataclasses
+import datetime
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import yaml
+
+ENV_PREFIX = "SOLR_"
+PLACEHOLDER = re.compile(r"^<.*>$|YOUR_")
+XRPL_ALPHABET = b"rpshnaf39wBUDNEGHJKLM4PQRST7VWXYZ2bcdeCg65jkm8oFqi1tuvAxyz"
+SEED_PREFIXES = (b"\x21", b"\x01\xe1\x4b")  # secp256k1, ed25519
+SITE_FIELDS = (
+    "jurisdiction", "program", "vintage", "vintage_start", "vintage_end", "meter_hash", "oracle_reference",
+    "image_path", "facility_name", "facility_location", "grid_region", "technology", "rec_serial_prefix",
+)
+
+
+class ConfigError(ValueError):
+    """Raised with every problem found in a config file, not just the first."""
+
+    def __init__(self, path: str, problems: List[str]):
+        self.path = path
+        self.problems = list(problems)
+        super().__init__(f"{path}: " + "; ".join(self.problems))
+
+
+@dataclass(frozen=True, slots=True)
+class OwnerConfig:
+    id: str
+    address: Optional[str] = None
+    seed: Optional[str] = field(default=None, repr=False)
+    name: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class HotWalletConfig:
+    id: str
+    address: Optional[str] = None
+    seed: Optional[str] = field(default=None, repr=False)
+
+
+@dataclass(frozen=True, slots=True)
+class SiteConfig:
+    id: str
+    owner: Optional[str] = None
+    jurisdiction: Optional[str] = None
+    program: Optional[str] = None
+    vintage: Optional[str] = None
+    vintage_start: Optional[str] = None
+    vintage_end: Optional[str] = None
+    meter_hash: Optional[str] = None
+    oracle_reference: Optional[str] = None
+    image_path: Optional[str] = None
+    facility_name: Optional[str] = None
+    facility_location: Optional[str] = None
+    grid_region: Optional[str] = None
+    technology: Optional[str] = None
+    rec_serial_prefix: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    path: str
+    issuer_seed: Optional[str] = field(default=None, repr=False)
+    hot_seed: Optional[str] = field(default=None, repr=False)
+    system_owner_seed: Optional[str] = field(default=None, repr=False)
+    nft_buyer_seed: Optional[str] = field(default=None, repr=False)
+    nft_minter_seed: Optional[str] = field(default=None, repr=False)
+    issuer_address: Optional[str] = None
+    hot_address: Optional[str] = None
+    system_owner_address: Optional[str] = None
+    nft_buyer_address: Optional[str] = None
+    nft_minter_address: Optional[str] = None
+    currency_code: Optional[str] = None
+    jurisdiction: Optional[str] = None
+    program: Optional[str] = None
+    vintage: Optional[str] = None
+    vintage_start: Optional[str] = None
+    vintage_end: Optional[str] = None
+    meter_hash: Optional[str] = None
+    oracle_reference: Optional[str] = None
+    price_usd: Optional[str] = None
+    price_xrp_drops: Optional[str] = None
+    image_path: Optional[str] = None
+    facility_name: Optional[str] = None
+    facility_location: Optional[str] = None
+    grid_region: Optional[str] = None
+    technology: Optional[str] = None
+    rec_serial_prefix: Optional[str] = None
+    schema_version: Optional[str] = None
+    hot_float: Optional[str] = None
+    owners: Tuple[OwnerConfig, ...] = ()
+    hot_wallets: Tuple[HotWalletConfig, ...] = ()
+    sites: Tuple[SiteConfig, ...] = ()
+    site_id: Optional[str] = None  # set on configs returned by for_site()
+    placeholders: Tuple[str, ...] = ()  # keys whose value is still a template
+    extra: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+
+    # dict-style access, so call sites written against yaml.safe_load() keep working
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in SCALAR_FIELDS:
+            value = getattr(self, key)
+        else:
+            value = self.extra.get(key)
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for key in SCALAR_FIELDS:
+            if getattr(self, key) is not None:
+                yield key, getattr(self, key)
+        yield from self.extra.items()
+
+    def is_set(self, key: str) -> bool:
+        return key not in self.placeholders and self.get(key) not in (None, "")
+
+    def require(self, *keys: str) -> "Config":
+        """Return self, or raise ConfigError naming every missing/template key."""
+        problems = []
+        for key in keys:
+            if key in self.placeholders:
+                problems.append(f"{key} is still a template value")
+            elif not self.is_set(key):
+                problems.append(f"{key} must be defined")
+        if problems:
+            raise ConfigError(self.path, problems)
+        return self
+
+    # multi-site / multi-owner
+    def owner(self, owner_id: str) -> OwnerConfig:
+        for owner in self.owners:
+            if owner.id == owner_id:
+                return owner
+        raise KeyError(f"unknown owner '{owner_id}'")
+
+    def hot_wallet(self, wallet_id: str) -> HotWalletConfig:
+        for wallet in self.hot_wallets:
+            if wallet.id == wallet_id:
+                return wallet
+        raise KeyError(f"unknown hot wallet '{wallet_id}'")
+
+    def site(self, site_id: str) -> SiteConfig:
+        for site in self.sites:
+            if site.id == site_id:
+                return site
+        raise KeyError(f"unknown site '{site_id}'")
+
+    def for_site(self, site_id: str) -> "Config":
+        site = self.site(site_id)
+        changes = {name: getattr(site, name) for name in SITE_FIELDS if getattr(site, name) is not None}
+        if site.owner:
+            owner = self.owner(site.owner)
+            changes.update(system_owner_address=owner.address or self.system_owner_address,
+                           system_owner_seed=owner.seed or self.system_owner_seed)
+        return dataclasses.replace(self, site_id=site.id, **changes)
+
+    def sites_by(self, attribute: str) -> Dict[Optional[str], List[SiteConfig]]:
+        """Group sites by owner, jurisdiction or any site field (inheriting top-level values)."""
+        groups: Dict[Optional[str], List[SiteConfig]] = {}
+        for site in self.sites:
+            key = getattr(site, attribute)
+            if key is None and attribute != "owner":
+                key = getattr(self, attribute)
+            groups.setdefault(key, []).append(site)
+        return groups
+
+
+SCALAR_FIELDS = tuple(f.name for f in dataclasses.fields(Config)
+                      if f.name not in ("path", "owners", "hot_wallets", "sites", "site_id", "placeholders", "extra"))
+CHECKED_FIELDS = frozenset(k for k in SCALAR_FIELDS
+                           if k.endswith(("_seed", "_address")) or k in ("currency_code", "price_xrp_drops"))
+
+_CACHE: Dict[str, Tuple[tuple, Config]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+# --- validation helpers ---
+def _base58check(value: str) -> Optional[bytes]:
+    """Decode an XRPL base58check string; None if malformed or the checksum fails."""
+    number = 0
+    for char in value.encode("ascii", "replace"):
+        digit = XRPL_ALPHABET.find(char)
+        if digit < 0:
+            return None
+        number = number * 58 + digit
+    raw = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    raw = b"\x00" * (len(value) - len(value.lstrip("r"))) + raw
+    body, checksum = raw[:-4], raw[-4:]
+    if len(raw) < 5 or hashlib.sha256(hashlib.sha256(body).digest()).digest()[:4] != checksum:
+        return None
+    return body
+
+
+def is_classic_address(value: str) -> bool:
+    body = _base58check(value)
+    return body is not None and len(body) == 21 and body[0] == 0
+
+
+def is_seed(value: str) -> bool:
+    body = _base58check(value)
+    return body is not None and any(body[:len(p)] == p and len(body) == len(p) + 16 for p in SEED_PREFIXES)
+
+
+def is_placeholder(value: Any) -> bool:
+    return isinstance(value, str) and bool(PLACEHOLDER.search(value))
+
+
+def _check_scalar(key: str, value: str, problems: List[str], where: str = "") -> None:
+    label = f"{where}{key}"
+    if key.endswith("address") and not is_classic_address(value):
+        problems.append(f"{label} is not a valid classic address: {value!r}")
+    elif key.endswith("seed") and not is_seed(value):
+        problems.append(f"{label} is not a valid seed")
+    elif key == "currency_code" and not (
+        (len(value) == 3 and value.isascii() and value.upper() != "XRP")
+        or (len(value) == 40 and all(c in "0123456789abcdefABCDEF" for c in value))
+    ):
+        problems.append(f"{label} must be a 3-character code other than XRP or 40 hex characters: {value!r}")
+    elif key == "price_xrp_drops" and not (value.isdigit() and int(value) > 0):
+        problems.append(f"{label} must be a positive integer number of drops: {value!r}")
+    elif key in ("price_usd", "hot_float"):
+        try:
+            Decimal(value)
+        except InvalidOperation:
+            problems.append(f"{label} must be a number: {value!r}")
+
+
+def _check_window(start: Optional[str], end: Optional[str], problems: List[str], where: str = "") -> None:
+    dates = {}
+    for key, value in (("vintage_start", start), ("vintage_end", end)):
+        if value is None:
+            continue
+        try:
+            dates[key] = datetime.date.fromisoformat(value)
+        except ValueError:
+            problems.append(f"{where}{key} must be an ISO date (YYYY-MM-DD): {value!r}")
+    if len(dates) == 2 and dates["vintage_start"] > dates["vintage_end"]:
+        problems.append(f"{where}vintage_start {start} is after vintage_end {end}")
+
+
+def _scalar(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, Decimal, datetime.date)) and not isinstance(value, bool):
+        return value.isoformat() if isinstance(value, datetime.date) else str(value)
+    raise TypeError(type(value).__name__)
+
+
+def _env_overrides() -> Tuple[Tuple[str, str], ...]:
+    return tuple((key, os.environ[ENV_PREFIX + key.upper()])
+                 for key in SCALAR_FIELDS if ENV_PREFIX + key.upper() in os.environ)
+
+
+def _parse_accounts(entries: Any, section: str, cls, problems: List[str]) -> list:
+    """`owners:` / `hot_wallets:` entries: an id plus optional address and seed (owners also a name)."""
+    accounts = []
+    for i, entry in enumerate(entries or []):
+        where = f"{section}[{i}]."
+        if not isinstance(entry, Mapping) or not entry.get("id"):
+            problems.append(f"{section}[{i}] needs an id")
+            continue
+        try:
+            fields = {k: None if is_placeholder(entry.get(k)) else _scalar(entry.get(k)) for k in ("address", "seed")}
+            if cls is OwnerConfig:
+                fields["name"] = _scalar(entry.get("name"))
+            account = cls(id=str(entry["id"]), **fields)
+        except TypeError as e:
+            problems.append(f"{where[:-1]} fields must be scalars, got {e}")
+            continue
+        for key in ("address", "seed"):
+            if getattr(account, key) is not None:
+                _check_scalar(key, getattr(account, key), problems, where)
+        accounts.append(account)
+    return accounts
+
+
+# --- parsing ---
+def parse_config(raw: Mapping[str, Any], path: str = "<config>",
+                 overrides: Tuple[Tuple[str, str], ...] = ()) -> Config:
+    """Build a validated Config from parsed YAML plus (key, value) overrides."""
+    if not isinstance(raw, Mapping):
+        raise ConfigError(path, [f"expected a mapping at the top level, got {type(raw).__name__}"])
+    problems: List[str] = []
+    values: Dict[str, Optional[str]] = {}
+    placeholders: List[str] = []
+    merged = dict(raw)
+    merged.update(overrides)
+    for key in SCALAR_FIELDS:
+        try:
+            value = _scalar(merged.get(key))
+        except TypeError as e:
+            problems.append(f"{key} must be a scalar, got {e}")
+            continue
+        if key in CHECKED_FIELDS and is_placeholder(value):
+            placeholders.append(key)
+            value = None
+        if value is not None and key in CHECKED_FIELDS | {"price_usd", "hot_float"}:
+            _check_scalar(key, value, problems)
+        values[key] = value
+    _check_window(values.get("vintage_start"), values.get("vintage_end"), problems)
+
+    owners = _parse_accounts(raw.get("owners"), "owners", OwnerConfig, problems)
+    hot_wallets = _parse_accounts(raw.get("hot_wallets"), "hot_wallets", HotWalletConfig, problems)
+
+    sites = []
+    for i, entry in enumerate(raw.get("sites") or []):
+        where = f"sites[{i}]."
+        if not isinstance(entry, Mapping) or not entry.get("id"):
+            problems.append(f"sites[{i}] needs an id")
+            continue
+        unknown = set(entry) - set(SITE_FIELDS) - {"id", "owner"}
+        if unknown:
+            problems.append(f"{where[:-1]} has unknown fields: {', '.join(sorted(unknown))}")
+        try:
+            site = SiteConfig(id=str(entry["id"]), owner=_scalar(entry.get("owner")),
+                              **{k: _scalar(entry.get(k)) for k in SITE_FIELDS})
+        except TypeError as e:
+            problems.append(f"{where[:-1]} fields must be scalars, got {e}")
+            continue
+        _check_window(site.vintage_start or values.get("vintage_start"),
+                      site.vintage_end or values.get("vintage_end"), problems, where)
+        sites.append(site)
+
+    for kind, items in (("owner", owners), ("hot wallet", hot_wallets), ("site", sites)):
+        seen = set()
+        for item in items:
+            if item.id in seen:
+                problems.append(f"duplicate {kind} id '{item.id}'")
+            seen.add(item.id)
+    owner_ids = {o.id for o in owners}
+    for site in sites:
+        if site.owner and site.owner not in owner_ids:
+            problems.append(f"site '{site.id}' references unknown owner '{site.owner}'")
+
+    if problems:
+        raise ConfigError(path, problems)
+    known = set(SCALAR_FIELDS) | {"owners", "hot_wallets", "sites"}
+    extra = MappingProxyType({k: v for k, v in raw.items() if k not in known})
+    return Config(path=path, owners=tuple(owners), hot_wallets=tuple(hot_wallets), sites=tuple(sites),
+                  placeholders=tuple(placeholders), extra=extra, **values)
+
+
+def load_config(path: str = "config.yaml", missing_ok: bool = False) -> Config:
+    """Parse, validate and cache `path`; raises ConfigError (or FileNotFoundError)."""
+    p = Path(path)
+    overrides = _env_overrides()
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        if not missing_ok:
+            raise ConfigError(str(path), ["file not found"]) from None
+        return parse_config({}, str(path), overrides)
+    key = (st.st_mtime_ns, st.st_size, overrides)
+    cache_key = str(p.resolve())
+    with _CACHE_LOCK:
+        hit = _CACHE.get(cache_key)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    try:
+        raw = yaml.safe_load(p.read_text(encoding="utf-8")) or {}
+    except yaml.YAMLError as e:
+        raise ConfigError(str(path), [f"invalid YAML: {e}"]) from None
+    config = parse_config(raw, str(path), overrides)
+    with _CACHE_LOCK:
+        _CACHE[cache_key] = (key, config)
+    return config
+
+
+def config_or_exit(path: str = "config.yaml", *required: str, missing_ok: bool = False) -> Config:
+    """load_config() + require() for script entry points: print every problem and exit."""
+    try:
+        return load_config(path, missing_ok=missing_ok).require(*required)
+    except ConfigError as e:
+        sys.exit("Error: invalid config " + e.path + "\n" + "\n".join(f"  - {p}" for p in e.problems))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and inspect config.yaml")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_check = sub.add_parser("check", help="Validate the config (exit 1 on problems)")
+    p_check.add_argument("--config", default="config.yaml")
+    p_check.add_argument("--require", nargs="*", default=[], help="Keys that must be set")
+    p_show = sub.add_parser("show", help="Print the effective config (seeds redacted)")
+    p_show.add_argument("--config", default="config.yaml")
+    p_show.add_argument("--site", default=None)
+    args = parser.parse_args()
+
+    config = config_or_exit(args.config, *getattr(args, "require", []))
+    if args.cmd == "check":
+        print(f"{args.config}: OK ({len(config.sites)} sites, {len(config.owners)} owners, "
+              f"{len(config.hot_wallets) or 1} hot wallet(s)"
+              + (f"; template values: {', '.join(config.placeholders)}" if config.placeholders else "") + ")")
+        return
+    if args.site:
+        try:
+            config = config.for_site(args.site)
+        except KeyError as e:
+            sys.exit(f"Error: {e.args[0]}")
+    shown = {k: ("<redacted>" if k.endswith("_seed") else v) for k, v in config.items()}
+    shown["sites"] = [s.id for s in config.sites]
+    shown["owners"] = [o.id for o in config.owners]
+    shown["hot_wallets"] = [w.id for w in config.hot_wallets]
+    print(json.dumps(shown, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+solr_constants.py
+=================
+
+Ledger constants shared by the SOLR scripts.  This module imports nothing,
+so any script can use them without loading another script's flow.
+"""
+
+# ACCOUNT_ZERO: no key can sign for it, so SOLR sent here is out of
+# circulation.  rippled rejects the payment with tecNO_DST (no account root);
+# mock_rippled --blackhole-sink accepts it as a burn.
+BLACKHOLE = "rrrrrrrrrrrrrrrrrrrrrhoLvTp"
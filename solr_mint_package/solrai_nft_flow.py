@@ -6,23 +6,41 @@ solrai_nft_flow.py
 End-to-end flow for minting STN tokens, burning for NFT, and handling payment on XRPL Testnet.
 Ready for integration with XRP/Ripple/Xaman wallets and dApps.
 
+Each run is a job in a write-ahead journal (job_journal.py): the signed blob
+of every step is recorded before it is submitted and its outcome after it
+validates.  If the process dies, rerunning the same command resumes the job
+at the first incomplete step, so a burn that already happened is not
+repeated.
+
+With a `hot_wallets:` pool in config.yaml (hot_pool.py) the STN is issued to
+and transferred from the system owner's shard instead of the single hot
+wallet.
+
+The proof image is checked against the proof index (proof_index.py) before
+the first submit and recorded against the minted NFT; a reused or
+near-duplicate proof stops the run unless --allow-proof-reuse is given.
+
+Usage:
+    python solrai_nft_flow.py --kwh 1500                      # resumes an unfinished identical run
+    python solrai_nft_flow.py --kwh 1500 --job-id <id>        # resume a specific job
+    python solrai_nft_flow.py --kwh 1500 --metadata-dir metadata   # mint a short sha256: URI
+
 Dependencies:
-    pip install xrpl PyYAML python-dotenv
+    pip install xrpl PyYAML python-dotenv Pillow numpy
 """
+import os
 import sys
-import yaml
 from decimal import Decimal
 from pathlib import Path
 import base64
+import tempfile
 import json
 import argparse
 from xrpl.clients import JsonRpcClient
-from xrpl.wallet import Wallet
-from xrpl.transaction import safe_sign_and_submit_transaction, send_reliable_submission
 from xrpl.models.transactions import (
     AccountSet,
-    AccountSetTfFlags,
-    AccountSetAsfFlags,
+    AccountSetFlag,
+    AccountSetAsfFlag,
     TrustSet,
     Payment,
     NFTokenMint,
@@ -31,70 +49,70 @@ from xrpl.models.transactions import (
 )
 from xrpl.models.requests import AccountNFTs
 
+from hot_pool import pool_from_keys, pool_roles
+from nft_market import offer_index_from_meta
+from job_journal import DEFAULT_JOURNAL, Journal, JournalError
+from key_provider import keys_or_exit
+from meter_proofs import configured_proof, embed_proof
+from proof_index import DEFAULT_INDEX as DEFAULT_PROOF_INDEX, ProofIndex, ProofReused, guard
+from solr_config import config_or_exit
+from solr_constants import BLACKHOLE
+from stream_codec import metadata_uri_hex, write_metadata_json
+from telemetry import submit_and_wait
+
 TESTNET_URL = "https://s.altnet.rippletest.net:51234"
-BLACKHOLE = "rrrrrrrrrrrrrrrrrrrrrhoLvTp"
 
 # --- Utility Functions ---
-def load_config(path: str = "config.yaml") -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
-
 def get_client() -> JsonRpcClient:
-    return JsonRpcClient(TESTNET_URL)
+    return JsonRpcClient(os.getenv("XRPL_RPC_URL", TESTNET_URL))
 
-def configure_account(client, wallet, is_issuer):
+def configure_account(client, wallet, is_issuer, submit=submit_and_wait):
     if is_issuer:
-        flags = AccountSetTfFlags.tfDisallowXRP | AccountSetTfFlags.tfRequireDestTag
-        asf_flags = AccountSetAsfFlags.asfDefaultRipple
+        flags = AccountSetFlag.TF_DISALLOW_XRP | AccountSetFlag.TF_REQUIRE_DEST_TAG
+        asf_flags = AccountSetAsfFlag.ASF_DEFAULT_RIPPLE
     else:
-        flags = AccountSetTfFlags.tfDisallowXRP | AccountSetTfFlags.tfRequireDestTag
-        asf_flags = AccountSetAsfFlags.asfRequireAuth
+        flags = AccountSetFlag.TF_DISALLOW_XRP | AccountSetFlag.TF_REQUIRE_DEST_TAG
+        asf_flags = AccountSetAsfFlag.ASF_REQUIRE_AUTH
     tx = AccountSet(account=wallet.classic_address, flags=flags, set_flag=asf_flags)
-    signed = safe_sign_and_submit_transaction(tx, wallet, client)
-    send_reliable_submission(signed, client)
+    submit(tx, client, wallet)
 
-def create_trust_line(client, hot_wallet, issuer_address, currency, limit):
+def create_trust_line(client, hot_wallet, issuer_address, currency, limit, submit=submit_and_wait):
     trust_tx = TrustSet(
         account=hot_wallet.classic_address,
         limit_amount={"currency": currency, "issuer": issuer_address, "value": str(limit)},
     )
-    signed = safe_sign_and_submit_transaction(trust_tx, hot_wallet, client)
-    send_reliable_submission(signed, client)
+    submit(trust_tx, client, hot_wallet)
 
-def issue_stn(client, issuer_wallet, hot_address, currency, amount):
+def issue_stn(client, issuer_wallet, hot_address, currency, amount, submit=submit_and_wait):
     pay_tx = Payment(
         account=issuer_wallet.classic_address,
         amount={"currency": currency, "value": str(amount), "issuer": issuer_wallet.classic_address},
         destination=hot_address,
     )
-    signed = safe_sign_and_submit_transaction(pay_tx, issuer_wallet, client)
-    send_reliable_submission(signed, client)
+    submit(pay_tx, client, issuer_wallet)
 
-def transfer_stn(client, from_wallet, to_address, currency, amount, issuer_address):
+def transfer_stn(client, from_wallet, to_address, currency, amount, issuer_address, submit=submit_and_wait):
     pay_tx = Payment(
         account=from_wallet.classic_address,
         amount={"currency": currency, "value": str(amount), "issuer": issuer_address},
         destination=to_address,
     )
-    signed = safe_sign_and_submit_transaction(pay_tx, from_wallet, client)
-    send_reliable_submission(signed, client)
+    submit(pay_tx, client, from_wallet)
 
-def burn_stn(client, owner_wallet, currency, amount, issuer_address):
+def burn_stn(client, owner_wallet, currency, amount, issuer_address, submit=submit_and_wait):
     pay_tx = Payment(
         account=owner_wallet.classic_address,
         amount={"currency": currency, "value": str(amount), "issuer": issuer_address},
         destination=BLACKHOLE,
     )
-    signed = safe_sign_and_submit_transaction(pay_tx, owner_wallet, client)
-    response = send_reliable_submission(signed, client)
-    return response.result.get("hash") or signed.result.get("hash")
+    response = submit(pay_tx, client, owner_wallet)
+    return response.result.get("hash")
 
 def read_image_as_base64(image_path: Path) -> str:
     with image_path.open("rb") as img_f:
         return base64.b64encode(img_f.read()).decode("ascii")
 
-def create_metadata(config, burn_tx_hash, image_path):
-    image_b64 = read_image_as_base64(image_path)
+def metadata_dict(config, burn_tx_hash):
     metadata = {
         "jurisdiction": config.get("jurisdiction"),
         "program": config.get("program"),
@@ -102,13 +120,26 @@ def create_metadata(config, burn_tx_hash, image_path):
         "meter_hash": config.get("meter_hash"),
         "oracle_reference": config.get("oracle_reference"),
         "burn_tx_hash": burn_tx_hash,
-        "image": f"data:image/jpeg;base64,{image_b64}",
     }
-    json_str = json.dumps(metadata, separators=(",", ":"))
-    data_uri = "data:application/json;base64," + base64.b64encode(json_str.encode("utf-8")).decode("ascii")
-    return data_uri.encode("utf-8").hex()
+    proof = configured_proof(config)
+    if proof is not None:  # the proof's meter section replaces the flat meter fields
+        del metadata["meter_hash"], metadata["oracle_reference"]
+        embed_proof(metadata, proof)
+    return metadata
+
+def create_metadata(config, burn_tx_hash, image_path):
+    # Streams the image through both base64 layers instead of holding every intermediate copy
+    return metadata_uri_hex(metadata_dict(config, burn_tx_hash), image_path)
 
-def mint_solrai_nft(client, minter_wallet, uri_hex, transfer_fee=10000, flags=0x09, taxon=0):
+def store_metadata(config, burn_tx_hash, image_path: Path, metadata_dir: Path) -> str:
+    """Stream the metadata JSON to <dir>/<sha256>.json; return the short "sha256:<hash>" URI (hex) to mint instead."""
+    metadata_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=metadata_dir, suffix=".tmp", delete=False) as out:
+        digest = write_metadata_json(metadata_dict(config, burn_tx_hash), image_path, out)
+    os.replace(out.name, metadata_dir / f"{digest}.json")
+    return f"sha256:{digest}".encode("utf-8").hex()
+
+def mint_solrai_nft(client, minter_wallet, uri_hex, transfer_fee=10000, flags=0x09, taxon=0, submit=submit_and_wait):
     nft_mint_tx = NFTokenMint(
         account=minter_wallet.classic_address,
         uri=uri_hex,
@@ -116,30 +147,30 @@ def mint_solrai_nft(client, minter_wallet, uri_hex, transfer_fee=10000, flags=0x
         flags=flags,
         nftoken_taxon=taxon,
     )
-    signed = safe_sign_and_submit_transaction(nft_mint_tx, minter_wallet, client)
-    result = send_reliable_submission(signed, client)
+    result = submit(nft_mint_tx, client, minter_wallet)
     return result.result
 
-def send_xrp_payment(client, from_wallet, to_address, drops):
+def send_xrp_payment(client, from_wallet, to_address, drops, submit=submit_and_wait):
     pay_tx = Payment(
         account=from_wallet.classic_address,
         amount=str(drops),
         destination=to_address,
     )
-    signed = safe_sign_and_submit_transaction(pay_tx, from_wallet, client)
-    send_reliable_submission(signed, client)
+    submit(pay_tx, client, from_wallet)
 
 def fetch_nft_id_by_uri(client, account: str, uri_hex: str) -> str:
-    """Lookup the freshly minted NFTokenID by matching the URI on the minter's account."""
-    req = AccountNFTs(account=account)
-    resp = client.request(req)
-    nfts = resp.result.get("account_nfts", [])
-    for nft in nfts:
-        if nft.get("URI") == uri_hex:
-            return nft.get("NFTokenID") or nft.get("nft_id")
-    return ""
-
-def transfer_nft_to_owner(client, minter_wallet, owner_wallet, nft_id: str):
+    """Lookup the freshly minted NFTokenID by matching the URI on the minter's account (every page)."""
+    marker = None
+    while True:
+        result = client.request(AccountNFTs(account=account, limit=400, marker=marker)).result
+        for nft in result.get("account_nfts", []):
+            if (nft.get("URI") or "").upper() == uri_hex.upper():  # ledger returns uppercase hex
+                return nft.get("NFTokenID") or nft.get("nft_id")
+        marker = result.get("marker")
+        if marker is None:
+            return ""
+
+def transfer_nft_to_owner(client, minter_wallet, owner_wallet, nft_id: str, submit=submit_and_wait):
     """Create a zero-amount, destination-restricted sell offer and have owner accept it."""
     # Create zero-price sell offer restricted to owner
     create = NFTokenCreateOffer(
@@ -149,20 +180,15 @@ def transfer_nft_to_owner(client, minter_wallet, owner_wallet, nft_id: str):
         destination=owner_wallet.classic_address,
         flags=1,  # tfSellOffer
     )
-    signed = safe_sign_and_submit_transaction(create, minter_wallet, client)
-    result = send_reliable_submission(signed, client).result
+    result = submit(create, client, minter_wallet).result
     # Extract offer index from metadata
-    offer_index = result.get("offer_id") or result.get("OfferID")
-    if not offer_index:
-        # Fallback: try from tx json result
-        offer_index = signed.result.get("tx_json", {}).get("hash")  # not ideal, but avoids deep meta parsing here
+    offer_index = offer_index_from_meta(result.get("meta", {}))
     # Owner accepts offer
     accept = NFTokenAcceptOffer(
         account=owner_wallet.classic_address,
         nftoken_sell_offer=offer_index,
     )
-    signed2 = safe_sign_and_submit_transaction(accept, owner_wallet, client)
-    send_reliable_submission(signed2, client)
+    submit(accept, client, owner_wallet)
 
 # --- Main Flow ---
 def main():
@@ -171,62 +197,117 @@ def main():
     parser.add_argument("--config", default="config.yaml", help="Config YAML path")
     parser.add_argument("--image", default=None, help="Path to proof image")
     parser.add_argument("--price_xrp_drops", default=None, help="NFT price in XRP drops")
+    parser.add_argument("--metadata-dir", default=None,
+                        help="Write metadata to <dir>/<sha256>.json and mint a short sha256: URI")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL, help="Job journal (SQLite) used to resume after a crash")
+    parser.add_argument("--job-id", default=None, help="Resume (or name) this job instead of the latest unfinished one")
+    parser.add_argument("--no-journal", action="store_true", help="Run without a journal (nothing to resume from)")
+    parser.add_argument("--proof-index", default=DEFAULT_PROOF_INDEX, help="SQLite index of proof images used")
+    parser.add_argument("--allow-proof-reuse", action="store_true",
+                        help="Mint even if the proof image (or a near-duplicate) backs another NFT")
     args = parser.parse_args()
 
-    config = load_config(args.config)
-    issuer_wallet = Wallet.from_seed(config["issuer_seed"])
-    hot_wallet = Wallet.from_seed(config["hot_seed"])
-    system_owner_wallet = Wallet.from_seed(config["system_owner_seed"])
-    nft_buyer_wallet = Wallet.from_seed(config["nft_buyer_seed"])
-    minter_wallet = Wallet.from_seed(config["nft_minter_seed"]) if config.get("nft_minter_seed") else None
+    # The minter key is required for centralized minting; check everything before the first submit
+    config = config_or_exit(args.config, "currency_code", "system_owner_address",
+                            *([] if args.image else ["image_path"]))
+    keys = keys_or_exit(config, "issuer", *pool_roles(config), "owner", "buyer", "minter")
+    try:  # a bad meter proof must fail before anything is burned
+        configured_proof(config)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: meter_proof: {e}")
+    issuer_wallet = keys.wallet("issuer")
+    hot_pool = pool_from_keys(config, keys)
+    hot_shard = hot_pool.shard_for(config["system_owner_address"])
+    hot_wallet = hot_pool.shards[hot_shard]
+    system_owner_wallet = keys.wallet("owner")
+    nft_buyer_wallet = keys.wallet("buyer")
+    minter_wallet = keys.wallet("minter")
     currency = config["currency_code"]
+    image_path = Path(args.image or config["image_path"])
+    price_drops = args.price_xrp_drops or config.get("price_xrp_drops")
     client = get_client()
 
+    # Every step is journaled: after a crash the same command resumes the job instead of starting over
+    job = None
+    if not args.no_journal:
+        params = {"config": str(Path(args.config).resolve()), "kwh": str(args.kwh), "image": str(image_path),
+                  "price_xrp_drops": price_drops, "metadata_dir": args.metadata_dir}
+        try:
+            job = Journal(args.journal).open_job("solrai_nft_flow", params, args.job_id)
+        except JournalError as e:
+            sys.exit(f"Error: {e}")
+        if job.resumed:
+            print(f"Resuming job {job.id} (done: {', '.join(job.done_steps()) or 'nothing'})")
+        else:
+            print(f"Job {job.id} (journal {args.journal})")
+
+    proofs = ProofIndex(args.proof_index)
+    try:  # a resumed job may already have recorded the proof against its own NFT
+        proof = guard(proofs, image_path, args.allow_proof_reuse or (job is not None and job.resumed))
+    except (ProofReused, OSError) as e:
+        sys.exit(f"Error: {e}")
+
+    def step(name):
+        return submit_and_wait if job is None else job.submitter(name)
+
     # 1. Configure accounts
     print("Configuring issuer and hot wallets...")
-    configure_account(client, issuer_wallet, is_issuer=True)
-    configure_account(client, hot_wallet, is_issuer=False)
+    configure_account(client, issuer_wallet, is_issuer=True, submit=step("configure_issuer"))
+    configure_account(client, hot_wallet, is_issuer=False, submit=step("configure_hot"))
 
     # 2. Create trust line
     print("Creating trust line...")
-    create_trust_line(client, hot_wallet, issuer_wallet.classic_address, currency, limit=str(10**9))
+    create_trust_line(client, hot_wallet, issuer_wallet.classic_address, currency, limit=str(10**9),
+                      submit=step("trust_line"))
 
     # 3. Mint STN tokens to hot wallet
-    print(f"Minting {args.kwh} STN to hot wallet...")
-    issue_stn(client, issuer_wallet, hot_wallet.classic_address, currency, args.kwh)
+    print(f"Minting {args.kwh} STN to hot wallet ({hot_shard})...")
+    issue_stn(client, issuer_wallet, hot_wallet.classic_address, currency, args.kwh, submit=step("issue"))
 
     # 4. Transfer STN to system owner
     print(f"Transferring {args.kwh} STN to system owner...")
-    transfer_stn(client, hot_wallet, config["system_owner_address"], currency, args.kwh, issuer_wallet.classic_address)
+    transfer_stn(client, hot_wallet, config["system_owner_address"], currency, args.kwh, issuer_wallet.classic_address,
+                 submit=step("transfer"))
 
     # 5. Burn 1000 STN to mint NFT
     print("Burning 1000 STN from system owner...")
-    burn_tx_hash = burn_stn(client, system_owner_wallet, currency, "1000", issuer_wallet.classic_address)
+    burn_tx_hash = burn_stn(client, system_owner_wallet, currency, "1000", issuer_wallet.classic_address,
+                            submit=step("burn"))
     print(f"Burn tx hash: {burn_tx_hash}")
 
     # 6. Mint NFT
-    image_path = Path(args.image or config["image_path"])
     print("Creating NFT metadata and minting NFT via designated minter...")
-    uri_hex = create_metadata(config, burn_tx_hash, image_path)
-    if not minter_wallet:
-        raise SystemExit("Config missing nft_minter_seed; required for centralized minting.")
-    nft_result = mint_solrai_nft(client, minter_wallet, uri_hex)
+    if args.metadata_dir:
+        uri_hex = store_metadata(config, burn_tx_hash, image_path, Path(args.metadata_dir))
+    else:
+        uri_hex = create_metadata(config, burn_tx_hash, image_path)
+    nft_result = mint_solrai_nft(client, minter_wallet, uri_hex, submit=step("mint"))
     print(json.dumps(nft_result, indent=2))
-    # Find NFTokenID and transfer to system owner
-    nft_id = fetch_nft_id_by_uri(client, minter_wallet.classic_address, uri_hex)
-    if nft_id:
-        print(f"Transferring NFT {nft_id} to system owner via zero-amount offer...")
-        transfer_nft_to_owner(client, minter_wallet, system_owner_wallet, nft_id)
+    # NFTokenID from the (journaled) mint result; the URI lookup is for servers that omit meta.nftoken_id
+    nft_id = (nft_result.get("meta") or {}).get("nftoken_id")
+    if not nft_id:
+        find_nft = lambda: fetch_nft_id_by_uri(client, minter_wallet.classic_address, uri_hex)
+        try:
+            nft_id = find_nft() if job is None else job.local("nft_id", find_nft)
+        except JournalError:
+            nft_id = ""
+    if not nft_id:
+        sys.exit(f"Error: NFT minted in {nft_result.get('hash')} not found on the minter's account; "
+                 f"rerun the same command to resume the job.")
+    proofs.record(proof["fingerprint"], nft_id, image_path)
+    print(f"Transferring NFT {nft_id} to system owner via zero-amount offer...")
+    transfer_nft_to_owner(client, minter_wallet, system_owner_wallet, nft_id, submit=step("transfer_nft"))
 
     # 7. Buyer pays system owner
-    if args.price_xrp_drops or config.get("price_xrp_drops"):
-        price_drops = args.price_xrp_drops or config["price_xrp_drops"]
+    if price_drops:
         print(f"NFT buyer paying {price_drops} drops to system owner...")
-        send_xrp_payment(client, nft_buyer_wallet, config["system_owner_address"], price_drops)
+        send_xrp_payment(client, nft_buyer_wallet, config["system_owner_address"], price_drops, submit=step("payment"))
         print("Payment sent.")
     else:
         print("No price_xrp_drops specified; skipping payment.")
 
+    if job is not None:
+        job.finish()
     print("Flow complete. Check XRPL explorer for all tx hashes.")
 
 if __name__ == "__main__":
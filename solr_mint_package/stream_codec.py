@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+stream_codec.py
+===============
+
+Streaming encoder for the data-URI NFT metadata built by `create_metadata`.
+
+The metadata URI is hex(data:application/json;base64, base64(JSON)), where
+the JSON embeds the proof image as data:image/jpeg;base64, base64(image).
+Building it the obvious way leaves five or more full-size copies of a
+multi-MB image alive at once: raw bytes, inner base64, the JSON string, its
+UTF-8 bytes, the outer base64, the data-URI string and finally its hex.
+
+Here the JSON is split around the image (base64 never needs JSON escaping),
+and the image is read in chunks through two incremental base64 encoders
+(each carries len % 3 bytes between writes) into one sink:
+
+  - `metadata_uri_hex` writes the outer base64 into an exactly pre-sized
+    buffer and hex-encodes that once: peak is the buffer plus the returned
+    string (about 1.8x + 3.6x the image) instead of about 11x
+  - `spill_metadata_uri` streams the hex form to a temp file and yields a
+    read-only mmap of it, so peak Python memory is one chunk however large
+    the proof is
+  - `write_metadata_json` streams the JSON payload itself to a file object
+    and returns its SHA-256 (for content-addressed metadata directories)
+
+Output is byte-identical to the non-streaming construction.
+
+Usage:
+    python stream_codec.py uri --image proof.jpeg [--output uri.hex]
+    python stream_codec.py bench --image-mb 4 50        # tracemalloc peaks: legacy vs stream vs spill
+
+Dependencies:
+    none beyond the standard library
+"""
+import argparse
+import base64
+import binascii
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+
+DATA_URI_PREFIX = b"data:application/json;base64,"
+CHUNK_SIZE = 3 * 64 * 1024  # a multiple of 3, so whole chunks need no carry in the inner encoder
+_SENTINEL = "@@solr-image-8c1f@@"
+
+Sink = Callable[[bytes], object]
+
+
+def b64_length(n: int) -> int:
+    return 4 * ((n + 2) // 3)
+
+
+class Base64Writer:
+    """Incremental base64: bytes in through write(), ASCII out to `sink`, carrying the last len % 3 bytes."""
+
+    __slots__ = ("sink", "carry")
+
+    def __init__(self, sink: Sink):
+        self.sink = sink
+        self.carry = b""
+
+    def write(self, data) -> None:
+        if self.carry:
+            data = self.carry + data
+        cut = len(data) - len(data) % 3
+        self.carry = bytes(data[cut:])
+        if cut:
+            self.sink(binascii.b2a_base64(memoryview(data)[:cut], newline=False))
+
+    def close(self) -> None:
+        if self.carry:
+            self.sink(binascii.b2a_base64(self.carry, newline=False))
+            self.carry = b""
+
+
+class _BufferSink:
+    """Write into a pre-sized bytearray; no re-allocation as it fills."""
+
+    __slots__ = ("view", "pos")
+
+    def __init__(self, buf: bytearray):
+        self.view = memoryview(buf)
+        self.pos = 0
+
+    def __call__(self, data: bytes) -> None:
+        end = self.pos + len(data)
+        self.view[self.pos:end] = data
+        self.pos = end
+
+
+def json_parts(metadata: dict, media_type: str = "image/jpeg", field: str = "image") -> Tuple[bytes, bytes]:
+    """The metadata JSON before and after the base64 image (exactly as json.dumps would lay it out)."""
+    text = json.dumps(dict(metadata, **{field: _SENTINEL}), separators=(",", ":"))
+    head, found, tail = text.partition(_SENTINEL)
+    if not found:
+        raise ValueError("could not place the image in the metadata JSON")
+    return (head + f"data:{media_type};base64,").encode("utf-8"), tail.encode("utf-8")
+
+
+def _stream_image(image_path: Path, sink: Sink, chunk_size: int = CHUNK_SIZE) -> None:
+    inner = Base64Writer(sink)
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with image_path.open("rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            inner.write(view[:n])
+    inner.close()
+
+
+def _stream_json(metadata: dict, image_path: Path, sink: Sink, media_type: str, chunk_size: int) -> None:
+    head, tail = json_parts(metadata, media_type)
+    sink(head)
+    _stream_image(image_path, sink, chunk_size)
+    sink(tail)
+
+
+def _stream_uri(metadata: dict, image_path: Path, sink: Sink, media_type: str, chunk_size: int) -> None:
+    sink(DATA_URI_PREFIX)
+    outer = Base64Writer(sink)
+    _stream_json(metadata, image_path, outer.write, media_type, chunk_size)
+    outer.close()
+
+
+def uri_length(metadata: dict, image_path: Path, media_type: str = "image/jpeg") -> int:
+    """Length in bytes of the data URI (before hex) for `metadata` with the image at `image_path`."""
+    head, tail = json_parts(metadata, media_type)
+    json_len = len(head) + b64_length(image_path.stat().st_size) + len(tail)
+    return len(DATA_URI_PREFIX) + b64_length(json_len)
+
+
+def metadata_uri_hex(metadata: dict, image_path: Path, media_type: str = "image/jpeg",
+                     chunk_size: int = CHUNK_SIZE) -> str:
+    """hex(data-URI(JSON with the embedded image)), streaming the image through both base64 layers."""
+    buf = bytearray(uri_length(metadata, image_path, media_type))
+    sink = _BufferSink(buf)
+    _stream_uri(metadata, image_path, sink, media_type, chunk_size)
+    if sink.pos != len(buf):
+        raise RuntimeError(f"{image_path} changed while it was being encoded")
+    sink.view.release()
+    return buf.hex()
+
+
+def write_metadata_uri(metadata: dict, image_path: Path, out, media_type: str = "image/jpeg",
+                       chunk_size: int = CHUNK_SIZE, as_hex: bool = True) -> None:
+    """Stream the data URI (hex-encoded by default) to a binary file object."""
+    if as_hex:
+        _stream_uri(metadata, image_path, lambda data: out.write(binascii.hexlify(data)), media_type, chunk_size)
+    else:
+        _stream_uri(metadata, image_path, out.write, media_type, chunk_size)
+
+
+@contextmanager
+def spill_metadata_uri(metadata: dict, image_path: Path, media_type: str = "image/jpeg",
+                       directory: Optional[str] = None, as_hex: bool = True) -> Iterator[mmap.mmap]:
+    """Encode through an anonymous temp file and yield a read-only mmap of the result."""
+    with tempfile.TemporaryFile(dir=directory) as f:
+        write_metadata_uri(metadata, image_path, f, media_type, as_hex=as_hex)
+        f.flush()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+def write_metadata_json(metadata: dict, image_path: Path, out, media_type: str = "image/jpeg",
+                        chunk_size: int = CHUNK_SIZE) -> str:
+    """Stream the metadata JSON (image embedded) to a binary file object; return its SHA-256 hex digest."""
+    digest = hashlib.sha256()
+
+    def sink(data: bytes) -> None:
+        digest.update(data)
+        out.write(data)
+
+    _stream_json(metadata, image_path, sink, media_type, chunk_size)
+    return digest.hexdigest()
+
+
+# --- measurements ---
+def _legacy_uri_hex(metadata: dict, image_path: Path) -> str:
+    """The non-streaming construction create_metadata used before this module (for comparison)."""
+    with image_path.open("rb") as img_f:
+        image_b64 = base64.b64encode(img_f.read()).decode("ascii")
+    metadata = dict(metadata)
+    metadata["image"] = f"data:image/jpeg;base64,{image_b64}"
+    json_str = json.dumps(metadata, separators=(",", ":"))
+    data_uri = "data:application/json;base64," + base64.b64encode(json_str.encode("utf-8")).decode("ascii")
+    return data_uri.encode("utf-8").hex()
+
+
+def _measure(fn: Callable[[], object]) -> dict:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        elapsed = time.perf_counter() - start
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_mb": round(peak / 2**20, 2), "seconds": round(elapsed, 3), "result": result}
+
+
+def bench(image_mbs, metadata: dict) -> dict:
+    """tracemalloc peak and time per encoding path for noise images of each size."""
+    report = {"python": sys.version.split()[0], "chunk_size": CHUNK_SIZE, "cases": []}
+    with tempfile.TemporaryDirectory(prefix="solr-stream-") as tmp:
+        for mb in image_mbs:
+            image = Path(tmp) / f"proof-{mb}mb.jpeg"
+            with image.open("wb") as f:
+                for _ in range(int(mb * 16)):
+                    f.write(os.urandom(64 * 1024))
+
+            def spill():
+                with spill_metadata_uri(metadata, image, directory=tmp) as mapped:
+                    return hashlib.sha256(mapped).hexdigest(), len(mapped)
+
+            legacy = _measure(lambda: _legacy_uri_hex(metadata, image))
+            reference = hashlib.sha256(legacy.pop("result").encode("ascii")).hexdigest()
+            stream = _measure(lambda: metadata_uri_hex(metadata, image))
+            stream_hash = hashlib.sha256(stream.pop("result").encode("ascii")).hexdigest()
+            spilled = _measure(spill)
+            spill_hash, uri_hex_len = spilled.pop("result")
+            report["cases"].append({
+                "image_mb": mb,
+                "uri_hex_mb": round(uri_hex_len / 2**20, 2),
+                "legacy": legacy,
+                "stream": stream,
+                "spill": spilled,
+                "identical": reference == stream_hash == spill_hash,
+            })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming data-URI metadata encoder")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("uri", help="Encode metadata (from config) + image as a hex data URI")
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--image", required=True)
+    p.add_argument("--burn-tx-hash", default="")
+    p.add_argument("--output", default="-", help="Hex URI path, or - for stdout")
+    p = sub.add_parser("bench", help="tracemalloc peak memory: legacy vs stream vs spill")
+    p.add_argument("--image-mb", type=float, nargs="+", default=[4, 50])
+    p.add_argument("--output", default="-")
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        from burn_and_mint_solrai_nft import metadata_fields
+
+        text = json.dumps(bench(args.image_mb, metadata_fields({"vintage": "2025"}, "0" * 64)), indent=2)
+        if args.output == "-":
+            print(text)
+        else:
+            Path(args.output).write_text(text + "\n", encoding="utf-8")
+        return
+
+    from burn_and_mint_solrai_nft import metadata_fields
+    from solr_config import config_or_exit
+
+    image = Path(args.image)
+    if not image.exists():
+        sys.exit(f"Error: image file {image} not found.")
+    metadata = metadata_fields(config_or_exit(args.config, missing_ok=True), args.burn_tx_hash)
+    if args.output == "-":
+        write_metadata_uri(metadata, image, sys.stdout.buffer)
+        sys.stdout.buffer.write(b"\n")
+    else:
+        with open(args.output, "wb") as out:
+            write_metadata_uri(metadata, image, out)
+
+
+if __name__ == "__main__":
+    main()
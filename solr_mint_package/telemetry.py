@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+telemetry.py
+============
+
+Instrumented transaction submission for every script in the package.
+
+`submit_and_wait` is a drop-in for `xrpl.transaction.submit_and_wait` that
+runs the same autofill/sign -> submit -> wait-until-validated steps, timing
+each phase and recording one span per transaction: tx type, account,
+sequence/ticket, fee, preliminary and final engine result, sign / submit /
+validation seconds, ledgers waited and waiter passes.  Waiting goes through
+the shared validation waiter (validation_waiter.py) instead of a per-hash
+`tx` polling loop.  With SOLR_SEQUENCE_DB set, Sequence numbers come from
+the cross-process coordinator (sequence_coordinator.py) and are released
+once the outcome is known.  tx_pipeline records a span per pipelined
+transaction through `observe`.
+
+Spans feed two exporters:
+
+  - in-process Prometheus counters/histograms, served as text exposition on
+    http://127.0.0.1:$SOLR_METRICS_PORT/metrics (or `serve_metrics(port)`);
+  - one JSON line per span on the `solr.tx` logger, written to
+    $SOLR_TX_LOG ("-" for stderr) or wherever the application routes it.
+
+Recording is a few dict updates under a lock; JSON is only built when the
+logger is enabled, so the layer is meant to stay on.
+
+Usage:
+    SOLR_METRICS_PORT=9464 SOLR_TX_LOG=tx.jsonl python solrai_nft_flow.py --kwh 1000
+    python telemetry.py tx.jsonl             # Prometheus text aggregated from a span log
+
+Dependencies:
+    pip install xrpl-py
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.response import Response, ResponseStatus
+from xrpl.models.transactions.transaction import Transaction
+from xrpl.transaction import XRPLReliableSubmissionException, sign, submit
+from xrpl.wallet import Wallet
+
+from sequence_coordinator import allocate_and_sign, coordinator, release_sequences, resync_after_past_seq
+from validation_waiter import TransactionExpired, waiter_for
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LEDGER_BUCKETS = (1, 2, 3, 4, 5, 10, 20)
+PHASES = ("sign", "submit", "validation", "total")
+
+log = logging.getLogger("solr.tx")
+
+
+class TransactionNotApplied(XRPLReliableSubmissionException):
+    """Known not to have taken effect: never submitted, tem/tef, a tec result, or expired past LastLedgerSequence.
+
+    Any other exception from submit_and_wait leaves the outcome unknown.
+    """
+
+
+class Span:
+    __slots__ = ("tx_type", "account", "sequence", "ticket", "fee", "hash", "prelim_result", "engine_result",
+                 "started", "sign_s", "submit_s", "validation_s", "total_s", "submit_ledger", "ledger_index",
+                 "ledgers_waited", "polls", "attempt", "error")
+
+    def __init__(self, tx_type: str, account: str):
+        self.tx_type, self.account = tx_type, account
+        self.sequence = self.ticket = self.fee = self.hash = None
+        self.prelim_result = self.engine_result = self.error = None
+        self.started = time.time()
+        self.sign_s = self.submit_s = self.validation_s = self.total_s = None
+        self.submit_ledger = self.ledger_index = self.ledgers_waited = None
+        self.polls = 0
+        self.attempt = 1
+
+    def set_tx(self, tx: Transaction) -> None:
+        self.sequence, self.ticket, self.fee = tx.sequence, tx.ticket_sequence, tx.fee
+        self.hash = tx.get_hash()
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Prometheus-style counters and histograms keyed by label tuples."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.submissions: Dict[Tuple[str, str], int] = {}
+        self.polls: Dict[str, int] = {}
+        self.fees: Dict[str, int] = {}
+        self.phases: Dict[Tuple[str, str], Histogram] = {}
+        self.ledgers: Dict[str, Histogram] = {}
+
+    def record(self, span: Span) -> None:
+        result = span.engine_result or span.prelim_result or "error"
+        with self.lock:
+            key = (span.tx_type, result)
+            self.submissions[key] = self.submissions.get(key, 0) + 1
+            self.polls[span.tx_type] = self.polls.get(span.tx_type, 0) + span.polls
+            if span.fee and span.engine_result:
+                self.fees[span.tx_type] = self.fees.get(span.tx_type, 0) + int(span.fee)
+            for phase in PHASES:
+                value = getattr(span, phase + "_s")
+                if value is not None:
+                    hist = self.phases.get((span.tx_type, phase))
+                    if hist is None:
+                        hist = self.phases[(span.tx_type, phase)] = Histogram(DURATION_BUCKETS)
+                    hist.observe(value)
+            if span.ledgers_waited is not None:
+                hist = self.ledgers.get(span.tx_type)
+                if hist is None:
+                    hist = self.ledgers[span.tx_type] = Histogram(LEDGER_BUCKETS)
+                hist.observe(span.ledgers_waited)
+
+    def render(self) -> str:
+        out = []
+        with self.lock:
+            out.append("# HELP solr_tx_submissions_total Transactions submitted, by type and final engine result.")
+            out.append("# TYPE solr_tx_submissions_total counter")
+            for (tx_type, result), n in sorted(self.submissions.items()):
+                out.append(f'solr_tx_submissions_total{{tx_type="{tx_type}",result="{result}"}} {n}')
+            out.append("# HELP solr_tx_polls_total Validation-waiter ledger passes spent waiting for validation.")
+            out.append("# TYPE solr_tx_polls_total counter")
+            for tx_type, n in sorted(self.polls.items()):
+                out.append(f'solr_tx_polls_total{{tx_type="{tx_type}"}} {n}')
+            out.append("# HELP solr_tx_fee_drops_total Fees paid by applied transactions, in drops.")
+            out.append("# TYPE solr_tx_fee_drops_total counter")
+            for tx_type, n in sorted(self.fees.items()):
+                out.append(f'solr_tx_fee_drops_total{{tx_type="{tx_type}"}} {n}')
+            out.append("# HELP solr_tx_phase_seconds Time spent signing, submitting and waiting for validation.")
+            out.append("# TYPE solr_tx_phase_seconds histogram")
+            for (tx_type, phase), hist in sorted(self.phases.items()):
+                out.extend(_histogram_lines("solr_tx_phase_seconds", f'tx_type="{tx_type}",phase="{phase}"', hist))
+            out.append("# HELP solr_tx_ledgers_waited Ledgers between submission and validation.")
+            out.append("# TYPE solr_tx_ledgers_waited histogram")
+            for tx_type, hist in sorted(self.ledgers.items()):
+                out.extend(_histogram_lines("solr_tx_ledgers_waited", f'tx_type="{tx_type}"', hist))
+        return "\n".join(out) + "\n"
+
+
+def _histogram_lines(name: str, labels: str, hist: Histogram):
+    cumulative = 0
+    for bound, n in zip(hist.buckets, hist.counts):
+        cumulative += n
+        yield f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}'
+    yield f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}'
+    yield f"{name}_sum{{{labels}}} {hist.sum:.6f}"
+    yield f"{name}_count{{{labels}}} {hist.count}"
+
+
+METRICS = Metrics()
+_server: Optional[ThreadingHTTPServer] = None
+_env_lock = threading.Lock()
+_env_done = False
+_log_handler: Optional[logging.Handler] = None
+
+
+def _init_from_env() -> None:
+    """Start exporters requested through SOLR_METRICS_PORT / SOLR_TX_LOG, once (until reset_from_env)."""
+    global _env_done, _log_handler
+    if _env_done:
+        return
+    with _env_lock:
+        if _env_done:
+            return
+        _env_done = True
+        # Runs inside submit_and_wait's finally: a broken exporter is reported, never raised into the submit path.
+        path = os.getenv("SOLR_TX_LOG")
+        if path:
+            try:
+                handler = (logging.StreamHandler(sys.stderr) if path == "-"
+                           else logging.FileHandler(path, encoding="utf-8"))
+            except OSError as e:
+                print(f"Warning: SOLR_TX_LOG {path}: {e}; span log disabled", file=sys.stderr)
+            else:
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                log.addHandler(handler)
+                log.setLevel(logging.INFO)
+                log.propagate = False
+                _log_handler = handler
+        port = os.getenv("SOLR_METRICS_PORT")
+        if port and _server is None:
+            try:
+                serve_metrics(int(port))
+            except (OSError, ValueError) as e:
+                print(f"Warning: SOLR_METRICS_PORT {port}: {e}; metrics endpoint disabled", file=sys.stderr)
+
+
+def reset_from_env() -> None:
+    """Close the SOLR_TX_LOG handler so the next span re-reads the environment.
+
+    For long-lived processes that change os.environ between commands (solr.py
+    daemon).  A running metrics endpoint is kept: its port is process-wide.
+    """
+    global _env_done, _log_handler
+    with _env_lock:
+        _env_done = False
+        if _log_handler is not None:
+            log.removeHandler(_log_handler)
+            _log_handler.close()
+            _log_handler = None
+            log.setLevel(logging.NOTSET)
+            log.propagate = True
+
+
+def observe(span: Span) -> None:
+    """Record a finished span in the metrics and, if enabled, the JSON log."""
+    _init_from_env()
+    METRICS.record(span)
+    if log.isEnabledFor(logging.INFO):
+        log.info(json.dumps(span.as_dict(), separators=(",", ":")))
+
+
+def submit_and_wait(
+    transaction: Transaction,
+    client: JsonRpcClient,
+    wallet: Optional[Wallet] = None,
+    *,
+    check_fee: bool = True,
+    autofill: bool = True,
+    fail_hard: bool = False,
+) -> Response:
+    """Instrumented `xrpl.transaction.submit_and_wait` (same arguments, result and exceptions)."""
+    span = Span(transaction.transaction_type.value, transaction.account)
+    start = time.perf_counter()
+    try:
+        if transaction.is_signed():
+            signed = transaction
+        elif wallet is None:
+            raise TransactionNotApplied("Wallet must be provided when submitting an unsigned transaction")
+        elif autofill:
+            signed = allocate_and_sign(transaction, client, wallet, check_fee=check_fee)
+        else:
+            signed = sign(transaction, wallet, multisign=bool(transaction.signers))
+        span.set_tx(signed)
+        mark = time.perf_counter()
+        span.sign_s = mark - start
+        if signed.last_ledger_sequence is None:
+            raise TransactionNotApplied("Transaction must have a `last_ledger_sequence` param.")
+
+        submitted = submit(signed, client, fail_hard=fail_hard).result
+        if (submitted.get("engine_result") == "tefPAST_SEQ" and signed is not transaction
+                and resync_after_past_seq(client, signed)):
+            # The coordinated number was used outside the coordinator: resynced, take the next one.
+            signed = allocate_and_sign(transaction, client, wallet, check_fee=check_fee)
+            span.set_tx(signed)
+            submitted = submit(signed, client, fail_hard=fail_hard).result
+        span.submit_s = time.perf_counter() - mark
+        span.prelim_result = submitted.get("engine_result", "")
+        span.submit_ledger = submitted.get("validated_ledger_index")
+        if span.prelim_result[:3] == "tem":
+            release_sequences(client, [(signed, False)], wallet)
+            raise TransactionNotApplied(f"{span.prelim_result}: {submitted.get('engine_result_message')}")
+        if span.prelim_result[:3] == "tef" and span.prelim_result not in ("tefALREADY", "tefPAST_SEQ") \
+                and coordinator() is not None:
+            # Never applies; with coordinated sequences other processes may be queued behind this number.
+            release_sequences(client, [(signed, False)], wallet)
+            raise TransactionNotApplied(f"{span.prelim_result}: {submitted.get('engine_result_message')}")
+
+        mark = time.perf_counter()
+        try:
+            response = _wait_for_validation(client, span, signed.last_ledger_sequence)
+        except XRPLReliableSubmissionException:
+            release_sequences(client, [(signed, False)], wallet)
+            raise
+        finally:
+            span.validation_s = time.perf_counter() - mark
+        release_sequences(client, [(signed, True)], wallet)
+        if span.engine_result != "tesSUCCESS":
+            raise TransactionNotApplied(f"Transaction failed: {span.engine_result}")
+        return response
+    except Exception as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.total_s = time.perf_counter() - start
+        observe(span)
+
+
+def _wait_for_validation(client: JsonRpcClient, span: Span, last_ledger_sequence: int) -> Response:
+    # One shared waiter per server resolves every pending hash from a single pass per validated ledger.
+    future = waiter_for(client).watch(span.hash, last_ledger_sequence, span.submit_ledger)
+    try:
+        result = future.result()
+    except TransactionExpired as e:
+        raise TransactionNotApplied(f"{e}. Prelim result: {span.prelim_result}") from None
+    finally:
+        span.polls = getattr(future, "scans", 0)
+    span.engine_result = result["meta"]["TransactionResult"]
+    span.ledger_index = result.get("ledger_index")
+    if span.submit_ledger is not None and span.ledger_index is not None:
+        span.ledgers_waited = span.ledger_index - span.submit_ledger
+    return Response(status=ResponseStatus.SUCCESS, result=result)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = METRICS.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # keep scrapes out of stderr
+        pass
+
+
+def serve_metrics(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread; returns the server (port 0 picks a free one)."""
+    global _server
+    _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name="solr-metrics", daemon=True).start()
+    return _server
+
+
+def read_spans(path: str):
+    """Yield spans from a JSON span log written through SOLR_TX_LOG."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                span = Span.__new__(Span)
+                for k in Span.__slots__:
+                    setattr(span, k, row.get(k))
+                span.polls = span.polls or 0
+                yield span
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transaction telemetry: summarize span logs or serve them as metrics")
+    parser.add_argument("logs", nargs="+", help="JSON span log(s) written via SOLR_TX_LOG")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT", help="Serve the aggregated /metrics on PORT")
+    args = parser.parse_args()
+
+    for path in args.logs:
+        for span in read_spans(path):
+            METRICS.record(span)
+    if args.serve is None:
+        sys.stdout.write(METRICS.render())
+        return
+    server = serve_metrics(args.serve)
+    print(f"Metrics on http://127.0.0.1:{server.server_address[1]}/metrics")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+tx_pipeline.py
+==============
+
+Sequence / Ticket pipelining for batches of XRPL transactions sent from one
+account.
+
+The single-offer helpers submit a transaction and block until it validates
+before building the next one, so N transactions cost N ledgers.  Here a chunk
+of transactions is signed up front with consecutive `Sequence` numbers (or
+pre-allocated Tickets), every blob is submitted back-to-back into the open
+ledger, and the whole chunk is then handed to the shared validation waiter
+(validation_waiter.py).  A chunk normally settles in one or two ledgers.
+
+Sequence mode is cheapest (no extra objects) but strictly ordered: if one
+transaction is rejected outright, every later sequence in the chunk is stuck
+behind it, so the remainder is re-signed into the next chunk.  Ticket mode
+costs one TicketCreate per chunk (and 2 XRP reserve per outstanding Ticket)
+but lets transactions validate independently of each other.  An account may
+own at most 250 Tickets, so each chunk only creates the Tickets it is short
+of, within what the account can still own.
+
+Malformed transactions (tem) and tef rejections other than a stale Sequence,
+Ticket or LastLedgerSequence would fail the same way when re-signed, so they
+are dropped at once; transactions that were merely stuck behind them are
+re-signed without using up an attempt.
+
+Dependencies:
+    pip install xrpl-py
+"""
+import dataclasses
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from xrpl.account import get_next_valid_seq_number
+from xrpl.clients import JsonRpcClient
+from xrpl.ledger import get_fee, get_latest_validated_ledger_sequence
+from xrpl.models.requests import AccountInfo
+from xrpl.models.transactions import TicketCreate
+from xrpl.models.transactions.transaction import Transaction
+from xrpl.transaction import sign, submit
+from xrpl.wallet import Wallet
+
+from sequence_coordinator import allocate_block, coordinator, release_sequences
+from telemetry import Span, observe, submit_and_wait
+from validation_waiter import TransactionExpired, waiter_for
+
+# Ledgers a pipelined transaction may wait before it is considered expired.
+LEDGER_WINDOW = 20
+# rippled queues at most 10 transactions per account once the open ledger is
+# full; staying a little above that still settles in a couple of ledgers.
+DEFAULT_CHUNK_SIZE = 50
+# Protocol limits on Tickets created by one TicketCreate and owned by one account.
+MAX_TICKETS_PER_TX = 250
+MAX_OWNED_TICKETS = 250
+# tef results a re-signed copy can get past; every other tef (and every tem) is final.
+RETRYABLE_TEF = ("tefPAST_SEQ", "tefNO_TICKET", "tefMAX_LEDGER")
+MAX_ATTEMPTS = 3
+# Signing accounts pipelined concurrently by fan_out.
+DEFAULT_WORKERS = 8
+
+
+def created_node(meta: dict, entry_type: str) -> Optional[dict]:
+    """Return the first CreatedNode of `entry_type` in transaction metadata."""
+    for node in (meta or {}).get("AffectedNodes", []):
+        created = node.get("CreatedNode")
+        if created and created.get("LedgerEntryType") == entry_type:
+            return created
+    return None
+
+
+def create_tickets(client: JsonRpcClient, wallet: Wallet, count: int) -> List[int]:
+    """Create `count` Tickets for `wallet` and return their TicketSequence values."""
+    tickets: List[int] = []
+    while len(tickets) < count:
+        batch = min(count - len(tickets), MAX_TICKETS_PER_TX)
+        tx = TicketCreate(account=wallet.classic_address, ticket_count=batch)
+        result = submit_and_wait(tx, client, wallet).result
+        for node in result.get("meta", {}).get("AffectedNodes", []):
+            created = node.get("CreatedNode")
+            if created and created.get("LedgerEntryType") == "Ticket":
+                tickets.append(created["NewFields"]["TicketSequence"])
+    return sorted(tickets)
+
+
+def owned_tickets(client: JsonRpcClient, account: str) -> int:
+    """Tickets `account` owns in the validated ledger (AccountRoot TicketCount)."""
+    result = client.request(AccountInfo(account=account, ledger_index="validated")).result
+    if "error" in result:
+        raise RuntimeError(f"account_info {account}: {result['error']}")
+    return int(result["account_data"].get("TicketCount", 0))
+
+
+def _hard_rejection(row: dict) -> bool:
+    result = row.get("engine_result") or ""
+    return row["status"] == "rejected" and (
+        result.startswith("tem") or (result.startswith("tef") and result not in RETRYABLE_TEF))
+
+
+def sign_chunk(
+    client: JsonRpcClient,
+    wallet: Wallet,
+    txs: List[Transaction],
+    tickets: Optional[List[int]] = None,
+) -> List[Transaction]:
+    """Sign a chunk offline with one account_info/fee/ledger lookup for all of it.
+
+    With `tickets`, each transaction consumes one Ticket (Sequence 0);
+    otherwise they get consecutive Sequence numbers from the current ledger,
+    or from the sequence coordinator when SOLR_SEQUENCE_DB is set.
+    """
+    fee = get_fee(client)
+    last_ledger = get_latest_validated_ledger_sequence(client) + LEDGER_WINDOW
+    if tickets is None:
+        sequences = allocate_block(client, wallet.classic_address, len(txs))
+        if sequences is None:
+            first_seq = get_next_valid_seq_number(wallet.classic_address, client)
+            sequences = range(first_seq, first_seq + len(txs))
+        numbering = [{"sequence": s} for s in sequences]
+    else:
+        numbering = [{"sequence": 0, "ticket_sequence": t} for t in tickets[: len(txs)]]
+    signed = []
+    for tx, fields in zip(txs, numbering):
+        tx = dataclasses.replace(tx, fee=fee, last_ledger_sequence=last_ledger, **fields)
+        signed.append(sign(tx, wallet))
+    if tickets is None and coordinator() is not None:
+        coordinator().signed(signed)
+    return signed
+
+
+def submit_chunk(client: JsonRpcClient, signed: List[Transaction], ordered: bool) -> List[dict]:
+    """Submit signed blobs back-to-back; return one status row per transaction.
+
+    In `ordered` (sequence) mode submission stops at the first hard rejection,
+    since every later sequence would be stuck behind the gap.
+    """
+    rows = []
+    blocked = False
+    for tx in signed:
+        row = {"hash": tx.get_hash(), "last_ledger_sequence": tx.last_ledger_sequence, "polls": 0}
+        if blocked:
+            row["status"] = "not_submitted"
+            rows.append(row)
+            continue
+        start = time.perf_counter()
+        submitted = submit(tx, client).result
+        row["submitted_at"] = time.perf_counter()
+        row["submit_s"] = row["submitted_at"] - start
+        row["submit_ledger"] = submitted.get("validated_ledger_index")
+        engine_result = submitted.get("engine_result", "")
+        row["engine_result"] = row["prelim_result"] = engine_result
+        if engine_result.startswith(("tes", "ter", "tec")):
+            row["status"] = "pending"
+        else:
+            row["status"] = "rejected"
+            blocked = ordered
+        rows.append(row)
+    return rows
+
+
+def wait_for_chunk(client: JsonRpcClient, rows: List[dict]) -> None:
+    """Wait until every pending row is validated or past its LastLedgerSequence.
+
+    The whole chunk is handed to the shared validation waiter, so waiting
+    costs one `ledger` call per poll however many rows are pending.  Rows are
+    updated in place with `validated`, `ledger_index`, `meta` and the final
+    `engine_result`.  Raises WaiterUnavailable if the server stops answering
+    while rows are pending (their outcome is then unknown).
+    """
+    waiter = waiter_for(client)
+    pending = [(row, waiter.watch(row["hash"], row["last_ledger_sequence"], row.get("submit_ledger")))
+               for row in rows if row["status"] == "pending"]
+    for row, future in pending:
+        try:
+            result = future.result()
+        except TransactionExpired:
+            row["status"] = "expired"
+        else:
+            row["status"] = "validated"
+            row["ledger_index"] = result.get("ledger_index")
+            row["meta"] = result.get("meta", {})
+            row["engine_result"] = row["meta"].get("TransactionResult", row.get("engine_result"))
+        row["validation_s"] = time.perf_counter() - row["submitted_at"]
+        row["polls"] = getattr(future, "scans", 0)
+
+
+def _observe(tx: Transaction, row: dict, sign_s: float, attempt: int) -> None:
+    """Record a telemetry span for one pipelined transaction (sign time is the chunk average)."""
+    span = Span(tx.transaction_type.value, tx.account)
+    span.set_tx(tx)
+    span.attempt, span.polls, span.sign_s = attempt, row["polls"], sign_s
+    span.submit_s, span.submit_ledger = row.get("submit_s"), row.get("submit_ledger")
+    span.prelim_result = row.get("prelim_result")
+    if row["status"] == "validated":
+        span.engine_result, span.ledger_index = row["engine_result"], row.get("ledger_index")
+        span.validation_s = row["validation_s"]
+        span.total_s = sign_s + span.submit_s + span.validation_s
+        if span.submit_ledger is not None and span.ledger_index is not None:
+            span.ledgers_waited = span.ledger_index - span.submit_ledger
+    else:
+        span.error = row["status"]
+    observe(span)
+
+
+def pipeline(
+    client: JsonRpcClient,
+    wallet: Wallet,
+    txs: Iterable[Transaction],
+    use_tickets: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_validated: Optional[Callable[[List[Tuple[int, dict]]], None]] = None,
+) -> List[dict]:
+    """Submit `txs` from `wallet` in pipelined chunks and wait for all of them.
+
+    Returns one row per input transaction, in input order, with keys `hash`,
+    `status` (validated / rejected / expired / not_submitted),
+    `engine_result`, `ledger_index` and `meta`.  Transactions that were never
+    applied (expired, or rejected with a result a new signature can get past)
+    are re-signed into the next chunk up to MAX_ATTEMPTS times; those only
+    stuck behind a rejection are re-signed without counting an attempt.
+    With `use_tickets`, Tickets are created per chunk; RuntimeError if the
+    account already owns MAX_OWNED_TICKETS and none are left.  `on_validated` is called after
+    every chunk with the (input index, row) pairs it validated, so callers
+    can record outcomes before the rest of the batch is submitted.
+    """
+    txs = list(txs)
+    results: Dict[int, dict] = {}
+    attempts = [0] * len(txs)
+    queue = list(range(len(txs)))
+    tickets: List[int] = []  # created for this batch and not consumed yet
+
+    while queue:
+        chunk, queue = queue[:chunk_size], queue[chunk_size:]
+        chunk_tickets = None
+        if use_tickets:
+            if len(tickets) < len(chunk):
+                room = MAX_OWNED_TICKETS - owned_tickets(client, wallet.classic_address)
+                tickets += create_tickets(client, wallet, max(0, min(len(chunk) - len(tickets), room)))
+            if not tickets:
+                raise RuntimeError(f"{wallet.classic_address} already owns {MAX_OWNED_TICKETS} Tickets")
+            chunk, queue = chunk[: len(tickets)], chunk[len(tickets):] + queue
+            chunk_tickets, tickets = tickets[: len(chunk)], tickets[len(chunk):]
+        start = time.perf_counter()
+        signed = sign_chunk(client, wallet, [txs[i] for i in chunk], tickets=chunk_tickets)
+        sign_s = (time.perf_counter() - start) / len(signed)
+        rows = submit_chunk(client, signed, ordered=not use_tickets)
+        wait_for_chunk(client, rows)
+        if not use_tickets:
+            release_sequences(client, [(tx, row["status"] == "validated") for tx, row in zip(signed, rows)], wallet)
+
+        retry, validated = [], []
+        for pos, (i, row) in enumerate(zip(chunk, rows)):
+            results[i] = row
+            if row["status"] == "not_submitted":
+                retry.append(i)  # stuck behind a rejection, never tried
+                continue
+            attempts[i] += 1
+            _observe(signed[pos], row, sign_s, attempts[i])
+            if row["status"] == "validated":
+                validated.append((i, row))
+                continue
+            if use_tickets and row.get("engine_result") != "tefNO_TICKET":
+                # Only validated transactions consume their Ticket; reuse it.
+                tickets.append(chunk_tickets[pos])
+            if not _hard_rejection(row) and attempts[i] < MAX_ATTEMPTS:
+                retry.append(i)
+        if on_validated is not None and validated:
+            on_validated(validated)
+        queue = retry + queue
+    return [results[i] for i in range(len(txs))]
+
+
+def fan_out(client: JsonRpcClient, work: Dict[str, tuple], workers: int = DEFAULT_WORKERS) -> Dict[str, List[dict]]:
+    """Run one pipeline per signing account concurrently: {key: (wallet, txs)} -> {key: rows}."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {key: pool.submit(pipeline, client, wallet, txs) for key, (wallet, txs) in work.items() if txs}
+        return {key: future.result() for key, future in futures.items()}
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+validation_waiter.py
+====================
+
+One shared waiter for every transaction the process has in flight.
+
+xrpl-py's reliable submission polls `tx` for its one hash every second until
+it validates or expires, so N pending transactions cost N polling loops (and
+N blocked threads issuing requests).  Here pending hashes live in one table
+indexed by LastLedgerSequence, and a single background thread per server
+walks the validated ledgers in order:
+
+  - one `ledger` request (transactions, expanded) per poll: while the next
+    ledger is not validated yet nothing else is asked; once it is, every
+    pending hash found in it is resolved with its `tx`-shaped result
+  - every pending transaction whose LastLedgerSequence is now at or below
+    the validated ledger, and that was not found, is resolved as expired
+  - a transaction whose window starts before the ledgers the waiter has
+    scanned (the waiter was idle, or the thread fell behind) gets one `tx`
+    lookup, and is then tracked like the others
+
+RPC load is one `ledger` call per poll interval whether 1 or 10,000
+transactions are waiting.  Callers get a concurrent.futures.Future per hash
+(`watch`) or block on it (`wait`).  telemetry.submit_and_wait and
+tx_pipeline.wait_for_chunk wait through it, so every script that submits
+(mint_solr_token, burn_and_mint_solrai_nft, solrai_nft_flow, nft_market,
+send_payment, fleet_flow, ...) shares the one waiter per RPC URL.
+
+Usage:
+    python validation_waiter.py bench --txs 200 --close-interval 0.5   # RPC calls: per-hash polling vs waiter
+
+Dependencies:
+    pip install xrpl-py
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, Optional, Set
+
+from xrpl.clients import JsonRpcClient
+from xrpl.models.requests import Ledger, Tx
+
+POLL_INTERVAL = 0.5
+# Consecutive failed polls (about 10 s at POLL_INTERVAL) before pending waits fail instead of retrying forever.
+MAX_POLL_ERRORS = 20
+# Further behind than this, jump to the latest validated ledger and look stragglers up by hash.
+MAX_CATCH_UP = 10
+
+
+class TransactionExpired(Exception):
+    """The transaction was not in any ledger up to its LastLedgerSequence; it can never validate."""
+
+    def __init__(self, tx_hash: str, last_ledger_sequence: int, validated: int):
+        super().__init__(f"The latest validated ledger sequence {validated} is greater than LastLedgerSequence "
+                         f"{last_ledger_sequence} in the transaction")
+        self.tx_hash = tx_hash
+        self.last_ledger_sequence = last_ledger_sequence
+        self.validated = validated
+
+
+class WaiterUnavailable(Exception):
+    """The server could not be polled MAX_POLL_ERRORS times in a row; the transaction's outcome is unknown."""
+
+    def __init__(self, tx_hash: str, errors: int, last_error: Optional[str]):
+        super().__init__(f"gave up waiting for {tx_hash} after {errors} failed polls: {last_error}")
+        self.tx_hash = tx_hash
+
+
+class _Pending:
+    __slots__ = ("tx_hash", "last_ledger_sequence", "first_ledger", "future", "scans")
+
+    def __init__(self, tx_hash: str, last_ledger_sequence: int, first_ledger: int):
+        self.tx_hash = tx_hash
+        self.last_ledger_sequence = last_ledger_sequence
+        self.first_ledger = first_ledger
+        self.future: Future = Future()
+        self.scans = 0
+
+
+def _tx_result(entry: dict, ledger_index: int, close_time: Optional[int]) -> dict:
+    """A `tx`-shaped result from an expanded `ledger` entry (API v1 flattened or v2 tx_json/meta)."""
+    if "tx_json" in entry:
+        result = dict(entry["tx_json"], hash=entry["hash"], meta=entry.get("meta"))
+    else:
+        result = dict(entry)
+        result["meta"] = result.pop("metaData", None) or result.get("meta")
+    result.update(ledger_index=ledger_index, validated=True)
+    if close_time is not None:
+        result.setdefault("date", close_time)
+    return result
+
+
+class ValidationWaiter:
+    """Pending hashes by LastLedgerSequence, resolved from one pass over each validated ledger."""
+
+    def __init__(self, url: str, poll_interval: float = POLL_INTERVAL):
+        self.client = JsonRpcClient(url)
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.pending: Dict[str, _Pending] = {}
+        self.by_last_ledger: Dict[int, Set[str]] = {}
+        self.scanned: Optional[int] = None  # last validated ledger scanned
+        self.covered_from: Optional[int] = None  # first ledger of the contiguous scanned range
+        self.thread: Optional[threading.Thread] = None
+        self.stats = Counter()
+        self.last_error: Optional[str] = None
+        self.consecutive_errors = 0
+        self.max_errors = MAX_POLL_ERRORS
+
+    # --- callers ---
+    def watch(self, tx_hash: str, last_ledger_sequence: int, submitted_ledger: Optional[int] = None) -> Future:
+        """Future resolving to the validated `tx` result, or raising TransactionExpired / WaiterUnavailable.
+
+        `submitted_ledger` is the validated ledger index when the transaction was submitted (the submit
+        response's validated_ledger_index); the transaction cannot be in that ledger or an earlier one.
+        """
+        with self.lock:
+            entry = self.pending.get(tx_hash)
+            if entry is None:
+                first = submitted_ledger + 1 if submitted_ledger is not None else 0
+                if self.scanned is not None and first <= self.scanned:
+                    first = 0  # ledgers it may be in were scanned before it was registered: look it up
+                entry = self.pending[tx_hash] = _Pending(tx_hash, last_ledger_sequence, first)
+                self.by_last_ledger.setdefault(last_ledger_sequence, set()).add(tx_hash)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="solr-validation", daemon=True)
+                self.thread.start()
+        return entry.future
+
+    def wait(self, tx_hash: str, last_ledger_sequence: int, submitted_ledger: Optional[int] = None,
+             timeout: Optional[float] = None) -> dict:
+        return self.watch(tx_hash, last_ledger_sequence, submitted_ledger).result(timeout)
+
+    # --- background thread ---
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception as e:  # a transport error must not strand the waiters; retry next interval
+                self.stats["errors"] += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.consecutive_errors += 1
+                if self.consecutive_errors >= self.max_errors:
+                    self._fail_all(e)
+            else:
+                self.consecutive_errors = 0
+            with self.lock:
+                if not self.pending:
+                    self.thread = None
+                    # Idle: the scanned range goes stale, so the next caller starts a fresh one.
+                    self.scanned = self.covered_from = None
+                    return
+
+    def _fail_all(self, error: Exception) -> None:
+        """Fail every pending wait: the server has been unreachable for too long to keep callers blocked."""
+        with self.lock:
+            failed = list(self.pending.values())
+            self.pending.clear()
+            self.by_last_ledger.clear()
+        for p in failed:
+            self.stats["abandoned"] += 1
+            exc = WaiterUnavailable(p.tx_hash, self.consecutive_errors, self.last_error)
+            exc.__cause__ = error
+            p.future.set_exception(exc)
+        self.consecutive_errors = 0
+
+    def _ledger(self, ledger_index) -> Optional[dict]:
+        """The validated ledger, or None while it is not validated yet; other RPC errors raise."""
+        self.stats["ledger_calls"] += 1
+        result = self.client.request(Ledger(ledger_index=ledger_index, transactions=True, expand=True)).result
+        if "error" in result:
+            if result["error"] == "lgrNotFound":
+                return None
+            raise RuntimeError(f"ledger {ledger_index}: {result.get('error_message') or result['error']}")
+        if not result.get("validated"):
+            return None
+        return result
+
+    def poll(self) -> None:
+        """One pass: scan newly validated ledgers (one call each), then look up stragglers, then expire."""
+        ledgers = []
+        if self.scanned is None:
+            with self.lock:
+                earliest = min((p.first_ledger for p in self.pending.values()), default=0)
+            if earliest:  # start where the oldest submission can first appear; the catch-up cap still applies
+                self.scanned = earliest - 1
+        if self.scanned is None:
+            latest = self._ledger("validated")
+            if latest is None:
+                return
+            ledgers.append(latest)
+        else:
+            while len(ledgers) <= MAX_CATCH_UP:
+                nxt = self._ledger(self.scanned + len(ledgers) + 1)
+                if nxt is None:
+                    break
+                ledgers.append(nxt)
+            if len(ledgers) > MAX_CATCH_UP:  # far behind: restart the range at the latest ledger
+                latest = self._ledger("validated")
+                ledgers = [latest] if latest is not None else ledgers
+                self.covered_from = None
+        if not ledgers:
+            return
+
+        for ledger in ledgers:
+            index = int(ledger.get("ledger_index") or ledger["ledger"]["ledger_index"])
+            header = ledger.get("ledger", {})
+            if self.covered_from is None:
+                self.covered_from = index
+            self.scanned = index
+            self.stats["ledgers_scanned"] += 1
+            with self.lock:
+                wanted = [e for e in header.get("transactions", []) if isinstance(e, dict)
+                          and e.get("hash") in self.pending]
+            for entry in wanted:
+                self._resolve(entry["hash"], _tx_result(entry, index, header.get("close_time")))
+
+        with self.lock:
+            stragglers = [p for p in self.pending.values() if p.first_ledger < self.covered_from]
+            for p in self.pending.values():
+                p.scans += 1
+        for p in stragglers:
+            self.stats["tx_lookups"] += 1
+            result = self.client.request(Tx(transaction=p.tx_hash)).result
+            if "error" in result and result["error"] != "txnNotFound":
+                # only "not found" may count towards expiry; anything else says nothing about the transaction
+                raise RuntimeError(f"tx {p.tx_hash}: {result.get('error_message') or result['error']}")
+            if result.get("validated"):
+                self._resolve(p.tx_hash, result)
+            else:
+                p.first_ledger = self.covered_from
+
+        validated = self.scanned
+        with self.lock:
+            expired_keys = [k for k in self.by_last_ledger if k <= validated]
+            expired = [self.pending[h] for k in expired_keys for h in self.by_last_ledger.pop(k) if h in self.pending]
+            for p in expired:
+                del self.pending[p.tx_hash]
+        for p in expired:
+            self.stats["expired"] += 1
+            p.future.set_exception(TransactionExpired(p.tx_hash, p.last_ledger_sequence, validated))
+
+    def _resolve(self, tx_hash: str, result: dict) -> None:
+        with self.lock:
+            p = self.pending.pop(tx_hash, None)
+            if p is None:
+                return
+            bucket = self.by_last_ledger.get(p.last_ledger_sequence)
+            if bucket is not None:
+                bucket.discard(tx_hash)
+                if not bucket:
+                    del self.by_last_ledger[p.last_ledger_sequence]
+        self.stats["resolved"] += 1
+        p.future.scans = p.scans  # ledger passes spent waiting (telemetry reports it as polls)
+        p.future.set_result(result)
+
+
+_waiters: Dict[str, ValidationWaiter] = {}
+_waiters_lock = threading.Lock()
+
+
+def waiter_for(client: JsonRpcClient) -> ValidationWaiter:
+    """The process-wide waiter for `client`'s server."""
+    with _waiters_lock:
+        waiter = _waiters.get(client.url)
+        if waiter is None:
+            waiter = _waiters[client.url] = ValidationWaiter(client.url)
+        return waiter
+
+
+# --- measurement against the simulator ---
+def bench(txs: int, close_interval: float) -> dict:
+    """Calls spent waiting for `txs` pipelined payments to validate: per-hash `tx` polling vs the waiter.
+
+    Waiting starts as each chunk is submitted, as it does for concurrent submit_and_wait callers.
+    """
+    from bench_flows import simulator
+    from xrpl.models.transactions import Payment
+    from tx_pipeline import DEFAULT_CHUNK_SIZE, sign_chunk, submit_chunk
+
+    report = {"txs": txs, "close_interval_s": close_interval, "poll_interval_s": POLL_INTERVAL, "modes": {}}
+    for mode in ("per_hash_polling", "shared_waiter"):
+        with simulator(f"waiter:{mode}", close_interval) as (ledger, client, wallets):
+            sender, dest = wallets["buyer"], wallets["owner"].classic_address
+            calls = Counter()
+            pending, futures, submitting = [], [], True
+            lock = threading.Lock()
+
+            def poll_per_hash():
+                # The calls N submit_and_wait loops make: one `tx` per pending hash per interval
+                # (issued from one thread here; N real threads overrun the simulator's HTTP backlog).
+                while submitting or pending:
+                    time.sleep(POLL_INTERVAL)
+                    validated = ledger.validated_index
+                    with lock:
+                        snapshot = list(pending)
+                    finished = set()
+                    for row in snapshot:
+                        calls["tx"] += 1
+                        if (client.request(Tx(transaction=row["hash"])).result.get("validated")
+                                or row["last_ledger_sequence"] <= validated):
+                            finished.add(row["hash"])
+                    with lock:
+                        pending[:] = [r for r in pending if r["hash"] not in finished]
+
+            waiter = ValidationWaiter(client.url)
+            poller = threading.Thread(target=poll_per_hash, daemon=True)
+            if mode == "per_hash_polling":
+                poller.start()
+            t0 = time.perf_counter()
+            waited = 0
+            for start in range(0, txs, DEFAULT_CHUNK_SIZE):
+                payments = [Payment(account=sender.classic_address, destination=dest, amount="1000")
+                            for _ in range(min(DEFAULT_CHUNK_SIZE, txs - start))]
+                rows = [r for r in submit_chunk(client, sign_chunk(client, sender, payments), ordered=True)
+                        if r["status"] == "pending"]
+                waited += len(rows)
+                if mode == "per_hash_polling":
+                    with lock:
+                        pending.extend(rows)
+                else:
+                    futures += [waiter.watch(r["hash"], r["last_ledger_sequence"], r["submit_ledger"])
+                                for r in rows]
+            submitting = False
+            if mode == "per_hash_polling":
+                poller.join()
+            for f in futures:
+                f.exception()  # validated or expired, either way done waiting
+            if mode == "shared_waiter":
+                calls.update(ledger=waiter.stats["ledger_calls"], tx=waiter.stats["tx_lookups"])
+            report["modes"][mode] = {"waited": waited, "seconds": round(time.perf_counter() - t0, 3),
+                                     "wait_calls": sum(calls.values()), "by_method": dict(calls)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared ledger-validation waiter")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("bench", help="RPC calls to wait for N transactions against the simulator")
+    p.add_argument("--txs", type=int, nargs="+", default=[10, 100, 200])
+    p.add_argument("--close-interval", type=float, default=0.5)
+    p.add_argument("--output", default="-")
+    args = parser.parse_args()
+
+    report = [bench(n, args.close_interval) for n in args.txs]
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+vintage_render.py
+=================
+
+Incremental re-render of a vintage's certificate images, build-system style.
+
+After one config field changes (facility_location, price_usd, ...) the only
+option with generate_rec_image.py is to re-render every certificate.  Here
+each output image has a manifest entry holding the SHA-256 of its render
+inputs (generate_rec_image.render_inputs: the config fields the renderer
+reads, resolved per site through the registry; the screenshot's content
+digest; the certificate's burn hash and NFTokenID; RENDER_VERSION).  A run:
+
+  - reads the certificates from fleet_flow reports (JSONL) and keeps those
+    of --vintage (the report's vintage, else the site's latest)
+  - recomputes every input hash; site configs and screenshot digests are
+    resolved once per site and file, so this is a dict and a hash per cert
+  - renders only outputs whose hash changed or whose file is missing, in
+    worker processes, each written to a temporary name and renamed
+  - deletes outputs still in the manifest but no longer in the set
+  - rewrites the manifest (atomically) only when something changed
+
+Outputs go to <out-dir>/<vintage>/<NFTokenID or burn hash>.png, next to that
+vintage's manifest.json.
+
+Usage:
+    python vintage_render.py render --vintage 2025 --certificates fleet.jsonl [--workers 4]
+    python vintage_render.py render --vintage 2025 --certificates fleet.jsonl --dry-run
+    python vintage_render.py bench --certs 10000 --sites 500     # no-op, one site changed, orphans
+
+Dependencies:
+    pip install Pillow qrcode[pil] PyYAML
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from generate_rec_image import DEFAULT_SCREENSHOT, generate_rec, render_inputs, render_key, sample_fields
+from site_registry import DEFAULT_REGISTRY, Registry, RegistryError
+from solr_config import Config, config_or_exit
+
+DEFAULT_OUT_DIR = "certificates"
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+KWH_PER_CERT = 1000.0
+
+
+def read_certificates(paths: Iterable[str]) -> List[dict]:
+    """Certificate rows with a burn hash from fleet_flow --report files."""
+    certs = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    if row.get("burn_tx"):
+                        certs.append(row)
+    return certs
+
+
+def load_manifest(path: Path) -> Dict[str, str]:
+    """{output name: input hash} recorded by the last run; empty if missing or from another manifest version."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data.get("outputs", {}) if data.get("version") == MANIFEST_VERSION else {}
+
+
+def save_manifest(path: Path, vintage: str, outputs: Dict[str, str]) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "vintage": vintage, "outputs": outputs},
+                              sort_keys=True, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def plan(certs: List[dict], registry: Registry, config: Config, vintage: str) -> dict:
+    """{"wanted": {name: job}, "skipped": {reason: count}} for the certificates of `vintage`."""
+    bases: Dict[Optional[str], Optional[tuple]] = {}  # site -> (config, screenshot, inputs minus cert fields)
+    wanted: Dict[str, dict] = {}
+    skipped: Dict[str, int] = {}
+    for cert in certs:
+        site_id = cert.get("site_id")
+        cert_vintage = cert.get("vintage")
+        if cert_vintage is None:  # reports written before fleet_flow recorded it: the site's latest vintage
+            chosen = registry.vintage(site_id) if site_id else None
+            cert_vintage = chosen.vintage if chosen else config.vintage
+        if cert_vintage != vintage:
+            continue
+        if site_id not in bases:
+            try:
+                cfg = registry.site_config(config, site_id, vintage) if site_id else config
+            except RegistryError:
+                bases[site_id] = None
+            else:
+                screenshot = Path(cfg.get("image_path") or DEFAULT_SCREENSHOT)
+                bases[site_id] = (cfg, screenshot, render_inputs(cfg, screenshot, "", None, KWH_PER_CERT))
+        if bases[site_id] is None:
+            skipped["unknown_site"] = skipped.get("unknown_site", 0) + 1
+            continue
+        cfg, screenshot, inputs = bases[site_id]
+        nft_id = cert.get("nft_id")
+        inputs = dict(inputs, burn_tx=cert["burn_tx"], nft_id=nft_id)
+        name = (nft_id or cert["burn_tx"]).upper()
+        wanted[name] = {"key": render_key(inputs), "config": cfg, "screenshot": screenshot,
+                        "burn_tx": cert["burn_tx"], "nft_id": nft_id}
+    return {"wanted": wanted, "skipped": skipped}
+
+
+def _render(job: tuple) -> Optional[str]:
+    """Render one certificate (in a worker process); returns an error message or None."""
+    path, cfg, screenshot, burn_tx, nft_id = job
+    tmp = path.with_name(f".{path.stem}.{os.getpid()}.png")
+    try:
+        generate_rec(output=tmp, screenshot=screenshot, kwh=KWH_PER_CERT, burn_tx=burn_tx, nft_id=nft_id,
+                     config=cfg, **sample_fields(cfg))
+        os.replace(tmp, path)
+    except Exception as e:  # one bad certificate must not stop the rest of the vintage
+        tmp.unlink(missing_ok=True)
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def build(certs: List[dict], registry: Registry, config: Config, vintage: str, out_dir: str = DEFAULT_OUT_DIR,
+          workers: Optional[int] = None, dry_run: bool = False) -> dict:
+    """Bring <out_dir>/<vintage> up to date; returns counts, timings and any render errors."""
+    start = time.perf_counter()
+    target = Path(out_dir) / vintage
+    manifest_path = target / MANIFEST
+    recorded = load_manifest(manifest_path)
+    planned = plan(certs, registry, config, vintage)
+    wanted = planned["wanted"]
+    present = {entry.name for entry in os.scandir(target)} if target.is_dir() else set()
+    stale = [name for name, job in wanted.items() if recorded.get(name) != job["key"] or f"{name}.png" not in present]
+    orphans = [name for name in recorded if name not in wanted]
+    summary = {"vintage": vintage, "certificates": len(wanted), "stale": len(stale), "orphans": len(orphans),
+               "skipped": planned["skipped"], "plan_s": round(time.perf_counter() - start, 4)}
+    if dry_run:
+        return dict(summary, stale_outputs=sorted(stale), orphan_outputs=sorted(orphans))
+
+    errors: Dict[str, str] = {}
+    outputs = dict(recorded)
+    start = time.perf_counter()
+    try:
+        if stale:
+            target.mkdir(parents=True, exist_ok=True)
+            # generate_rec only calls config.get(), and a plain dict pickles to the worker processes
+            fields = {id(job["config"]): {k: v for k, v in job["config"].items() if v is not None}
+                      for job in (wanted[name] for name in stale)}
+            jobs = [(target / f"{name}.png", fields[id(wanted[name]["config"])], wanted[name]["screenshot"],
+                     wanted[name]["burn_tx"], wanted[name]["nft_id"]) for name in stale]
+            workers = workers or os.cpu_count() or 1
+            if workers > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(_render, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+            else:
+                results = [_render(job) for job in jobs]
+            for name, error in zip(stale, results):
+                if error is None:
+                    outputs[name] = wanted[name]["key"]
+                else:
+                    errors[name] = error
+                    outputs.pop(name, None)
+        for name in orphans:
+            (target / f"{name}.png").unlink(missing_ok=True)
+            del outputs[name]
+    finally:
+        if outputs != recorded:
+            save_manifest(manifest_path, vintage, outputs)
+    return dict(summary, rendered=len(stale) - len(errors), deleted=len(orphans), errors=errors,
+                render_s=round(time.perf_counter() - start, 3))
+
+
+# --- measurement ---
+def bench(certs: int, sites: int, workers: Optional[int]) -> dict:
+    """No-op run over `certs` certificates, then one site changed, then orphans.
+
+    The initial state is seeded from the plan (manifest entries plus placeholder files) instead of rendering every
+    certificate; only the changed site's certificates are actually rendered.
+    """
+    import hashlib
+    import tempfile
+
+    from site_registry import Owner, Site, Vintage
+
+    config = config_or_exit(missing_ok=True)
+    vintage = "2025"
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = Registry(str(Path(tmp) / "registry.sqlite"))
+        registry.add(Owner("o0"), *[Site(f"s{i}", "o0", f"Facility {i}", "Newark, NJ", "US-NJ", "NJ-SREC")
+                                    for i in range(sites)],
+                     *[Vintage(f"s{i}", vintage) for i in range(sites)])
+        rows = [{"site_id": f"s{i % sites}", "vintage": vintage,
+                 "burn_tx": hashlib.sha256(f"burn{i}".encode()).hexdigest().upper(),
+                 "nft_id": hashlib.sha256(f"nft{i}".encode()).hexdigest().upper()} for i in range(certs)]
+        out_dir = Path(tmp) / "out"
+        target = out_dir / vintage
+        target.mkdir(parents=True)
+        wanted = plan(rows, registry, config, vintage)["wanted"]
+        for name in wanted:
+            (target / f"{name}.png").write_bytes(b"")
+        save_manifest(target / MANIFEST, vintage, {name: job["key"] for name, job in wanted.items()})
+
+        start = time.perf_counter()
+        noop = build(rows, registry, config, vintage, str(out_dir), workers)
+        noop["seconds"] = round(time.perf_counter() - start, 4)
+
+        registry.conn.execute("UPDATE sites SET facility_location = ? WHERE id = ?", ("Trenton, NJ", "s0"))
+        registry.conn.commit()
+        registry.close()
+        registry = Registry(str(Path(tmp) / "registry.sqlite"))
+        start = time.perf_counter()
+        changed = build(rows, registry, config, vintage, str(out_dir), workers)
+        changed["seconds"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        orphaned = build(rows[: certs - 100], registry, config, vintage, str(out_dir), workers)
+        orphaned["seconds"] = round(time.perf_counter() - start, 4)
+        files = sum(1 for entry in os.scandir(target) if entry.name.endswith(".png"))
+        registry.close()
+    return {"certs": certs, "sites": sites, "noop": noop, "one_site_changed": changed,
+            "100_removed": orphaned, "files_left": files}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally re-render a vintage's certificate images")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("render", help="Render stale certificates of a vintage and delete orphans")
+    p.add_argument("--config", default="config.yaml")
+    p.add_argument("--vintage", required=True)
+    p.add_argument("--certificates", nargs="+", required=True, help="fleet_flow --report JSONL file(s)")
+    p.add_argument("--registry", default=DEFAULT_REGISTRY)
+    p.add_argument("--out-dir", default=DEFAULT_OUT_DIR)
+    p.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+    p.add_argument("--dry-run", action="store_true", help="List stale and orphaned outputs without touching them")
+    p = sub.add_parser("bench", help="No-op and incremental runs over a synthetic vintage")
+    p.add_argument("--certs", type=int, default=10000)
+    p.add_argument("--sites", type=int, default=500)
+    p.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        print(json.dumps(bench(args.certs, args.sites, args.workers), indent=2))
+        return
+    config = config_or_exit(args.config, missing_ok=True)
+    try:
+        certs = read_certificates(args.certificates)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+    registry = Registry(args.registry)
+    try:
+        summary = build(certs, registry, config, args.vintage, args.out_dir, args.workers, args.dry_run)
+    finally:
+        registry.close()
+    print(json.dumps(summary, indent=2))
+    if summary.get("errors"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,6 @@ import argparse
 import json
 import os
 from urllib.parse import urlencode, quote
-import os
 from xumm_client import create_payload, payload_sign_url_from_response, XummError
 
 # Xumm sign request deep link patterns documented by Xumm/Xaman
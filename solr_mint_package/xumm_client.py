@@ -10,7 +10,6 @@ credentials secret and create server-side endpoints to create payloads.
 Docs: https://xumm.readme.io/reference/xapps-jwt-endpoints
 """
 import os
-import requests
 from typing import Dict, Any
 
 
@@ -31,6 +30,8 @@ def create_payload(tx_json: Dict[str, Any], metadata: Dict[str, Any] = None) ->
     if not api_key or not api_secret:
         raise XummError("XUMM_API_KEY and XUMM_API_SECRET must be set in environment")
 
+    import requests  # only needed once credentials are configured; keeps fallback mode light
+
     url = f"{XUMM_BASE}/platform/payload"
     body = {
         "txjson": tx_json,